@@ -0,0 +1,15 @@
+from internal.handler import AppHandler, OpenApiHandler, WebAppHandler
+from internal.server import Asgi
+from .app import app
+from .module import injector
+
+# 调试会话、WebApp会话以及开放API会话的SSE接口在事件循环中异步执行，其余接口仍交由Flask处理
+# 启动方式: uvicorn app.http.asgi:asgi_app
+asgi_app = Asgi(
+    app,
+    stream_views={
+        "llmops.debug_chat": injector.get(AppHandler).create_debug_chat_stream,
+        "llmops.web_app_chat": injector.get(WebAppHandler).create_web_app_chat_stream,
+        "openapi.chat": injector.get(OpenApiHandler).create_chat_stream,
+    },
+)
@@ -1,11 +1,28 @@
-from .agent_queue_manager import AgentQueueManager
+from .agent_chat_stream import AgentChatStream
+from .agent_executor import AgentExecutor, get_agent_executor, get_async_agent_executor, get_tool_executor
+from .agent_thought_accumulator import AgentThoughtAccumulator
+from .agent_queue_manager import AgentQueueManager, get_agent_queue_manager_class
+from .async_agent_queue_manager import AsyncAgentQueueManager
 from .base_agent import BaseAgent
 from .function_call_agent import FunctionCallAgent
 from .react_agent import ReACTAgent
+from .redis_stream_agent_queue_manager import RedisStreamAgentQueueManager
+from .speculative_retrieval import SpeculativeRetrieval, get_speculative_retrieval_stats
 
 __all__ = [
+    "AgentChatStream",
+    "AgentExecutor",
+    "get_agent_executor",
+    "get_async_agent_executor",
+    "get_tool_executor",
+    "AgentThoughtAccumulator",
     "AgentQueueManager",
+    "AsyncAgentQueueManager",
+    "RedisStreamAgentQueueManager",
+    "get_agent_queue_manager_class",
     "BaseAgent",
     "FunctionCallAgent",
-    "ReACTAgent"
+    "ReACTAgent",
+    "SpeculativeRetrieval",
+    "get_speculative_retrieval_stats",
 ]
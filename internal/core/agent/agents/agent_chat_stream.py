@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Generator, Iterable, Optional, Union
+
+from internal.core.agent.entities.agent_entity import AgentState
+from internal.core.agent.entities.queue_entity import AgentThought, AgentThoughtDelta
+from internal.core.tracing import get_tracer
+from internal.exception import TooManyRequestsException
+from internal.lib.helper import format_sse_event
+from .agent_queue_manager import AgentQueueManager, get_agent_queue_manager_class
+from .agent_thought_accumulator import AgentThoughtAccumulator
+from .base_agent import BaseAgent
+
+
+class AgentChatStream:
+    """智能体会话流，统一处理推理事件的聚合、SSE格式化以及结束后的持久化
+
+    同一个会话流既可以通过stream()在执行池中同步执行(WSGI)，也可以通过astream()在事件循环中异步执行(ASGI)。
+    开启合并模式后，同一个事件id的agent_message增量会先缓冲，达到coalesce_ms毫秒或coalesce_bytes字节时合并成一帧输出，
+    缓冲检测在收到新事件时进行，其他事件到达或流结束时会先输出缓冲内容，保证事件顺序不变。
+    """
+
+    def __init__(
+            self,
+            agent: BaseAgent,
+            agent_state: AgentState,
+            include: set[str],
+            extra_data: dict[str, Any],
+            on_finish: Callable[..., None],
+            on_reject: Optional[Callable[[], None]] = None,
+            coalesce_ms: Optional[int] = None,
+            coalesce_bytes: Optional[int] = None,
+    ):
+        """构造函数，传递智能体、智能体状态、SSE数据包含的字段、附加数据、结束回调、任务被拒绝时的回调以及合并参数
+
+        结束回调以agent_thoughts关键字参数调用，异步执行时会在其他线程/会话中调用，因此需提前绑定好id等数据。
+        合并参数未传递时读取SSE_COALESCE_MS/SSE_COALESCE_BYTES配置，均为0时不合并。
+        """
+        self.agent = agent
+        self.agent_state = agent_state
+        self.include = include
+        self.extra_data = extra_data
+        self.on_finish = on_finish
+        self.on_reject = on_reject
+        self.coalesce_ms = int(os.getenv("SSE_COALESCE_MS", 0)) if coalesce_ms is None else coalesce_ms
+        self.coalesce_bytes = int(os.getenv("SSE_COALESCE_BYTES", 0)) if coalesce_bytes is None else coalesce_bytes
+        self._accumulator = AgentThoughtAccumulator()
+
+        # 合并模式下缓冲的增量事件
+        self._pending: list[AgentThoughtDelta] = []
+        self._pending_bytes = 0
+        self._pending_since = 0.0
+
+        # 输出统计，便于对比合并前后的帧数、字节数以及序列化CPU耗时
+        self.stats = {"events": 0, "frames": 0, "bytes": 0, "cpu_ms": 0.0}
+
+    def stream(self) -> Generator[str, None, None]:
+        """同步流式输出，立即向执行池提交智能体任务，执行池饱和时执行拒绝回调并抛出429异常
+
+        提交前记录任务的附加数据，断线重连时返回与实时数据帧一致的内容。
+        """
+        self.agent_state["task_id"] = self.agent_state.get("task_id") or uuid.uuid4()
+        try:
+            agent_thoughts_stream = self.agent.stream(self.agent_state)
+        except TooManyRequestsException:
+            if self.on_reject:
+                self.on_reject()
+            raise
+        get_agent_queue_manager_class().set_task_extra_data(self.agent_state["task_id"], self.extra_data)
+        return self._handle_stream(agent_thoughts_stream)
+
+    @classmethod
+    def resume(
+            cls,
+            agent_queue_manager: AgentQueueManager,
+            task_id: uuid.UUID,
+            last_event_id: str,
+            include: set[str],
+            extra_data: Optional[dict[str, Any]] = None,
+    ) -> Generator[str, None, None]:
+        """断线重连，从队列管理器中继续读取事件并转换成SSE数据帧，任务记录的附加数据会覆盖传递的默认附加数据"""
+        task_extra_data = None
+        for agent_thought in agent_queue_manager.resume(task_id, last_event_id):
+            # 1.任务归属校验通过后再读取附加数据
+            if task_extra_data is None:
+                task_extra_data = {**(extra_data or {}), **agent_queue_manager.get_task_extra_data(task_id)}
+            data = {
+                **agent_thought.model_dump(include=include),
+                "id": str(agent_thought.id),
+                **task_extra_data,
+                "task_id": str(agent_thought.task_id),
+            }
+            yield format_sse_event(agent_thought.event, data, agent_thought.stream_id)
+
+    def _handle_stream(self, agent_thoughts_stream: Iterable[AgentThought]) -> Generator[str, None, None]:
+        """流式事件处理器，聚合推理过程并在结束后存储到数据库"""
+        for agent_thought in agent_thoughts_stream:
+            frames = self._process(agent_thought)
+            if frames:
+                yield frames
+        frames = self._finish_frames()
+        if frames:
+            yield frames
+        self._persist()
+
+    def astream(
+            self,
+            run_sync: Optional[Callable[[Callable[[], None]], Awaitable[None]]] = None,
+    ) -> AsyncGenerator[str, None]:
+        """异步流式输出，需在事件循环中调用，立即启动智能体任务，异步执行名额已满时抛出429异常
+
+        拒绝回调以及结束回调均涉及数据库操作，不能阻塞事件循环，因此被拒绝时由调用方在线程中执行on_reject，
+        结束回调默认放到线程中执行，可传递run_sync自定义执行方式(例如附带应用上下文)。
+        """
+        agent_thoughts_stream = self.agent.astream(self.agent_state)
+        return self._ahandle_stream(agent_thoughts_stream, run_sync)
+
+    async def _ahandle_stream(
+            self,
+            agent_thoughts_stream: AsyncIterator[AgentThought],
+            run_sync: Optional[Callable[[Callable[[], None]], Awaitable[None]]] = None,
+    ) -> AsyncGenerator[str, None]:
+        """异步流式事件处理器，聚合推理过程并在结束后存储到数据库"""
+        async for agent_thought in agent_thoughts_stream:
+            frames = self._process(agent_thought)
+            if frames:
+                yield frames
+        frames = self._finish_frames()
+        if frames:
+            yield frames
+
+        await (run_sync(self._persist) if run_sync else asyncio.to_thread(self._persist))
+
+    def _persist(self) -> None:
+        """执行结束回调，将聚合后的推理过程存储到数据库"""
+        with get_tracer().span("chat.persist", {"task_id": str(self.agent_state.get("task_id", ""))}):
+            self.on_finish(agent_thoughts=self.agent_thoughts)
+
+    def _process(self, agent_thought: Union[AgentThought, AgentThoughtDelta]) -> str:
+        """聚合单条推理事件并转换成SSE数据帧，合并模式下增量事件可能被缓冲而返回空字符串"""
+        start = time.thread_time()
+        self.stats["events"] += 1
+
+        # 1.将数据聚合到累加器中，便于存储到数据库服务中
+        self._accumulator.add(agent_thought)
+
+        # 2.未开启合并或非增量事件时，先输出缓冲内容再输出当前事件
+        if not (self.coalesce_ms or self.coalesce_bytes) or not isinstance(agent_thought, AgentThoughtDelta):
+            frames = self._flush_pending() + self._format(agent_thought)
+            return self._record(frames, start)
+
+        # 3.事件id变化时先输出之前的缓冲内容，再缓冲当前增量
+        frames = ""
+        if self._pending and self._pending[0].id != agent_thought.id:
+            frames = self._flush_pending()
+        if not self._pending:
+            self._pending_since = time.perf_counter()
+        self._pending.append(agent_thought)
+        self._pending_bytes += len(agent_thought.thought.encode("utf-8"))
+
+        # 4.缓冲时长或字节数达到阈值时合并输出
+        if (
+                (self.coalesce_ms and (time.perf_counter() - self._pending_since) * 1000 >= self.coalesce_ms)
+                or (self.coalesce_bytes and self._pending_bytes >= self.coalesce_bytes)
+        ):
+            frames += self._flush_pending()
+        return self._record(frames, start)
+
+    def _flush_pending(self) -> str:
+        """将缓冲的增量事件合并成一个增量事件并转换成SSE数据帧"""
+        if not self._pending:
+            return ""
+        first, last = self._pending[0], self._pending[-1]
+        merged = AgentThoughtDelta(
+            id=first.id,
+            task_id=first.task_id,
+            thought="".join(delta.thought for delta in self._pending),
+            latency=last.latency,
+        )
+        merged.stream_id = last.stream_id
+        self._pending = []
+        self._pending_bytes = 0
+        return self._format(merged)
+
+    def _finish_frames(self) -> str:
+        """流结束时输出剩余缓冲内容，并记录本次会话流的输出统计"""
+        frames = self._record(self._flush_pending(), time.thread_time())
+        logging.info(
+            "智能体会话流输出统计: 事件数%(events)d, 数据帧%(frames)d, 字节数%(bytes)d, 序列化CPU耗时%(cpu_ms).2fms",
+            self.stats,
+        )
+        return frames
+
+    def _format(self, agent_thought: Union[AgentThought, AgentThoughtDelta]) -> str:
+        """将单条推理事件转换成SSE数据帧"""
+        data = {
+            **agent_thought.model_dump(include=self.include),
+            "id": str(agent_thought.id),
+            **self.extra_data,
+            "task_id": str(agent_thought.task_id),
+        }
+        return format_sse_event(agent_thought.event, data, agent_thought.stream_id)
+
+    def _record(self, frames: str, start: float) -> str:
+        """记录输出的帧数、字节数以及处理耗费的CPU时间"""
+        if frames:
+            self.stats["frames"] += frames.count("\n\n")
+            self.stats["bytes"] += len(frames.encode("utf-8"))
+        self.stats["cpu_ms"] += (time.thread_time() - start) * 1000
+        return frames
+
+    @property
+    def agent_thoughts(self) -> list[AgentThought]:
+        """聚合后的推理过程列表"""
+        return self._accumulator.agent_thoughts
@@ -0,0 +1,191 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from internal.exception import TooManyRequestsException
+
+
+class AgentExecutor:
+    """有界智能体执行池，限制单个进程内同时运行的智能体数量，并对排队请求做准入控制
+
+    运行中的任务达到max_concurrency后新请求进入等待，等待数达到max_queue_depth或等待超过queue_timeout秒时
+    立即抛出TooManyRequestsException(HTTP 429)，并根据最近任务的平均耗时估算Retry-After。
+    """
+
+    def __init__(self, max_concurrency: int = 32, max_queue_depth: int = 64, queue_timeout: float = 10):
+        """构造函数，传递最大并发数、最大排队数以及排队超时时间(秒)"""
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_queue_depth = max(max_queue_depth, 0)
+        self.queue_timeout = max(queue_timeout, 0)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="agent")
+        self._condition = threading.Condition()
+        self._running = 0
+        self._waiting = 0
+
+        # 统计数据
+        self._submitted_total = 0
+        self._rejected_total = 0
+        self._completed_total = 0
+        self._wait_time_total = 0.0
+        self._max_wait_time = 0.0
+        self._avg_run_time = 0.0
+
+    def submit(self, fn: Callable, *args: Any, **kwargs: Any) -> Future:
+        """申请执行名额并提交任务，执行池饱和时抛出TooManyRequestsException"""
+        # 1.申请执行名额，必要时排队等待
+        wait_time = self._acquire()
+
+        # 2.提交到线程池执行，任务结束后释放名额并记录耗时
+        start_time = time.perf_counter()
+
+        def run() -> Any:
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._release(time.perf_counter() - start_time)
+
+        with self._condition:
+            self._submitted_total += 1
+            self._wait_time_total += wait_time
+            self._max_wait_time = max(self._max_wait_time, wait_time)
+        return self._pool.submit(run)
+
+    def reserve(self) -> Callable[[], None]:
+        """不排队直接占用执行名额，返回释放名额的回调(可重复调用)，执行池饱和时抛出TooManyRequestsException
+
+        用于在事件循环中执行的异步智能体，事件循环不能阻塞等待名额，因此名额已满或已有请求在排队时直接拒绝。
+        """
+        # 1.存在空闲名额并且没有排队请求时占用，否则快速拒绝
+        with self._condition:
+            if self._running >= self.max_concurrency or self._waiting:
+                self._rejected_total += 1
+                raise self._too_many_requests()
+            self._running += 1
+            self._submitted_total += 1
+
+        # 2.构建只生效一次的释放回调
+        start_time = time.perf_counter()
+        released = threading.Event()
+
+        def release() -> None:
+            if not released.is_set():
+                released.set()
+                self._release(time.perf_counter() - start_time)
+
+        return release
+
+    def _acquire(self) -> float:
+        """申请执行名额，返回排队等待的时长"""
+        with self._condition:
+            # 1.存在空闲名额直接占用
+            if self._running < self.max_concurrency:
+                self._running += 1
+                return 0.0
+
+            # 2.排队人数已满则快速拒绝
+            if self._waiting >= self.max_queue_depth:
+                self._rejected_total += 1
+                raise self._too_many_requests()
+
+            # 3.排队等待空闲名额，超时则拒绝
+            self._waiting += 1
+            start_time = time.perf_counter()
+            try:
+                acquired = self._condition.wait_for(
+                    lambda: self._running < self.max_concurrency,
+                    timeout=self.queue_timeout,
+                )
+                if not acquired:
+                    self._rejected_total += 1
+                    raise self._too_many_requests()
+                self._running += 1
+                return time.perf_counter() - start_time
+            finally:
+                self._waiting -= 1
+
+    def _release(self, run_time: float) -> None:
+        """释放执行名额，并使用指数移动平均更新任务耗时"""
+        with self._condition:
+            self._running -= 1
+            self._completed_total += 1
+            self._avg_run_time = run_time if self._avg_run_time == 0 else 0.9 * self._avg_run_time + 0.1 * run_time
+            self._condition.notify()
+
+    def _too_many_requests(self) -> TooManyRequestsException:
+        """构建429异常，Retry-After按排队任务全部执行完毕所需的大致时间估算"""
+        estimated = self._avg_run_time * (self._waiting + 1) / self.max_concurrency
+        retry_after = min(max(math.ceil(estimated), 1), 60)
+        return TooManyRequestsException("当前请求过多，请稍后重试", retry_after=retry_after)
+
+    def stats(self) -> dict[str, Any]:
+        """获取执行池统计数据，涵盖运行数、排队数、拒绝数以及排队等待耗时"""
+        with self._condition:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue_depth": self.max_queue_depth,
+                "running": self._running,
+                "queue_depth": self._waiting,
+                "submitted_total": self._submitted_total,
+                "rejected_total": self._rejected_total,
+                "completed_total": self._completed_total,
+                "avg_wait_ms": round(self._wait_time_total / self._submitted_total * 1000, 2)
+                if self._submitted_total else 0,
+                "max_wait_ms": round(self._max_wait_time * 1000, 2),
+                "avg_run_ms": round(self._avg_run_time * 1000, 2),
+            }
+
+
+_agent_executor = None
+_agent_executor_lock = threading.Lock()
+
+
+def get_agent_executor() -> AgentExecutor:
+    """获取当前进程共享的智能体执行池，通过AGENT_MAX_CONCURRENCY/AGENT_MAX_QUEUE_DEPTH/AGENT_QUEUE_TIMEOUT配置"""
+    global _agent_executor
+    if _agent_executor is None:
+        with _agent_executor_lock:
+            if _agent_executor is None:
+                _agent_executor = AgentExecutor(
+                    max_concurrency=int(os.getenv("AGENT_MAX_CONCURRENCY", 32)),
+                    max_queue_depth=int(os.getenv("AGENT_MAX_QUEUE_DEPTH", 64)),
+                    queue_timeout=float(os.getenv("AGENT_QUEUE_TIMEOUT", 10)),
+                )
+    return _agent_executor
+
+
+_async_agent_executor = None
+
+
+def get_async_agent_executor() -> AgentExecutor:
+    """获取当前进程共享的异步智能体准入控制池，只通过reserve占用名额，不会创建线程
+
+    异步智能体不占用独立线程，因此与同步执行池分开计数，通过AGENT_MAX_ASYNC_CONCURRENCY配置最大并发数。
+    """
+    global _async_agent_executor
+    if _async_agent_executor is None:
+        with _agent_executor_lock:
+            if _async_agent_executor is None:
+                _async_agent_executor = AgentExecutor(
+                    max_concurrency=int(os.getenv("AGENT_MAX_ASYNC_CONCURRENCY", 256)),
+                    max_queue_depth=0,
+                )
+    return _async_agent_executor
+
+
+_tool_executor = None
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """获取当前进程共享的工具执行线程池，用于并行执行同一轮中的多个工具调用，通过AGENT_TOOL_MAX_WORKERS配置"""
+    global _tool_executor
+    if _tool_executor is None:
+        with _agent_executor_lock:
+            if _tool_executor is None:
+                _tool_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("AGENT_TOOL_MAX_WORKERS", 64)),
+                    thread_name_prefix="agent-tool",
+                )
+    return _tool_executor
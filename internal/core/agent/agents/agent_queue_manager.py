@@ -1,3 +1,4 @@
+import os
 import queue
 import time
 import uuid
@@ -5,9 +6,9 @@ from queue import Queue
 from uuid import UUID
 
 from redis import Redis
-from typing_extensions import Generator
+from typing_extensions import Generator, Union
 
-from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
+from internal.core.agent.entities.queue_entity import AgentThought, AgentThoughtDelta, QueueEvent
 from internal.entity.conversation_entity import InvokeFrom
 from internal.exception import FailException
 
@@ -84,7 +85,7 @@ class AgentQueueManager:
         """停止监听队列信息"""
         self.queue(task_id).put(None)
 
-    def publish(self, task_id: UUID, agent_thought: AgentThought) -> None:
+    def publish(self, task_id: UUID, agent_thought: Union[AgentThought, AgentThoughtDelta]) -> None:
         """发布事件信息到队列"""
         # 1.将事件添加到队列中
         self.queue(task_id).put(agent_thought)
@@ -118,24 +119,39 @@ class AgentQueueManager:
 
         # 2.检测队列是否存在，如果不存在则创建队列，并添加缓存键标识
         if not q:
-            # 3.添加缓存键标识
-            user_prefix = "account" if self.invoke_from in [
-                InvokeFrom.WEB_APP, InvokeFrom.DEBUGGER, InvokeFrom.ASSISTANT_AGENT,
-            ] else "end-user"
-
-            # 4.设置任务对应的缓存键，代表这次任务已经开始了
-            self.redis_client.setex(
-                self.generate_task_belong_cache_key(task_id),
-                1800,
-                f"{user_prefix}-{str(self.user_id)}",
-            )
-
-            # 5.将任务队列添加到队列字典中
+            # 3.设置任务对应的缓存键，代表这次任务已经开始了
+            self._set_task_belong(task_id)
+
+            # 4.将任务队列添加到队列字典中
             q = Queue()
             self._queues[str(task_id)] = q
 
         return q
 
+    def resume(self, task_id: UUID, last_event_id: str) -> Generator:
+        """断线重连后从指定事件继续读取，内存队列只存在于执行任务的进程中，不支持该操作"""
+        raise FailException("当前智能体队列后端不支持断线重连")
+
+    @classmethod
+    def set_task_extra_data(cls, task_id: UUID, extra_data: dict) -> None:
+        """记录任务数据帧附带的额外数据(例如会话id、消息id)，用于断线重连时补全数据帧，内存队列不支持断线重连，无需记录"""
+        pass
+
+    def get_task_extra_data(self, task_id: UUID) -> dict:
+        """获取任务数据帧附带的额外数据，不存在时返回空字典"""
+        return {}
+
+    def _set_task_belong(self, task_id: UUID) -> None:
+        """设置任务归属缓存键，代表这次任务已经开始了"""
+        user_prefix = "account" if self.invoke_from in [
+            InvokeFrom.WEB_APP, InvokeFrom.DEBUGGER, InvokeFrom.ASSISTANT_AGENT,
+        ] else "end-user"
+        self.redis_client.setex(
+            self.generate_task_belong_cache_key(task_id),
+            1800,
+            f"{user_prefix}-{str(self.user_id)}",
+        )
+
     @classmethod
     def set_stop_flag(cls, task_id: UUID, invoke_from: InvokeFrom, user_id: UUID) -> None:
         """根据传递的任务id+调用来源停止某次会话"""
@@ -168,3 +184,11 @@ class AgentQueueManager:
     def generate_task_stopped_cache_key(cls, task_id: UUID) -> str:
         """生成任务已停止的缓存键"""
         return f"generate_task_stopped:{str(task_id)}"
+
+
+def get_agent_queue_manager_class() -> type[AgentQueueManager]:
+    """根据AGENT_QUEUE_BACKEND环境变量获取智能体队列管理器类，memory为进程内队列，redis_stream为Redis Streams"""
+    if os.getenv("AGENT_QUEUE_BACKEND", "memory") == "redis_stream":
+        from .redis_stream_agent_queue_manager import RedisStreamAgentQueueManager
+        return RedisStreamAgentQueueManager
+    return AgentQueueManager
@@ -0,0 +1,73 @@
+from typing import Union
+
+from internal.core.agent.entities.queue_entity import AgentThought, AgentThoughtDelta, QueueEvent
+
+
+class AgentThoughtAccumulator:
+    """推理事件聚合器，将流式发布的推理事件按事件id聚合成完整的推理过程
+
+    agent_message事件的推理内容与答案以片段列表的方式记录，只在读取结果时拼接一次，避免每个token都
+    复制一次完整的AgentThought并拼接越来越长的字符串；其余事件直接覆盖。
+    """
+
+    # 统计事件中需要覆盖到聚合结果上的字段
+    _message_stat_fields = (
+        "message_token_count", "message_unit_price", "message_price_unit",
+        "answer_token_count", "answer_unit_price", "answer_price_unit",
+        "total_token_count", "total_price", "token_count_estimated",
+    )
+
+    def __init__(self) -> None:
+        """构造函数，初始化聚合数据"""
+        self._agent_thoughts: dict[str, AgentThought] = {}
+        self._thought_parts: dict[str, list[str]] = {}
+        self._answer_parts: dict[str, list[str]] = {}
+        self._answer: list[str] = []
+
+    def add(self, agent_thought: Union[AgentThought, AgentThoughtDelta]) -> None:
+        """聚合单条推理事件，ping事件直接忽略"""
+        # 1.ping事件无需聚合
+        if agent_thought.event == QueueEvent.PING:
+            return
+        event_id = str(agent_thought.id)
+
+        # 2.除了agent_message事件为叠加，其他事件均为覆盖
+        if agent_thought.event != QueueEvent.AGENT_MESSAGE:
+            self._agent_thoughts[event_id] = agent_thought
+            self._thought_parts.pop(event_id, None)
+            self._answer_parts.pop(event_id, None)
+            return
+
+        # 3.记录推理内容与答案片段
+        self._answer.append(agent_thought.answer)
+        existing = self._agent_thoughts.get(event_id)
+        if existing is None or event_id not in self._thought_parts:
+            self._agent_thoughts[event_id] = agent_thought.to_agent_thought() \
+                if isinstance(agent_thought, AgentThoughtDelta) else agent_thought.model_copy()
+            self._thought_parts[event_id] = [agent_thought.thought]
+            self._answer_parts[event_id] = [agent_thought.answer]
+            return
+        self._thought_parts[event_id].append(agent_thought.thought)
+        self._answer_parts[event_id].append(agent_thought.answer)
+
+        # 4.增量事件只更新耗时，统计事件额外携带消息列表以及token、价格等数据
+        existing.latency = agent_thought.latency
+        if not isinstance(agent_thought, AgentThoughtDelta):
+            # 增量事件不携带消息列表，只在统计事件中更新
+            existing.message = agent_thought.message or existing.message
+            for name in self._message_stat_fields:
+                setattr(existing, name, getattr(agent_thought, name))
+
+    @property
+    def agent_thoughts(self) -> list[AgentThought]:
+        """聚合后的推理过程列表，读取时拼接agent_message事件的内容片段"""
+        for event_id, thought_parts in self._thought_parts.items():
+            agent_thought = self._agent_thoughts[event_id]
+            agent_thought.thought = "".join(thought_parts)
+            agent_thought.answer = "".join(self._answer_parts[event_id])
+        return list(self._agent_thoughts.values())
+
+    @property
+    def answer(self) -> str:
+        """所有agent_message事件拼接后的完整答案"""
+        return "".join(self._answer)
@@ -0,0 +1,137 @@
+import asyncio
+import time
+import uuid
+from typing import AsyncGenerator, Optional, Union
+from uuid import UUID
+
+from internal.core.agent.entities.queue_entity import AgentThought, AgentThoughtDelta, QueueEvent
+from internal.entity.conversation_entity import InvokeFrom
+from internal.exception import FailException
+from .agent_queue_manager import AgentQueueManager
+
+
+class AsyncAgentQueueManager(AgentQueueManager):
+    """基于asyncio.Queue的智能体队列管理器，用于在事件循环中执行智能体并流式输出
+
+    每个流式响应不再独占一个线程，而是以协程的方式等待事件；智能体中的同步节点可能运行在线程池中，
+    因此发布事件时会通过call_soon_threadsafe切回事件循环。停止标识由管理器自身的单个后台任务
+    统一使用MGET批量检测，管理器监听的所有任务共用一次Redis查询，检测状态不在实例之间共享。
+    """
+    listen_timeout: int = 600  # 监听超时时间
+    ping_interval: int = 10  # ping事件间隔
+    stop_check_interval: float = 1  # 停止标识检测间隔
+
+    def __init__(self, user_id: UUID, invoke_from: InvokeFrom) -> None:
+        """构造函数，必须在事件循环中创建，发布事件时会切回该事件循环"""
+        super().__init__(user_id=user_id, invoke_from=invoke_from)
+        self._loop = asyncio.get_running_loop()
+        self._async_queues: dict[str, asyncio.Queue] = {}
+
+        # 正在监听的任务id，以及批量检测停止标识的后台任务
+        self._listening: set[str] = set()
+        self._stop_watcher: Optional[asyncio.Task] = None
+
+    def queue(self, task_id: UUID) -> asyncio.Queue:
+        """根据传递的task_id获取对应的异步任务队列，需在事件循环线程中首次创建"""
+        q = self._async_queues.get(str(task_id))
+        if q is None:
+            self._set_task_belong(task_id)
+            q = asyncio.Queue()
+            self._async_queues[str(task_id)] = q
+        return q
+
+    def _put(self, task_id: UUID, item: Optional[Union[AgentThought, AgentThoughtDelta]]) -> None:
+        """往异步队列中添加数据，在非事件循环线程中调用时切回事件循环执行"""
+        q = self._async_queues.get(str(task_id))
+        if q is None:
+            return
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            q.put_nowait(item)
+        else:
+            self._loop.call_soon_threadsafe(q.put_nowait, item)
+
+    def stop_listen(self, task_id: UUID) -> None:
+        """停止监听队列信息"""
+        self._put(task_id, None)
+
+    def publish(self, task_id: UUID, agent_thought: Union[AgentThought, AgentThoughtDelta]) -> None:
+        """发布事件信息到异步队列"""
+        # 1.将事件添加到队列中
+        self._put(task_id, agent_thought)
+
+        # 2.检测事件类型是否为需要停止的类型，涵盖STOP、ERROR、TIMEOUT、AGENT_END
+        if agent_thought.event in [QueueEvent.STOP, QueueEvent.ERROR, QueueEvent.TIMEOUT, QueueEvent.AGENT_END]:
+            self.stop_listen(task_id)
+
+    def listen(self, task_id: UUID):
+        """异步队列只能在事件循环中读取，同步监听请使用alisten替代"""
+        raise FailException("异步智能体队列不支持同步监听，请使用alisten")
+
+    async def alisten(self, task_id: UUID) -> AsyncGenerator[AgentThought, None]:
+        """异步监听队列返回的数据，超时、停止或读取到结束标识时结束"""
+        # 1.定义基础数据记录开始时间、最后一次ping通时间，并登记到停止标识检测任务中
+        q = self.queue(task_id)
+        start_time = time.time()
+        last_ping_time = 0
+        self._watch(task_id)
+
+        try:
+            while True:
+                # 2.等待队列数据，最多等待到下一次ping的时间点
+                elapsed_time = time.time() - start_time
+                wait_time = max((last_ping_time + 1) * self.ping_interval - elapsed_time, 0.01)
+                try:
+                    item = await asyncio.wait_for(q.get(), timeout=wait_time)
+                    if item is None:
+                        break
+                    yield item
+                except asyncio.TimeoutError:
+                    pass
+
+                # 3.每10秒发起一个ping事件
+                elapsed_time = time.time() - start_time
+                if elapsed_time // self.ping_interval > last_ping_time:
+                    last_ping_time = elapsed_time // self.ping_interval
+                    yield AgentThought(id=uuid.uuid4(), task_id=task_id, event=QueueEvent.PING)
+
+                # 4.判断总耗时是否超时，如果超时则往队列中添加超时事件
+                if elapsed_time >= self.listen_timeout:
+                    self.publish(task_id, AgentThought(id=uuid.uuid4(), task_id=task_id, event=QueueEvent.TIMEOUT))
+        finally:
+            self._listening.discard(str(task_id))
+            self._async_queues.pop(str(task_id), None)
+
+    def _watch(self, task_id: UUID) -> None:
+        """登记需要检测停止标识的任务，并按需启动后台检测任务"""
+        self._listening.add(str(task_id))
+        if self._stop_watcher is None or self._stop_watcher.done():
+            self._stop_watcher = self._loop.create_task(self._watch_stop_flags())
+
+    async def _watch_stop_flags(self) -> None:
+        """后台任务，每秒使用一次MGET批量检测所有监听中任务的停止标识"""
+        while self._listening:
+            await asyncio.sleep(self.stop_check_interval)
+
+            # 1.批量读取停止标识，Redis调用放到线程池中避免阻塞事件循环
+            listening = list(self._listening)
+            if not listening:
+                break
+            keys = [self.generate_task_stopped_cache_key(task_id) for task_id in listening]
+            try:
+                results = await asyncio.to_thread(self.redis_client.mget, keys)
+            except Exception:
+                continue
+
+            # 2.已停止的任务发布停止事件，并移出检测列表
+            for task_id, result in zip(listening, results):
+                if result is not None and task_id in self._listening:
+                    self._listening.discard(task_id)
+                    self.publish(UUID(task_id), AgentThought(
+                        id=uuid.uuid4(),
+                        task_id=UUID(task_id),
+                        event=QueueEvent.STOP,
+                    ))
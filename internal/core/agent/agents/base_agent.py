@@ -1,27 +1,42 @@
+import asyncio
+import logging
+import threading
+import time
 import uuid
 from abc import abstractmethod
-from threading import Thread
 
 from langchain_core.load import Serializable
-from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
 from langgraph.graph.state import CompiledStateGraph
 from pydantic import PrivateAttr, ConfigDict
-from typing_extensions import Optional, Any, Iterator
+from typing_extensions import Optional, Any, Iterator, AsyncIterator, ClassVar
 
 from internal.core.agent.entities.agent_entity import AgentConfig, AgentState
 from internal.core.agent.entities.queue_entity import AgentResult, AgentThought, QueueEvent
 from internal.core.language_model.entities.model_entity import BaseLanguageModel
+from internal.core.tracing import get_tracer
 from internal.exception import FailException
-from .agent_queue_manager import AgentQueueManager
+from .agent_executor import get_agent_executor, get_async_agent_executor
+from .agent_thought_accumulator import AgentThoughtAccumulator
+from .agent_queue_manager import AgentQueueManager, get_agent_queue_manager_class
+from .async_agent_queue_manager import AsyncAgentQueueManager
 
 
 class BaseAgent(Serializable, Runnable):
-    """基于Runnable的基础智能体基类"""
+    """基于Runnable的基础智能体基类
+
+    图结构与具体的应用配置无关，因此每个智能体类只构建、编译一次并在所有请求间共享，节点执行时通过
+    RunnableConfig中的configurable.agent获取本次请求对应的智能体实例(LLM、应用配置、队列管理器)。
+    """
     llm: BaseLanguageModel
     agent_config: AgentConfig
     _agent: CompiledStateGraph = PrivateAttr(None)
     _agent_queue_manager: AgentQueueManager = PrivateAttr(None)
 
+    # 每个智能体类编译后的图结构程序缓存
+    _compiled_agents: ClassVar[dict[type, CompiledStateGraph]] = {}
+    _compiled_agents_lock: ClassVar[threading.Lock] = threading.Lock()
+
     # Pydantic v2配置
     model_config = ConfigDict(
         arbitrary_types_allowed=True,
@@ -35,19 +50,52 @@ class BaseAgent(Serializable, Runnable):
             *args,
             **kwargs,
     ):
-        """构造函数，初始化智能体图结构程序"""
+        """构造函数，获取当前智能体类共享的图结构程序，队列管理器在执行时按需创建"""
         super().__init__(*args, llm=llm, agent_config=agent_config, **kwargs)
-        self._agent = self._build_agent()
-        self._agent_queue_manager = AgentQueueManager(
-            user_id=agent_config.user_id,
-            invoke_from=agent_config.invoke_from,
-        )
+        self._agent = self._get_compiled_agent()
 
+    @classmethod
+    def _get_compiled_agent(cls) -> CompiledStateGraph:
+        """获取当前智能体类编译后的图结构程序，首次调用时构建并缓存"""
+        agent = cls._compiled_agents.get(cls)
+        if agent is None:
+            with cls._compiled_agents_lock:
+                agent = cls._compiled_agents.get(cls)
+                if agent is None:
+                    agent = cls._build_agent()
+                    cls._compiled_agents[cls] = agent
+        return agent
+
+    @classmethod
     @abstractmethod
-    def _build_agent(self) -> CompiledStateGraph:
-        """构建智能体函数，等待子类实现"""
+    def _build_agent(cls) -> CompiledStateGraph:
+        """构建智能体图结构程序，等待子类实现，节点需使用_node包装，不能直接绑定实例方法"""
         raise NotImplementedError("_build_agent()未实现")
 
+    @classmethod
+    def _node(cls, name: str, async_name: Optional[str] = None) -> RunnableLambda:
+        """将智能体方法包装成图节点，执行时从config中取出本次请求的智能体实例并调用对应的方法(子类重写同样生效)
+
+        每次节点执行都会创建一个agent.node.<节点名>的追踪跨度。
+        """
+        node_name = name.strip("_").removesuffix("_node")
+
+        def func(state: AgentState, config: RunnableConfig) -> AgentState:
+            with get_tracer().span(f"agent.node.{node_name}", {"task_id": str(state["task_id"])}):
+                return getattr(config["configurable"]["agent"], name)(state)
+
+        afunc = None
+        if async_name:
+            async def afunc(state: AgentState, config: RunnableConfig) -> AgentState:
+                with get_tracer().span(f"agent.node.{node_name}", {"task_id": str(state["task_id"])}):
+                    return await getattr(config["configurable"]["agent"], async_name)(state)
+
+        return RunnableLambda(func, afunc=afunc, name=node_name)
+
+    def _graph_config(self) -> RunnableConfig:
+        """构建执行图结构程序的配置，通过configurable传递本次请求的智能体实例"""
+        return {"configurable": {"agent": self}}
+
     def invoke(self, input: AgentState, config: Optional[RunnableConfig] = None,
                **kwargs: Optional[Any]) -> AgentResult:
         """块内容响应，一次性生成完整内容后返回"""
@@ -61,35 +109,23 @@ class BaseAgent(Serializable, Runnable):
             query = content[0]["text"]
             image_urls = [chunk["image_url"]["url"] for chunk in content if chunk.get("type") == "image_url"]
         agent_result = AgentResult(query=query, image_urls=image_urls)
-        agent_thoughts = {}
+        accumulator = AgentThoughtAccumulator()
         for agent_thought in self.stream(input, config):
-            event_id = str(agent_thought.id)
-
-            if agent_thought.event != QueueEvent.PING:
-                if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                    if event_id not in agent_thoughts:
-                        agent_thoughts[event_id] = agent_thought
-                    else:
-                        agent_thoughts[event_id] = agent_thoughts[event_id].model_copy(
-                            update={
-                                "thought": agent_thoughts[event_id].thought + agent_thought.thought,
-                                "answer": agent_thoughts[event_id].answer + agent_thought.answer,
-                                "latency": agent_thought.latency,
-                            })
-                    agent_result.answer += agent_thought.answer
-                else:
-                    agent_thoughts[event_id] = agent_thought
-                    # 10.单独判断是否为异常消息类型，如果是则修改状态并记录错误
-                    if agent_thought.event in [QueueEvent.STOP, QueueEvent.TIMEOUT, QueueEvent.ERROR]:
-                        agent_result.status = agent_thought.event
-                        agent_result.error = agent_thought.observation if agent_thought.event == QueueEvent.ERROR else ""
-        agent_result.agent_thoughts = [agent_thought for agent_thought in agent_thoughts.values()]
+            accumulator.add(agent_thought)
+            # 10.单独判断是否为异常消息类型，如果是则修改状态并记录错误
+            if agent_thought.event in [QueueEvent.STOP, QueueEvent.TIMEOUT, QueueEvent.ERROR]:
+                agent_result.status = agent_thought.event
+                agent_result.error = agent_thought.observation if agent_thought.event == QueueEvent.ERROR else ""
+        # 11.聚合推理过程以及答案
+        agent_thoughts = accumulator.agent_thoughts
+        agent_result.agent_thoughts = agent_thoughts
+        agent_result.answer = accumulator.answer
         # 12.完善message
         agent_result.message = next(
-            (agent_thought.message for agent_thought in agent_thoughts.values()
+            (agent_thought.message for agent_thought in agent_thoughts
              if agent_thought.event == QueueEvent.AGENT_MESSAGE), []
         )
-        agent_result.latency = sum([agent_thought.latency for agent_thought in agent_thoughts.values()])
+        agent_result.latency = sum([agent_thought.latency for agent_thought in agent_thoughts])
         return agent_result
 
     def stream(
@@ -98,7 +134,11 @@ class BaseAgent(Serializable, Runnable):
             config: Optional[RunnableConfig] = None,
             **kwargs: Optional[Any],
     ) -> Iterator[AgentThought]:
-        """流式输出，每个Not节点或者LLM每生成一个token时则会返回相应内容"""
+        """流式输出，每个Not节点或者LLM每生成一个token时则会返回相应内容
+
+        该方法不是生成器，调用时会立即向有界执行池提交任务，执行池饱和时直接抛出TooManyRequestsException，
+        从而保证调用方在返回流式响应之前就能完成准入控制。
+        """
         # 1.检测子类是否已构建Agent智能体，如果未构建则抛出错误
         if not self._agent:
             raise FailException("智能体未成功构建，请核实后尝试")
@@ -108,17 +148,99 @@ class BaseAgent(Serializable, Runnable):
         input["history"] = input.get("history", [])
         input["iteration_count"] = input.get("iteration_count", 0)
 
-        # 3.创建子线程并执行
-        thread = Thread(
-            target=self._agent.invoke,
-            args=(input,)
+        # 3.提交到有界执行池中执行，线程池会吞掉异常，因此需要在回调中记录日志
+        submitted_at = time.perf_counter()
+
+        def run() -> Any:
+            with get_tracer().span("agent.run", self._trace_attributes(input)) as span:
+                span.set_attribute("queue_delay_ms", round((time.perf_counter() - submitted_at) * 1000, 2))
+                return self._agent.invoke(input, self._graph_config())
+
+        future = get_agent_executor().submit(run)
+        future.add_done_callback(
+            lambda f: f.exception() and logging.error("智能体执行出错: %(error)s", {"error": f.exception()})
         )
-        thread.start()
 
         # 4.调用队列管理器监听数据并返回迭代器
-        yield from self._agent_queue_manager.listen(input["task_id"])
+        return self.agent_queue_manager.listen(input["task_id"])
+
+    def astream(
+            self,
+            input: AgentState,
+            config: Optional[RunnableConfig] = None,
+            **kwargs: Optional[Any],
+    ) -> AsyncIterator[AgentThought]:
+        """异步流式输出，在当前事件循环中使用LangGraph的ainvoke执行智能体，LLM节点使用astream输出
+
+        流式响应不占用独立线程，事件通过asyncio.Queue传递，适用于ASGI入口下的高并发SSE场景。
+        该方法不是协程，需在事件循环中调用，调用时立即申请异步执行名额并启动智能体任务，名额已满时直接抛出
+        TooManyRequestsException，从而保证调用方在返回流式响应之前就能完成准入控制。
+        """
+        # 1.检测子类是否已构建Agent智能体，如果未构建则抛出错误
+        if not self._agent:
+            raise FailException("智能体未成功构建，请核实后尝试")
+
+        # 2.构建对应的任务id及数据初始化
+        input["task_id"] = input.get("task_id", uuid.uuid4())
+        input["history"] = input.get("history", [])
+        input["iteration_count"] = input.get("iteration_count", 0)
+
+        # 3.申请异步执行名额，名额在智能体任务结束(含取消)时释放
+        release = get_async_agent_executor().reserve()
+        try:
+            # 4.切换成异步队列管理器，并在启动任务前创建好任务队列
+            self._agent_queue_manager = AsyncAgentQueueManager(
+                user_id=self.agent_config.user_id,
+                invoke_from=self.agent_config.invoke_from,
+            )
+            self._agent_queue_manager.queue(input["task_id"])
+
+            # 5.在当前事件循环中启动智能体任务，任务异常同样需要在回调中记录日志
+            submitted_at = time.perf_counter()
+
+            async def run() -> Any:
+                with get_tracer().span("agent.run", self._trace_attributes(input)) as span:
+                    span.set_attribute("queue_delay_ms", round((time.perf_counter() - submitted_at) * 1000, 2))
+                    return await self._agent.ainvoke(input, self._graph_config())
+
+            task = asyncio.create_task(run())
+        except BaseException:
+            release()
+            raise
+
+        def on_done(t: asyncio.Task) -> None:
+            release()
+            if not t.cancelled() and t.exception():
+                logging.error("智能体执行出错: %(error)s", {"error": t.exception()})
+
+        task.add_done_callback(on_done)
+
+        # 6.返回监听异步队列的迭代器
+        return self._alisten(input["task_id"], task)
+
+    async def _alisten(self, task_id: uuid.UUID, task: asyncio.Task) -> AsyncIterator[AgentThought]:
+        """监听异步队列并返回数据，调用方提前结束迭代(例如客户端断开)时同步取消智能体任务"""
+        try:
+            async for agent_thought in self._agent_queue_manager.alisten(task_id):
+                yield agent_thought
+        finally:
+            if not task.done():
+                task.cancel()
+
+    def _trace_attributes(self, input: AgentState) -> dict[str, Any]:
+        """智能体运行跨度的公共属性"""
+        return {
+            "agent": self.__class__.__name__,
+            "task_id": str(input["task_id"]),
+            "invoke_from": self.agent_config.invoke_from.value,
+        }
 
     @property
     def agent_queue_manager(self) -> AgentQueueManager:
-        """只读属性，返回智能体队列管理器"""
+        """只读属性，返回智能体队列管理器，未通过astream切换成异步队列管理器时按配置创建"""
+        if self._agent_queue_manager is None:
+            self._agent_queue_manager = get_agent_queue_manager_class()(
+                user_id=self.agent_config.user_id,
+                invoke_from=self.agent_config.invoke_from,
+            )
         return self._agent_queue_manager
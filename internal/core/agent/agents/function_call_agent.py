@@ -1,15 +1,24 @@
+import asyncio
+import contextvars
 import json
 import logging
-import re
 import time
 import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass, field
+from uuid import UUID
 
-from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage, RemoveMessage, AIMessage
+from langchain_core.messages import (
+    HumanMessage, SystemMessage, ToolMessage, RemoveMessage, AIMessage, AIMessageChunk, BaseMessage,
+)
 from langchain_core.messages import messages_to_dict
+from langchain_core.messages.ai import add_ai_message_chunks
+from langchain_core.tools import BaseTool
 from langgraph.constants import END
 from langgraph.graph import StateGraph
 from langgraph.graph.state import CompiledStateGraph
-from typing_extensions import Literal
+from pydantic import PrivateAttr
+from typing_extensions import Callable, Literal, Optional, Any
 
 from internal.core.agent.entities.agent_entity import (
     AgentState,
@@ -17,32 +26,91 @@ from internal.core.agent.entities.agent_entity import (
     DATASET_RETRIEVAL_TOOL_NAME,
     MAX_ITERATION_RESPONSE,
 )
-from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
+from internal.core.agent.entities.queue_entity import AgentThought, AgentThoughtDelta, QueueEvent
 from internal.core.language_model.entities.model_entity import ModelFeature
+from internal.core.review import KeywordRedactor, get_keyword_matcher
+from internal.core.tools.tool_cache import CachedTool, get_tool_schema
+from internal.core.tracing import get_tracer
 from internal.exception import FailException
+from .agent_executor import get_tool_executor
 from .base_agent import BaseAgent
+from .speculative_retrieval import SpeculativeRetrieval
+
+# 工具在共享线程池中排队时检测其是否已开始执行的间隔(秒)，工具超时从开始执行时计算
+TOOL_START_POLL_INTERVAL = 0.05
+
+
+@dataclass
+class LLMStreamState:
+    """LLM节点单次流式输出过程中的中间状态"""
+    id: UUID = field(default_factory=uuid.uuid4)  # 本次推理对应的事件id
+    start_at: float = field(default_factory=time.perf_counter)  # 开始时间
+    generation_type: str = ""  # 生成类型，thought为工具调用，message为文本生成
+    redactor: Optional[KeywordRedactor] = None  # 输出审核的流式敏感词替换器，开启输出审核时按需创建
+    chunks: list[AIMessageChunk] = field(default_factory=list)  # 流式输出的内容块
+    first_chunk_at: Optional[float] = None  # 首个内容块到达时间，用于计算首token耗时
+    usage: dict[str, Any] = field(default_factory=dict)  # 本次推理的token与成本统计
+    _gathered: Optional[AIMessageChunk] = field(default=None, repr=False)  # 叠加结果缓存
+    _gathered_count: int = field(default=0, repr=False)  # 叠加结果对应的内容块数
+
+    def add(self, chunk: AIMessageChunk) -> None:
+        """记录流式输出的内容块，不立即叠加，避免逐块叠加时重复拷贝越来越长的内容"""
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.perf_counter()
+        self.chunks.append(chunk)
+
+    @property
+    def gathered(self) -> Optional[AIMessageChunk]:
+        """叠加后的输出内容，读取时一次性合并所有内容块，内容块未变化时复用上一次的结果"""
+        if not self.chunks:
+            return None
+        if self._gathered_count != len(self.chunks):
+            self._gathered = add_ai_message_chunks(self.chunks[0], *self.chunks[1:])
+            self._gathered_count = len(self.chunks)
+        return self._gathered
+
+    def trace_attributes(self) -> dict[str, Any]:
+        """LLM调用跨度的统计属性，涵盖首token耗时、总耗时、输入/输出token数以及输出速度"""
+        now = time.perf_counter()
+        output_tokens = self.usage.get("answer_token_count", 0)
+        attributes = {
+            "duration_ms": round((now - self.start_at) * 1000, 2),
+            "input_tokens": self.usage.get("message_token_count", 0),
+            "output_tokens": output_tokens,
+            "token_count_estimated": self.usage.get("token_count_estimated", False),
+            "chunk_count": len(self.chunks),
+        }
+        if self.first_chunk_at is not None:
+            generation_time = now - self.first_chunk_at
+            attributes["ttft_ms"] = round((self.first_chunk_at - self.start_at) * 1000, 2)
+            attributes["tokens_per_second"] = round(output_tokens / generation_time, 2) if generation_time > 0 else 0
+        return attributes
 
 
 class FunctionCallAgent(BaseAgent):
     """基于函数/工具调用的智能体"""
     name: str = "function_call_agent"
+    _message_token_counts: dict[str, int] = PrivateAttr(default_factory=dict)
+    _bound_llm: Any = PrivateAttr(None)
+    _speculative_retrieval: Optional[SpeculativeRetrieval] = PrivateAttr(None)
 
-    def _build_agent(self) -> CompiledStateGraph:
-        """构建LangGraph图结构编译程序"""
+    @classmethod
+    def _build_agent(cls) -> CompiledStateGraph:
+        """构建LangGraph图结构编译程序，每个智能体类只构建一次，节点运行时从config中获取智能体实例"""
         # 1.创建图
         graph = StateGraph(AgentState)
 
         # 2.添加节点
-        graph.add_node("preset_operation", self._preset_operation_node)
-        graph.add_node("long_term_memory_recall", self._long_term_memory_recall_node)
-        graph.add_node("llm", self._llm_node)
-        graph.add_node("tools", self._tools_node)
+        graph.add_node("preset_operation", cls._node("_preset_operation_node"))
+        graph.add_node("long_term_memory_recall", cls._node("_long_term_memory_recall_node"))
+        graph.add_node("llm", cls._node("_llm_node", "_allm_node"))
+        graph.add_node("tools", cls._node("_tools_node", "_atools_node"))
 
         # 3.添加边，并设置起点和终点
         graph.set_entry_point("preset_operation")
-        graph.add_conditional_edges("preset_operation", self._preset_operation_condition)
+        graph.add_conditional_edges("preset_operation", cls._preset_operation_condition)
         graph.add_edge("long_term_memory_recall", "llm")
-        graph.add_conditional_edges("llm", self._tools_condition)
+        graph.add_conditional_edges("llm", cls._tools_condition)
         graph.add_edge("tools", "llm")
 
         # 4.编译应用并返回
@@ -58,7 +126,7 @@ class FunctionCallAgent(BaseAgent):
 
         # 2.检测是否开启审核配置
         if review_config["enable"] and review_config["inputs_config"]["enable"]:
-            contains_keyword = any(keyword in query for keyword in review_config["keywords"])
+            contains_keyword = get_keyword_matcher(review_config["keywords"]).contains(query)
             # 3.如果包含敏感词则执行后续步骤
             if contains_keyword:
                 preset_response = review_config["inputs_config"]["preset_response"]
@@ -126,6 +194,59 @@ class FunctionCallAgent(BaseAgent):
 
     def _llm_node(self, state: AgentState) -> AgentState:
         """大语言模型节点"""
+        # 1.检测迭代次数并绑定工具，超过最大迭代次数时直接返回预设响应
+        result, llm = self._prepare_llm_node(state)
+        if result is not None:
+            return result
+
+        # 2.流式调用LLM输出对应内容
+        llm_stream = LLMStreamState()
+        with get_tracer().span("llm.call", self._llm_trace_attributes(state)) as span:
+            try:
+                for chunk in llm.stream(state["messages"]):
+                    self._on_llm_chunk(state, llm_stream, chunk)
+            except Exception as e:
+                self._publish_llm_error(state, e)
+                raise e
+
+            # 3.汇总流式输出结果并发布统计事件
+            result = self._finish_llm_node(state, llm_stream)
+            span.set_attributes(llm_stream.trace_attributes())
+            return result
+
+    async def _allm_node(self, state: AgentState) -> AgentState:
+        """大语言模型节点的异步版本，使用LLM的astream流式输出，不占用额外线程"""
+        # 1.检测迭代次数并绑定工具，超过最大迭代次数时直接返回预设响应
+        result, llm = self._prepare_llm_node(state)
+        if result is not None:
+            return result
+
+        # 2.异步流式调用LLM输出对应内容
+        llm_stream = LLMStreamState()
+        with get_tracer().span("llm.call", self._llm_trace_attributes(state)) as span:
+            try:
+                async for chunk in llm.astream(state["messages"]):
+                    self._on_llm_chunk(state, llm_stream, chunk)
+            except Exception as e:
+                self._publish_llm_error(state, e)
+                raise e
+
+            # 3.汇总流式输出结果并发布统计事件
+            result = self._finish_llm_node(state, llm_stream)
+            span.set_attributes(llm_stream.trace_attributes())
+            return result
+
+    def _llm_trace_attributes(self, state: AgentState) -> dict[str, Any]:
+        """LLM调用跨度的公共属性"""
+        return {
+            "task_id": str(state["task_id"]),
+            "model": str(getattr(self.llm, "model_name", None) or getattr(self.llm, "model", "")),
+            "iteration": state["iteration_count"],
+            "message_count": len(state["messages"]),
+        }
+
+    def _prepare_llm_node(self, state: AgentState) -> tuple[Optional[AgentState], Any]:
+        """LLM节点预处理，超过最大迭代次数时返回预设响应，否则返回绑定工具后的大语言模型"""
         # 1.检测当前Agent迭代次数是否符合需求
         if state["iteration_count"] > self.agent_config.max_iteration_count:
             self.agent_queue_manager.publish(
@@ -146,182 +267,403 @@ class FunctionCallAgent(BaseAgent):
                     task_id=state["task_id"],
                     event=QueueEvent.AGENT_END,
                 ))
-            return {"messages": [AIMessage(MAX_ITERATION_RESPONSE)]}
-
-        # 2.从智能体配置中提取大语言模型
-        id = uuid.uuid4()
-        start_at = time.perf_counter()
-        llm = self.llm
-
-        # 3.检测大语言模型实例是否有bind_tools方法，如果没有则不绑定，如果有还需要检测tools是否为空，不为空则绑定
-        if (
-                ModelFeature.TOOL_CALL in llm.features
-                and hasattr(llm, "bind_tools")
-                and callable(getattr(llm, "bind_tools"))
-                and len(self.agent_config.tools) > 0
-        ):
-            llm = llm.bind_tools(self.agent_config.tools)
-
-        # 4.流式调用LLM输出对应内容
-        gathered = None
-        is_first_chunk = True
-        generation_type = ""
-        try:
-            for chunk in llm.stream(state["messages"]):
-                if is_first_chunk:
-                    gathered = chunk
-                    is_first_chunk = False
-                else:
-                    gathered += chunk
-
-                # 5.检测生成类型是工具参数还是文本生成
-                if not generation_type:
-                    if chunk.tool_calls:
-                        generation_type = "thought"
-                    elif chunk.content:
-                        generation_type = "message"
-
-                # 6.如果生成的是消息则提交智能体消息事件
-                if generation_type == "message":
-                    # 7.提取片段内容并检测是否开启输出审核
-                    review_config = self.agent_config.review_config
-                    content = chunk.content
-                    if review_config["enable"] and review_config["outputs_config"]["enable"]:
-                        for keyword in review_config["keywords"]:
-                            content = re.sub(re.escape(keyword), "**", content, flags=re.IGNORECASE)
-
-                    self.agent_queue_manager.publish(state["task_id"], AgentThought(
-                        id=id,
-                        task_id=state["task_id"],
-                        event=QueueEvent.AGENT_MESSAGE,
-                        thought=content,
-                        message=messages_to_dict(state["messages"]),
-                        answer=content,
-                        latency=(time.perf_counter() - start_at),
-                    ))
-        except Exception as e:
-            logging.exception(
-                "LLM节点发生错误, 错误信息: %(error)s",
-                {"error": str(e) or "LLM出现未知错误"}
+            return {"messages": [AIMessage(MAX_ITERATION_RESPONSE)]}, None
+
+        # 2.首次调用LLM时按需使用用户原始提问投机检索知识库
+        if state["iteration_count"] == 0:
+            self._start_speculative_retrieval(state)
+
+        # 3.获取绑定工具后的大语言模型
+        return None, self._get_bound_llm()
+
+    def _start_speculative_retrieval(self, state: AgentState) -> None:
+        """开启投机检索时，与首次LLM调用并行使用用户原始提问检索知识库"""
+        # 1.未开启投机检索或者未关联知识库时直接跳过
+        if not self.agent_config.speculative_retrieval or self._speculative_retrieval is not None:
+            return
+        tool = next((tool for tool in self.agent_config.tools if tool.name == DATASET_RETRIEVAL_TOOL_NAME), None)
+        if tool is None or not SpeculativeRetrieval.supports(tool):
+            return
+
+        # 2.提取用户原始提问，多模态消息只保留文本部分
+        content = state["messages"][-1].content
+        if isinstance(content, list):
+            content = " ".join(
+                item if isinstance(item, str) else item.get("text", "")
+                for item in content
+                if isinstance(item, str) or item.get("type") == "text"
             )
-            self.agent_queue_manager.publish_error(
-                state["task_id"],
-                f"LLM节点发生错误, 错误信息: {str(e) or 'LLM出现未知错误'}",
-            )
-            raise e
-
-        # 8.计算LLM的输入+输出token总数
-        input_token_count = self.llm.get_num_tokens_from_messages(state["messages"])
-        output_token_count = self.llm.get_num_tokens_from_messages([gathered])
-
-        # 9.获取输入/输出价格和单位
-        input_price, output_price, unit = self.llm.get_pricing()
-
-        # 10.计算总token+总成本
-        total_token_count = input_token_count + output_token_count
-        total_price = (input_token_count * input_price + output_token_count * output_price) * unit
-
-        # 11.如果类型为推理则添加智能体推理事件
-        if generation_type == "thought":
+        if not content.strip():
+            return
+
+        # 3.提交检索任务
+        self._speculative_retrieval = SpeculativeRetrieval(
+            tool, content, self.agent_config.speculative_retrieval_min_similarity,
+        )
+
+    def _take_speculative_retrieval(self, tool_call: dict) -> bool:
+        """判断知识库检索工具调用能否复用投机检索的结果"""
+        if self._speculative_retrieval is None or tool_call["name"] != DATASET_RETRIEVAL_TOOL_NAME:
+            return False
+        return self._speculative_retrieval.take(str(tool_call["args"].get("query", "")))
+
+    def _get_bound_llm(self) -> Any:
+        """获取绑定工具后的大语言模型，同一次请求的多轮迭代只绑定一次，工具结构使用缓存的转换结果"""
+        if self._bound_llm is None:
+            # 1.从智能体配置中提取大语言模型
+            llm = self.llm
+
+            # 2.检测大语言模型实例是否有bind_tools方法，如果没有则不绑定，如果有还需要检测tools是否为空，不为空则绑定
+            if (
+                    ModelFeature.TOOL_CALL in llm.features
+                    and hasattr(llm, "bind_tools")
+                    and callable(getattr(llm, "bind_tools"))
+                    and len(self.agent_config.tools) > 0
+            ):
+                llm = llm.bind_tools([get_tool_schema(tool) for tool in self.agent_config.tools])
+            self._bound_llm = llm
+        return self._bound_llm
+
+    def _on_llm_chunk(self, state: AgentState, llm_stream: LLMStreamState, chunk: AIMessageChunk) -> None:
+        """处理LLM流式输出的单个内容块"""
+        # 1.记录流式输出内容块
+        llm_stream.add(chunk)
+
+        # 2.检测生成类型是工具参数还是文本生成
+        if not llm_stream.generation_type:
+            if chunk.tool_calls:
+                llm_stream.generation_type = "thought"
+            elif chunk.content:
+                llm_stream.generation_type = "message"
+
+        # 3.如果生成的是消息则提交智能体消息事件
+        if llm_stream.generation_type == "message":
+            self._publish_agent_message(state, llm_stream, chunk.content)
+
+    def _publish_agent_message(self, state: AgentState, llm_stream: LLMStreamState, content: str) -> None:
+        """检测是否开启输出审核，并发布智能体消息增量事件"""
+        # 1.开启输出审核时使用流式替换器，可能是敏感词前缀的末尾字符会保留到下一个内容块再输出
+        review_config = self.agent_config.review_config
+        if review_config["enable"] and review_config["outputs_config"]["enable"]:
+            if llm_stream.redactor is None:
+                llm_stream.redactor = get_keyword_matcher(review_config["keywords"]).redactor()
+            content = llm_stream.redactor.feed(content)
+            if not content:
+                return
+
+        # 2.增量事件只携带本次输出的内容，完整的消息列表在推理结束时的统计事件中发布一次
+        self.agent_queue_manager.publish(state["task_id"], AgentThoughtDelta(
+            id=llm_stream.id,
+            task_id=state["task_id"],
+            thought=content,
+            latency=(time.perf_counter() - llm_stream.start_at),
+        ))
+
+    def _publish_llm_error(self, state: AgentState, error: Exception) -> None:
+        """记录并发布LLM节点错误事件"""
+        logging.exception(
+            "LLM节点发生错误, 错误信息: %(error)s",
+            {"error": str(error) or "LLM出现未知错误"}
+        )
+        self.agent_queue_manager.publish_error(
+            state["task_id"],
+            f"LLM节点发生错误, 错误信息: {str(error) or 'LLM出现未知错误'}",
+        )
+
+    def _finish_llm_node(self, state: AgentState, llm_stream: LLMStreamState) -> AgentState:
+        """汇总LLM流式输出结果，计算token与成本并发布推理/消息统计事件"""
+        # 1.计算LLM的token消耗与成本
+        usage = self._calculate_llm_usage(state, llm_stream.gathered)
+        llm_stream.usage = usage
+
+        # 2.如果类型为推理则添加智能体推理事件
+        if llm_stream.generation_type == "thought":
             self.agent_queue_manager.publish(state["task_id"], AgentThought(
-                id=id,
+                id=llm_stream.id,
                 task_id=state["task_id"],
                 event=QueueEvent.AGENT_THOUGHT,
-                thought=json.dumps(gathered.tool_calls),
-                # 消息相关字段
-                message=messages_to_dict(state["messages"]),
-                message_token_count=input_token_count,
-                message_unit_price=input_price,
-                message_price_unit=unit,
-                # 答案相关字段
-                answer="",
-                answer_token_count=output_token_count,
-                answer_unit_price=output_price,
-                answer_price_unit=unit,
-                # Agent推理统计相关
-                total_token_count=total_token_count,
-                total_price=total_price,
-                latency=(time.perf_counter() - start_at),
-            ))
-        elif generation_type == "message":
-            # 7.如果LLM直接生成answer则表示已经拿到了最终答案，推送一条空内容用于计算总token+总成本，并停止监听
-            self.agent_queue_manager.publish(state["task_id"], AgentThought(
-                id=id,
-                task_id=state["task_id"],
-                event=QueueEvent.AGENT_MESSAGE,
-                thought="",
-                # 消息相关字段
+                thought=json.dumps(llm_stream.gathered.tool_calls),
                 message=messages_to_dict(state["messages"]),
-                message_token_count=input_token_count,
-                message_unit_price=input_price,
-                message_price_unit=unit,
-                # 答案相关字段
                 answer="",
-                answer_token_count=output_token_count,
-                answer_unit_price=output_price,
-                answer_price_unit=unit,
-                # Agent推理统计相关
-                total_token_count=total_token_count,
-                total_price=total_price,
-                latency=(time.perf_counter() - start_at),
-            ))
-            self.agent_queue_manager.publish(state["task_id"], AgentThought(
-                id=uuid.uuid4(),
-                task_id=state["task_id"],
-                event=QueueEvent.AGENT_END,
+                latency=(time.perf_counter() - llm_stream.start_at),
+                **usage,
             ))
+        elif llm_stream.generation_type == "message":
+            # 3.如果LLM直接生成answer则表示已经拿到了最终答案，推送一条空内容用于计算总token+总成本，并停止监听
+            self._publish_agent_end(state, llm_stream, usage)
+
+        return {"messages": [llm_stream.gathered], "iteration_count": state["iteration_count"] + 1}
+
+    def _calculate_llm_usage(self, state: AgentState, gathered: AIMessageChunk) -> dict[str, Any]:
+        """计算LLM本次调用的输入/输出token数、单价以及总成本，返回AgentThought对应的字段
+
+        优先使用流式输出中携带的usage_metadata(服务商返回的精确值)，未返回时按消息逐条估算并缓存，
+        已计算过的消息在后续迭代中不再重复分词。
+        """
+        # 1.优先从流式输出的usage_metadata中获取token数
+        usage_metadata = getattr(gathered, "usage_metadata", None) or {}
+        if usage_metadata.get("input_tokens") or usage_metadata.get("output_tokens"):
+            input_token_count = usage_metadata.get("input_tokens", 0)
+            output_token_count = usage_metadata.get("output_tokens", 0)
+            token_count_estimated = False
+        else:
+            # 2.服务商未返回用量时使用缓存的逐条消息token数估算
+            input_token_count = sum(self._get_message_token_count(message) for message in state["messages"])
+            output_token_count = self._get_message_token_count(gathered)
+            token_count_estimated = True
+
+        # 3.获取输入/输出价格和单位
+        input_price, output_price, unit = self.llm.get_pricing()
+
+        # 4.计算总token+总成本
+        return {
+            # 消息相关字段
+            "message_token_count": input_token_count,
+            "message_unit_price": input_price,
+            "message_price_unit": unit,
+            # 答案相关字段
+            "answer_token_count": output_token_count,
+            "answer_unit_price": output_price,
+            "answer_price_unit": unit,
+            # Agent推理统计相关
+            "total_token_count": input_token_count + output_token_count,
+            "total_price": (input_token_count * input_price + output_token_count * output_price) * unit,
+            "token_count_estimated": token_count_estimated,
+        }
 
-        return {"messages": [gathered], "iteration_count": state["iteration_count"] + 1}
+    def _get_message_token_count(self, message: BaseMessage) -> int:
+        """获取单条消息的token数，存在消息id时缓存计算结果，避免多轮迭代中重复分词"""
+        if not message.id:
+            return self.llm.get_num_tokens_from_messages([message])
+        token_count = self._message_token_counts.get(message.id)
+        if token_count is None:
+            token_count = self.llm.get_num_tokens_from_messages([message])
+            self._message_token_counts[message.id] = token_count
+        return token_count
+
+    def _publish_agent_end(self, state: AgentState, llm_stream: LLMStreamState, usage: dict[str, Any]) -> None:
+        """推送输出审核保留的剩余内容以及一条携带统计数据的空消息，并发布智能体结束事件"""
+        if llm_stream.redactor is not None:
+            remaining = llm_stream.redactor.flush()
+            if remaining:
+                self.agent_queue_manager.publish(state["task_id"], AgentThoughtDelta(
+                    id=llm_stream.id,
+                    task_id=state["task_id"],
+                    thought=remaining,
+                    latency=(time.perf_counter() - llm_stream.start_at),
+                ))
+        self.agent_queue_manager.publish(state["task_id"], AgentThought(
+            id=llm_stream.id,
+            task_id=state["task_id"],
+            event=QueueEvent.AGENT_MESSAGE,
+            thought="",
+            message=messages_to_dict(state["messages"]),
+            answer="",
+            latency=(time.perf_counter() - llm_stream.start_at),
+            **usage,
+        ))
+        self.agent_queue_manager.publish(state["task_id"], AgentThought(
+            id=uuid.uuid4(),
+            task_id=state["task_id"],
+            event=QueueEvent.AGENT_END,
+        ))
 
     def _tools_node(self, state: AgentState) -> AgentState:
-        """工具执行节点"""
+        """工具执行节点，同一轮中的多个工具调用在共享线程池中并行执行，并保持工具消息的顺序"""
         # 1.将工具列表转换成字典，便于调用指定的工具
         tools_by_name = {tool.name: tool for tool in self.agent_config.tools}
 
         # 2.提取消息中的工具调用参数
         tool_calls = state["messages"][-1].tool_calls
+        results: list[Any] = [None] * len(tool_calls)
+        max_concurrency = max(self.agent_config.max_tool_concurrency, 1)
+        timeout = self.agent_config.tool_timeout
+
+        # 3.按单次运行的并发上限提交工具调用，某个工具完成后再补充提交下一个
+        executor = get_tool_executor()
+        pending: dict[Future, tuple[int, UUID, list[float]]] = {}
+        next_index = 0
+        while next_index < len(tool_calls) or pending:
+            while next_index < len(tool_calls) and len(pending) < max_concurrency:
+                tool_call = tool_calls[next_index]
+                # 每个工具调用复制一份上下文，使工具跨度能关联到当前节点跨度，可复用投机检索结果时直接等待预取任务
+                if self._take_speculative_retrieval(tool_call):
+                    func, args = self._wait_speculative_retrieval, (self._speculative_retrieval, tools_by_name)
+                else:
+                    func, args = self._invoke_tool, (tools_by_name,)
+                started_at: list[float] = []
+                future = executor.submit(
+                    contextvars.copy_context().run, self._run_tool, started_at, func, *args, tool_call,
+                )
+                pending[future] = (next_index, uuid.uuid4(), started_at)
+                next_index += 1
+
+            # 4.等待任意工具完成或最早开始执行的工具超时，仍在线程池中排队的工具不计时，需定期检测其是否已开始执行
+            deadlines = [started_at[0] + timeout for _, _, started_at in pending.values() if started_at]
+            wait_timeout = max(min(deadlines) - time.perf_counter(), 0) if deadlines else None
+            if len(deadlines) < len(pending):
+                wait_timeout = min(wait_timeout, TOOL_START_POLL_INTERVAL) if deadlines else TOOL_START_POLL_INTERVAL
+            done, _ = wait(pending.keys(), timeout=wait_timeout, return_when=FIRST_COMPLETED)
+
+            # 5.处理已完成以及已超时的工具调用，超时的工具无法强制中断，仅不再等待其结果，其占用的仍是有界线程池中的线程
+            now = time.perf_counter()
+            for future in list(pending.keys()):
+                index, id, started_at = pending[future]
+                if future in done:
+                    tool_result, cache_hit = future.result()
+                elif started_at and now - started_at[0] >= timeout:
+                    logging.warning("工具执行超时，已放弃等待: %(tool)s", {"tool": tool_calls[index]["name"]})
+                    tool_result, cache_hit = f"工具执行出错: 工具执行超时({timeout}秒)", None
+                else:
+                    continue
+                del pending[future]
+                results[index] = tool_result
+                latency = now - started_at[0] if started_at else 0
+                self._publish_tool_event(state, tool_calls[index], id, tool_result, latency, cache_hit)
+
+        # 6.按工具调用顺序组装工具消息
+        return {"messages": self._build_tool_messages(tool_calls, results)}
 
-        # 3.循环执行工具组装工具消息
-        messages = []
-        for tool_call in tool_calls:
-            # 4.创建智能体动作事件id并记录开始时间
-            id = uuid.uuid4()
-            start_at = time.perf_counter()
-            print(tool_call)
+    @classmethod
+    def _run_tool(
+            cls,
+            started_at: list[float],
+            func: Callable[..., tuple[Any, Optional[bool]]],
+            *args: Any,
+    ) -> tuple[Any, Optional[bool]]:
+        """在共享线程池的工作线程中执行单个工具调用，开始执行时记录时间，工具超时从该时间开始计算"""
+        started_at.append(time.perf_counter())
+        return func(*args)
+
+    async def _atools_node(self, state: AgentState) -> AgentState:
+        """工具执行节点的异步版本，使用信号量限制并发数并为每个工具调用设置超时时间"""
+        # 1.将工具列表转换成字典，便于调用指定的工具
+        tools_by_name = {tool.name: tool for tool in self.agent_config.tools}
+        tool_calls = state["messages"][-1].tool_calls
+        semaphore = asyncio.Semaphore(max(self.agent_config.max_tool_concurrency, 1))
+
+        async def run(tool_call: dict) -> Any:
+            """在并发上限内执行单个工具调用，并发布对应的事件"""
+            async with semaphore:
+                id = uuid.uuid4()
+                start_at = time.perf_counter()
+                speculative_hit = self._take_speculative_retrieval(tool_call)
+                try:
+                    tool_result, cache_hit = await asyncio.wait_for(
+                        self._await_speculative_retrieval(self._speculative_retrieval, tools_by_name, tool_call)
+                        if speculative_hit
+                        else self._ainvoke_tool(tools_by_name, tool_call),
+                        timeout=self.agent_config.tool_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    tool_result, cache_hit = f"工具执行出错: 工具执行超时({self.agent_config.tool_timeout}秒)", None
+                self._publish_tool_event(state, tool_call, id, tool_result, time.perf_counter() - start_at, cache_hit)
+                return tool_result
+
+        # 2.并行执行所有工具调用，gather会按传入顺序返回结果
+        results = await asyncio.gather(*[run(tool_call) for tool_call in tool_calls])
+
+        return {"messages": self._build_tool_messages(tool_calls, list(results))}
+
+    @classmethod
+    def _wait_speculative_retrieval(
+            cls,
+            speculative_retrieval: SpeculativeRetrieval,
+            tools_by_name: dict[str, BaseTool],
+            tool_call: dict,
+    ) -> tuple[Any, Optional[bool]]:
+        """等待并使用投机检索的结果，预取失败时回退为正常调用知识库检索工具"""
+        with get_tracer().span("agent.tool", {"tool": tool_call["name"], "speculative_hit": True}) as span:
+            try:
+                return speculative_retrieval.result(), None
+            except Exception as e:
+                span.record_exception(e)
+        return cls._invoke_tool(tools_by_name, tool_call)
+
+    @classmethod
+    async def _await_speculative_retrieval(
+            cls,
+            speculative_retrieval: SpeculativeRetrieval,
+            tools_by_name: dict[str, BaseTool],
+            tool_call: dict,
+    ) -> tuple[Any, Optional[bool]]:
+        """_wait_speculative_retrieval的异步版本，记录检索涉及数据库操作，放到线程中执行"""
+        with get_tracer().span("agent.tool", {"tool": tool_call["name"], "speculative_hit": True}) as span:
+            try:
+                prefetched = await asyncio.wrap_future(speculative_retrieval.future)
+                return await asyncio.to_thread(speculative_retrieval.use, prefetched), None
+            except Exception as e:
+                span.record_exception(e)
+        return await cls._ainvoke_tool(tools_by_name, tool_call)
+
+    @classmethod
+    def _invoke_tool(cls, tools_by_name: dict[str, BaseTool], tool_call: dict) -> tuple[Any, Optional[bool]]:
+        """获取并调用工具，返回工具结果以及是否命中结果缓存(未启用缓存时为None)，执行出错时返回错误信息"""
+        with get_tracer().span("agent.tool", {"tool": tool_call["name"]}) as span:
             try:
-                # 5.获取工具并调用工具
                 tool = tools_by_name[tool_call["name"]]
-                tool_result = tool.invoke(tool_call["args"])
-                print(tool_result)
+                if isinstance(tool, CachedTool):
+                    result, cache_hit = tool.invoke_with_cache(tool_call["args"])
+                    span.set_attribute("cache_hit", cache_hit)
+                    return result, cache_hit
+                return tool.invoke(tool_call["args"]), None
             except Exception as e:
-                # 6.添加错误工具信息
-                tool_result = f"工具执行出错: {str(e)}"
+                span.record_exception(e)
+                return f"工具执行出错: {str(e)}", None
 
-            # 7.将工具消息添加到消息列表中
+    @classmethod
+    async def _ainvoke_tool(cls, tools_by_name: dict[str, BaseTool], tool_call: dict) -> tuple[Any, Optional[bool]]:
+        """异步获取并调用工具，返回工具结果以及是否命中结果缓存(未启用缓存时为None)，执行出错时返回错误信息"""
+        with get_tracer().span("agent.tool", {"tool": tool_call["name"]}) as span:
+            try:
+                tool = tools_by_name[tool_call["name"]]
+                if isinstance(tool, CachedTool):
+                    result, cache_hit = await tool.ainvoke_with_cache(tool_call["args"])
+                    span.set_attribute("cache_hit", cache_hit)
+                    return result, cache_hit
+                return await tool.ainvoke(tool_call["args"]), None
+            except Exception as e:
+                span.record_exception(e)
+                return f"工具执行出错: {str(e)}", None
+
+    def _publish_tool_event(
+            self,
+            state: AgentState,
+            tool_call: dict,
+            id: UUID,
+            tool_result: Any,
+            latency: float,
+            cache_hit: Optional[bool] = None,
+    ) -> None:
+        """判断执行工具的名字，提交不同事件，涵盖智能体动作以及知识库检索，并记录工具结果缓存的命中情况"""
+        event = (
+            QueueEvent.AGENT_ACTION
+            if tool_call["name"] != DATASET_RETRIEVAL_TOOL_NAME
+            else QueueEvent.DATASET_RETRIEVAL
+        )
+        self.agent_queue_manager.publish(state["task_id"], AgentThought(
+            id=id,
+            task_id=state["task_id"],
+            event=event,
+            observation=json.dumps(tool_result),
+            tool=tool_call["name"],
+            tool_input=tool_call["args"],
+            latency=latency,
+            cache_hits=1 if cache_hit else 0,
+            cache_misses=1 if cache_hit is False else 0,
+        ))
 
-            messages.append(ToolMessage(
+    @classmethod
+    def _build_tool_messages(cls, tool_calls: list[dict], results: list[Any]) -> list[ToolMessage]:
+        """按工具调用顺序组装工具消息"""
+        return [
+            ToolMessage(
                 tool_call_id=tool_call["id"],
                 content=json.dumps(tool_result),
                 name=tool_call["name"],
-            ))
-
-            # 7.判断执行工具的名字，提交不同事件，涵盖智能体动作以及知识库检索
-            event = (
-                QueueEvent.AGENT_ACTION
-                if tool_call["name"] != DATASET_RETRIEVAL_TOOL_NAME
-                else QueueEvent.DATASET_RETRIEVAL
             )
-            self.agent_queue_manager.publish(state["task_id"], AgentThought(
-                id=id,
-                task_id=state["task_id"],
-                event=event,
-                observation=json.dumps(tool_result),
-                tool=tool_call["name"],
-                tool_input=tool_call["args"],
-                latency=(time.perf_counter() - start_at),
-            ))
-
-        return {"messages": messages}
+            for tool_call, tool_result in zip(tool_calls, results)
+        ]
 
     @classmethod
     def _tools_condition(cls, state: AgentState) -> Literal["tools", "__end__"]:
@@ -4,23 +4,23 @@ import re
 import time
 import uuid
 
-from langchain_core.messages import SystemMessage, messages_to_dict, HumanMessage, RemoveMessage, AIMessage
+from langchain_core.messages import SystemMessage, messages_to_dict, HumanMessage, RemoveMessage, AIMessage, AIMessageChunk
 from langchain_core.tools import render_text_description_and_args
 from typing_extensions import override
 
 from internal.core.agent.entities.agent_entity import (
     AgentState,
     AGENT_SYSTEM_PROMPT_TEMPLATE,
-    REACT_AGENT_SYSTEM_PROMPT_TEMPLATE, MAX_ITERATION_RESPONSE,
+    REACT_AGENT_SYSTEM_PROMPT_TEMPLATE,
 )
 from internal.core.agent.entities.queue_entity import QueueEvent, AgentThought
 from internal.core.language_model.entities.model_entity import ModelFeature
 from internal.exception import FailException
-from .function_call_agent import FunctionCallAgent
+from .function_call_agent import FunctionCallAgent, LLMStreamState
 
 
 class ReACTAgent(FunctionCallAgent):
-    """基于ReACT推理的智能体，继承FunctionCallAgent，并重写long_term_memory_node和llm_node两个节点"""
+    """基于ReACT推理的智能体，继承FunctionCallAgent，并重写long_term_memory_node节点以及llm节点的内容块处理与结果汇总"""
     name: str = "react_agent"
 
     @override
@@ -83,177 +83,93 @@ class ReACTAgent(FunctionCallAgent):
         }
 
     @override
-    def _llm_node(self, state: AgentState) -> AgentState:
-        """重写工具调用智能体的LLM节点"""
-        # 1.判断当前LLM是否支持tool_call，如果是则使用FunctionCallAgent的_llm_node
+    def _on_llm_chunk(self, state: AgentState, llm_stream: LLMStreamState, chunk: AIMessageChunk) -> None:
+        """重写LLM内容块处理，判断输出内容是否以"```json"为开头，用于区分工具调用和文本生成"""
+        # 1.判断当前LLM是否支持tool_call，如果是则使用FunctionCallAgent的处理逻辑
         if ModelFeature.TOOL_CALL in self.llm.features:
-            return super()._llm_node(state)
-
-        # 2.检测当前Agent迭代次数是否符合需求
-        if state["iteration_count"] > self.agent_config.max_iteration_count:
-            self.agent_queue_manager.publish(
-                state["task_id"],
-                AgentThought(
-                    id=uuid.uuid4(),
-                    task_id=state["task_id"],
-                    event=QueueEvent.AGENT_MESSAGE,
-                    thought=MAX_ITERATION_RESPONSE,
-                    message=messages_to_dict(state["messages"]),
-                    answer=MAX_ITERATION_RESPONSE,
-                    latency=0,
-                ))
-            self.agent_queue_manager.publish(
-                state["task_id"],
-                AgentThought(
-                    id=uuid.uuid4(),
-                    task_id=state["task_id"],
-                    event=QueueEvent.AGENT_END,
-                ))
-            return {"messages": [AIMessage(MAX_ITERATION_RESPONSE)]}
-
-        # 3.从智能体配置中提取大语言模型
-        id = uuid.uuid4()
-        start_at = time.perf_counter()
-        llm = self.llm
-
-        # 4.定义变量存储流式输出内容
-        gathered = None
-        is_first_chunk = True
-        generation_type = ""
-
-        # 5.流式输出调用LLM，并判断输出内容是否以"```json"为开头，用于区分工具调用和文本生成
-        for chunk in llm.stream(state["messages"]):
-            # 6.处理流式输出内容块叠加
-            if is_first_chunk:
-                gathered = chunk
-                is_first_chunk = False
+            return super()._on_llm_chunk(state, llm_stream, chunk)
+
+        # 2.记录流式输出内容块
+        llm_stream.add(chunk)
+
+        # 3.如果生成的是消息则提交智能体消息事件，如果是推理则等待输出结束后再统一解析
+        if llm_stream.generation_type == "message":
+            self._publish_agent_message(state, llm_stream, chunk.content)
+            return
+        if llm_stream.generation_type:
+            return
+
+        # 4.类型未确定时只拼接已输出的文本，当长度大于等于7(```json)长度时才可以判断出类型是什么
+        content = "".join(item.content for item in llm_stream.chunks if isinstance(item.content, str))
+        if len(content.strip()) >= 7:
+            if content.strip().startswith("```json"):
+                llm_stream.generation_type = "thought"
             else:
-                gathered += chunk
-
-            # 7.如果生成的是消息则提交智能体消息事件
-            if generation_type == "message":
-                # 8.提取片段内容并校测是否开启输出审核
-                review_config = self.agent_config.review_config
-                content = chunk.content
-                if review_config["enable"] and review_config["outputs_config"]["enable"]:
-                    for keyword in review_config["keywords"]:
-                        content = re.sub(re.escape(keyword), "**", content, flags=re.IGNORECASE)
-
-                self.agent_queue_manager.publish(state["task_id"], AgentThought(
-                    id=id,
-                    task_id=state["task_id"],
-                    event=QueueEvent.AGENT_MESSAGE,
-                    thought=content,
-                    message=messages_to_dict(state["messages"]),
-                    answer=content,
-                    latency=(time.perf_counter() - start_at),
-                ))
-
-            # 9.检测生成的类型是工具调用还是文本生成，同时赋值
-            if not generation_type:
-                # 10.当生成内容的长度大于等于7(```json)长度时才可以判断出类型是什么
-                if len(gathered.content.strip()) >= 7:
-                    if gathered.content.strip().startswith("```json"):
-                        generation_type = "thought"
-                    else:
-                        generation_type = "message"
-                        # 11.添加发布事件，避免前几个字符遗漏
-                        self.agent_queue_manager.publish(state["task_id"], AgentThought(
-                            id=id,
-                            task_id=state["task_id"],
-                            event=QueueEvent.AGENT_MESSAGE,
-                            thought=gathered.content,
-                            message=messages_to_dict(state["messages"]),
-                            answer=gathered.content,
-                            latency=(time.perf_counter() - start_at),
-                        ))
+                llm_stream.generation_type = "message"
+                # 5.添加发布事件，避免前几个字符遗漏
+                self._publish_agent_message(state, llm_stream, content)
 
-        # 8.计算LLM的输入+输出token总数
-        input_token_count = self.llm.get_num_tokens_from_messages(state["messages"])
-        output_token_count = self.llm.get_num_tokens_from_messages([gathered])
-
-        # 9.获取输入/输出价格和单位
-        input_price, output_price, unit = self.llm.get_pricing()
+    @override
+    def _finish_llm_node(self, state: AgentState, llm_stream: LLMStreamState) -> AgentState:
+        """重写LLM输出汇总，解析```json包裹的工具调用信息"""
+        # 1.判断当前LLM是否支持tool_call，如果是则使用FunctionCallAgent的处理逻辑
+        if ModelFeature.TOOL_CALL in self.llm.features:
+            return super()._finish_llm_node(state, llm_stream)
 
-        # 10.计算总token+总成本
-        total_token_count = input_token_count + output_token_count
-        total_price = (input_token_count * input_price + output_token_count * output_price) * unit
+        # 2.计算LLM的token消耗与成本
+        gathered = llm_stream.gathered
+        usage = self._calculate_llm_usage(state, gathered)
+        llm_stream.usage = usage
 
-        # 12.如果类型为推理则解析json，并添加智能体消息
-        if generation_type == "thought":
+        # 3.如果类型为推理则解析json，并添加智能体消息
+        if llm_stream.generation_type == "thought":
             try:
-                # 13.使用正则解析信息，如果失败则当成普通消息返回
-                pattern = r"^```json(.*?)```$"
-                matches = re.findall(pattern, gathered.content, re.DOTALL)
-                match_json = json.loads(matches[0])
-                tool_calls = [{
-                    "id": str(uuid.uuid4()),
-                    "type": "tool_call",
-                    "name": match_json.get("name", ""),
-                    "args": match_json.get("args", {}),
-                }]
+                # 4.解析工具调用信息，支持多个动作(json数组或多个json代码块)，如果失败则当成普通消息返回
+                tool_calls = self._parse_tool_calls(gathered.content)
                 self.agent_queue_manager.publish(state["task_id"], AgentThought(
-                    id=id,
+                    id=llm_stream.id,
                     task_id=state["task_id"],
                     event=QueueEvent.AGENT_THOUGHT,
-                    thought=json.dumps(gathered.tool_calls),
-                    # 消息相关字段
+                    thought=json.dumps(tool_calls),
                     message=messages_to_dict(state["messages"]),
-                    message_token_count=input_token_count,
-                    message_unit_price=input_price,
-                    message_price_unit=unit,
-                    # 答案相关字段
                     answer="",
-                    answer_token_count=output_token_count,
-                    answer_unit_price=output_price,
-                    answer_price_unit=unit,
-                    # Agent推理统计相关
-                    total_token_count=total_token_count,
-                    total_price=total_price,
-                    latency=(time.perf_counter() - start_at),
+                    latency=(time.perf_counter() - llm_stream.start_at),
+                    **usage,
                 ))
                 return {
                     "messages": [AIMessage(content="", tool_calls=tool_calls)],
                     "iteration_count": state["iteration_count"] + 1
                 }
             except Exception as _:
-                generation_type = "message"
-                self.agent_queue_manager.publish(state["task_id"], AgentThought(
-                    id=id,
-                    task_id=state["task_id"],
-                    event=QueueEvent.AGENT_MESSAGE,
-                    thought=gathered.content,
-                    message=messages_to_dict(state["messages"]),
-                    answer=gathered.content,
-                    latency=(time.perf_counter() - start_at),
-                ))
+                llm_stream.generation_type = "message"
+                self._publish_agent_message(state, llm_stream, gathered.content)
 
-        # 14.如果最终类型是message则表示已经拿到最终答案，则推送一条空内容并展示统计数据，同时停止监听
-        if generation_type == "message":
-            self.agent_queue_manager.publish(state["task_id"], AgentThought(
-                id=id,
-                task_id=state["task_id"],
-                event=QueueEvent.AGENT_MESSAGE,
-                thought="",
-                # 消息相关字段
-                message=messages_to_dict(state["messages"]),
-                message_token_count=input_token_count,
-                message_unit_price=input_price,
-                message_price_unit=unit,
-                # 答案相关字段
-                answer="",
-                answer_token_count=output_token_count,
-                answer_unit_price=output_price,
-                answer_price_unit=unit,
-                # Agent推理统计相关
-                total_token_count=total_token_count,
-                total_price=total_price,
-                latency=(time.perf_counter() - start_at),
-            ))
-            self.agent_queue_manager.publish(state["task_id"], AgentThought(
-                id=uuid.uuid4(),
-                task_id=state["task_id"],
-                event=QueueEvent.AGENT_END,
-            ))
+        # 5.如果最终类型是message则表示已经拿到最终答案，则推送一条空内容并展示统计数据，同时停止监听
+        if llm_stream.generation_type == "message":
+            self._publish_agent_end(state, llm_stream, usage)
 
         return {"messages": [gathered], "iteration_count": state["iteration_count"] + 1}
+
+    @classmethod
+    def _parse_tool_calls(cls, content: str) -> list[dict]:
+        """解析```json包裹的工具调用信息，单个代码块可以是对象或者数组，也可以连续生成多个代码块"""
+        # 1.内容必须以```json开头并以```结尾
+        content = content.strip()
+        if not content.endswith("```"):
+            raise ValueError("工具调用信息格式错误")
+
+        # 2.逐个解析代码块，并将数组展开成多个动作
+        actions = []
+        for match in re.findall(r"```json(.*?)```", content, re.DOTALL):
+            match_json = json.loads(match)
+            actions.extend(match_json if isinstance(match_json, list) else [match_json])
+        if not actions:
+            raise ValueError("工具调用信息为空")
+
+        # 3.转换成工具调用列表
+        return [{
+            "id": str(uuid.uuid4()),
+            "type": "tool_call",
+            "name": action.get("name", ""),
+            "args": action.get("args", {}),
+        } for action in actions]
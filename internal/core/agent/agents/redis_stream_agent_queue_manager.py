@@ -0,0 +1,143 @@
+import json
+import time
+import uuid
+from typing import Optional, Union
+from uuid import UUID
+
+from redis import Redis
+from typing_extensions import Generator
+
+from internal.core.agent.entities.queue_entity import AgentThought, AgentThoughtDelta, QueueEvent
+from internal.entity.conversation_entity import InvokeFrom
+from internal.exception import FailException
+from internal.lib.helper import json_dumps
+from .agent_queue_manager import AgentQueueManager
+
+
+class RedisStreamAgentQueueManager(AgentQueueManager):
+    """基于Redis Streams的智能体队列管理器
+
+    事件通过XADD写入任务专属的Stream，监听端使用XREAD阻塞读取，因此执行智能体的进程与提供SSE的进程可以不同，
+    客户端断线后也可以携带Last-Event-ID从断点继续读取，停止信号同样通过Stream下发，无需轮询停止标识。
+    """
+    stream_maxlen: int = 20000  # 单个任务Stream保留的最大事件数(近似裁剪)
+    stream_ttl: int = 1800  # Stream过期时间，与任务归属缓存键保持一致
+    block_ms: int = 1000  # XREAD单次阻塞时长
+
+    def __init__(self, user_id: UUID, invoke_from: InvokeFrom) -> None:
+        """构造函数，初始化智能体队列管理器"""
+        super().__init__(user_id=user_id, invoke_from=invoke_from)
+        self._started_tasks: set[str] = set()
+
+    def listen(self, task_id: UUID, last_event_id: Optional[str] = None) -> Generator:
+        """阻塞读取任务Stream中的事件，传递last_event_id时从该事件之后继续读取"""
+        # 1.定义基础数据记录超时时间、开始时间、最后一次ping通时间
+        listen_timeout = 600
+        start_time = time.time()
+        last_ping_time = 0
+        stream_key = self.generate_task_stream_key(task_id)
+        last_id = last_event_id or "0-0"
+
+        while True:
+            # 2.阻塞读取新事件，读取到结束标识时退出循环
+            response = self.redis_client.xread({stream_key: last_id}, count=100, block=self.block_ms)
+            for _, entries in response or []:
+                for entry_id, fields in entries:
+                    last_id = entry_id.decode("utf-8") if isinstance(entry_id, bytes) else entry_id
+                    data = fields.get(b"data")
+                    if data is None:
+                        return
+                    agent_thought = AgentThought.model_validate_json(data)
+                    agent_thought.stream_id = last_id
+                    yield agent_thought
+
+            # 3.每10秒直接向当前监听者返回ping事件，ping事件无需写入Stream
+            elapsed_time = time.time() - start_time
+            if elapsed_time // 10 > last_ping_time:
+                last_ping_time = elapsed_time // 10
+                yield AgentThought(id=uuid.uuid4(), task_id=task_id, event=QueueEvent.PING)
+
+            # 4.判断总耗时是否超时，如果超时则往Stream中添加超时事件
+            if elapsed_time >= listen_timeout:
+                self.publish(task_id, AgentThought(id=uuid.uuid4(), task_id=task_id, event=QueueEvent.TIMEOUT))
+
+    def resume(self, task_id: UUID, last_event_id: str) -> Generator:
+        """断线重连，校验任务归属后从last_event_id之后继续读取事件"""
+        # 1.任务归属缓存键不存在或不属于当前用户时，均视为任务不存在
+        user_prefix = "account" if self.invoke_from in [
+            InvokeFrom.WEB_APP, InvokeFrom.DEBUGGER, InvokeFrom.ASSISTANT_AGENT,
+        ] else "end-user"
+        result = self.redis_client.get(self.generate_task_belong_cache_key(task_id))
+        if not result or result.decode("utf-8") != f"{user_prefix}-{str(self.user_id)}":
+            raise FailException("当前任务不存在或已过期")
+
+        # 2.任务Stream已过期同样无法继续读取
+        if not self.redis_client.exists(self.generate_task_stream_key(task_id)):
+            raise FailException("当前任务不存在或已过期")
+
+        yield from self.listen(task_id, last_event_id)
+
+    @classmethod
+    def set_task_extra_data(cls, task_id: UUID, extra_data: dict) -> None:
+        """记录任务数据帧附带的额外数据(例如会话id、消息id)，断线重连时补全数据帧，过期时间与任务Stream一致"""
+        from app.http.module import injector
+        injector.get(Redis).setex(cls.generate_task_extra_data_cache_key(task_id), cls.stream_ttl, json_dumps(extra_data))
+
+    def get_task_extra_data(self, task_id: UUID) -> dict:
+        """获取任务数据帧附带的额外数据，不存在或已过期时返回空字典"""
+        result = self.redis_client.get(self.generate_task_extra_data_cache_key(task_id))
+        return json.loads(result) if result else {}
+
+    def stop_listen(self, task_id: UUID) -> None:
+        """往Stream中写入结束标识，所有监听者读取到后结束监听"""
+        self._xadd(self.redis_client, task_id, {"end": "1"})
+
+    def publish(self, task_id: UUID, agent_thought: Union[AgentThought, AgentThoughtDelta]) -> None:
+        """发布事件信息到Stream"""
+        # 1.首次发布时记录任务归属，用于停止任务时的权限校验
+        if str(task_id) not in self._started_tasks:
+            self._started_tasks.add(str(task_id))
+            self._set_task_belong(task_id)
+
+        # 2.将事件写入Stream
+        self._xadd(self.redis_client, task_id, {"data": agent_thought.model_dump_json(exclude={"stream_id"})})
+
+        # 3.检测事件类型是否为需要停止的类型，涵盖STOP、ERROR、TIMEOUT、AGENT_END
+        if agent_thought.event in [QueueEvent.STOP, QueueEvent.ERROR, QueueEvent.TIMEOUT, QueueEvent.AGENT_END]:
+            self.stop_listen(task_id)
+
+    @classmethod
+    def set_stop_flag(cls, task_id: UUID, invoke_from: InvokeFrom, user_id: UUID) -> None:
+        """校验任务归属后，直接往任务Stream中写入停止事件与结束标识"""
+        # 1.沿用父类的归属校验并设置停止标识，便于内存队列的监听者同样可以感知
+        super().set_stop_flag(task_id, invoke_from, user_id)
+
+        # 2.停止标识未写入说明任务不属于当前用户，无需继续处理
+        from app.http.module import injector
+        redis_client = injector.get(Redis)
+        if not redis_client.exists(cls.generate_task_stopped_cache_key(task_id)):
+            return
+
+        # 3.往Stream中写入停止事件与结束标识
+        stop_thought = AgentThought(id=uuid.uuid4(), task_id=task_id, event=QueueEvent.STOP)
+        cls._xadd(redis_client, task_id, {"data": stop_thought.model_dump_json(exclude={"stream_id"})})
+        cls._xadd(redis_client, task_id, {"end": "1"})
+
+    @classmethod
+    def _xadd(cls, redis_client: Redis, task_id: UUID, fields: dict) -> None:
+        """往任务Stream中追加数据并刷新过期时间"""
+        stream_key = cls.generate_task_stream_key(task_id)
+        pipeline = redis_client.pipeline(transaction=False)
+        pipeline.xadd(stream_key, fields, maxlen=cls.stream_maxlen, approximate=True)
+        pipeline.expire(stream_key, cls.stream_ttl)
+        pipeline.execute()
+
+    @classmethod
+    def generate_task_stream_key(cls, task_id: UUID) -> str:
+        """生成任务事件Stream的缓存键"""
+        return f"generate_task_stream:{str(task_id)}"
+
+    @classmethod
+    def generate_task_extra_data_cache_key(cls, task_id: UUID) -> str:
+        """生成任务数据帧附带额外数据的缓存键"""
+        return f"generate_task_extra_data:{str(task_id)}"
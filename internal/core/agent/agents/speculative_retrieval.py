@@ -0,0 +1,129 @@
+import contextvars
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Optional
+
+from langchain_core.tools import BaseTool
+
+from .agent_executor import get_tool_executor
+
+
+def query_similarity(a: str, b: str) -> float:
+    """计算两个检索语句的相似度，使用去除空白/标点后字符二元组的Jaccard系数，兼顾中英文"""
+    a, b = re.sub(r"[\W_]+", "", a.lower()), re.sub(r"[\W_]+", "", b.lower())
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    a_grams = {a[i:i + 2] for i in range(max(len(a) - 1, 1))}
+    b_grams = {b[i:i + 2] for i in range(max(len(b) - 1, 1))}
+    return len(a_grams & b_grams) / len(a_grams | b_grams)
+
+
+class SpeculativeRetrievalStats:
+    """投机检索统计数据，记录命中、未命中、丢弃次数以及命中时节省的耗时"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._started = 0
+        self._hits = 0
+        self._misses = 0
+        self._saved_time_total = 0.0
+
+    def record_start(self) -> None:
+        with self._lock:
+            self._started += 1
+
+    def record_hit(self, saved_time: float) -> None:
+        with self._lock:
+            self._hits += 1
+            self._saved_time_total += saved_time
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self._misses += 1
+
+    def stats(self) -> dict[str, Any]:
+        """获取统计数据，未被使用的预取结果(模型未调用检索工具)计为丢弃"""
+        with self._lock:
+            return {
+                "started": self._started,
+                "hits": self._hits,
+                "misses": self._misses,
+                "discarded": self._started - self._hits - self._misses,
+                "hit_rate": round(self._hits / self._started, 4) if self._started else 0,
+                "saved_ms_total": round(self._saved_time_total * 1000, 2),
+                "avg_saved_ms": round(self._saved_time_total / self._hits * 1000, 2) if self._hits else 0,
+            }
+
+
+speculative_retrieval_stats = SpeculativeRetrievalStats()
+
+
+class SpeculativeRetrieval:
+    """投机知识库检索，在首次调用LLM的同时使用用户原始提问预先检索
+
+    模型随后使用相似的语句调用知识库检索工具时直接复用预取结果，否则丢弃，每次请求最多使用一次。
+    检索工具需要提供prefetch(query)执行无副作用的检索，以及use_prefetched(query, prefetched)在预取结果
+    被使用时记录查询与命中次数并转换成工具结果，被丢弃的预取不会产生任何记录。
+    """
+
+    def __init__(self, tool: BaseTool, query: str, min_similarity: float):
+        """构造函数，传递知识库检索工具、用户原始提问以及复用预取结果的最低相似度，并立即提交检索任务"""
+        self.tool = tool
+        self.query = query
+        self.min_similarity = min_similarity
+        self.start_at = time.perf_counter()
+        self.end_at: Optional[float] = None
+        self._consumed = False
+        self._lock = threading.Lock()
+        self.future: Future = get_tool_executor().submit(
+            contextvars.copy_context().run, self._prefetch, query,
+        )
+        speculative_retrieval_stats.record_start()
+
+    @classmethod
+    def supports(cls, tool: BaseTool) -> bool:
+        """判断检索工具是否支持无副作用的预取"""
+        return callable(getattr(tool, "prefetch", None)) and callable(getattr(tool, "use_prefetched", None))
+
+    def _prefetch(self, query: str) -> Any:
+        """执行无副作用的检索并记录结束时间"""
+        try:
+            return self.tool.prefetch(query)
+        finally:
+            self.end_at = time.perf_counter()
+
+    def take(self, query: str) -> bool:
+        """判断模型调用检索工具的语句是否与预取语句相似，相似则记录节省的耗时并返回True，随后需调用result()获取结果"""
+        with self._lock:
+            if self._consumed:
+                return False
+            self._consumed = True
+
+        # 1.语句不相似或预取失败时不复用
+        if query_similarity(self.query, query) < self.min_similarity or (
+                self.future.done() and self.future.exception() is not None
+        ):
+            speculative_retrieval_stats.record_miss()
+            return False
+
+        # 2.节省的耗时为预取任务在被使用前已经执行的时长
+        now = time.perf_counter()
+        speculative_retrieval_stats.record_hit(min(now, self.end_at or now) - self.start_at)
+        return True
+
+    def use(self, prefetched: Any) -> Any:
+        """使用预取结果，由检索工具记录本次检索并转换成工具结果"""
+        return self.tool.use_prefetched(self.query, prefetched)
+
+    def result(self) -> Any:
+        """等待预取任务完成并使用预取结果，预取失败时抛出对应的异常"""
+        return self.use(self.future.result())
+
+
+def get_speculative_retrieval_stats() -> dict[str, Any]:
+    """获取当前进程投机检索的统计数据"""
+    return speculative_retrieval_stats.stats()
@@ -1,3 +1,4 @@
+import os
 from uuid import UUID
 
 from langchain_core.messages import AnyMessage
@@ -79,6 +80,7 @@ REACT_AGENT_SYSTEM_PROMPT_TEMPLATE = """你是一个高度定制的智能体应
       - 生成的内容必须以"```json"为开头，以"```"为结尾，前面和后面不要添加任何内容，避免代码解析出错。
       - 注意`工具描述参数args`和最终生成的`工具调用参数args`的区别，不要错误生成。
       - 如果不需要工具调用，则正常生成即可，程序会自动检测内容开头是否为"```json"进行判断
+      - 如果需要同时调用多个相互独立的工具(例如同时查询多个城市的天气)，可以生成json数组一次性调用，程序会并行执行这些工具，例如: ```json\n[{{"name": "gaode_weather", "args": {{"city": "北京"}}}}, {{"name": "gaode_weather", "args": {{"city": "上海"}}}}]\n```
     - 正确示例:
       - ```json\\n{{"name": "google_serper", "args": {{"query": "慕课网 AI课程"}}}}\\n```
       - ```json\\n{{"name": "current_time", "args": {{}}}}\\n```
@@ -109,6 +111,16 @@ class AgentConfig(BaseModel):
 
     max_iteration_count: int = 10
 
+    # 工具执行配置，同一轮中的多个工具调用并行执行
+    max_tool_concurrency: int = 4  # 单次运行中同时执行的工具调用数上限
+    tool_timeout: float = 60  # 单个工具调用的超时时间(秒)
+
+    # 投机检索配置，开启后首次调用LLM的同时使用用户原始提问预先检索知识库，默认通过AGENT_SPECULATIVE_RETRIEVAL配置
+    speculative_retrieval: bool = Field(
+        default_factory=lambda: os.getenv("AGENT_SPECULATIVE_RETRIEVAL", "false").lower() == "true",
+    )
+    speculative_retrieval_min_similarity: float = 0.5  # 模型检索语句与原始提问的相似度达到该值时复用预取结果
+
     # 智能体预设提示词
     system_prompt: str = AGENT_SYSTEM_PROMPT_TEMPLATE
     preset_prompt: str = ""  # 预设prompt，默认为空，该值由前端用户在编排的时候记录，并填充到system_prompt中
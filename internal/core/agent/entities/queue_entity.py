@@ -1,6 +1,9 @@
+import json
 from enum import Enum
 from uuid import UUID
 
+from typing_extensions import Any, Optional
+
 from pydantic import BaseModel, Field, ConfigDict
 
 from internal.entity.conversation_entity import MessageStatus
@@ -36,7 +39,7 @@ class AgentThought(BaseModel):
     tool_input: dict = Field(default_factory=dict)  # 工具的输入
 
     # 消息相关的数据
-    message: list[dict] = Field(default_factory=dict)  # 推理使用的消息列表
+    message: list[dict] = Field(default_factory=list)  # 推理使用的消息列表
     message_token_count: int = 0  # 消息花费的token数
     message_unit_price: float = 0  # 单价
     message_price_unit: float = 0  # 价格单位
@@ -51,6 +54,62 @@ class AgentThought(BaseModel):
     total_token_count: int = 0  # 总token消耗数量
     total_price: float = 0  # 总价格
     latency: float = 0  # 步骤推理耗时
+    token_count_estimated: bool = False  # token数是否为本地估算值，False表示取自服务商返回的用量数据
+    cache_hits: int = 0  # 工具结果缓存命中次数
+    cache_misses: int = 0  # 工具结果缓存未命中次数，未启用缓存的工具两者均为0
+
+    # 事件在Redis Stream中的id，仅Stream队列后端有值，用于SSE断线重连
+    stream_id: str = ""
+
+
+class AgentThoughtDelta:
+    """智能体消息增量事件，LLM每输出一个内容块时发布，仅携带增量文本与耗时
+
+    与AgentThought保持相同的读取接口(未携带的字段返回AgentThought的默认值)，但不做pydantic校验、
+    不携带消息列表快照，完整的消息列表只在本次推理结束时的统计事件中发布一次。
+    """
+    __slots__ = ("id", "task_id", "event", "thought", "answer", "latency", "stream_id")
+
+    def __init__(self, id: UUID, task_id: UUID, thought: str, latency: float = 0) -> None:
+        """构造函数，传递事件id、任务id、增量文本以及当前推理耗时"""
+        self.id = id
+        self.task_id = task_id
+        self.event = QueueEvent.AGENT_MESSAGE
+        self.thought = thought
+        self.answer = thought
+        self.latency = latency
+        self.stream_id = ""
+
+    def __getattr__(self, name: str) -> Any:
+        """增量事件未携带的字段返回AgentThought对应的默认值"""
+        field = AgentThought.model_fields.get(name)
+        if field is None:
+            raise AttributeError(name)
+        return field.get_default(call_default_factory=True)
+
+    def model_dump(self, include: Optional[set[str]] = None, exclude: Optional[set[str]] = None) -> dict[str, Any]:
+        """转换成与AgentThought.model_dump一致的字典"""
+        names = include if include is not None else AgentThought.model_fields.keys()
+        return {
+            name: getattr(self, name) for name in AgentThought.model_fields
+            if name in names and not (exclude and name in exclude)
+        }
+
+    def model_dump_json(self, exclude: Optional[set[str]] = None) -> str:
+        """转换成与AgentThought.model_dump_json一致的JSON字符串"""
+        return json.dumps(self.model_dump(exclude=exclude), default=str, ensure_ascii=False)
+
+    def to_agent_thought(self) -> AgentThought:
+        """转换成完整的AgentThought，用于聚合存储"""
+        return AgentThought(
+            id=self.id,
+            task_id=self.task_id,
+            event=self.event,
+            thought=self.thought,
+            answer=self.answer,
+            latency=self.latency,
+            stream_id=self.stream_id,
+        )
 
 
 class AgentResult(BaseModel):
@@ -0,0 +1,8 @@
+from .simhash import SimHashIndex, hamming_distance, simhash, simhash_fingerprint
+
+__all__ = [
+    "SimHashIndex",
+    "hamming_distance",
+    "simhash",
+    "simhash_fingerprint",
+]
@@ -0,0 +1,77 @@
+import hashlib
+import re
+from typing import Optional
+
+# SimHash指纹位数，以及LSH分段数(分段数需大于允许的最大汉明距离，按抽屉原理保证不漏召回)
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 8
+
+
+def _normalize(text: str) -> str:
+    """归一化文本，忽略大小写、空白以及标点差异"""
+    return re.sub(r"[\W_]+", "", text.lower())
+
+
+def simhash(text: str, ngram: int = 3) -> int:
+    """计算文本的64位SimHash指纹，特征为去除空白/标点后的字符n-gram"""
+    # 1.归一化文本，忽略大小写、空白以及标点差异
+    normalized = _normalize(text)
+    if not normalized:
+        return 0
+    features = [normalized[i:i + ngram] for i in range(max(len(normalized) - ngram + 1, 1))]
+
+    # 2.对每个特征计算哈希并按位累加权重
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if (value >> bit) & 1 else -1
+
+    # 3.权重大于0的位置为1，生成最终指纹
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def simhash_fingerprint(text: str) -> str:
+    """计算文本SimHash指纹的16进制字符串，归一化后为空的文本指纹都为0会互相误判，因此返回空字符串不参与检测"""
+    if not _normalize(text):
+        return ""
+    return f"{simhash(text):016x}"
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """计算两个指纹的汉明距离"""
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex:
+    """SimHash近似重复检测索引，将指纹分成若干段做LSH分桶，只与同桶候选计算汉明距离"""
+
+    def __init__(self, max_distance: int = 6):
+        """构造函数，传递判定为近似重复的最大汉明距离"""
+        if max_distance >= SIMHASH_BANDS:
+            raise ValueError(f"最大汉明距离必须小于分段数{SIMHASH_BANDS}")
+        self.max_distance = max_distance
+        self._band_bits = SIMHASH_BITS // SIMHASH_BANDS
+        self._buckets: list[dict[int, list[tuple[int, str]]]] = [{} for _ in range(SIMHASH_BANDS)]
+
+    def _bands(self, fingerprint: int) -> list[int]:
+        """将指纹切分成多个分段"""
+        mask = (1 << self._band_bits) - 1
+        return [(fingerprint >> (band * self._band_bits)) & mask for band in range(SIMHASH_BANDS)]
+
+    def add(self, fingerprint: int, key: str) -> None:
+        """添加指纹及其关联的键(例如片段id)"""
+        for band, value in enumerate(self._bands(fingerprint)):
+            self._buckets[band].setdefault(value, []).append((fingerprint, key))
+
+    def find(self, fingerprint: int) -> Optional[str]:
+        """查找与传递指纹近似重复的键，不存在则返回None"""
+        for band, value in enumerate(self._bands(fingerprint)):
+            for candidate, key in self._buckets[band].get(value, []):
+                if hamming_distance(candidate, fingerprint) <= self.max_distance:
+                    return key
+        return None
@@ -0,0 +1,23 @@
+from .embeddings_provider import (
+    EmbeddingsFactory,
+    create_embeddings,
+    register_embeddings_provider,
+    get_embeddings_provider_names,
+    get_embeddings_dimension,
+)
+from .batching_embeddings import BatchingEmbeddings
+from .hash_embeddings import HashEmbeddings
+from .redis_embeddings_store import RedisEmbeddingsStore, encode_embedding, decode_embedding
+
+__all__ = [
+    "EmbeddingsFactory",
+    "create_embeddings",
+    "register_embeddings_provider",
+    "get_embeddings_provider_names",
+    "get_embeddings_dimension",
+    "BatchingEmbeddings",
+    "HashEmbeddings",
+    "RedisEmbeddingsStore",
+    "encode_embedding",
+    "decode_embedding",
+]
@@ -0,0 +1,114 @@
+import threading
+import time
+from typing import Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+class _PendingQuery:
+    """等待批量嵌入的单条query"""
+    __slots__ = ("text", "event", "result", "error", "promoted")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.event = threading.Event()
+        self.promoted = False  # 被上一任leader指定为新的leader
+        self.result: Optional[list[float]] = None
+        self.error: Optional[BaseException] = None
+
+
+class BatchingEmbeddings(Embeddings):
+    """跨请求微批处理文本嵌入模型，将时间窗口内并发的embed_query合并成一次embed_documents调用
+
+    第一个到达的调用者成为leader，等待batch_window_ms或凑满max_batch_size后统一发起批量请求，
+    并将结果分发给各个等待者。leader派发完包含自身query的批次后即返回，并将leader身份交给队列中
+    最早的等待者，持续高负载下每个调用者的等待时间也有上限，整个过程无后台线程。
+    """
+
+    def __init__(self, embeddings: Embeddings, batch_window_ms: float = 5, max_batch_size: int = 10):
+        """构造函数，传递底层文本嵌入模型、合并窗口(毫秒)以及单批最大条数"""
+        self._embeddings = embeddings
+        self._batch_window = max(batch_window_ms, 0) / 1000
+        self._max_batch_size = max(max_batch_size, 1)
+        self._condition = threading.Condition()
+        self._pending: list[_PendingQuery] = []
+        self._leader_active = False
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """只读属性，返回底层文本嵌入模型"""
+        return self._embeddings
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """文档列表本身就是批量请求，直接透传给底层模型"""
+        return self._embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        """将query加入等待队列，由leader合并成批量请求后返回对应的向量"""
+        # 1.未开启合并窗口时直接调用底层模型
+        if self._batch_window <= 0:
+            return self._embeddings.embed_query(text)
+
+        # 2.加入等待队列并判断当前调用者是否需要成为leader
+        pending_query = _PendingQuery(text)
+        with self._condition:
+            self._pending.append(pending_query)
+            if len(self._pending) >= self._max_batch_size:
+                self._condition.notify_all()
+            is_leader = not self._leader_active
+            self._leader_active = True
+
+        # 3.leader负责派发批量请求，其余调用者等待结果，被指定为新leader时立即派发剩余的query
+        if is_leader:
+            self._dispatch(pending_query, time.monotonic() + self._batch_window)
+        pending_query.event.wait()
+        while pending_query.promoted:
+            pending_query.promoted = False
+            pending_query.event.clear()
+            self._dispatch(pending_query, time.monotonic())
+            pending_query.event.wait()
+
+        if pending_query.error is not None:
+            raise pending_query.error
+        return pending_query.result
+
+    def _dispatch(self, own_query: _PendingQuery, deadline: float) -> None:
+        """leader按顺序派发等待队列中的query，直到包含自身query的批次派发完成，随后移交leader身份"""
+        while True:
+            with self._condition:
+                # 1.等待窗口结束或凑满一个批次
+                while len(self._pending) < self._max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                # 2.取出队列最前面的一个批次
+                batch = self._pending[:self._max_batch_size]
+                del self._pending[:self._max_batch_size]
+
+            self._flush(batch)
+
+            # 3.自身query已派发则移交leader身份，队列为空时释放
+            if own_query in batch:
+                with self._condition:
+                    if self._pending:
+                        self._pending[0].promoted = True
+                        self._pending[0].event.set()
+                    else:
+                        self._leader_active = False
+                return
+
+    def _flush(self, batch: list[_PendingQuery]) -> None:
+        """对批次内的文本去重后发起一次批量嵌入，并将结果/异常回填给等待者"""
+        try:
+            texts = list(dict.fromkeys(pending_query.text for pending_query in batch))
+            vectors = dict(zip(texts, self._embeddings.embed_documents(texts)))
+            for pending_query in batch:
+                pending_query.result = vectors[pending_query.text]
+        except BaseException as e:
+            for pending_query in batch:
+                pending_query.error = e
+        finally:
+            for pending_query in batch:
+                pending_query.event.set()
@@ -0,0 +1,78 @@
+from langchain_core.embeddings import Embeddings
+from typing_extensions import Any, Callable, Optional
+
+from internal.exception import NotFoundException
+from .hash_embeddings import HashEmbeddings
+
+# 文本嵌入模型工厂函数，接收模型名字与向量维度，返回LangChain文本嵌入模型实例
+EmbeddingsFactory = Callable[[str, Optional[int]], Embeddings]
+
+# 支持指定输出向量维度的DashScope文本嵌入模型，其他模型的维度固定
+DASHSCOPE_DIMENSION_MODELS = ("text-embedding-v3", "text-embedding-v4")
+
+# 不支持指定维度的DashScope文本嵌入模型的固定输出维度
+DASHSCOPE_FIXED_DIMENSIONS = {"text-embedding-v1": 1536, "text-embedding-v2": 1536}
+
+
+class _DashScopeDimensionClient:
+    """DashScope文本嵌入接口的包装，每次调用时附加输出向量维度"""
+
+    def __init__(self, client: Any, dimension: int):
+        self.client = client
+        self.dimension = dimension
+
+    def call(self, **kwargs) -> Any:
+        return self.client.call(dimension=self.dimension, **kwargs)
+
+
+def _create_dashscope_embeddings(model: str, dimension: Optional[int] = None) -> Embeddings:
+    """创建通义千问DashScope文本嵌入模型，只有支持自定义维度的模型才会传递向量维度"""
+    from langchain_community.embeddings import DashScopeEmbeddings
+    embeddings = DashScopeEmbeddings(model=model)
+    if dimension is not None and model in DASHSCOPE_DIMENSION_MODELS:
+        embeddings.client = _DashScopeDimensionClient(embeddings.client, dimension)
+    return embeddings
+
+
+def _create_openai_embeddings(model: str, dimension: Optional[int] = None) -> Embeddings:
+    """创建OpenAI文本嵌入模型"""
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model=model, dimensions=dimension)
+
+
+def _create_local_embeddings(model: str, dimension: Optional[int] = None) -> Embeddings:
+    """创建本地确定性哈希文本嵌入模型，model参数对该提供者无意义"""
+    return HashEmbeddings(dimension=dimension or 1024)
+
+
+# 文本嵌入模型提供者注册表
+_EMBEDDINGS_PROVIDERS: dict[str, EmbeddingsFactory] = {
+    "dashscope": _create_dashscope_embeddings,
+    "openai": _create_openai_embeddings,
+    "local": _create_local_embeddings,
+}
+
+
+def register_embeddings_provider(name: str, factory: EmbeddingsFactory) -> None:
+    """注册新的文本嵌入模型提供者，同名提供者会被覆盖"""
+    _EMBEDDINGS_PROVIDERS[name] = factory
+
+
+def get_embeddings_provider_names() -> list[str]:
+    """获取所有已注册的文本嵌入模型提供者名字"""
+    return list(_EMBEDDINGS_PROVIDERS.keys())
+
+
+def get_embeddings_dimension(provider: str, model: str, dimension: int) -> int:
+    """获取文本嵌入模型实际输出的向量维度，不支持指定维度的模型返回模型的固定维度"""
+    if provider == "dashscope" and model not in DASHSCOPE_DIMENSION_MODELS:
+        return DASHSCOPE_FIXED_DIMENSIONS.get(model, dimension)
+    return dimension
+
+
+def create_embeddings(provider: str, model: str, dimension: Optional[int] = None) -> Embeddings:
+    """根据提供者名字+模型名字+向量维度创建文本嵌入模型"""
+    factory = _EMBEDDINGS_PROVIDERS.get(provider)
+    if factory is None:
+        raise NotFoundException(f"该文本嵌入模型提供者不存在: {provider}")
+    return factory(model, dimension)
@@ -0,0 +1,66 @@
+import hashlib
+import re
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from pydantic import BaseModel, Field
+
+
+class HashEmbeddings(BaseModel, Embeddings):
+    """基于哈希n-gram特征的本地确定性文本嵌入模型，纯CPU计算、无需网络，适用于CI、压测以及远程服务不可用时的降级运行"""
+    dimension: int = Field(default=1024, gt=0)  # 向量维度，默认与text-embedding-v3保持一致
+    ngram_range: tuple[int, int] = (1, 3)  # 字符n-gram的范围(包含两端)
+    lowercase: bool = True  # 是否统一转换成小写
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """将传递的文本列表转换成向量列表"""
+        return [self._embed(text).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        """将传递的query转换成向量"""
+        return self._embed(text).tolist()
+
+    def _embed(self, text: str) -> np.ndarray:
+        """提取文本的n-gram特征并哈希投影到固定维度，最终返回L2归一化后的向量"""
+        # 1.提取特征并计算每个特征的哈希桶位置与符号
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        features = self._extract_features(text)
+        if not features:
+            return vector
+
+        indices = np.empty(len(features), dtype=np.int64)
+        signs = np.empty(len(features), dtype=np.float32)
+        for i, feature in enumerate(features):
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            indices[i] = digest % self.dimension
+            signs[i] = 1.0 if (digest >> 63) & 1 else -1.0
+
+        # 2.累加特征到向量中，并使用次线性tf缩放降低高频特征的影响
+        np.add.at(vector, indices, signs)
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+
+        # 3.L2归一化，使得内积与余弦相似度一致
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def _extract_features(self, text: str) -> list[str]:
+        """提取文本的单词特征以及字符n-gram特征"""
+        if self.lowercase:
+            text = text.lower()
+        text = re.sub(r"\s+", " ", text).strip()
+        if not text:
+            return []
+
+        # 1.单词级特征(英文/数字)
+        features = [f"w:{word}" for word in re.findall(r"[a-z0-9_]+", text)]
+
+        # 2.字符n-gram特征，对中文等无空格语言同样有效
+        min_n, max_n = self.ngram_range
+        for n in range(min_n, max_n + 1):
+            if len(text) < n:
+                break
+            features.extend(f"c{n}:{text[i:i + n]}" for i in range(len(text) - n + 1))
+
+        return features
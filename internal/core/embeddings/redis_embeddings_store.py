@@ -0,0 +1,157 @@
+import hashlib
+import json
+import struct
+import uuid
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+from langchain_core.stores import BaseStore
+from redis import Redis
+
+# 向量编码格式，首字节标记编码类型，便于后续切换编码时新旧数据共存
+CODEC_FLOAT32 = "float32"
+CODEC_FLOAT16 = "float16"
+CODEC_INT8 = "int8"
+_CODEC_HEADERS = {CODEC_FLOAT32: b"\x01", CODEC_FLOAT16: b"\x02", CODEC_INT8: b"\x03"}
+
+# LangChain CacheBackedEmbeddings旧版缓存键使用的命名空间UUID
+_LEGACY_NAMESPACE_UUID = uuid.UUID(int=1985)
+
+
+def encode_embedding(vector: Sequence[float], codec: str = CODEC_FLOAT32) -> bytes:
+    """将向量编码成紧凑的二进制数据，int8编码会额外存储一个float32缩放系数"""
+    if codec not in _CODEC_HEADERS:
+        raise ValueError(f"不支持的向量编码格式: {codec}")
+
+    array = np.asarray(vector, dtype=np.float32)
+    if codec == CODEC_FLOAT32:
+        return _CODEC_HEADERS[codec] + array.astype("<f4").tobytes()
+    if codec == CODEC_FLOAT16:
+        return _CODEC_HEADERS[codec] + array.astype("<f2").tobytes()
+
+    # int8对称量化：按向量最大绝对值缩放到[-127, 127]
+    max_abs = float(np.max(np.abs(array))) if array.size else 0.0
+    scale = max_abs / 127 if max_abs > 0 else 1.0
+    quantized = np.clip(np.rint(array / scale), -127, 127).astype(np.int8)
+    return _CODEC_HEADERS[codec] + struct.pack("<f", scale) + quantized.tobytes()
+
+
+def decode_embedding(data: bytes) -> list[float]:
+    """将二进制数据解码成向量，根据首字节自动识别编码格式"""
+    header, body = data[:1], data[1:]
+    if header == _CODEC_HEADERS[CODEC_FLOAT32]:
+        return np.frombuffer(body, dtype="<f4").tolist()
+    if header == _CODEC_HEADERS[CODEC_FLOAT16]:
+        return np.frombuffer(body, dtype="<f2").astype(np.float32).tolist()
+    if header == _CODEC_HEADERS[CODEC_INT8]:
+        scale = struct.unpack("<f", body[:4])[0]
+        return (np.frombuffer(body[4:], dtype=np.int8).astype(np.float32) * scale).tolist()
+    raise ValueError("无法识别的向量编码格式")
+
+
+class RedisEmbeddingsStore(BaseStore[str, list[float]]):
+    """基于Redis的文本嵌入向量存储器，以二进制编码存储向量并按模型+维度隔离命名空间
+
+    键格式为`embeddings:{model}:{dimension}:{sha1(text)}`，写入时设置TTL并在命中时续期，
+    配合Redis的volatile-lru/allkeys-lru淘汰策略即可限制缓存内存上限。
+    传递legacy_namespace后，未命中的key会回查旧版JSON格式缓存，命中则迁移成新格式并删除旧数据。
+    """
+
+    def __init__(
+            self,
+            client: Redis,
+            model: str,
+            dimension: int,
+            codec: str = CODEC_FLOAT32,
+            ttl: Optional[int] = None,
+            legacy_namespace: Optional[str] = None,
+    ):
+        """构造函数，传递redis客户端、模型名字、向量维度、编码格式、过期时间(秒)、旧版缓存命名空间"""
+        if codec not in _CODEC_HEADERS:
+            raise ValueError(f"不支持的向量编码格式: {codec}")
+        self.client = client
+        self.namespace = f"embeddings:{model}:{dimension}:"
+        self.dimension = dimension
+        self.codec = codec
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.legacy_namespace = legacy_namespace
+
+    def _get_key(self, text: str) -> str:
+        """根据文本生成缓存键"""
+        return self.namespace + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _get_legacy_key(self, text: str) -> str:
+        """根据文本生成旧版CacheBackedEmbeddings.from_bytes_store的缓存键"""
+        hash_value = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return self.legacy_namespace + str(uuid.uuid5(_LEGACY_NAMESPACE_UUID, hash_value))
+
+    def mget(self, keys: Sequence[str]) -> list[Optional[list[float]]]:
+        """批量获取文本对应的向量，命中的key会刷新过期时间"""
+        if not keys:
+            return []
+
+        # 1.在同一个pipeline中完成读取与续期，只产生一次网络往返
+        cache_keys = [self._get_key(key) for key in keys]
+        pipeline = self.client.pipeline(transaction=False)
+        for cache_key in cache_keys:
+            pipeline.get(cache_key)
+            if self.ttl:
+                pipeline.expire(cache_key, self.ttl)
+        raw_values = pipeline.execute()[::2] if self.ttl else pipeline.execute()
+        values = [decode_embedding(raw_value) if raw_value else None for raw_value in raw_values]
+
+        # 2.未命中的key回查旧版缓存并迁移
+        if self.legacy_namespace is not None:
+            missing_indexes = [index for index, value in enumerate(values) if value is None]
+            if missing_indexes:
+                for index, value in zip(missing_indexes, self._migrate_legacy([keys[i] for i in missing_indexes])):
+                    values[index] = value
+
+        return values
+
+    def _migrate_legacy(self, keys: Sequence[str]) -> list[Optional[list[float]]]:
+        """读取旧版JSON格式的缓存，维度匹配的向量会以新格式写回并删除旧数据"""
+        legacy_keys = [self._get_legacy_key(key) for key in keys]
+        legacy_values = self.client.mget(legacy_keys)
+
+        migrated: list[tuple[str, list[float]]] = []
+        values: list[Optional[list[float]]] = []
+        for key, legacy_value in zip(keys, legacy_values):
+            vector = None
+            if legacy_value:
+                try:
+                    vector = json.loads(legacy_value)
+                except ValueError:
+                    vector = None
+                if not isinstance(vector, list) or len(vector) != self.dimension:
+                    vector = None
+            if vector is not None:
+                migrated.append((key, vector))
+            values.append(vector)
+
+        if migrated:
+            self.mset(migrated)
+            self.client.delete(*[self._get_legacy_key(key) for key, _ in migrated])
+
+        return values
+
+    def mset(self, key_value_pairs: Sequence[tuple[str, list[float]]]) -> None:
+        """批量写入文本对应的向量"""
+        if not key_value_pairs:
+            return
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in key_value_pairs:
+            pipeline.set(self._get_key(key), encode_embedding(value, self.codec), ex=self.ttl)
+        pipeline.execute()
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        """批量删除文本对应的向量"""
+        if keys:
+            self.client.delete(*[self._get_key(key) for key in keys])
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        """迭代当前命名空间下的缓存键，由于存储的是文本哈希，返回的是哈希值而非原文"""
+        pattern = f"{self.namespace}{prefix or ''}*"
+        for cache_key in self.client.scan_iter(match=pattern):
+            cache_key = cache_key.decode("utf-8") if isinstance(cache_key, bytes) else cache_key
+            yield cache_key[len(self.namespace):]
@@ -10,6 +10,7 @@ from internal.core.language_model.entities.model_entity import BaseLanguageModel
 
 class Chat(BaseChatOpenAI, BaseLanguageModel):
     """深度求索大语言模型基类"""
+    stream_usage: bool = True  # 流式输出时请求stream_options.include_usage，在最后一个内容块中返回token用量
 
     def __init__(self, *args, **kwargs):
         super().__init__(
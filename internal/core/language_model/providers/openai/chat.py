@@ -5,5 +5,4 @@ from internal.core.language_model.entities.model_entity import BaseLanguageModel
 
 class Chat(ChatOpenAI, BaseLanguageModel):
     """openai基础聊天模型类"""
-
-    pass
+    stream_usage: bool = True  # 流式输出时请求stream_options.include_usage，在最后一个内容块中返回token用量
@@ -9,6 +9,7 @@ from internal.core.language_model.entities.model_entity import BaseLanguageModel
 
 class Chat(ChatOpenAI, BaseLanguageModel):
     """通义千问聊天模型"""
+    stream_usage: bool = True  # 兼容模式同样支持stream_options.include_usage，流式输出时返回token用量
 
     def __init__(self, *args, **kwargs):  # 添加 model_name 参数
         # 默认从环境变量获取 API 密钥和基础 URL
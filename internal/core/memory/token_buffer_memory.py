@@ -1,17 +1,33 @@
+import json
+import logging
+import os
 from dataclasses import dataclass
+from typing import Any
+from uuid import UUID
 
-from langchain_core.messages import AnyMessage, AIMessage, trim_messages, get_buffer_string
+from langchain_core.messages import AnyMessage, AIMessage, get_buffer_string
 from sqlalchemy import desc
 
 from internal.core.language_model.entities.model_entity import BaseLanguageModel
+from internal.entity.cache_entity import CONVERSATION_HISTORY_WINDOW, CONVERSATION_HISTORY_WINDOW_EXPIRE_TIME
 from internal.entity.conversation_entity import MessageStatus
 from internal.model import Conversation, Message
 from pkg.sqlalchemy import SQLAlchemy
 
+# 可以作为短期记忆的消息状态
+HISTORY_MESSAGE_STATUSES = [MessageStatus.NORMAL, MessageStatus.STOP, MessageStatus.TIMEOUT]
+
+# Redis中缓存的最近问答条数，需要不小于应用可配置的最大上下文轮数
+HISTORY_WINDOW_SIZE = int(os.getenv("CONVERSATION_HISTORY_WINDOW_SIZE", 100))
+
 
 @dataclass
 class TokenBufferMemory:
-    """基于token计数的缓冲记忆组件"""
+    """基于token计数的缓冲记忆组件
+
+    每条问答作为短期记忆时的token数在消息保存时计算并持久化，会话最近的问答窗口缓存在Redis中并随新消息追加，
+    获取短期记忆时只需按记录的token数从后往前累加截断，无需重新分词。
+    """
     db: SQLAlchemy  # 数据库实例
     conversation: Conversation  # 会话模型
     model_instance: BaseLanguageModel  # LLM大语言模型
@@ -23,35 +39,27 @@ class TokenBufferMemory:
     ) -> list[AnyMessage]:
         """根据传递的token限制+消息条数限制获取指定会话模型的历史消息列表"""
         # 1.判断会话模型是否存在，如果不存在则直接返回空列表
-        if self.conversation is None:
+        if self.conversation is None or message_limit <= 0:
             return []
 
-        # 2.查询该会话的消息列表，并且使用时间进行倒序，同时匹配答案不为空、匹配会话id、没有软删除、状态是正常
-        messages = self.db.session.query(Message).filter(
-            Message.conversation_id == self.conversation.id,
-            Message.answer != "",
-            Message.is_deleted == False,
-            Message.status.in_([MessageStatus.NORMAL, MessageStatus.STOP, MessageStatus.TIMEOUT]),
-        ).order_by(desc("created_at")).limit(message_limit).all()
-        messages = list(reversed(messages))
+        # 2.获取最近的问答窗口(按时间正序)，并保留最后message_limit条
+        entries = self._get_history_window(message_limit)[-message_limit:]
+
+        # 3.从最新的问答开始累加token数，超过限制时截断，保证历史消息始终以人类消息开头、AI消息结尾
+        token_count = 0
+        start = len(entries)
+        while start > 0 and token_count + entries[start - 1]["token_count"] <= max_token_limit:
+            token_count += entries[start - 1]["token_count"]
+            start -= 1
 
-        # 3.将messages转换成LangChain消息列表
+        # 4.将保留的问答转换成LangChain消息列表
         prompt_messages = []
-        for message in messages:
+        for entry in entries[start:]:
             prompt_messages.extend([
-                self.model_instance.convert_to_human_message(message.query, message.image_urls),
-                AIMessage(content=message.answer),
+                self.model_instance.convert_to_human_message(entry["query"], entry["image_urls"]),
+                AIMessage(content=entry["answer"]),
             ])
-
-        # 4.调用LangChain继承的trim_messages函数剪切消息列表
-        return trim_messages(
-            messages=prompt_messages,
-            max_tokens=max_token_limit,
-            token_counter=self.model_instance,
-            strategy="last",
-            start_on="human",
-            end_on="ai",
-        )
+        return prompt_messages
 
     def get_history_prompt_text(
             self,
@@ -66,3 +74,108 @@ class TokenBufferMemory:
 
         # 2.调用LangChain集成的get_buffer_string()函数将消息列表转换成文本
         return get_buffer_string(messages, human_prefix, ai_prefix)
+
+    def append_message(self, message: Message) -> None:
+        """消息保存完成后计算并持久化其作为短期记忆的token数，同时追加到会话的问答窗口缓存中"""
+        # 1.答案为空、已删除或者出错的消息不会作为短期记忆
+        if message.is_deleted or message.answer == "" or message.status not in HISTORY_MESSAGE_STATUSES:
+            return
+
+        # 2.计算并持久化token数
+        token_count = self._count_history_tokens(message.query, message.image_urls, message.answer)
+        with self.db.auto_commit():
+            message.history_token_count = token_count
+
+        # 3.窗口缓存存在时才追加，不存在时下次获取短期记忆会从数据库重建
+        key = CONVERSATION_HISTORY_WINDOW.format(conversation_id=message.conversation_id)
+        try:
+            pipeline = self._get_redis_client().pipeline()
+            pipeline.rpushx(key, json.dumps(self._to_entry(message, token_count), ensure_ascii=False))
+            pipeline.ltrim(key, -HISTORY_WINDOW_SIZE, -1)
+            pipeline.expire(key, CONVERSATION_HISTORY_WINDOW_EXPIRE_TIME)
+            pipeline.execute()
+        except Exception as e:
+            logging.warning("追加会话短期记忆缓存失败: %(error)s", {"error": e})
+
+    @classmethod
+    def clear_history_cache(cls, conversation_id: UUID) -> None:
+        """清除会话的问答窗口缓存，删除消息等导致窗口失效的操作后调用"""
+        try:
+            cls._get_redis_client().delete(CONVERSATION_HISTORY_WINDOW.format(conversation_id=conversation_id))
+        except Exception as e:
+            logging.warning("清除会话短期记忆缓存失败: %(error)s", {"error": e})
+
+    def _get_history_window(self, message_limit: int) -> list[dict[str, Any]]:
+        """获取会话最近的问答窗口，优先读取Redis缓存，未命中时从数据库加载并回填缓存"""
+        # 1.需要的条数超过缓存窗口时直接从数据库加载
+        if message_limit > HISTORY_WINDOW_SIZE:
+            return self._load_history_entries(message_limit)
+
+        # 2.读取缓存
+        key = CONVERSATION_HISTORY_WINDOW.format(conversation_id=self.conversation.id)
+        try:
+            data = self._get_redis_client().lrange(key, 0, -1)
+            if data:
+                return [json.loads(item) for item in data]
+        except Exception as e:
+            logging.warning("读取会话短期记忆缓存失败: %(error)s", {"error": e})
+
+        # 3.缓存未命中则从数据库加载并回填
+        entries = self._load_history_entries(HISTORY_WINDOW_SIZE)
+        if entries:
+            try:
+                pipeline = self._get_redis_client().pipeline()
+                pipeline.delete(key)
+                pipeline.rpush(key, *[json.dumps(entry, ensure_ascii=False) for entry in entries])
+                pipeline.expire(key, CONVERSATION_HISTORY_WINDOW_EXPIRE_TIME)
+                pipeline.execute()
+            except Exception as e:
+                logging.warning("写入会话短期记忆缓存失败: %(error)s", {"error": e})
+        return entries
+
+    def _load_history_entries(self, limit: int) -> list[dict[str, Any]]:
+        """从数据库加载最近的问答，未记录token数的历史消息(旧数据)计算后回写"""
+        # 1.查询该会话的消息列表，并且使用时间进行倒序，同时匹配答案不为空、匹配会话id、没有软删除、状态是正常
+        messages = self.db.session.query(Message).filter(
+            Message.conversation_id == self.conversation.id,
+            Message.answer != "",
+            Message.is_deleted == False,
+            Message.status.in_(HISTORY_MESSAGE_STATUSES),
+        ).order_by(desc("created_at")).limit(limit).all()
+        messages = list(reversed(messages))
+
+        # 2.补充计算缺失的token数
+        missing = [message for message in messages if not message.history_token_count]
+        if missing:
+            with self.db.auto_commit():
+                for message in missing:
+                    message.history_token_count = self._count_history_tokens(
+                        message.query, message.image_urls, message.answer,
+                    )
+
+        return [self._to_entry(message, message.history_token_count) for message in messages]
+
+    def _count_history_tokens(self, query: str, image_urls: list[str], answer: str) -> int:
+        """计算一条问答转换成人类消息+AI消息后的token数"""
+        return self.model_instance.get_num_tokens_from_messages([
+            self.model_instance.convert_to_human_message(query, image_urls),
+            AIMessage(content=answer),
+        ])
+
+    @classmethod
+    def _to_entry(cls, message: Message, token_count: int) -> dict[str, Any]:
+        """将消息转换成问答窗口中的缓存条目"""
+        return {
+            "id": str(message.id),
+            "query": message.query,
+            "image_urls": message.image_urls or [],
+            "answer": message.answer,
+            "token_count": token_count,
+        }
+
+    @classmethod
+    def _get_redis_client(cls):
+        """获取Redis客户端"""
+        from redis import Redis
+        from app.http.module import injector
+        return injector.get(Redis)
@@ -0,0 +1,7 @@
+from .keyword_matcher import KeywordMatcher, KeywordRedactor, get_keyword_matcher
+
+__all__ = [
+    "KeywordMatcher",
+    "KeywordRedactor",
+    "get_keyword_matcher",
+]
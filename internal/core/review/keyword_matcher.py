@@ -0,0 +1,175 @@
+from collections import deque
+from functools import lru_cache
+from typing import Any, Iterable, Union
+
+# 敏感词替换后的内容
+REDACTED_TEXT = "**"
+
+
+def _normalize_char(char: str) -> str:
+    """字符归一化(忽略大小写)，转换后长度变化的字符保持原样，保证匹配位置与原文一一对应"""
+    lower = char.lower()
+    return lower if len(lower) == 1 else char
+
+
+def _extract_text_parts(content: list[Any]) -> list[str]:
+    """提取多模态消息内容列表中的文本部分，图片等非文本部分直接忽略"""
+    texts = []
+    for part in content:
+        if isinstance(part, str):
+            texts.append(part)
+        elif isinstance(part, dict) and part.get("type") == "text":
+            texts.append(part.get("text", ""))
+    return texts
+
+
+class KeywordMatcher:
+    """基于Aho–Corasick自动机的敏感词匹配器，忽略大小写
+
+    构建一次后可以在O(文本长度)内找出所有敏感词，与敏感词数量无关，适用于输入审核以及流式输出的敏感词替换。
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        """构造函数，传递敏感词列表并构建自动机"""
+        # 1.初始化根节点，每个节点记录子节点跳转、失败指针以及以该节点结尾的最长敏感词长度
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._depth: list[int] = [0]
+        self._output: list[int] = [0]
+
+        # 2.构建字典树
+        for keyword in keywords:
+            if not keyword:
+                continue
+            node = 0
+            for char in keyword:
+                char = _normalize_char(char)
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._depth.append(self._depth[node] + 1)
+                    self._output.append(0)
+                    self._goto[node][char] = next_node
+                node = next_node
+            self._output[node] = max(self._output[node], len(keyword))
+        self.max_keyword_length = max(self._depth)
+
+        # 3.广度优先计算失败指针，并沿失败指针合并输出(取最长的敏感词)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = max(self._output[child], self._output[self._fail[child]])
+                queue.append(child)
+
+    def _step(self, node: int, char: str) -> int:
+        """自动机状态跳转"""
+        while node and char not in self._goto[node]:
+            node = self._fail[node]
+        return self._goto[node].get(char, 0)
+
+    def _scan(self, text: str) -> tuple[list[tuple[int, int]], int]:
+        """扫描文本，返回合并后的敏感词区间列表以及末尾仍处于匹配中的字符数"""
+        spans: list[tuple[int, int]] = []
+        node = 0
+        for index, char in enumerate(text):
+            node = self._step(node, _normalize_char(char))
+            length = self._output[node]
+            if length:
+                start, end = index + 1 - length, index + 1
+                # 与上一个区间重叠时合并，避免重复替换
+                if spans and start < spans[-1][1]:
+                    spans[-1] = (min(spans[-1][0], start), end)
+                else:
+                    spans.append((start, end))
+        return spans, self._depth[node]
+
+    def contains(self, text: Union[str, list[Any]]) -> bool:
+        """检测文本中是否包含敏感词，支持多模态消息的内容列表(只检测其中的文本部分)"""
+        if self.max_keyword_length == 0:
+            return False
+        if isinstance(text, list):
+            return any(self.contains(part) for part in _extract_text_parts(text))
+        node = 0
+        for char in text:
+            node = self._step(node, _normalize_char(char))
+            if self._output[node]:
+                return True
+        return False
+
+    def redact(self, text: str) -> str:
+        """将文本中的敏感词替换成**"""
+        if self.max_keyword_length == 0:
+            return text
+        spans, _ = self._scan(text)
+        return self._replace(text, spans)
+
+    @classmethod
+    def _replace(cls, text: str, spans: list[tuple[int, int]]) -> str:
+        """按区间替换文本内容"""
+        if not spans:
+            return text
+        parts = []
+        last = 0
+        for start, end in spans:
+            parts.append(text[last:start])
+            parts.append(REDACTED_TEXT)
+            last = end
+        parts.append(text[last:])
+        return "".join(parts)
+
+    def redactor(self) -> "KeywordRedactor":
+        """创建流式替换器，每个流式输出过程单独创建一个"""
+        return KeywordRedactor(self)
+
+
+class KeywordRedactor:
+    """流式敏感词替换器，保留末尾可能是敏感词前缀的少量字符，与下一个内容块拼接后再判断
+
+    因此跨内容块的敏感词同样可以被替换，保留的字符数不超过最长敏感词的长度，输出结束时需调用flush。
+    """
+
+    def __init__(self, matcher: KeywordMatcher):
+        """构造函数，传递敏感词匹配器"""
+        self.matcher = matcher
+        self._carry = ""
+
+    def feed(self, chunk: str) -> str:
+        """输入一个内容块，返回可以安全输出的替换后内容"""
+        if self.matcher.max_keyword_length == 0:
+            return chunk
+
+        # 1.拼接上一次保留的内容并扫描，末尾仍处于匹配中的字符需要保留
+        text = self._carry + chunk
+        spans, pending = self.matcher._scan(text)
+        cut = len(text) - pending
+
+        # 2.跨越切分点的敏感词整体保留到下一次处理
+        while spans and spans[-1][1] > cut:
+            cut = min(cut, spans.pop()[0])
+
+        # 3.输出切分点之前的内容，其余内容保留
+        self._carry = text[cut:]
+        return self.matcher._replace(text[:cut], spans)
+
+    def flush(self) -> str:
+        """输出结束时返回剩余保留内容替换后的结果"""
+        carry, self._carry = self._carry, ""
+        return self.matcher.redact(carry)
+
+
+@lru_cache(maxsize=64)
+def _get_keyword_matcher(keywords: tuple[str, ...]) -> KeywordMatcher:
+    """根据敏感词元组构建并缓存匹配器"""
+    return KeywordMatcher(keywords)
+
+
+def get_keyword_matcher(keywords: Iterable[str]) -> KeywordMatcher:
+    """获取敏感词匹配器，相同的敏感词列表(即同一个应用配置版本)只构建一次自动机"""
+    return _get_keyword_matcher(tuple(keywords))
@@ -81,6 +81,11 @@ class OpenAPISchema(BaseModel):
                 raise ValidateErrorException("operationId不能为空且为字符串")
             if not isinstance(interface["operation"].get("parameters", []), list):
                 raise ValidateErrorException("parameters必须是列表或者为空")
+            cache_ttl = interface["operation"].get("x-cache-ttl", 0)
+            if not isinstance(cache_ttl, int) or isinstance(cache_ttl, bool) or cache_ttl < 0:
+                raise ValidateErrorException("x-cache-ttl必须是大于等于0的整数")
+            if cache_ttl > 0 and interface["method"] != "get":
+                raise ValidateErrorException("x-cache-ttl只支持get请求")
 
             # 6.检测operationId是否是唯一的
             if interface["operation"]["operationId"] in operation_ids:
@@ -111,11 +116,12 @@ class OpenAPISchema(BaseModel):
                         f"parameter.type参数必须为{'/'.join([item.value for item in ParameterType])}"
                     )
 
-            # 9.组装数据并更新
+            # 9.组装数据并更新，x-cache-ttl为工具结果的缓存时间(秒)，不传递时不缓存
             extra_paths[interface["path"]] = {
                 interface["method"]: {
                     "description": interface["operation"]["description"],
                     "operationId": interface["operation"]["operationId"],
+                    "x-cache-ttl": cache_ttl,
                     "parameters": [{
                         "name": parameter.get("name"),
                         "in": parameter.get("in"),
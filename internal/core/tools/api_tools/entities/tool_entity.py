@@ -10,3 +10,4 @@ class ToolEntity(BaseModel):
     description: str = Field(default="", description="API工具的描述信息")
     headers: list[dict] = Field(default_factory=list, description="API工具的请求头信息")
     parameters: list[dict] = Field(default_factory=list, description="API工具的参数列表信息")
+    cache_ttl: int = Field(default=0, description="API工具结果的缓存时间(秒)，为0时不缓存，只有GET请求支持缓存")
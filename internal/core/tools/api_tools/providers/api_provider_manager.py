@@ -5,15 +5,18 @@
 @Author  : thezehui@gmail.com
 @File    : api_provider_manager.py
 """
+import json
 from dataclasses import dataclass
+from functools import lru_cache
 
 import requests
 from injector import inject
-from langchain_core.tools import BaseTool, StructuredTool
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
 from pydantic import BaseModel, create_model, Field
 from typing_extensions import Type, Optional, Callable
 
 from internal.core.tools.api_tools.entities import ToolEntity, ParameterTypeMap, ParameterIn
+from internal.core.tools.tool_cache import CachedTool
 
 
 @inject
@@ -50,23 +53,32 @@ class ApiProviderManager(BaseModel):
                 # 5.将参数存储到合适的位置上，默认在query上
                 parameters[parameter.get("in", ParameterIn.QUERY)][key] = value
 
-            # 6.构建request请求并返回采集的内容
-            return requests.request(
+            # 6.构建request请求并返回采集的内容，请求失败(非2xx)时抛出ToolException，开启缓存时失败结果不会被缓存
+            response = requests.request(
                 method=tool_entity.method,
                 url=tool_entity.url.format(**parameters[ParameterIn.PATH]),
                 params=parameters[ParameterIn.QUERY],
                 json=parameters[ParameterIn.REQUEST_BODY],
                 headers={**header_map, **parameters[ParameterIn.HEADER]},
                 cookies=parameters[ParameterIn.COOKIE],
-            ).text
+            )
+            if not response.ok:
+                raise ToolException(response.text)
+            return response.text
 
         return tool_func
 
     @classmethod
     def _create_model_from_parameters(cls, parameters: list[dict]) -> Type[BaseModel]:
-        """根据传递的parameters参数创建BaseModel子类"""
+        """根据传递的parameters参数创建BaseModel子类，相同的参数列表复用同一个类，便于LLM绑定工具时复用转换后的工具结构"""
+        return cls._create_model_from_parameters_json(json.dumps(parameters, ensure_ascii=False, sort_keys=True))
+
+    @classmethod
+    @lru_cache(maxsize=1024)
+    def _create_model_from_parameters_json(cls, parameters_json: str) -> Type[BaseModel]:
+        """根据JSON格式的parameters参数创建BaseModel子类"""
         fields = {}
-        for parameter in parameters:
+        for parameter in json.loads(parameters_json):
             field_name = parameter.get("name")
             field_type = ParameterTypeMap.get(parameter.get("type"), str)
             field_required = parameter.get("required", True)
@@ -79,11 +91,31 @@ class ApiProviderManager(BaseModel):
 
         return create_model("DynamicModel", **fields)
 
+    @classmethod
+    def _get_cache_ttl(cls, tool_entity: ToolEntity) -> int:
+        """获取API工具结果的缓存时间，只有工具作者通过x-cache-ttl开启缓存的GET请求才会缓存"""
+        if tool_entity.method.lower() != "get":
+            return 0
+        return max(tool_entity.cache_ttl, 0)
+
     def get_tool(self, tool_entity: ToolEntity) -> BaseTool:
-        """根据传递的配置获取自定义API工具"""
-        return StructuredTool.from_function(
+        """根据传递的配置获取自定义API工具，开启缓存的GET请求会包装上结果缓存"""
+        # 1.创建发起API请求的LangChain工具，未缓存时请求失败的响应内容仍作为工具结果返回给LLM
+        tool = StructuredTool.from_function(
             func=self._create_tool_func_from_tool_entity(tool_entity),
             name=f"{tool_entity.id}_{tool_entity.name}",
             description=tool_entity.description,
             args_schema=self._create_model_from_parameters(tool_entity.parameters),
+            handle_tool_error=True,
+        )
+
+        # 2.需要缓存时进行包装，请求地址与请求头同样参与缓存键计算，修改配置后旧缓存自动失效
+        cache_ttl = self._get_cache_ttl(tool_entity)
+        if cache_ttl <= 0:
+            return tool
+        return CachedTool.wrap(
+            tool,
+            tool_id=f"api:{tool_entity.id}:{tool_entity.name}",
+            cache_ttl=cache_ttl,
+            cache_scope={"url": tool_entity.url, "headers": tool_entity.headers},
         )
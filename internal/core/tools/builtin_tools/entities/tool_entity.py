@@ -37,3 +37,5 @@ class ToolEntity(BaseModel):
     label: str  # 工具标签
     description: str  # 工具描述
     params: list[ToolParam] = Field(default_factory=list)  # 工具的参数信息
+    cacheable: bool = False  # 工具是否幂等，幂等的工具相同参数的调用结果可以缓存
+    cache_ttl: int = 0  # 工具结果的缓存时间(秒)
@@ -2,7 +2,7 @@ import json
 import os
 
 import requests
-from langchain_core.tools import BaseTool
+from langchain_core.tools import BaseTool, ToolException
 from pydantic import BaseModel, Field
 from typing_extensions import Any, Type
 
@@ -18,17 +18,18 @@ class GaodeWeatherTool(BaseTool):
     name: str = "gaode_weather"
     description: str = "当你想查询天气或者与天气相关的问题时可以使用的工具"
     args_schema: Type[BaseModel] = GaodeWeatherArgsSchema
+    handle_tool_error: bool = True  # 失败时抛出ToolException，未缓存时失败信息作为工具结果返回，缓存时不会写入缓存
 
     def _run(self, *args: Any, **kwargs: Any) -> str:
         """根据传入的城市名称运行调用api获取城市对应的天气预报信息"""
-        try:
-            # 1.获取高德API秘钥，如果没有创建的话，则抛出错误
-            gaode_api_key = os.getenv("GAODE_API_KEY")
-            if not gaode_api_key:
-                return f"高德开放平台API未配置"
+        # 1.获取高德API秘钥，如果没有创建的话，则抛出错误
+        gaode_api_key = os.getenv("GAODE_API_KEY")
+        if not gaode_api_key:
+            raise ToolException("高德开放平台API未配置")
 
-            # 2.从参数中获取city城市名字
-            city = kwargs.get("city", "")
+        # 2.从参数中获取city城市名字
+        city = kwargs.get("city", "")
+        try:
             api_domain = "https://restapi.amap.com/v3"
             session = requests.session()
 
@@ -54,9 +55,9 @@ class GaodeWeatherTool(BaseTool):
                 if weather_data.get("info") == "OK":
                     # 5.返回最后的结果字符串
                     return json.dumps(weather_data)
-            return f"获取{city}天气预报信息失败"
         except Exception as e:
-            return f"获取{kwargs.get('city', '')}天气预报信息失败"
+            raise ToolException(f"获取{city}天气预报信息失败") from e
+        raise ToolException(f"获取{city}天气预报信息失败")
 
 
 @add_attribute("args_schema", GaodeWeatherArgsSchema)
@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+class ToolResultCache:
+    """工具结果缓存，进程内LRU作为一级缓存，Redis作为跨进程共享的二级缓存
+
+    缓存键由工具标识与规范化后的参数(键排序的JSON)计算得到，Redis不可用时自动降级为仅使用进程内缓存。
+    """
+
+    def __init__(self, max_size: int = 1024):
+        """构造函数，传递进程内缓存的最大条目数"""
+        self.max_size = max(max_size, 0)
+        self._lock = threading.Lock()
+        self._local: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+        # 统计数据
+        self._local_hits = 0
+        self._redis_hits = 0
+        self._misses = 0
+
+    @classmethod
+    def generate_cache_key(cls, tool_id: str, tool_input: Any) -> str:
+        """根据工具标识以及规范化后的参数生成缓存键"""
+        canonical_input = json.dumps(tool_input, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+        digest = hashlib.sha256(canonical_input.encode("utf-8")).hexdigest()
+        return f"tool_result:{tool_id}:{digest}"
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """读取缓存，返回是否命中以及缓存的结果"""
+        # 1.优先读取进程内缓存，过期的数据直接移除
+        with self._lock:
+            item = self._local.get(key)
+            if item is not None:
+                expire_at, value = item
+                if expire_at > time.time():
+                    self._local.move_to_end(key)
+                    self._local_hits += 1
+                    return True, value
+                del self._local[key]
+
+        # 2.进程内未命中则读取Redis，命中后回填进程内缓存
+        try:
+            redis_client = self._get_redis_client()
+            pipeline = redis_client.pipeline(transaction=False)
+            pipeline.get(key)
+            pipeline.ttl(key)
+            data, ttl = pipeline.execute()
+            if data is not None:
+                value = json.loads(data)
+                self._set_local(key, value, ttl if ttl and ttl > 0 else 1)
+                with self._lock:
+                    self._redis_hits += 1
+                return True, value
+        except Exception as e:
+            logging.warning("读取工具结果缓存失败: %(error)s", {"error": e})
+
+        with self._lock:
+            self._misses += 1
+        return False, None
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        """写入缓存，结果无法序列化成JSON时仅写入进程内缓存"""
+        if ttl <= 0:
+            return
+        self._set_local(key, value, ttl)
+        try:
+            data = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return
+        try:
+            self._get_redis_client().setex(key, ttl, data)
+        except Exception as e:
+            logging.warning("写入工具结果缓存失败: %(error)s", {"error": e})
+
+    def _set_local(self, key: str, value: Any, ttl: int) -> None:
+        """写入进程内缓存，超出容量时淘汰最久未使用的数据"""
+        if self.max_size == 0:
+            return
+        with self._lock:
+            self._local[key] = (time.time() + ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+    @classmethod
+    def _get_redis_client(cls):
+        """获取Redis客户端"""
+        from redis import Redis
+        from app.http.module import injector
+        return injector.get(Redis)
+
+    def stats(self) -> dict[str, Any]:
+        """获取缓存统计数据，涵盖进程内/Redis命中数、未命中数以及命中率"""
+        with self._lock:
+            hits = self._local_hits + self._redis_hits
+            total = hits + self._misses
+            return {
+                "size": len(self._local),
+                "max_size": self.max_size,
+                "hits": hits,
+                "local_hits": self._local_hits,
+                "redis_hits": self._redis_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / total, 4) if total else 0,
+            }
+
+
+_tool_result_cache = None
+_tool_result_cache_lock = threading.Lock()
+
+
+def get_tool_result_cache() -> ToolResultCache:
+    """获取当前进程共享的工具结果缓存，通过TOOL_RESULT_CACHE_SIZE配置进程内缓存条目数"""
+    global _tool_result_cache
+    if _tool_result_cache is None:
+        with _tool_result_cache_lock:
+            if _tool_result_cache is None:
+                _tool_result_cache = ToolResultCache(max_size=int(os.getenv("TOOL_RESULT_CACHE_SIZE", 1024)))
+    return _tool_result_cache
+
+
+_tool_schemas: OrderedDict[tuple, dict] = OrderedDict()
+_tool_schemas_lock = threading.Lock()
+_TOOL_SCHEMAS_MAX_SIZE = 1024
+
+
+def get_tool_schema(tool: BaseTool) -> dict:
+    """获取工具转换后的OpenAI工具结构，名字、描述以及参数结构相同的工具只转换一次，供LLM绑定工具时使用"""
+    # 1.参数结构无法哈希(例如字典结构)时直接转换
+    key = (type(tool), tool.name, tool.description, tool.args_schema)
+    try:
+        hash(key)
+    except TypeError:
+        return convert_to_openai_tool(tool)
+
+    # 2.读取缓存，未命中则转换后写入缓存
+    with _tool_schemas_lock:
+        schema = _tool_schemas.get(key)
+        if schema is not None:
+            _tool_schemas.move_to_end(key)
+            return schema
+    schema = convert_to_openai_tool(tool)
+    with _tool_schemas_lock:
+        _tool_schemas[key] = schema
+        while len(_tool_schemas) > _TOOL_SCHEMAS_MAX_SIZE:
+            _tool_schemas.popitem(last=False)
+    return schema
+
+
+class CachedTool(BaseTool):
+    """带结果缓存的工具包装器，相同工具在缓存时间内使用相同参数调用时直接返回缓存结果
+
+    只应包装幂等的工具(例如搜索、天气查询、GET请求)，工具执行抛出异常时不会写入缓存。工具需通过抛出ToolException表示执行失败，
+    包装时会关闭原始工具的handle_tool_error，使失败以异常的形式返回，避免失败信息被当作正常结果缓存并在所有用户间共享。
+    """
+    tool: BaseTool  # 被包装的原始工具
+    tool_id: str  # 工具唯一标识，与参数共同组成缓存键
+    cache_ttl: int  # 缓存时间(秒)
+    cache_scope: dict = {}  # 影响工具结果的额外配置(例如内置工具的自定义参数)，同样参与缓存键计算
+
+    @classmethod
+    def wrap(cls, tool: BaseTool, tool_id: str, cache_ttl: int, cache_scope: Optional[dict] = None) -> "CachedTool":
+        """包装工具，名字、描述以及参数结构与原始工具保持一致，便于LLM绑定"""
+        if tool.handle_tool_error:
+            tool = tool.model_copy(update={"handle_tool_error": False})
+        return cls(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            return_direct=tool.return_direct,
+            tool=tool,
+            tool_id=tool_id,
+            cache_ttl=cache_ttl,
+            cache_scope=cache_scope or {},
+        )
+
+    def _cache_key(self, tool_input: Any) -> str:
+        """生成本次调用的缓存键"""
+        return ToolResultCache.generate_cache_key(self.tool_id, {"input": tool_input, "scope": self.cache_scope})
+
+    def invoke_with_cache(self, tool_input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> tuple[Any, bool]:
+        """调用工具并返回结果以及是否命中缓存"""
+        # 1.读取缓存，命中则直接返回
+        cache = get_tool_result_cache()
+        key = self._cache_key(tool_input)
+        hit, value = cache.get(key)
+        if hit:
+            return value, True
+
+        # 2.未命中则调用原始工具并写入缓存
+        result = self.tool.invoke(tool_input, config, **kwargs)
+        cache.set(key, result, self.cache_ttl)
+        return result, False
+
+    async def ainvoke_with_cache(
+            self,
+            tool_input: Any,
+            config: Optional[RunnableConfig] = None,
+            **kwargs,
+    ) -> tuple[Any, bool]:
+        """invoke_with_cache的异步版本，缓存读写涉及Redis，放到线程中执行"""
+        cache = get_tool_result_cache()
+        key = self._cache_key(tool_input)
+        hit, value = await asyncio.to_thread(cache.get, key)
+        if hit:
+            return value, True
+
+        result = await self.tool.ainvoke(tool_input, config, **kwargs)
+        await asyncio.to_thread(cache.set, key, result, self.cache_ttl)
+        return result, False
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        """调用工具，优先返回缓存结果"""
+        return self.invoke_with_cache(input, config, **kwargs)[0]
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        """异步调用工具，优先返回缓存结果"""
+        return (await self.ainvoke_with_cache(input, config, **kwargs))[0]
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        """直接执行原始工具(不经过缓存)"""
+        return self.tool.invoke(kwargs or (args[0] if args else {}))
@@ -0,0 +1,25 @@
+from .tracer import (
+    InMemorySpanExporter,
+    InMemoryTracer,
+    NoopTracer,
+    OpenTelemetryTracer,
+    Span,
+    SpanData,
+    Tracer,
+    get_tracer,
+    set_tracer,
+    traced,
+)
+
+__all__ = [
+    "InMemorySpanExporter",
+    "InMemoryTracer",
+    "NoopTracer",
+    "OpenTelemetryTracer",
+    "Span",
+    "SpanData",
+    "Tracer",
+    "get_tracer",
+    "set_tracer",
+    "traced",
+]
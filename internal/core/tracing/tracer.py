@@ -0,0 +1,188 @@
+import functools
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+
+
+class Span:
+    """链路追踪跨度接口，默认实现不做任何记录"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """设置跨度属性"""
+
+    def set_attributes(self, attributes: dict[str, Any]) -> None:
+        """批量设置跨度属性"""
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def add_event(self, name: str, attributes: Optional[dict[str, Any]] = None) -> None:
+        """记录跨度内的事件(例如首个token到达)"""
+
+    def record_exception(self, exception: BaseException) -> None:
+        """记录跨度内发生的异常"""
+
+
+class Tracer:
+    """链路追踪器接口，通过span上下文管理器创建跨度，兼容OpenTelemetry的跨度语义"""
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[dict[str, Any]] = None) -> Iterator[Span]:
+        """创建一个跨度，退出上下文时结束，发生异常时记录异常并继续抛出"""
+        yield Span()
+
+
+class NoopTracer(Tracer):
+    """空追踪器，未开启链路追踪时使用，不产生任何开销"""
+    _span = Span()
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[dict[str, Any]] = None) -> Iterator[Span]:
+        yield self._span
+
+
+@dataclass
+class SpanData(Span):
+    """内存中的跨度数据，记录名字、父子关系、属性、事件以及起止时间"""
+    name: str
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    parent_id: Optional[str] = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    events: list[tuple[str, float, dict[str, Any]]] = field(default_factory=list)
+    exception: Optional[BaseException] = None
+    start_time: float = field(default_factory=time.perf_counter)
+    end_time: Optional[float] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name: str, attributes: Optional[dict[str, Any]] = None) -> None:
+        self.events.append((name, time.perf_counter(), attributes or {}))
+
+    def record_exception(self, exception: BaseException) -> None:
+        self.exception = exception
+
+    @property
+    def duration_ms(self) -> float:
+        """跨度耗时(毫秒)，未结束时为当前已耗时"""
+        return ((self.end_time or time.perf_counter()) - self.start_time) * 1000
+
+
+class InMemorySpanExporter:
+    """内存跨度导出器，保存已结束的跨度，主要用于测试与本地排查"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._spans: list[SpanData] = []
+
+    def export(self, span: SpanData) -> None:
+        """导出已结束的跨度"""
+        with self._lock:
+            self._spans.append(span)
+
+    def get_finished_spans(self, name: Optional[str] = None) -> list[SpanData]:
+        """获取已结束的跨度列表，可按名字过滤"""
+        with self._lock:
+            return [span for span in self._spans if name is None or span.name == name]
+
+    def clear(self) -> None:
+        """清空已导出的跨度"""
+        with self._lock:
+            self._spans.clear()
+
+
+class InMemoryTracer(Tracer):
+    """内存追踪器，跨度父子关系通过contextvars传递，线程池/协程中需复制上下文才能关联到父跨度"""
+    _current_span: ContextVar[Optional[SpanData]] = ContextVar("current_span", default=None)
+
+    def __init__(self, exporter: Optional[InMemorySpanExporter] = None) -> None:
+        self.exporter = exporter or InMemorySpanExporter()
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[dict[str, Any]] = None) -> Iterator[SpanData]:
+        parent = self._current_span.get()
+        span = SpanData(name=name, parent_id=parent.span_id if parent else None, attributes=dict(attributes or {}))
+        token = self._current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            span.end_time = time.perf_counter()
+            self._current_span.reset(token)
+            self.exporter.export(span)
+
+
+class _OpenTelemetrySpan(Span):
+    """OpenTelemetry跨度适配器"""
+
+    def __init__(self, span: Any) -> None:
+        self._span = span
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self._span.set_attribute(key, value)
+
+    def add_event(self, name: str, attributes: Optional[dict[str, Any]] = None) -> None:
+        self._span.add_event(name, attributes or {})
+
+    def record_exception(self, exception: BaseException) -> None:
+        self._span.record_exception(exception)
+
+
+class OpenTelemetryTracer(Tracer):
+    """基于OpenTelemetry的追踪器，导出器与采样等配置由OpenTelemetry SDK/环境变量负责"""
+
+    def __init__(self, instrumentation_name: str = "llmops") -> None:
+        from opentelemetry import trace
+
+        self._tracer = trace.get_tracer(instrumentation_name)
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[dict[str, Any]] = None) -> Iterator[Span]:
+        with self._tracer.start_as_current_span(name, attributes=attributes) as span:
+            yield _OpenTelemetrySpan(span)
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """获取当前进程的追踪器，通过TRACING_EXPORTER配置：none(默认)/otel/memory"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                exporter = os.getenv("TRACING_EXPORTER", "none").lower()
+                if exporter == "otel":
+                    _tracer = OpenTelemetryTracer()
+                elif exporter == "memory":
+                    _tracer = InMemoryTracer()
+                else:
+                    _tracer = NoopTracer()
+    return _tracer
+
+
+def set_tracer(tracer: Tracer) -> None:
+    """设置当前进程的追踪器，用于测试或自定义导出"""
+    global _tracer
+    _tracer = tracer
+
+
+def traced(name: str) -> Callable:
+    """装饰器，使用当前进程的追踪器为函数调用创建跨度"""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
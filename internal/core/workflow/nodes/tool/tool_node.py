@@ -65,6 +65,7 @@ class ToolNode(BaseNode):
                 description=api_tool.description,
                 headers=api_tool.provider.headers,
                 parameters=api_tool.parameters,
+                cache_ttl=api_tool.cache_ttl,
             ))
 
     def invoke(self, state: WorkFlowState, config: Optional[RunnableConfig] = None, **kwargs: Any) -> WorkFlowState:
@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+class AnalysisGranularity(str, Enum):
+    """统计分析的时间粒度"""
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+
+
+# 自定义时间范围统计时最多返回的时间桶数量
+MAX_ANALYSIS_BUCKETS = 24 * 31
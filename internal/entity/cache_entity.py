@@ -16,3 +16,66 @@ LOCK_KEYWORD_TABLE_UPDATE_KEYWORD_TABLE = "lock:keyword_table:update:keyword_tab
 
 # 更新片段启用状态缓存锁
 LOCK_SEGMENT_UPDATE_ENABLED = "lock:segment:update:enabled_{segment_id}"
+
+# 会话短期记忆窗口缓存，存储最近的问答及其token数
+CONVERSATION_HISTORY_WINDOW = "conversation:history_window:{conversation_id}"
+
+# 会话短期记忆窗口缓存的过期时间，单位为秒
+CONVERSATION_HISTORY_WINDOW_EXPIRE_TIME = 86400
+
+# 会话待摘要的问答列表，摘要任务执行时一次性取出
+CONVERSATION_PENDING_SUMMARY = "conversation:pending_summary:{conversation_id}"
+
+# 会话摘要任务已调度标记，存在时新的问答只追加到待摘要列表中
+CONVERSATION_SUMMARY_SCHEDULED = "conversation:summary_scheduled:{conversation_id}"
+
+# 会话命名任务已调度标记
+CONVERSATION_NAME_SCHEDULED = "conversation:name_scheduled:{conversation_id}"
+
+# 会话后台任务(摘要、命名)的执行名额租约，有序集合的成员为租约id，分值为租约到期时间戳
+CONVERSATION_TASK_SLOTS = "conversation:task_slots"
+
+# 会话后台任务执行名额的租约时长，单位为秒，worker被强制终止时租约到期后名额自动归还
+CONVERSATION_TASK_SLOT_LEASE_TIME = 600
+
+# 会话后台任务相关标记的过期时间，单位为秒
+CONVERSATION_TASK_EXPIRE_TIME = 3600
+
+# 会话摘要任务已调度标记的过期时间，单位为秒，调度的任务丢失时标记到期后可以重新调度
+CONVERSATION_SUMMARY_SCHEDULED_EXPIRE_TIME = 300
+
+# 应用当日已统计的用户集合，用于增量更新每日统计汇总时判断用户是否为当日首次出现
+APP_DAILY_STAT_ACCOUNTS = "app_daily_stat:accounts:{app_id}:{stat_date}"
+
+# 应用当日已统计的会话集合
+APP_DAILY_STAT_CONVERSATIONS = "app_daily_stat:conversations:{app_id}:{stat_date}"
+
+# 应用每日统计去重集合的过期时间，单位为秒
+APP_DAILY_STAT_EXPIRE_TIME = 2 * 24 * 60 * 60
+
+# 应用每日活跃用户HyperLogLog，多天合并计数即可得到一段时间内的去重用户数
+APP_DAILY_STAT_ACCOUNTS_HLL = "app_daily_stat:accounts_hll:{app_id}:{stat_date}"
+
+# 应用每日活跃会话HyperLogLog
+APP_DAILY_STAT_CONVERSATIONS_HLL = "app_daily_stat:conversations_hll:{app_id}:{stat_date}"
+
+# 应用每日HyperLogLog的过期时间，单位为秒，需覆盖统计分析使用的最近14天
+APP_DAILY_STAT_HLL_EXPIRE_TIME = 16 * 24 * 60 * 60
+
+# 每日统计汇总的水位线(所有应用)，该日期及之后的统计汇总完整，没有汇总行的日期即没有消息
+APP_DAILY_STAT_WATERMARK = "app_daily_stat:watermark"
+
+# 单个应用的每日统计汇总水位线，只回填了指定应用时使用
+APP_DAILY_STAT_APP_WATERMARK = "app_daily_stat:watermark:{app_id}"
+
+# 应用每小时实时统计计数(哈希)，涵盖消息数、token数、耗时以及费用
+APP_LIVE_STAT_COUNTERS = "app_live_stat:counters:{app_id}:{hour}"
+
+# 应用每小时活跃用户HyperLogLog
+APP_LIVE_STAT_ACCOUNTS = "app_live_stat:accounts:{app_id}:{hour}"
+
+# 应用每小时活跃会话HyperLogLog
+APP_LIVE_STAT_CONVERSATIONS = "app_live_stat:conversations:{app_id}:{hour}"
+
+# 应用实时统计计数的过期时间，单位为秒
+APP_LIVE_STAT_EXPIRE_TIME = 2 * 24 * 60 * 60
@@ -12,6 +12,7 @@ from .exception import (
     UnauthorizedException,
     ForbiddenException,
     ValidateErrorException,
+    TooManyRequestsException,
 )
 
 __all__ = [
@@ -21,4 +22,5 @@ __all__ = [
     "UnauthorizedException",
     "ForbiddenException",
     "ValidateErrorException",
+    "TooManyRequestsException",
 ]
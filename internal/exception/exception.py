@@ -46,3 +46,13 @@ class ForbiddenException(CustomException):
 class ValidateErrorException(CustomException):
     """数据验证异常"""
     code = HttpCode.VALIDATE_ERROR
+
+
+class TooManyRequestsException(CustomException):
+    """请求过多异常，retry_after为建议客户端重试的等待秒数"""
+    code = HttpCode.TOO_MANY_REQUESTS
+    retry_after: int = 1
+
+    def __init__(self, message: str = None, data: Any = None, retry_after: int = 1):
+        super().__init__(message, data)
+        self.retry_after = retry_after
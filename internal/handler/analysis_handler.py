@@ -1,11 +1,13 @@
 from dataclasses import dataclass
 from uuid import UUID
 
+from flask import request
 from flask_login import current_user, login_required
 from injector import inject
 
+from internal.schema.analysis_schema import GetAppAnalysisTrendReq
 from internal.service import AnalysisService
-from pkg.response import success_json
+from pkg.response import success_json, validate_error_json
 
 
 @inject
@@ -19,3 +21,21 @@ class AnalysisHandler:
         """根据传递的应用id获取应用的统计信息"""
         app_analysis = self.analysis_service.get_app_analysis(app_id, current_user)
         return success_json(app_analysis)
+
+    @login_required
+    def get_app_today_analysis(self, app_id: UUID):
+        """根据传递的应用id获取应用今日截至当前的实时统计信息"""
+        app_analysis = self.analysis_service.get_app_today_analysis(app_id, current_user)
+        return success_json(app_analysis)
+
+    @login_required
+    def get_app_analysis_trend(self, app_id: UUID):
+        """根据传递的应用id+时间范围+时间粒度获取应用的趋势数据"""
+        # 1.提取请求并校验
+        req = GetAppAnalysisTrendReq(request.args)
+        if not req.validate():
+            return validate_error_json(req.errors)
+
+        # 2.调用服务获取趋势数据
+        trend = self.analysis_service.get_app_analysis_trend(app_id, req, current_user)
+        return success_json(trend)
@@ -192,12 +192,30 @@ class AppHandler:
 
         return compact_generate_response(response)
 
+    @login_required
+    def create_debug_chat_stream(self, app_id: UUID):
+        """根据传递的应用id+query构建调试会话流，供ASGI入口异步执行，校验失败时返回错误响应"""
+        # 1.提取数据并校验数据
+        req = DebugChatReq()
+        if not req.validate():
+            return validate_error_json(req.errors)
+
+        # 2.调用服务构建调试会话流
+        return self.app_service.create_debug_chat_stream(app_id, req, current_user)
+
     @login_required
     def stop_debug_chat(self, app_id: UUID, task_id: UUID):
         """根据传递的应用id+任务id停止某个应用的指定调试会话"""
         self.app_service.stop_debug_chat(app_id, task_id, current_user)
         return success_message("停止应用调试会话成功")
 
+    @login_required
+    def resume_debug_chat(self, app_id: UUID, task_id: UUID):
+        """根据传递的应用id+任务id+Last-Event-ID，断线重连继续获取调试会话的流式事件"""
+        last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id", "0-0")
+        response = self.app_service.resume_debug_chat(app_id, task_id, last_event_id, current_user)
+        return compact_generate_response(response)
+
     @login_required
     def get_debug_conversation_messages_with_page(self, app_id: UUID):
         """根据传递的应用id，获取该应用的调试会话分页列表记录"""
@@ -226,6 +244,17 @@ class AppHandler:
         token = self.app_service.regenerate_web_app_token(app_id, current_user)
         return success_json({"token": token})
 
+    @login_required
+    def get_agent_executor_stats(self):
+        """获取当前进程智能体执行池的统计数据，涵盖运行数、排队深度、拒绝数、排队耗时及工具结果缓存命中情况"""
+        from internal.core.agent.agents import get_agent_executor, get_speculative_retrieval_stats
+        from internal.core.tools.tool_cache import get_tool_result_cache
+        return success_json({
+            **get_agent_executor().stats(),
+            "tool_cache": get_tool_result_cache().stats(),
+            "speculative_retrieval": get_speculative_retrieval_stats(),
+        })
+
     @login_required
     def ping(self):
         from app.http.module import injector
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
+from uuid import UUID
 
+from flask import request
 from flask_login import current_user, login_required
 from injector import inject
 
@@ -21,3 +23,20 @@ class OpenApiHandler:
             return validate_error_json(req.errors)
         resp = self.openapi_service.chat(req, current_user)
         return compact_generate_response(resp)
+
+    @login_required
+    def resume_chat(self, task_id: UUID):
+        """根据传递的任务id+Last-Event-ID，断线重连继续获取开放Chat流式对话的事件"""
+        last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id", "0-0")
+        resp = self.openapi_service.resume_chat(task_id, last_event_id, current_user)
+        return compact_generate_response(resp)
+
+    @login_required
+    def create_chat_stream(self):
+        """构建开放Chat会话流，供ASGI入口异步执行，非流式请求直接返回块内容响应"""
+        req = OpenAPIChatReq()
+        if not req.validate():
+            return validate_error_json(req.errors)
+        if req.stream.data is not True:
+            return compact_generate_response(self.openapi_service.chat(req, current_user))
+        return self.openapi_service.create_chat_stream(req, current_user)
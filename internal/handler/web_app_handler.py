@@ -7,6 +7,7 @@ from injector import inject
 
 from internal.schema.web_app_schema import WebAppChatReq, GetConversationsReq, GetConversationsResp
 from internal.service import WebAppService
+from pkg.paginator import PageModel
 from pkg.response import validate_error_json, compact_generate_response, success_json, success_message
 
 
@@ -38,12 +39,30 @@ class WebAppHandler:
 
         return compact_generate_response(response)
 
+    @login_required
+    def create_web_app_chat_stream(self, token: str):
+        """根据传递的token+query构建WebApp会话流，供ASGI入口异步执行，校验失败时返回错误响应"""
+        # 1.提取请求并校验
+        req = WebAppChatReq()
+        if not req.validate():
+            return validate_error_json(req.errors)
+
+        # 2.调用服务构建会话流
+        return self.web_app_service.create_web_app_chat_stream(token, req, current_user)
+
     @login_required
     def stop_web_app_chat(self, token: str, task_id: UUID):
         """根据传递的token+task_id停止与WebApp的对话"""
         self.web_app_service.stop_web_app_chat(token, task_id, current_user)
         return success_message("停止WebApp会话成功")
 
+    @login_required
+    def resume_web_app_chat(self, token: str, task_id: UUID):
+        """根据传递的token+task_id+Last-Event-ID，断线重连继续获取WebApp会话的流式事件"""
+        last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id", "0-0")
+        response = self.web_app_service.resume_web_app_chat(token, task_id, last_event_id, current_user)
+        return compact_generate_response(response)
+
     @login_required
     def get_conversations(self, token: str):
         """根据传递的token+is_pinned获取指定WebApp下的所有会话列表信息"""
@@ -53,9 +72,16 @@ class WebAppHandler:
             return validate_error_json(req.errors)
 
         # 2.调用服务获取会话列表
-        conversations = self.web_app_service.get_conversations(token, req.is_pinned.data, current_user)
+        conversations, paginator = self.web_app_service.get_conversations(token, req, current_user)
 
-        # 3.构建响应并返回
+        # 3.构建响应并返回，游标分页时返回分页数据
         resp = GetConversationsResp(many=True)
+        if req.cursor_mode:
+            return success_json(PageModel(list=resp.dump(conversations), paginator=paginator))
 
-        return success_json(resp.dump(conversations))
+        # 4.旧列表接口保持响应结构不变，通过响应头告知列表是否被截断以及继续获取的游标
+        response, status = success_json(resp.dump(conversations))
+        return response, status, {
+            "X-Has-More": "true" if paginator.has_more else "false",
+            "X-Next-Cursor": paginator.next_cursor,
+        }
@@ -6,6 +6,7 @@
 @File    : helper.py
 """
 import importlib
+import json
 import random
 import string
 from datetime import datetime
@@ -17,6 +18,11 @@ from langchain_core.documents import Document
 from pydantic import BaseModel
 from typing_extensions import Any
 
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，未安装时回退到标准库json
+    orjson = None
+
 
 def dynamic_import(module_name: str, symbol_name: str) -> Any:
     """动态导入特定模块下的特定功能"""
@@ -107,3 +113,27 @@ def remove_fields(origin_dict: dict, target_dict: list[str]) -> any:
     """
     for field in target_dict:
         origin_dict.pop(field, None)
+
+
+def _json_default(value: Any) -> Any:
+    """标准库json无法序列化的类型转换，与orjson的原生处理保持一致"""
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_dumps(data: Any) -> str:
+    """快速JSON序列化，原生支持UUID/datetime/枚举且不转义中文，安装了orjson时使用orjson，否则回退到标准库json"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+
+
+def format_sse_event(event: str, data: dict, event_id: str = "") -> str:
+    """将事件格式化成SSE数据帧，传递event_id时附带id字段，便于客户端携带Last-Event-ID断线重连"""
+    frame = f"event: {event}\ndata:{json_dumps(data)}\n\n"
+    return f"id: {event_id}\n{frame}" if event_id else frame
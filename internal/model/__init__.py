@@ -1,7 +1,7 @@
 from .account import Account, AccountOAuth
 from .api_key import ApiKey
 from .api_tool import ApiTool, ApiToolProvider
-from .app import App, AppDatasetJoin, AppConfig, AppConfigVersion
+from .app import App, AppDatasetJoin, AppConfig, AppConfigVersion, AppDailyStat
 from .conversation import Conversation, Message, MessageAgentThought
 from .dataset import Dataset, Document, Segment, KeywordTable, DatasetQuery, ProcessRule
 from .end_user import EndUser
@@ -11,7 +11,7 @@ from .upload_file import UploadFile
 from .workflow import Workflow, WorkflowResult
 
 __all__ = [
-    "App", "AppDatasetJoin", "AppConfig", "AppConfigVersion",
+    "App", "AppDatasetJoin", "AppConfig", "AppConfigVersion", "AppDailyStat",
     "ApiTool", "ApiToolProvider",
     "UploadFile",
     "Dataset", "Document", "Segment", "KeywordTable", "DatasetQuery", "ProcessRule",
@@ -16,6 +16,7 @@ from sqlalchemy import (
     text,
     PrimaryKeyConstraint,
     Index,
+    Integer,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 
@@ -68,6 +69,7 @@ class ApiTool(db.Model):
     url = Column(String(255), nullable=False, server_default=text("''::character varying"))
     method = Column(String(255), nullable=False, server_default=text("''::character varying"))
     parameters = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))
+    cache_ttl = Column(Integer, nullable=False, server_default=text("0"))  # 工具结果的缓存时间(秒)，为0时不缓存
     updated_at = Column(
         DateTime,
         nullable=False,
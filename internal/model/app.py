@@ -8,8 +8,12 @@ from sqlalchemy import (
     Text,
     Integer,
     DateTime,
+    Date,
+    Float,
+    Numeric,
     text,
     PrimaryKeyConstraint,
+    UniqueConstraint,
     Index,
 )
 from sqlalchemy.dialects.postgresql import JSONB
@@ -268,3 +272,29 @@ class AppDatasetJoin(db.Model):
         onupdate=datetime.now,
     )
     created_at = Column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP(0)"))
+
+
+class AppDailyStat(db.Model):
+    """应用每日统计汇总模型，消息保存时增量更新，供统计分析直接读取"""
+    __tablename__ = "app_daily_stat"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", name="pk_app_daily_stat_id"),
+        UniqueConstraint("app_id", "stat_date", name="uk_app_daily_stat_app_id_stat_date"),
+    )
+
+    id = Column(UUID, nullable=False, server_default=text("uuid_generate_v4()"))
+    app_id = Column(UUID, nullable=False)  # 关联应用id
+    stat_date = Column(Date, nullable=False)  # 统计日期
+    message_count = Column(Integer, nullable=False, server_default=text("0"))  # 消息数
+    account_count = Column(Integer, nullable=False, server_default=text("0"))  # 当日去重后的用户数
+    conversation_count = Column(Integer, nullable=False, server_default=text("0"))  # 当日去重后的会话数
+    total_token_count = Column(Integer, nullable=False, server_default=text("0"))  # 消耗的总token数
+    latency_sum = Column(Float, nullable=False, server_default=text("0.0"))  # 消息耗时总和
+    total_price = Column(Numeric(20, 7), nullable=False, server_default=text("0.0"))  # 消耗的总价格
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        server_default=text("CURRENT_TIMESTAMP(0)"),
+        onupdate=datetime.now,
+    )
+    created_at = Column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP(0)"))
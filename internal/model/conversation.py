@@ -28,6 +28,7 @@ class Conversation(db.Model):
         PrimaryKeyConstraint("id", name="pk_conversation_id"),
         Index("conversation_app_id_idx", "app_id"),
         Index("conversation_app_created_by_idx", "created_by"),
+        Index("conversation_app_id_created_at_id_idx", "app_id", "created_at", "id"),
     )
 
     id = Column(UUID, nullable=False, server_default=text("uuid_generate_v4()"))
@@ -66,6 +67,11 @@ class Message(db.Model):
         PrimaryKeyConstraint("id", name="pk_message_id"),
         Index("message_conversation_id_idx", "conversation_id"),
         Index("message_created_by_idx", "created_by"),
+        Index("message_conversation_id_created_at_id_idx", "conversation_id", "created_at", "id"),
+        Index(
+            "message_app_id_created_at_idx", "app_id", "created_at",
+            postgresql_include=["created_by", "conversation_id"],
+        ),
     )
 
     id = Column(UUID, nullable=False, server_default=text("uuid_generate_v4()"))
@@ -93,6 +99,7 @@ class Message(db.Model):
     answer_token_count = Column(Integer, nullable=False, server_default=text("0"))  # 消息答案的token数
     answer_unit_price = Column(Numeric(10, 7), nullable=False, server_default=text("0.0"))  # token的单位价格
     answer_price_unit = Column(Numeric(10, 4), nullable=False, server_default=text("0.0"))  # token的价格单位
+    history_token_count = Column(Integer, nullable=False, server_default=text("0"))  # 问答作为短期记忆时的token数，0表示未计算
 
     # 消息的相关统计信息
     latency = Column(Float, nullable=False, server_default=text("0.0"))  # 消息的总耗时
@@ -90,6 +90,7 @@ class Document(db.Model):
         Index("document_account_id_idx", "account_id"),
         Index("document_dataset_id_idx", "dataset_id"),
         Index("document_batch_idx", "batch"),
+        Index("document_dataset_id_created_at_id_idx", "dataset_id", "created_at", "id"),
     )
 
     id = Column(UUID, nullable=False, server_default=text("uuid_generate_v4()"))
@@ -102,6 +103,7 @@ class Document(db.Model):
     position = Column(Integer, nullable=False, server_default=text("1"))
     character_count = Column(Integer, nullable=False, server_default=text("0"))
     token_count = Column(Integer, nullable=False, server_default=text("0"))
+    duplicate_segment_count = Column(Integer, nullable=False, server_default=text("0"))
     processing_started_at = Column(DateTime, nullable=True)
     parsing_completed_at = Column(DateTime, nullable=True)
     splitting_completed_at = Column(DateTime, nullable=True)
@@ -153,6 +155,7 @@ class Segment(db.Model):
         Index("segment_account_id_idx", "account_id"),
         Index("segment_dataset_id_idx", "dataset_id"),
         Index("segment_document_id_idx", "document_id"),
+        Index("segment_document_id_position_id_idx", "document_id", "position", "id"),
     )
 
     id = Column(UUID, nullable=False, server_default=text("uuid_generate_v4()"))
@@ -166,6 +169,7 @@ class Segment(db.Model):
     token_count = Column(Integer, nullable=False, server_default=text("0"))
     keywords = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))
     hash = Column(String(255), nullable=False, server_default=text("''::character varying"))
+    fingerprint = Column(String(255), nullable=False, server_default=text("''::character varying"))
     hit_count = Column(Integer, nullable=False, server_default=text("0"))
     enabled = Column(Boolean, nullable=False, server_default=text("false"))
     disabled_at = Column(DateTime, nullable=True)
@@ -72,6 +72,7 @@ class Router:
 
         # 2.将url与对应的控制器方法做绑定
         bp.add_url_rule("/ping", view_func=self.app_handler.ping)
+        bp.add_url_rule("/agents/executor-stats", view_func=self.app_handler.get_agent_executor_stats)
         bp.add_url_rule("/apps", view_func=self.app_handler.get_apps_with_page)
         bp.add_url_rule("/apps", methods=["POST"], view_func=self.app_handler.create_app)
         bp.add_url_rule("/apps/<uuid:app_id>", view_func=self.app_handler.get_app)
@@ -127,6 +128,10 @@ class Router:
             methods=["POST"],
             view_func=self.app_handler.stop_debug_chat,
         )
+        bp.add_url_rule(
+            "/apps/<uuid:app_id>/conversations/tasks/<uuid:task_id>/events",
+            view_func=self.app_handler.resume_debug_chat,
+        )
         bp.add_url_rule(
             "/apps/<uuid:app_id>/conversations/messages",
             view_func=self.app_handler.get_debug_conversation_messages_with_page,
@@ -367,6 +372,10 @@ class Router:
             methods=["POST"],
             view_func=self.openapi_handler.chat,
         )
+        openapi_bp.add_url_rule(
+            "/openapi/chat/tasks/<uuid:task_id>/events",
+            view_func=self.openapi_handler.resume_chat,
+        )
         # 10.内置应用模块
         bp.add_url_rule("/builtin-apps/categories", view_func=self.builtin_app_handler.get_builtin_app_categories)
         bp.add_url_rule("/builtin-apps", view_func=self.builtin_app_handler.get_builtin_apps)
@@ -449,6 +458,14 @@ class Router:
             "/analysis/<uuid:app_id>",
             view_func=self.analysis_handler.get_app_analysis,
         )
+        bp.add_url_rule(
+            "/analysis/<uuid:app_id>/trend",
+            view_func=self.analysis_handler.get_app_analysis_trend,
+        )
+        bp.add_url_rule(
+            "/analysis/<uuid:app_id>/today",
+            view_func=self.analysis_handler.get_app_today_analysis,
+        )
 
         # 15.WebApp模块
         bp.add_url_rule("/web-apps/<string:token>", view_func=self.web_app_handler.get_web_app)
@@ -462,6 +479,10 @@ class Router:
             methods=["POST"],
             view_func=self.web_app_handler.stop_web_app_chat,
         )
+        bp.add_url_rule(
+            "/web-apps/<string:token>/chat/<uuid:task_id>/events",
+            view_func=self.web_app_handler.resume_web_app_chat,
+        )
         bp.add_url_rule("/web-apps/<string:token>/conversations", view_func=self.web_app_handler.get_conversations)
 
         # 16.会话模块
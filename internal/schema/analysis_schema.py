@@ -0,0 +1,26 @@
+from flask_wtf import FlaskForm
+from wtforms import IntegerField, StringField
+from wtforms.validators import AnyOf, DataRequired, NumberRange, Optional, ValidationError
+
+from internal.entity.analysis_entity import AnalysisGranularity
+
+
+class GetAppAnalysisTrendReq(FlaskForm):
+    """获取应用自定义时间范围趋势数据请求结构"""
+    start_at = IntegerField("start_at", validators=[
+        DataRequired("开始时间不能为空"),
+        NumberRange(min=0, message="开始时间格式错误"),
+    ])
+    end_at = IntegerField("end_at", validators=[
+        DataRequired("结束时间不能为空"),
+        NumberRange(min=0, message="结束时间格式错误"),
+    ])
+    granularity = StringField("granularity", default=AnalysisGranularity.DAY.value, validators=[
+        Optional(),
+        AnyOf([item.value for item in AnalysisGranularity], message="时间粒度格式错误"),
+    ])
+
+    def validate_end_at(self, field: IntegerField) -> None:
+        """校验结束时间必须大于开始时间"""
+        if self.start_at.data is not None and field.data is not None and field.data <= self.start_at.data:
+            raise ValidationError("结束时间必须大于开始时间")
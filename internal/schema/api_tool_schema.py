@@ -99,6 +99,7 @@ class GetApiToolResp(Schema):
     name = fields.String()
     description = fields.String()
     inputs = fields.List(fields.Dict, dump_default=[])
+    cache_ttl = fields.Integer(dump_default=0)
     provider = fields.Dict()
 
     @pre_dump
@@ -109,6 +110,7 @@ class GetApiToolResp(Schema):
             "name": data.name,
             "description": data.description,
             "inputs": [{k: v for k, v in parameter.items() if k != "in"} for parameter in data.parameters],
+            "cache_ttl": data.cache_ttl,
             "provider": {
                 "id": provider.id,
                 "name": provider.name,
@@ -69,7 +69,9 @@ class CreateDocumentsReq(FlaskForm):
                 # 5.校验id参数，非空、id规范
                 if (
                         "id" not in pre_process_rule
-                        or pre_process_rule["id"] not in ["remove_extra_space", "remove_url_and_email"]
+                        or pre_process_rule["id"] not in [
+                            "remove_extra_space", "remove_url_and_email", "remove_duplicate_segments",
+                        ]
                 ):
                     raise ValidationError("预处理id格式错误")
 
@@ -83,8 +85,8 @@ class CreateDocumentsReq(FlaskForm):
                     "enabled": pre_process_rule["enabled"],
                 }
 
-            # 8.判断一下是否传递了两个处理规则
-            if len(unique_pre_process_rule_dict) != 2:
+            # 8.判断一下是否传递了两个必填的处理规则，近似重复片段去除为可选规则
+            if not {"remove_extra_space", "remove_url_and_email"}.issubset(unique_pre_process_rule_dict):
                 raise ValidationError("预处理规则格式错误，请重试尝试")
 
             # 9.将处理后的数据转换成列表并覆盖与处理规则
@@ -153,6 +155,7 @@ class GetDocumentResp(Schema):
     dataset_id = fields.UUID(dump_default="")
     name = fields.String(dump_default="")
     segment_count = fields.Integer(dump_default=0)
+    duplicate_segment_count = fields.Integer(dump_default=0)
     character_count = fields.Integer(dump_default=0)
     hit_count = fields.Integer(dump_default=0)
     position = fields.Integer(dump_default=0)
@@ -170,6 +173,7 @@ class GetDocumentResp(Schema):
             "dataset_id": data.dataset_id,
             "name": data.name,
             "segment_count": data.segment_count,
+            "duplicate_segment_count": data.duplicate_segment_count,
             "character_count": data.character_count,
             "hit_count": data.hit_count,
             "position": data.position,
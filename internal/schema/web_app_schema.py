@@ -7,6 +7,7 @@ from wtforms.validators import Optional, UUID, DataRequired, ValidationError
 
 from internal.lib.helper import datetime_to_timestamp
 from internal.model import Conversation
+from pkg.paginator import PaginatorReq
 from .schema import ListField
 
 
@@ -39,8 +40,8 @@ class WebAppChatReq(FlaskForm):
                 raise ValidationError("上传的图片URL地址格式错误，请核实后重试")
 
 
-class GetConversationsReq(FlaskForm):
-    """获取WebApp会话列表请求结构体"""
+class GetConversationsReq(PaginatorReq):
+    """获取WebApp会话列表请求结构体，携带cursor参数时使用游标分页，否则返回最近的会话列表"""
     is_pinned = BooleanField("is_pinned", default=False)
 
 
@@ -5,6 +5,7 @@
 @Author  : thezehui@gmail.com
 @File    : __init__.py.py
 """
+from .asgi import Asgi
 from .http import Http
 
-__all__ = ["Http"]
+__all__ = ["Asgi", "Http"]
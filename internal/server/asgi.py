@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from flask import Flask
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+
+from internal.core.agent.agents import AgentChatStream
+from internal.exception import TooManyRequestsException
+
+
+class Asgi:
+    """ASGI服务入口，智能体会话的SSE接口在事件循环中异步执行，其余接口原样交给Flask(WSGI)处理
+
+    会话流接口的鉴权、参数校验以及数据库准备工作仍复用Flask的请求上下文，在线程中同步完成，
+    随后智能体在事件循环中通过LangGraph的ainvoke+LLM的astream执行，单个流式响应不再独占线程。
+    """
+
+    def __init__(self, app: Flask, stream_views: dict[str, Callable[..., Any]]):
+        """构造函数，传递Flask应用以及端点名字到会话流构建函数的映射"""
+        from asgiref.wsgi import WsgiToAsgi
+
+        self.app = app
+        self.stream_views = stream_views
+        self.wsgi = WsgiToAsgi(app)
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        """ASGI调用入口，只有匹配到会话流端点的POST请求才走异步链路，预检等请求仍由Flask处理"""
+        if scope["type"] == "http" and scope["method"] == "POST":
+            endpoint, view_args = self._match(scope)
+            if endpoint in self.stream_views:
+                await self._handle_stream(self.stream_views[endpoint], view_args, scope, receive, send)
+                return
+        await self.wsgi(scope, receive, send)
+
+    def _match(self, scope: dict) -> tuple[str, dict]:
+        """使用Flask路由表匹配请求对应的端点"""
+        try:
+            return self.app.url_map.bind("localhost").match(scope["path"], method=scope["method"])
+        except HTTPException:
+            return "", {}
+
+    async def _handle_stream(
+            self,
+            view: Callable[..., Any],
+            view_args: dict,
+            scope: dict,
+            receive: Callable,
+            send: Callable,
+    ) -> None:
+        """处理会话流请求，构建失败时直接返回Flask响应，成功时在事件循环中流式输出"""
+        # 1.读取完整请求体，并在线程中借助Flask请求上下文完成鉴权、校验以及会话流构建
+        body = await self._read_body(receive)
+        environ = self._build_environ(scope, body)
+        status, headers, result = await asyncio.to_thread(self._prepare, view, view_args, environ)
+
+        # 2.返回的不是会话流(例如校验失败、异常、块内容响应)则直接输出对应响应
+        if not isinstance(result, AgentChatStream):
+            await self._send_response(send, status, headers, result)
+            return
+
+        # 3.在事件循环中启动智能体任务，异步执行名额已满时执行拒绝回调并返回429响应
+        try:
+            frames = result.astream(run_sync=self._run_in_app_context)
+        except TooManyRequestsException as e:
+            status, headers, body = await asyncio.to_thread(self._reject, result, environ, e)
+            await self._send_response(send, status, headers, body)
+            return
+
+        # 4.在事件循环中流式输出，客户端断开连接时取消智能体任务
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        stream_task = asyncio.create_task(self._send_stream(frames, send))
+        disconnect_task = asyncio.create_task(self._wait_disconnect(receive))
+        done, _ = await asyncio.wait({stream_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        for task in (stream_task, disconnect_task):
+            if task not in done:
+                task.cancel()
+
+    def _prepare(self, view: Callable[..., Any], view_args: dict, environ: dict) -> tuple[int, list, Any]:
+        """在Flask请求上下文中执行会话流构建函数，非会话流结果统一转换成响应，响应头同样经过after_request(例如跨域)处理"""
+        with self.app.request_context(environ):
+            result = None
+            try:
+                result = view(**view_args)
+                if isinstance(result, AgentChatStream):
+                    response = self.app.response_class(mimetype="text/event-stream")
+                    response.headers["Cache-Control"] = "no-cache"
+                else:
+                    response = self.app.make_response(result)
+            except Exception as e:
+                response = self.app.make_response(self.app.handle_user_exception(e))
+            response = self.app.process_response(response)
+            if isinstance(result, AgentChatStream):
+                response.headers.pop("Content-Length", None)
+            headers = self._encode_headers(response)
+            if isinstance(result, AgentChatStream):
+                return response.status_code, headers, result
+            return response.status_code, headers, response.get_data()
+
+    def _reject(
+            self,
+            chat_stream: AgentChatStream,
+            environ: dict,
+            error: TooManyRequestsException,
+    ) -> tuple[int, list, bytes]:
+        """会话流被准入控制拒绝时，在Flask请求上下文中执行拒绝回调，并将异常转换成429响应"""
+        with self.app.request_context(environ):
+            if chat_stream.on_reject:
+                chat_stream.on_reject()
+            response = self.app.make_response(self.app.handle_user_exception(error))
+            response = self.app.process_response(response)
+            return response.status_code, self._encode_headers(response), response.get_data()
+
+    @classmethod
+    async def _send_response(cls, send: Callable, status: int, headers: list, body: bytes) -> None:
+        """输出完整的非流式响应"""
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    @classmethod
+    async def _send_stream(cls, frames: AsyncIterator[str], send: Callable) -> None:
+        """逐帧发送SSE数据，结束回调(持久化)在附带应用上下文的线程中执行"""
+        try:
+            async for frame in frames:
+                await send({"type": "http.response.body", "body": frame.encode("utf-8"), "more_body": True})
+        except Exception as e:
+            logging.error("智能体会话流输出出错: %(error)s", {"error": e}, exc_info=True)
+        await send({"type": "http.response.body", "body": b""})
+
+    def _run_in_app_context(self, func: Callable[[], None]) -> Awaitable[None]:
+        """在线程中附带Flask应用上下文执行同步函数"""
+
+        def run() -> None:
+            with self.app.app_context():
+                func()
+
+        return asyncio.to_thread(run)
+
+    @classmethod
+    def _encode_headers(cls, response: Any) -> list[tuple[bytes, bytes]]:
+        """将Flask响应头转换成ASGI响应头"""
+        return [(key.lower().encode("latin-1"), value.encode("latin-1")) for key, value in response.headers]
+
+    @classmethod
+    async def _read_body(cls, receive: Callable) -> bytes:
+        """读取完整的请求体"""
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                return body
+
+    @classmethod
+    async def _wait_disconnect(cls, receive: Callable) -> None:
+        """等待客户端断开连接"""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+
+    @classmethod
+    def _build_environ(cls, scope: dict, body: bytes) -> dict:
+        """根据ASGI scope构建WSGI environ，便于复用Flask的请求上下文"""
+        headers = {}
+        for key, value in scope.get("headers", []):
+            name, value = key.decode("latin-1"), value.decode("latin-1")
+            headers[name] = f"{headers[name]},{value}" if name in headers else value
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        return EnvironBuilder(
+            path=scope["path"],
+            base_url=f"{scope.get('scheme', 'http')}://{server[0]}:{server[1]}{scope.get('root_path', '')}",
+            query_string=scope.get("query_string", b"").decode("latin-1"),
+            method=scope["method"],
+            headers=headers,
+            data=body,
+            environ_base={"REMOTE_ADDR": client[0]},
+        ).get_environ()
@@ -15,7 +15,7 @@ from flask_migrate import Migrate
 from flask_weaviate import FlaskWeaviate
 
 from config import Config
-from internal.exception import CustomException
+from internal.exception import CustomException, TooManyRequestsException
 from internal.extension import logging_extension, redis_extension, celery_extension
 from internal.middleware import Middleware
 from internal.router import Router
@@ -86,7 +86,16 @@ class Http(Flask):
         # 1.日志记录异常信息
         logging.error("An error occurred: %s", error, exc_info=True)
 
-        # 2.异常信息是不是我们的自定义异常，如果是可以提取message和code等信息
+        # 2.请求过多异常需要返回429状态码以及Retry-After响应头，便于客户端及网关退避重试
+        if isinstance(error, TooManyRequestsException):
+            response, _ = json(Response(
+                code=error.code,
+                message=error.message,
+                data=error.data if error.data is not None else {},
+            ))
+            return response, 429, {"Retry-After": str(error.retry_after)}
+
+        # 3.异常信息是不是我们的自定义异常，如果是可以提取message和code等信息
         if isinstance(error, CustomException):
             return json(Response(
                 code=error.code,
@@ -94,7 +103,7 @@ class Http(Flask):
                 data=error.data if error.data is not None else {},
             ))
 
-        # 3.如果不是我们的自定义异常，则有可能是程序、数据库抛出的异常，也可以提取信息，设置为FAIL状态码
+        # 4.如果不是我们的自定义异常，则有可能是程序、数据库抛出的异常，也可以提取信息，设置为FAIL状态码
         if self.debug or os.getenv("FLASK_ENV") == "development":
             raise error
         else:
@@ -11,6 +11,7 @@ from .analysis_service import AnalysisService
 from .api_key_service import ApiKeyService
 from .api_tool_service import ApiToolService
 from .app_service import AppService
+from .app_stat_service import AppStatService
 from .assistant_agent_service import AssistantAgentService
 from .audio_service import AudioService
 from .builtin_app_service import BuiltinAppService
@@ -41,6 +42,7 @@ from .workflow_service import WorkflowService
 __all__ = [
 
     "AppService",
+    "AppStatService",
     "VectorDatabaseService",
     "BuiltinToolService",
     "ApiToolService",
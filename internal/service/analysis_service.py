@@ -1,17 +1,30 @@
 import json
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
 from uuid import UUID
 
 from injector import inject
 from redis import Redis
+from sqlalchemy import distinct, func
 from typing_extensions import Any
 
+from internal.entity.analysis_entity import AnalysisGranularity, MAX_ANALYSIS_BUCKETS
+from internal.exception import ValidateErrorException
 from internal.model import Account, App, Message
+from internal.schema.analysis_schema import GetAppAnalysisTrendReq
 from pkg.sqlalchemy import SQLAlchemy
 from .app_service import AppService
+from .app_stat_service import AppStatService
 from .base_service import BaseService
 
+# 各时间粒度对应的时间桶长度
+GRANULARITY_DELTAS = {
+    AnalysisGranularity.HOUR: timedelta(hours=1),
+    AnalysisGranularity.DAY: timedelta(days=1),
+    AnalysisGranularity.WEEK: timedelta(weeks=1),
+}
+
 
 @inject
 @dataclass
@@ -20,6 +33,7 @@ class AnalysisService(BaseService):
     db: SQLAlchemy
     redis_client: Redis
     app_service: AppService
+    app_stat_service: AppStatService
 
     def get_app_analysis(self, app_id: UUID, account: Account) -> dict[str, Any]:
         """根据传递的应用id+账号获取指定应用的分析信息"""
@@ -45,27 +59,56 @@ class AnalysisService(BaseService):
             # 6.如果出错则什么都不处理，重新计算数据并更新缓存
             pass
 
-        # 7.查询消息表最近7天，以及最近14-7天的数据（数据要求答案非空、并且只要需要计算的数据）
-        seven_days_messages = self.get_messages_by_time_range(app, seven_days_ago, today_midnight)
-        fourteen_days_messages = self.get_messages_by_time_range(app, fourteen_days_ago, seven_days_ago)
-
-        # 8.计算5个概念指标，涵盖：全部会话数、激活用户数、平均会话互动数、Token输出速度、费用消耗
-        seven_overview_indicators = self.calculate_overview_indicators_by_messages(seven_days_messages)
-        fourteen_overview_indicators = self.calculate_overview_indicators_by_messages(fourteen_days_messages)
-
-        # 9.统计环比数据
+        # 7.读取最近14天的每日统计汇总(最多14行)，水位线之后没有汇总行的日期即没有消息，
+        #   水位线之前(例如尚未回填)缺少汇总的日期在数据库中按天聚合消息补齐
+        daily_stats = self.app_stat_service.get_daily_stats(app.id, fourteen_days_ago.date(), today_midnight.date())
+        covered_since = self.app_stat_service.get_covered_since(app.id) or today_midnight.date()
+        missing_dates = [
+            fourteen_days_ago.date() + timedelta(days=day)
+            for day in range(14)
+            if fourteen_days_ago.date() + timedelta(days=day) not in daily_stats
+               and fourteen_days_ago.date() + timedelta(days=day) < covered_since
+        ]
+        if missing_dates:
+            for stat in self.aggregate_messages_by_time_range(
+                    app,
+                    datetime.combine(missing_dates[0], datetime.min.time()),
+                    min(today_midnight, datetime.combine(covered_since, datetime.min.time())),
+                    AnalysisGranularity.DAY,
+            ):
+                daily_stats.setdefault(stat.bucket.date(), stat)
+
+        # 8.统计最近7天、14-7天的去重用户数与会话数，优先合并每日HyperLogLog，缺少时在数据库中去重统计
+        seven_days_distinct = self.app_stat_service.get_distinct_counts(app.id, {
+            stat_date: stat for stat_date, stat in daily_stats.items() if stat_date >= seven_days_ago.date()
+        }) or self.get_distinct_counts_by_time_range(app, seven_days_ago, today_midnight)
+        fourteen_days_distinct = self.app_stat_service.get_distinct_counts(app.id, {
+            stat_date: stat for stat_date, stat in daily_stats.items() if stat_date < seven_days_ago.date()
+        }) or self.get_distinct_counts_by_time_range(app, fourteen_days_ago, seven_days_ago)
+
+        # 9.计算5个概念指标，涵盖：全部会话数、激活用户数、平均会话互动数、Token输出速度、费用消耗
+        seven_overview_indicators = self.calculate_overview_indicators_by_stats(
+            [stat for stat_date, stat in daily_stats.items() if stat_date >= seven_days_ago.date()],
+            *seven_days_distinct,
+        )
+        fourteen_overview_indicators = self.calculate_overview_indicators_by_stats(
+            [stat for stat_date, stat in daily_stats.items() if stat_date < seven_days_ago.date()],
+            *fourteen_days_distinct,
+        )
+
+        # 10.统计环比数据
         pop = self.calculate_pop_by_overview_indicators(seven_overview_indicators, fourteen_overview_indicators)
 
-        # 10.计算4个指标对应的趋势
-        trend = self.calculate_trend_by_messages(today_midnight, 7, seven_days_messages)
+        # 11.计算4个指标对应的趋势
+        trend = self.calculate_trend_by_stats(today_midnight, 7, daily_stats)
 
-        # 11.定义5个指标字段名称
+        # 12.定义5个指标字段名称
         fields = [
             "total_messages", "active_accounts", "avg_of_conversation_messages",
             "token_output_rate", "cost_consumption",
         ]
 
-        # 12.构建应用分析字典
+        # 13.构建应用分析字典
         app_analysis = {
             **trend,
             **{
@@ -76,49 +119,124 @@ class AnalysisService(BaseService):
             }
         }
 
-        # 13.将数据存储到redis缓存中，并设置过期时间为1天
+        # 14.将数据存储到redis缓存中，并设置过期时间为1天
         self.redis_client.setex(cache_key, 24 * 60 * 60, json.dumps(app_analysis))
 
         return app_analysis
 
-    def get_messages_by_time_range(self, app: App, start_at: datetime, end_at: datetime) -> list[Message]:
-        """根据传递的时间段获取指定应用的消息会话数据"""
-        return self.db.session.query(Message).with_entities(
-            Message.id, Message.conversation_id, Message.created_by,
-            Message.latency, Message.total_token_count, Message.total_price,
-            Message.created_at,
+    def get_app_today_analysis(self, app_id: UUID, account: Account) -> dict[str, Any]:
+        """根据传递的应用id+账号获取指定应用今日截至当前的分析信息，数据来自消息保存时更新的每小时实时计数，
+        最多读取24个小时桶，激活用户数与会话数为HyperLogLog近似值"""
+        # 1.根据传递的应用id获取应用信息并校验权限
+        app = self.app_service.get_app(app_id, account)
+
+        # 2.生成今日午夜到当前小时的所有小时桶
+        now = datetime.now()
+        today_midnight = datetime.combine(now, datetime.min.time())
+        bucket_starts = [today_midnight + timedelta(hours=hour) for hour in range(now.hour + 1)]
+
+        # 3.读取每小时的实时计数以及今日合并去重后的用户数与会话数
+        live_stats = self.app_stat_service.get_live_stats(app.id, bucket_starts)
+        hourly_stats = {stat["hour"]: SimpleNamespace(**stat) for stat in live_stats["hourly"]}
+
+        # 4.计算今日的概览指标以及按小时的趋势
+        overview_indicators = self.calculate_overview_indicators_by_stats(
+            list(hourly_stats.values()), live_stats["account_count"], live_stats["conversation_count"],
+        )
+        trend = self.calculate_trend_by_buckets(bucket_starts, hourly_stats)
+
+        return {
+            **trend,
+            **{field: {"data": value} for field, value in overview_indicators.items()},
+        }
+
+    def get_app_analysis_trend(self, app_id: UUID, req: GetAppAnalysisTrendReq, account: Account) -> dict[str, Any]:
+        """根据传递的应用id+时间范围+时间粒度获取指定应用的趋势数据，聚合在数据库中完成，内存占用与消息量无关"""
+        # 1.根据传递的应用id获取应用信息并校验权限
+        app = self.app_service.get_app(app_id, account)
+
+        # 2.按时间粒度截断开始时间，并生成时间范围内的所有时间桶
+        granularity = AnalysisGranularity(req.granularity.data or AnalysisGranularity.DAY)
+        start_at = self.truncate_datetime(datetime.fromtimestamp(req.start_at.data), granularity)
+        end_at = datetime.fromtimestamp(req.end_at.data)
+        bucket_starts = []
+        bucket_start = start_at
+        while bucket_start < end_at:
+            bucket_starts.append(bucket_start)
+            if len(bucket_starts) > MAX_ANALYSIS_BUCKETS:
+                raise ValidateErrorException(f"时间范围过大，最多支持{MAX_ANALYSIS_BUCKETS}个时间段，请增大时间粒度")
+            bucket_start += GRANULARITY_DELTAS[granularity]
+
+        # 3.在数据库中按时间桶聚合并计算趋势
+        stats = self.aggregate_messages_by_time_range(app, start_at, end_at, granularity)
+        return self.calculate_trend_by_buckets(bucket_starts, {stat.bucket: stat for stat in stats})
+
+    def aggregate_messages_by_time_range(
+            self, app: App, start_at: datetime, end_at: datetime, granularity: AnalysisGranularity,
+    ) -> list[Any]:
+        """在数据库中按时间粒度聚合指定应用在时间段内的消息，返回字段与每日统计汇总一致的聚合行，bucket为时间桶起点"""
+        bucket = func.date_trunc(granularity.value, Message.created_at)
+        return self.db.session.query(
+            bucket.label("bucket"),
+            func.count(Message.id).label("message_count"),
+            func.count(distinct(Message.created_by)).label("account_count"),
+            func.count(distinct(Message.conversation_id)).label("conversation_count"),
+            func.coalesce(func.sum(Message.total_token_count), 0).label("total_token_count"),
+            func.coalesce(func.sum(Message.latency), 0).label("latency_sum"),
+            func.coalesce(func.sum(Message.total_price), 0).label("total_price"),
         ).filter(
             Message.app_id == app.id,
             Message.created_at >= start_at,
             Message.created_at < end_at,
             Message.answer != "",
-        ).all()
+        ).group_by(bucket).order_by(bucket).all()
 
     @classmethod
-    def calculate_overview_indicators_by_messages(cls, messages: list[Message]) -> dict[str, Any]:
-        """根据传递的消息列表计算概览指标，涵盖全部会话数、激活用户数、平均会话互动数、Token输出速度、费用消耗"""
-        # 1.计算全部会话数，使用消息总数来计算
-        total_messages = len(messages)
+    def truncate_datetime(cls, value: datetime, granularity: AnalysisGranularity) -> datetime:
+        """按时间粒度截断时间，与PostgreSQL的date_trunc保持一致，周以周一为起点"""
+        if granularity == AnalysisGranularity.HOUR:
+            return value.replace(minute=0, second=0, microsecond=0)
+        midnight = datetime.combine(value, datetime.min.time())
+        if granularity == AnalysisGranularity.WEEK:
+            return midnight - timedelta(days=midnight.weekday())
+        return midnight
+
+    def get_distinct_counts_by_time_range(self, app: App, start_at: datetime, end_at: datetime) -> tuple[int, int]:
+        """根据传递的时间段在数据库中统计指定应用的去重用户数与去重会话数，去重数据无法由每日汇总累加得到"""
+        active_accounts, conversation_count = self.db.session.query(
+            func.count(distinct(Message.created_by)),
+            func.count(distinct(Message.conversation_id)),
+        ).filter(
+            Message.app_id == app.id,
+            Message.created_at >= start_at,
+            Message.created_at < end_at,
+            Message.answer != "",
+        ).one()
+        return active_accounts, conversation_count
 
-        # 2.计算激活用户数，使用唯一用户数判断
-        active_accounts = len({message.created_by for message in messages})
+    @classmethod
+    def calculate_overview_indicators_by_stats(
+            cls, stats: list[Any], active_accounts: int, conversation_count: int,
+    ) -> dict[str, Any]:
+        """根据传递的每日统计汇总以及去重数据计算概览指标，涵盖全部会话数、激活用户数、平均会话互动数、Token输出速度、费用消耗"""
+        # 1.计算全部会话数，使用消息总数来计算
+        total_messages = sum(stat.message_count for stat in stats)
 
-        # 3.平均会话互动数，使用消息总数/会话总数，涉及除法要做/0判断
+        # 2.平均会话互动数，使用消息总数/会话总数，涉及除法要做/0判断
         avg_of_conversation_messages = 0
-        conversation_count = len({message.conversation_id for message in messages})
         if conversation_count != 0:
             avg_of_conversation_messages = total_messages / conversation_count
 
-        # 4.Token输出速度，使用总token数/总耗时，涉及除法要做/0判断
+        # 3.Token输出速度，使用总token数/总耗时，涉及除法要做/0判断
         token_output_rate = 0
-        latency_sum = sum(message.latency for message in messages)
+        latency_sum = sum(stat.latency_sum for stat in stats)
         if latency_sum != 0:
-            token_output_rate = sum(message.total_token_count for message in messages) / latency_sum
+            token_output_rate = sum(stat.total_token_count for stat in stats) / latency_sum
 
-        # 5.计算费用消耗，使用总花费进行求和
-        cost_consumption = sum(message.total_price for message in messages)
+        # 4.计算费用消耗，使用总花费进行求和
+        cost_consumption = sum(stat.total_price for stat in stats)
 
-        # 6.返回数据，并且对于小数型数据，如果数值过小，需要转换成float，避免Python使用科学计数法进行展示
+        # 5.返回数据，并且对于小数型数据，如果数值过小，需要转换成float，避免Python使用科学计数法进行展示
         return {
             "total_messages": total_messages,
             "active_accounts": active_accounts,
@@ -156,61 +274,55 @@ class AnalysisService(BaseService):
         return pop
 
     @classmethod
-    def calculate_trend_by_messages(
-            cls, end_at: datetime, days_ago: int, messages: list[Message],
+    def calculate_trend_by_stats(
+            cls, end_at: datetime, days_ago: int, daily_stats: dict[date, Any],
     ) -> dict[str, Any]:
-        """根据传递的结束时间、回退天数、消息列表计算对应指标的趋势数据"""
-        # 1.重新计算end_at为午夜时间
+        """根据传递的结束时间、回退天数、每日统计汇总计算对应指标的趋势数据"""
+        # 1.重新计算end_at为午夜时间，并生成每一天的起点时间
         end_at = datetime.combine(end_at, datetime.min.time())
+        bucket_starts = [end_at - timedelta(days_ago - day) for day in range(days_ago)]
 
-        # 2.定义初始数据
+        # 2.按天计算趋势数据
+        return cls.calculate_trend_by_buckets(bucket_starts, {
+            datetime.combine(stat_date, datetime.min.time()): stat for stat_date, stat in daily_stats.items()
+        })
+
+    @classmethod
+    def calculate_trend_by_buckets(cls, bucket_starts: list[datetime], stats: dict[datetime, Any]) -> dict[str, Any]:
+        """根据传递的时间桶起点列表以及每个时间桶的统计数据计算对应指标的趋势数据，没有数据的时间桶各项指标均为0"""
+        # 1.定义初始数据
         total_messages_trend = {"x_axis": [], "y_axis": []}
         active_accounts_trend = {"x_axis": [], "y_axis": []}
         avg_of_conversation_messages_trend = {"x_axis": [], "y_axis": []}
         cost_consumption_trend = {"x_axis": [], "y_axis": []}
 
-        # 3.循环遍历计算并提取数据
-        for day in range(days_ago):
-            # 4.计算起点和终点时间
-            trend_start_at = end_at - timedelta(days_ago - day)
-            trend_end_at = end_at - timedelta(days_ago - day - 1)
-
-            # 5.计算全部会话趋势
-            total_messages_trend_y_axis = len([
-                message for message in messages
-                if trend_start_at <= message.created_at < trend_end_at
-            ])
-            total_messages_trend["x_axis"].append(int(trend_start_at.timestamp()))
-            total_messages_trend["y_axis"].append(total_messages_trend_y_axis)
-
-            # 6.计算激活用户趋势数据
-            active_accounts_trend_y_axis = len({
-                message.created_by for message in messages
-                if trend_start_at <= message.created_at < trend_end_at
-            })
-            active_accounts_trend["x_axis"].append(int(trend_start_at.timestamp()))
-            active_accounts_trend["y_axis"].append(active_accounts_trend_y_axis)
-
-            # 7.计算平均会话互动趋势
-            avg_of_conversation_messages_trend_y_axis = 0
-            conversation_count = len({
-                message.conversation_id for message in messages
-                if trend_start_at <= message.created_at < trend_end_at
-            })
-            if conversation_count != 0:
-                avg_of_conversation_messages_trend_y_axis = total_messages_trend_y_axis / conversation_count
-            avg_of_conversation_messages_trend["x_axis"].append(int(trend_start_at.timestamp()))
-            avg_of_conversation_messages_trend["y_axis"].append(float(avg_of_conversation_messages_trend_y_axis))
-
-            # 8.计算费用消耗趋势
-            cost_consumption_trend_y_axis = sum(
-                message.total_price for message in messages
-                if trend_start_at <= message.created_at < trend_end_at
+        # 2.循环遍历每一个时间桶
+        for bucket_start in bucket_starts:
+            # 3.获取时间桶的统计数据
+            x_axis = int(bucket_start.timestamp())
+            stat = stats.get(bucket_start)
+            message_count = stat.message_count if stat else 0
+            conversation_count = stat.conversation_count if stat else 0
+
+            # 4.计算全部会话趋势
+            total_messages_trend["x_axis"].append(x_axis)
+            total_messages_trend["y_axis"].append(message_count)
+
+            # 5.计算激活用户趋势数据
+            active_accounts_trend["x_axis"].append(x_axis)
+            active_accounts_trend["y_axis"].append(stat.account_count if stat else 0)
+
+            # 6.计算平均会话互动趋势
+            avg_of_conversation_messages_trend["x_axis"].append(x_axis)
+            avg_of_conversation_messages_trend["y_axis"].append(
+                float(message_count / conversation_count) if conversation_count != 0 else 0.0
             )
-            cost_consumption_trend["x_axis"].append(int(trend_start_at.timestamp()))
-            cost_consumption_trend["y_axis"].append(float(cost_consumption_trend_y_axis))
 
-        # 9.返回数据
+            # 7.计算费用消耗趋势
+            cost_consumption_trend["x_axis"].append(x_axis)
+            cost_consumption_trend["y_axis"].append(float(stat.total_price) if stat else 0.0)
+
+        # 8.返回数据
         return {
             "total_messages_trend": total_messages_trend,
             "active_accounts_trend": active_accounts_trend,
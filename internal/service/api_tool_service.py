@@ -84,6 +84,7 @@ class ApiToolService(BaseService):
                     url=f"{openapi_schema.server}{path}",
                     method=method,
                     parameters=method_item.get("parameters", []),
+                    cache_ttl=method_item.get("x-cache-ttl", 0),
                 )
 
     def get_api_tool_providers_with_page(
@@ -166,6 +167,7 @@ class ApiToolService(BaseService):
                     url=f"{openapi_schema.server}{path}",
                     method=method,
                     parameters=method_item.get("parameters", []),
+                    cache_ttl=method_item.get("x-cache-ttl", 0),
                 )
 
     def delete_api_tool_provider(self, provider_id: UUID, account: Account):
@@ -12,6 +12,7 @@ from internal.core.language_model.entities.model_entity import ModelParameterTyp
 from internal.core.tools.api_tools.entities import ToolEntity
 from internal.core.tools.api_tools.providers import ApiProviderManager
 from internal.core.tools.builtin_tools.providers import BuiltinProviderManager
+from internal.core.tools.tool_cache import CachedTool
 from internal.core.workflow import Workflow as WorkflowTool
 from internal.core.workflow.entities.workflow_entity import WorkflowConfig
 from internal.entity.app_entity import DEFAULT_APP_CONFIG
@@ -138,9 +139,22 @@ class AppConfigService(BaseService):
                 )
                 if not builtin_tool:
                     continue
-                tools.append(builtin_tool(**tool["tool"]["params"]))
+                langchain_tool = builtin_tool(**tool["tool"]["params"])
+
+                # 4.幂等的内置工具包装上结果缓存，工具自定义参数同样参与缓存键计算
+                tool_entity = self.builtin_provider_manager.get_provider(tool["provider"]["id"]).get_tool_entity(
+                    tool["tool"]["name"]
+                )
+                if tool_entity and tool_entity.cacheable and tool_entity.cache_ttl > 0:
+                    langchain_tool = CachedTool.wrap(
+                        langchain_tool,
+                        tool_id=f"builtin:{tool['provider']['id']}:{tool['tool']['name']}",
+                        cache_ttl=tool_entity.cache_ttl,
+                        cache_scope=tool["tool"]["params"],
+                    )
+                tools.append(langchain_tool)
             else:
-                # 4.API工具，首先根据id找到ApiTool记录，然后创建示例
+                # 5.API工具，首先根据id找到ApiTool记录，然后创建示例
                 api_tool = self.get(ApiTool, tool["tool"]["id"])
                 if not api_tool:
                     continue
@@ -154,6 +168,7 @@ class AppConfigService(BaseService):
                             description=api_tool.description,
                             headers=api_tool.provider.headers,
                             parameters=api_tool.parameters,
+                            cache_ttl=api_tool.cache_ttl,
                         )
                     )
                 )
@@ -5,8 +5,8 @@
 @Author  : thezehui@gmail.com
 @File    : app_service.py
 """
+import functools
 import io
-import json
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Any, Generator
@@ -25,14 +25,14 @@ from sqlalchemy import func, desc
 from sqlalchemy.orm import joinedload
 from werkzeug.datastructures import FileStorage
 
-from internal.core.agent.agents import FunctionCallAgent, AgentQueueManager, ReACTAgent
+from internal.core.agent.agents import AgentChatStream, FunctionCallAgent, get_agent_queue_manager_class, ReACTAgent
 from internal.core.agent.entities.agent_entity import AgentConfig
-from internal.core.agent.entities.queue_entity import QueueEvent
 from internal.core.language_model import LanguageModelManager
 from internal.core.language_model.entities.model_entity import ModelParameterType, ModelFeature
 from internal.core.memory.token_buffer_memory import TokenBufferMemory
 from internal.core.tools.api_tools.providers import ApiProviderManager
 from internal.core.tools.builtin_tools.providers import BuiltinProviderManager
+from internal.core.tracing import get_tracer, traced
 from internal.entity.ai_entity import OPTIMIZE_PROMPT_TEMPLATE
 from internal.entity.app_entity import AppStatus, AppConfigType, DEFAULT_APP_CONFIG
 from internal.entity.app_entity import GENERATE_ICON_PROMPT_TEMPLATE
@@ -40,7 +40,9 @@ from internal.entity.audio_enitty import ALLOWED_AUDIO_VOICES
 from internal.entity.conversation_entity import InvokeFrom, MessageStatus
 from internal.entity.dataset_entity import RetrievalSource
 from internal.entity.workflow_entity import WorkflowStatus
-from internal.exception import NotFoundException, ForbiddenException, ValidateErrorException, FailException
+from internal.exception import (
+    NotFoundException, ForbiddenException, ValidateErrorException, FailException,
+)
 from internal.lib.helper import remove_fields, get_value_type, generate_random_string
 from internal.model import (
     App,
@@ -91,11 +93,17 @@ class AppService(BaseService):
 
     def debug_chat(self, app_id: UUID, req: DebugChatReq, account: Account) -> Generator:
         """根据传递的应用id+提问query向特定的应用发起会话调试"""
+        return self.create_debug_chat_stream(app_id, req, account).stream()
+
+    @traced("chat.prepare")
+    def create_debug_chat_stream(self, app_id: UUID, req: DebugChatReq, account: Account) -> AgentChatStream:
+        """根据传递的应用id+提问query构建调试会话流，同步与异步(ASGI)调试会话共用"""
         # 1.获取应用信息并校验权限
         app = self.get_app(app_id, account)
 
         # 2.获取应用的最新草稿配置信息
-        draft_app_config = self.get_draft_app_config(app_id, account)
+        with get_tracer().span("chat.load_config"):
+            draft_app_config = self.get_draft_app_config(app_id, account)
         print(draft_app_config.items())
 
         # 3.获取当前应用的调试会话信息
@@ -122,17 +130,20 @@ class AppService(BaseService):
             conversation=debug_conversation,
             model_instance=llm,
         )
-        history = token_buffer_memory.get_history_prompt_messages(
-            message_limit=draft_app_config["dialog_round"],
-        )
+        with get_tracer().span("chat.history"):
+            history = token_buffer_memory.get_history_prompt_messages(
+                message_limit=draft_app_config["dialog_round"],
+            )
 
         # 7.将草稿配置中的tools转换成LangChain工具
-        tools = self.app_config_service.get_langchain_tools_by_tools_config(draft_app_config["tools"])
+        with get_tracer().span("chat.tools"):
+            tools = self.app_config_service.get_langchain_tools_by_tools_config(draft_app_config["tools"])
 
         # 8.将草稿配置中的mcp_tool
         if draft_app_config["mcp_tools"]:
-            mcp_tools = self.optimized_mcp_service.get_langchain_tools_by_mcp_tool_config(
-                mcp_tools=draft_app_config["mcp_tools"])
+            with get_tracer().span("chat.mcp_tools"):
+                mcp_tools = self.optimized_mcp_service.get_langchain_tools_by_mcp_tool_config(
+                    mcp_tools=draft_app_config["mcp_tools"])
             # mcp_tools = self.app_config_service.get_langchain_tools_by_mcp_tool_config(draft_app_config["mcp_tools"])
             for tool in mcp_tools:
                 tools.append(tool)
@@ -170,64 +181,32 @@ class AppService(BaseService):
             ),
         )
 
-        agent_thoughts = {}
-        for agent_thought in agent.stream({
-            "messages": [llm.convert_to_human_message(req.query.data, req.image_urls.data)],
-            "history": history,
-            "long_term_memory": debug_conversation.summary,
-        }):
-            # 11.提取thought以及answer
-            event_id = str(agent_thought.id)
-
-            # 12.将数据填充到agent_thought，便于存储到数据库服务中
-            if agent_thought.event != QueueEvent.PING:
-                # 13.除了agent_message数据为叠加，其他均为覆盖
-                if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                    if event_id not in agent_thoughts:
-                        # 14.初始化智能体消息事件
-                        agent_thoughts[event_id] = agent_thought
-                    else:
-                        # 15.叠加智能体消息
-                        agent_thoughts[event_id] = agent_thoughts[event_id].model_copy(update={
-                            "thought": agent_thoughts[event_id].thought + agent_thought.thought,
-                            # 消息相关数据
-                            "message": agent_thought.message,
-                            "message_token_count": agent_thought.message_token_count,
-                            "message_unit_price": agent_thought.message_unit_price,
-                            "message_price_unit": agent_thought.message_price_unit,
-                            # 答案相关数据
-                            "answer": agent_thoughts[event_id].answer + agent_thought.answer,
-                            "answer_token_count": agent_thought.answer_token_count,
-                            "answer_unit_price": agent_thought.answer_unit_price,
-                            "answer_price_unit": agent_thought.answer_price_unit,
-                            # Agent推理统计相关
-                            "total_token_count": agent_thought.total_token_count,
-                            "total_price": agent_thought.total_price,
-                            "latency": agent_thought.latency,
-                        })
-                else:
-                    # 16.处理其他类型事件的消息
-                    agent_thoughts[event_id] = agent_thought
-            data = {
-                **agent_thought.model_dump(include={
-                    "event", "thought", "observation", "tool", "tool_input", "answer",
-                    "total_token_count", "total_price", "latency",
-                }),
-                "id": event_id,
+        # 11.构建会话流，结束后将消息以及推理过程添加到数据库
+        return AgentChatStream(
+            agent=agent,
+            agent_state={
+                "messages": [llm.convert_to_human_message(req.query.data, req.image_urls.data)],
+                "history": history,
+                "long_term_memory": debug_conversation.summary,
+            },
+            include={
+                "event", "thought", "observation", "tool", "tool_input", "answer",
+                "total_token_count", "total_price", "latency", "cache_hits", "cache_misses",
+            },
+            extra_data={
                 "conversation_id": str(debug_conversation.id),
                 "message_id": str(message.id),
-                "task_id": str(agent_thought.task_id),
-            }
-            yield f"event: {agent_thought.event}\ndata:{json.dumps(data)}\n\n"
-
-        # 22.将消息以及推理过程添加到数据库
-        self.conversation_service.save_agent_thoughts(
-            account_id=account.id,
-            app_id=app.id,
-            app_config=draft_app_config,
-            conversation_id=debug_conversation.id,
-            message_id=message.id,
-            agent_thoughts=[agent_thought for agent_thought in agent_thoughts.values()],
+            },
+            on_finish=functools.partial(
+                self.conversation_service.save_agent_thoughts,
+                account_id=account.id,
+                app_id=app.id,
+                app_config=draft_app_config,
+                conversation_id=debug_conversation.id,
+                message_id=message.id,
+                token_buffer_memory=token_buffer_memory,
+            ),
+            on_reject=lambda: self.delete(message),
         )
 
     def auto_create_app(self, name: str, description: str, account_id: UUID) -> None:
@@ -643,7 +622,25 @@ class AppService(BaseService):
         self.get_app(app_id, account)
 
         # 2.调用智能体队列管理器停止特定任务
-        AgentQueueManager.set_stop_flag(task_id, InvokeFrom.DEBUGGER, account.id)
+        get_agent_queue_manager_class().set_stop_flag(task_id, InvokeFrom.DEBUGGER, account.id)
+
+    def resume_debug_chat(self, app_id: UUID, task_id: UUID, last_event_id: str, account: Account) -> Generator:
+        """根据传递的应用id+任务id+最后接收的事件id，断线重连继续获取调试会话的流式事件"""
+        # 1.获取应用信息并校验权限
+        app = self.get_app(app_id, account)
+
+        # 2.从队列管理器中继续读取事件，不会重新生成答案，数据帧与实时数据帧保持一致
+        agent_queue_manager = get_agent_queue_manager_class()(user_id=account.id, invoke_from=InvokeFrom.DEBUGGER)
+        return AgentChatStream.resume(
+            agent_queue_manager,
+            task_id,
+            last_event_id,
+            include={
+                "event", "thought", "observation", "tool", "tool_input", "answer",
+                "total_token_count", "total_price", "latency", "cache_hits", "cache_misses",
+            },
+            extra_data={"conversation_id": str(app.debug_conversation_id)},
+        )
 
     def get_debug_conversation_messages_with_page(
             self,
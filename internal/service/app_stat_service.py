@@ -0,0 +1,308 @@
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Optional
+from uuid import UUID
+
+from injector import inject
+from redis import Redis
+from sqlalchemy import distinct, func
+from sqlalchemy.dialects.postgresql import insert
+
+from internal.entity.cache_entity import (
+    APP_DAILY_STAT_ACCOUNTS,
+    APP_DAILY_STAT_ACCOUNTS_HLL,
+    APP_DAILY_STAT_APP_WATERMARK,
+    APP_DAILY_STAT_CONVERSATIONS,
+    APP_DAILY_STAT_CONVERSATIONS_HLL,
+    APP_DAILY_STAT_EXPIRE_TIME,
+    APP_DAILY_STAT_HLL_EXPIRE_TIME,
+    APP_DAILY_STAT_WATERMARK,
+    APP_LIVE_STAT_COUNTERS,
+    APP_LIVE_STAT_ACCOUNTS,
+    APP_LIVE_STAT_CONVERSATIONS,
+    APP_LIVE_STAT_EXPIRE_TIME,
+)
+from internal.model import AppDailyStat, Message
+from pkg.sqlalchemy import SQLAlchemy
+from .base_service import BaseService
+
+
+@inject
+@dataclass
+class AppStatService(BaseService):
+    """应用统计汇总服务，维护按应用+日期汇总的消息统计数据"""
+    db: SQLAlchemy
+    redis_client: Redis
+
+    # 统计字段，增量更新时累加，回填时覆盖
+    _stat_fields = (
+        "message_count", "account_count", "conversation_count",
+        "total_token_count", "latency_sum", "total_price",
+    )
+
+    def record_message(self, message: Message) -> None:
+        """消息保存完成后更新所属应用的实时计数以及当日的统计汇总，统计失败只记录日志，不影响消息保存后的其他处理"""
+        # 1.答案为空的消息不参与统计
+        if message.answer == "":
+            return
+
+        # 2.更新实时计数以及当日的统计汇总，Redis或数据库出错时跳过本条消息的统计
+        try:
+            self._record_live_stat(message)
+            self._record_daily_stat(message)
+        except Exception as e:
+            logging.warning(
+                "更新应用统计失败, message_id: %(message_id)s, 错误信息: %(error)s",
+                {"message_id": message.id, "error": e},
+            )
+
+    def _record_daily_stat(self, message: Message) -> None:
+        """将消息累加到所属应用当日的统计汇总中，用户与会话的当日去重通过Redis集合判断，同时记录到当日的HyperLogLog中"""
+        # 1.判断用户、会话是否为当日首次出现，并记录到当日的HyperLogLog中，便于统计多天合并的去重数量
+        stat_date = message.created_at.date()
+        accounts_key = APP_DAILY_STAT_ACCOUNTS.format(app_id=message.app_id, stat_date=stat_date)
+        conversations_key = APP_DAILY_STAT_CONVERSATIONS.format(app_id=message.app_id, stat_date=stat_date)
+        pipeline = self.redis_client.pipeline()
+        pipeline.sadd(accounts_key, str(message.created_by))
+        pipeline.expire(accounts_key, APP_DAILY_STAT_EXPIRE_TIME)
+        pipeline.sadd(conversations_key, str(message.conversation_id))
+        pipeline.expire(conversations_key, APP_DAILY_STAT_EXPIRE_TIME)
+        self._add_daily_hll(pipeline, message.app_id, stat_date, [message.created_by], [message.conversation_id])
+        new_account, _, new_conversation, _ = pipeline.execute()[:4]
+
+        # 2.将本条消息的数据累加到当日的统计汇总中
+        self._upsert([{
+            "app_id": message.app_id,
+            "stat_date": stat_date,
+            "message_count": 1,
+            "account_count": int(bool(new_account)),
+            "conversation_count": int(bool(new_conversation)),
+            "total_token_count": message.total_token_count,
+            "latency_sum": message.latency,
+            "total_price": message.total_price,
+        }], accumulate=True)
+
+    def _record_live_stat(self, message: Message) -> None:
+        """更新消息所在小时的实时计数，活跃用户与会话使用HyperLogLog近似去重"""
+        hour = self.format_hour(message.created_at)
+        counters_key = APP_LIVE_STAT_COUNTERS.format(app_id=message.app_id, hour=hour)
+        accounts_key = APP_LIVE_STAT_ACCOUNTS.format(app_id=message.app_id, hour=hour)
+        conversations_key = APP_LIVE_STAT_CONVERSATIONS.format(app_id=message.app_id, hour=hour)
+
+        pipeline = self.redis_client.pipeline(transaction=False)
+        pipeline.hincrby(counters_key, "message_count", 1)
+        pipeline.hincrby(counters_key, "total_token_count", message.total_token_count)
+        pipeline.hincrbyfloat(counters_key, "latency_sum", float(message.latency))
+        pipeline.hincrbyfloat(counters_key, "total_price", float(message.total_price))
+        pipeline.pfadd(accounts_key, str(message.created_by))
+        pipeline.pfadd(conversations_key, str(message.conversation_id))
+        for key in (counters_key, accounts_key, conversations_key):
+            pipeline.expire(key, APP_LIVE_STAT_EXPIRE_TIME)
+        pipeline.execute()
+
+    def get_live_stats(self, app_id: UUID, hours: list[datetime]) -> dict[str, Any]:
+        """获取应用在指定小时列表内的实时计数，返回每小时的计数以及所有小时合并去重后的活跃用户数与会话数"""
+        # 1.读取每小时的计数以及HyperLogLog基数
+        accounts_keys = [APP_LIVE_STAT_ACCOUNTS.format(app_id=app_id, hour=self.format_hour(hour)) for hour in hours]
+        conversations_keys = [
+            APP_LIVE_STAT_CONVERSATIONS.format(app_id=app_id, hour=self.format_hour(hour)) for hour in hours
+        ]
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for hour, accounts_key, conversations_key in zip(hours, accounts_keys, conversations_keys):
+            pipeline.hgetall(APP_LIVE_STAT_COUNTERS.format(app_id=app_id, hour=self.format_hour(hour)))
+            pipeline.pfcount(accounts_key)
+            pipeline.pfcount(conversations_key)
+
+        # 2.多个HyperLogLog一起计数时返回并集的基数，即整个时间段的去重数量
+        pipeline.pfcount(*accounts_keys)
+        pipeline.pfcount(*conversations_keys)
+        results = pipeline.execute()
+
+        # 3.整理每小时的计数
+        hourly = []
+        for index, hour in enumerate(hours):
+            counters, account_count, conversation_count = results[index * 3:index * 3 + 3]
+            counters = {
+                (key.decode() if isinstance(key, bytes) else key): float(value) for key, value in counters.items()
+            }
+            hourly.append({
+                "hour": hour,
+                "message_count": int(counters.get("message_count", 0)),
+                "account_count": account_count,
+                "conversation_count": conversation_count,
+                "total_token_count": int(counters.get("total_token_count", 0)),
+                "latency_sum": counters.get("latency_sum", 0.0),
+                "total_price": counters.get("total_price", 0.0),
+            })
+
+        return {"hourly": hourly, "account_count": results[-2], "conversation_count": results[-1]}
+
+    @classmethod
+    def format_hour(cls, value: datetime) -> str:
+        """将时间格式化成实时计数使用的小时标识"""
+        return value.strftime("%Y%m%d%H")
+
+    def backfill_daily_stats(self, start_date: date, end_date: date, app_id: Optional[UUID] = None) -> int:
+        """根据消息表重新计算[start_date, end_date]范围内的每日统计汇总并覆盖写入，返回写入的行数
+
+        回填时同时写入每日的HyperLogLog以及当日去重集合，回填覆盖到最近的日期时前移水位线，水位线之后没有汇总行的日期即没有消息。
+        """
+        # 1.在数据库中按应用+日期聚合消息数据
+        stat_date = func.date(Message.created_at)
+        rows = self.db.session.query(
+            Message.app_id,
+            stat_date.label("stat_date"),
+            func.count(Message.id),
+            func.count(distinct(Message.created_by)),
+            func.count(distinct(Message.conversation_id)),
+            func.coalesce(func.sum(Message.total_token_count), 0),
+            func.coalesce(func.sum(Message.latency), 0),
+            func.coalesce(func.sum(Message.total_price), 0),
+        ).filter(
+            *self._backfill_filters(start_date, end_date, app_id),
+        ).group_by(Message.app_id, stat_date).all()
+
+        # 2.覆盖写入统计汇总
+        self._upsert([dict(zip(("app_id", "stat_date", *self._stat_fields), row)) for row in rows], accumulate=False)
+
+        # 3.写入每日去重的用户与会话，避免回填后增量更新重复计算当日的用户数与会话数
+        accounts = self._load_distinct_members(Message.created_by, start_date, end_date, app_id)
+        conversations = self._load_distinct_members(Message.conversation_id, start_date, end_date, app_id)
+        self._seed_distinct_members(accounts, conversations)
+
+        # 4.前移水位线
+        self._advance_watermark(start_date, end_date, app_id)
+
+        return len(rows)
+
+    @classmethod
+    def _backfill_filters(cls, start_date: date, end_date: date, app_id: Optional[UUID]) -> list[Any]:
+        """回填[start_date, end_date]范围内消息的过滤条件"""
+        filters = [
+            Message.answer != "",
+            Message.created_at >= datetime.combine(start_date, datetime.min.time()),
+            Message.created_at < datetime.combine(end_date + timedelta(days=1), datetime.min.time()),
+        ]
+        if app_id is not None:
+            filters.append(Message.app_id == app_id)
+        return filters
+
+    def _load_distinct_members(
+            self, column: Any, start_date: date, end_date: date, app_id: Optional[UUID],
+    ) -> dict[tuple[UUID, date], list[Any]]:
+        """查询每个应用每天去重后的指定字段值(用户id或者会话id)"""
+        stat_date = func.date(Message.created_at)
+        rows = self.db.session.query(Message.app_id, stat_date, column).filter(
+            *self._backfill_filters(start_date, end_date, app_id),
+        ).distinct().all()
+        members: dict[tuple[UUID, date], list[Any]] = {}
+        for row_app_id, row_date, member in rows:
+            members.setdefault((row_app_id, row_date), []).append(member)
+        return members
+
+    def _seed_distinct_members(
+            self,
+            accounts: dict[tuple[UUID, date], list[Any]],
+            conversations: dict[tuple[UUID, date], list[Any]],
+    ) -> None:
+        """将回填的去重用户与会话写入每日HyperLogLog，仍在增量更新的日期(今天、昨天)同时写入当日去重集合"""
+        recent_date = date.today() - timedelta(days=1)
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for app_id, stat_date in set(accounts) | set(conversations):
+            account_ids = accounts.get((app_id, stat_date), [])
+            conversation_ids = conversations.get((app_id, stat_date), [])
+            self._add_daily_hll(pipeline, app_id, stat_date, account_ids, conversation_ids)
+            if stat_date < recent_date:
+                continue
+            for key, members in (
+                    (APP_DAILY_STAT_ACCOUNTS.format(app_id=app_id, stat_date=stat_date), account_ids),
+                    (APP_DAILY_STAT_CONVERSATIONS.format(app_id=app_id, stat_date=stat_date), conversation_ids),
+            ):
+                if members:
+                    pipeline.sadd(key, *[str(member) for member in members])
+                    pipeline.expire(key, APP_DAILY_STAT_EXPIRE_TIME)
+        pipeline.execute()
+
+    @classmethod
+    def _add_daily_hll(
+            cls, pipeline: Any, app_id: UUID, stat_date: date, account_ids: list[Any], conversation_ids: list[Any],
+    ) -> None:
+        """在管道中将用户与会话记录到应用当天的HyperLogLog中"""
+        for key, members in (
+                (APP_DAILY_STAT_ACCOUNTS_HLL.format(app_id=app_id, stat_date=stat_date), account_ids),
+                (APP_DAILY_STAT_CONVERSATIONS_HLL.format(app_id=app_id, stat_date=stat_date), conversation_ids),
+        ):
+            if members:
+                pipeline.pfadd(key, *[str(member) for member in members])
+                pipeline.expire(key, APP_DAILY_STAT_HLL_EXPIRE_TIME)
+
+    def _advance_watermark(self, start_date: date, end_date: date, app_id: Optional[UUID]) -> None:
+        """回填覆盖到昨天及之后时，之后的日期由增量更新维护，将水位线前移到回填的开始日期"""
+        if end_date < date.today() - timedelta(days=1):
+            return
+        key = APP_DAILY_STAT_WATERMARK if app_id is None else APP_DAILY_STAT_APP_WATERMARK.format(app_id=app_id)
+        current = self.redis_client.get(key)
+        if current is None or date.fromisoformat(current.decode()) > start_date:
+            self.redis_client.set(key, start_date.isoformat())
+
+    def get_covered_since(self, app_id: UUID) -> Optional[date]:
+        """获取应用每日统计汇总的水位线，该日期及之后没有汇总行的日期即没有消息，未回填或读取失败时返回None"""
+        try:
+            values = self.redis_client.mget([APP_DAILY_STAT_WATERMARK, APP_DAILY_STAT_APP_WATERMARK.format(app_id=app_id)])
+        except Exception as e:
+            logging.warning("读取应用统计水位线失败: %(error)s", {"error": e})
+            return None
+        dates = [date.fromisoformat(value.decode()) for value in values if value is not None]
+        return min(dates) if dates else None
+
+    def get_distinct_counts(self, app_id: UUID, daily_stats: dict[date, Any]) -> Optional[tuple[int, int]]:
+        """根据每日HyperLogLog合并计数得到多天内的去重用户数与会话数(近似值)，有消息的日期缺少HyperLogLog或读取失败时返回None"""
+        # 1.只需要合并有消息的日期
+        stat_dates = [stat_date for stat_date, stat in daily_stats.items() if stat.message_count]
+        if not stat_dates:
+            return 0, 0
+
+        # 2.检测HyperLogLog是否齐全，并合并计数
+        accounts_keys = [APP_DAILY_STAT_ACCOUNTS_HLL.format(app_id=app_id, stat_date=d) for d in stat_dates]
+        conversations_keys = [APP_DAILY_STAT_CONVERSATIONS_HLL.format(app_id=app_id, stat_date=d) for d in stat_dates]
+        try:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            pipeline.exists(*accounts_keys)
+            pipeline.exists(*conversations_keys)
+            pipeline.pfcount(*accounts_keys)
+            pipeline.pfcount(*conversations_keys)
+            accounts_exists, conversations_exists, account_count, conversation_count = pipeline.execute()
+        except Exception as e:
+            logging.warning("读取应用每日去重统计失败: %(error)s", {"error": e})
+            return None
+        if accounts_exists < len(stat_dates) or conversations_exists < len(stat_dates):
+            return None
+        return account_count, conversation_count
+
+    def get_daily_stats(self, app_id: UUID, start_date: date, end_date: date) -> dict[date, AppDailyStat]:
+        """获取应用在[start_date, end_date)范围内的每日统计汇总，键为统计日期"""
+        stats = self.db.session.query(AppDailyStat).filter(
+            AppDailyStat.app_id == app_id,
+            AppDailyStat.stat_date >= start_date,
+            AppDailyStat.stat_date < end_date,
+        ).all()
+        return {stat.stat_date: stat for stat in stats}
+
+    def _upsert(self, values: list[dict], accumulate: bool) -> None:
+        """批量写入统计汇总，应用+日期已存在时累加或者覆盖统计字段"""
+        if not values:
+            return
+        stmt = insert(AppDailyStat).values(values)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uk_app_daily_stat_app_id_stat_date",
+            set_={
+                **{
+                    field: getattr(AppDailyStat, field) + stmt.excluded[field] if accumulate else stmt.excluded[field]
+                    for field in self._stat_fields
+                },
+                "updated_at": datetime.now(),
+            },
+        )
+        with self.db.auto_commit():
+            self.db.session.execute(stmt)
@@ -1,4 +1,4 @@
-import json
+import functools
 from dataclasses import dataclass
 from datetime import datetime
 from uuid import UUID
@@ -10,9 +10,8 @@ from pydantic import BaseModel, Field
 from sqlalchemy import desc
 from sqlalchemy.orm import joinedload
 
-from internal.core.agent.agents import FunctionCallAgent, AgentQueueManager
+from internal.core.agent.agents import AgentChatStream, FunctionCallAgent, get_agent_queue_manager_class
 from internal.core.agent.entities.agent_entity import AgentConfig
-from internal.core.agent.entities.queue_entity import QueueEvent
 from internal.core.language_model.entities.model_entity import ModelFeature
 # from internal.core.language_model.providers.tongyi.chat import Chat
 from internal.core.language_model.providers.openai.chat import Chat
@@ -88,70 +87,38 @@ class AssistantAgentService(BaseService):
             ),
         )
 
-        agent_thoughts = {}
-        for agent_thought in agent.stream({
-            "messages": [llm.convert_to_human_message(req.query.data, req.image_urls.data)],
-            "history": history,
-            "long_term_memory": conversation.summary,
-        }):
-            # 8.提取thought以及answer
-            event_id = str(agent_thought.id)
-
-            # 9.将数据填充到agent_thought，便于存储到数据库服务中
-            if agent_thought.event != QueueEvent.PING:
-                # 10.除了agent_message数据为叠加，其他均为覆盖
-                if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                    if event_id not in agent_thoughts:
-                        # 11.初始化智能体消息事件
-                        agent_thoughts[event_id] = agent_thought
-                    else:
-                        # 12.叠加智能体消息
-                        agent_thoughts[event_id] = agent_thoughts[event_id].model_copy(update={
-                            "thought": agent_thoughts[event_id].thought + agent_thought.thought,
-                            # 消息相关数据
-                            "message": agent_thought.message,
-                            "message_token_count": agent_thought.message_token_count,
-                            "message_unit_price": agent_thought.message_unit_price,
-                            "message_price_unit": agent_thought.message_price_unit,
-                            # 答案相关字段
-                            "answer": agent_thoughts[event_id].answer + agent_thought.answer,
-                            "answer_token_count": agent_thought.answer_token_count,
-                            "answer_unit_price": agent_thought.answer_unit_price,
-                            "answer_price_unit": agent_thought.answer_price_unit,
-                            # Agent推理统计相关
-                            "total_token_count": agent_thought.total_token_count,
-                            "total_price": agent_thought.total_price,
-                            "latency": agent_thought.latency,
-                        })
-                else:
-                    # 13.处理其他类型事件的消息
-                    agent_thoughts[event_id] = agent_thought
-            data = {
-                **agent_thought.model_dump(include={
-                    "event", "thought", "observation", "tool", "tool_input", "answer", "latency",
-                    "total_token_count",
-                }),
-                "id": event_id,
+        # 8.构建会话流，结束后将消息以及推理过程添加到数据库
+        return AgentChatStream(
+            agent=agent,
+            agent_state={
+                "messages": [llm.convert_to_human_message(req.query.data, req.image_urls.data)],
+                "history": history,
+                "long_term_memory": conversation.summary,
+            },
+            include={
+                "event", "thought", "observation", "tool", "tool_input", "answer", "latency",
+                "total_token_count",
+            },
+            extra_data={
                 "conversation_id": str(conversation.id),
                 "message_id": str(message.id),
-                "task_id": str(agent_thought.task_id),
-            }
-            yield f"event: {agent_thought.event}\ndata:{json.dumps(data)}\n\n"
-
-        # 22.将消息以及推理过程添加到数据库
-        self.conversation_service.save_agent_thoughts(
-            account_id=account.id,
-            app_id=assistant_agent_id,
-            app_config={"long_term_memory": {"enable": True}},
-            conversation_id=conversation.id,
-            message_id=message.id,
-            agent_thoughts=[agent_thought for agent_thought in agent_thoughts.values()],
-        )
+            },
+            on_finish=functools.partial(
+                self.conversation_service.save_agent_thoughts,
+                account_id=account.id,
+                app_id=assistant_agent_id,
+                app_config={"long_term_memory": {"enable": True}},
+                conversation_id=conversation.id,
+                message_id=message.id,
+                token_buffer_memory=token_buffer_memory,
+            ),
+            on_reject=lambda: self.delete(message),
+        ).stream()
 
     def stop_chat(self, task_id: UUID, current_user: Account):
         pass
         """根据传递的任务id+账号停止某次响应会话"""
-        AgentQueueManager.set_stop_flag(task_id, InvokeFrom.ASSISTANT_AGENT, current_user.id)
+        get_agent_queue_manager_class().set_stop_flag(task_id, InvokeFrom.ASSISTANT_AGENT, current_user.id)
 
     def get_conversation_messages_with_page(self, req: GetAssistantAgentMessagesWithPageReq, current_user: Account):
         """根据传递的请求+账号获取与辅助Agent对话的消息分页列表"""
@@ -1,19 +1,34 @@
+import json
 import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime
-from threading import Thread
+from functools import lru_cache
 from uuid import UUID
 
-from flask import Flask, current_app
 from injector import inject
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
-from sqlalchemy import desc
+from redis import Redis
+from sqlalchemy import delete, desc, insert
 from sqlalchemy.orm import joinedload
-from typing_extensions import Any
+from typing_extensions import Any, Generator, Optional, Union
 
 from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
+from internal.core.memory.token_buffer_memory import TokenBufferMemory
+from internal.entity.cache_entity import (
+    CONVERSATION_PENDING_SUMMARY,
+    CONVERSATION_SUMMARY_SCHEDULED,
+    CONVERSATION_SUMMARY_SCHEDULED_EXPIRE_TIME,
+    CONVERSATION_NAME_SCHEDULED,
+    CONVERSATION_TASK_SLOTS,
+    CONVERSATION_TASK_SLOT_LEASE_TIME,
+    CONVERSATION_TASK_EXPIRE_TIME,
+)
 from internal.entity.conversation_entity import (
     SUMMARIZER_TEMPLATE,
     CONVERSATION_NAME_TEMPLATE,
@@ -24,25 +39,56 @@ from internal.entity.conversation_entity import (
 from internal.exception import NotFoundException
 from internal.model import Conversation, Message, MessageAgentThought, Account
 from internal.schema.conversation_schema import GetConversationMessagesWithPageReq
-from pkg.paginator import Paginator
+from internal.task.conversation_task import (
+    persist_agent_thoughts,
+    summarize_conversation,
+    generate_conversation_name,
+)
+from pkg.paginator import Paginator, CursorPaginator
 from pkg.sqlalchemy import SQLAlchemy
+from .app_stat_service import AppStatService
 from .base_service import BaseService
 
+# 会话摘要的防抖时间(秒)，时间窗口内同一会话的多轮问答合并成一次摘要
+SUMMARY_DEBOUNCE = float(os.getenv("CONVERSATION_SUMMARY_DEBOUNCE", 5))
+
+# 会话后台任务(摘要、命名)在所有worker中同时执行的数量上限
+SIDE_TASK_MAX_CONCURRENCY = int(os.getenv("CONVERSATION_TASK_MAX_CONCURRENCY", 8))
+
+# 会话后台任务达到并发上限时的重试间隔(秒)
+SIDE_TASK_RETRY_COUNTDOWN = 2
+
+# 是否将智能体推理过程交给后台任务异步写入
+AGENT_THOUGHT_WRITE_BEHIND = os.getenv("AGENT_THOUGHT_WRITE_BEHIND", "false").lower() == "true"
+
+
+@lru_cache(maxsize=None)
+def _get_chat_model(model: str, temperature: float) -> ChatOpenAI:
+    """获取进程内共享的ChatOpenAI客户端，相同模型与温度复用同一个实例及其HTTP连接池"""
+    return ChatOpenAI(model=model, temperature=temperature)
+
 
 @inject
 @dataclass
 class ConversationService(BaseService):
     """会话服务"""
     db: SQLAlchemy
+    redis_client: Redis
+    app_stat_service: AppStatService
 
     @classmethod
     def summary(cls, human_message: str, ai_message: str, old_summary: str = "") -> str:
         """根据传递的人类消息、AI消息还有原始的摘要信息总结生成一段新的摘要"""
+        return cls.summary_turns([{"query": human_message, "answer": ai_message}], old_summary)
+
+    @classmethod
+    def summary_turns(cls, turns: list[dict[str, str]], old_summary: str = "") -> str:
+        """根据传递的多轮问答以及原始的摘要信息，使用一次LLM调用总结生成一段新的摘要"""
         # 1.创建prompt
         prompt = ChatPromptTemplate.from_template(SUMMARIZER_TEMPLATE)
 
-        # 2.构建大语言模型实例，并且将大语言模型的温度调低，降低幻觉的概率
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.5)
+        # 2.获取共享的大语言模型实例，并且将大语言模型的温度调低，降低幻觉的概率
+        llm = _get_chat_model("gpt-4o-mini", 0.5)
 
         # 3.构建链应用
         summary_chain = prompt | llm | StrOutputParser()
@@ -50,7 +96,7 @@ class ConversationService(BaseService):
         # 4.调用链并获取新摘要信息
         new_summary = summary_chain.invoke({
             "summary": old_summary,
-            "new_lines": f"Human: {human_message}\nAI: {ai_message}",
+            "new_lines": "\n".join(f"Human: {turn['query']}\nAI: {turn['answer']}" for turn in turns),
         })
 
         return new_summary
@@ -64,8 +110,8 @@ class ConversationService(BaseService):
             ("human", "{query}")
         ])
 
-        # 2.构建大语言模型实例，并且将大语言模型的温度调低，降低幻觉的概率
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+        # 2.获取共享的大语言模型实例，并且将大语言模型的温度调低，降低幻觉的概率
+        llm = _get_chat_model("gpt-4o-mini", 0)
         structured_llm = llm.with_structured_output(ConversationInfo)
 
         # 3.构建链应用
@@ -103,8 +149,8 @@ class ConversationService(BaseService):
             ("human", "{histories}")
         ])
 
-        # 2.构建大语言模型实例，并且将大语言模型的温度调低，降低幻觉的概率
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+        # 2.获取共享的大语言模型实例，并且将大语言模型的温度调低，降低幻觉的概率
+        llm = _get_chat_model("gpt-4o-mini", 0)
         structured_llm = llm.with_structured_output(SuggestedQuestions)
 
         # 3.构建链应用
@@ -136,19 +182,60 @@ class ConversationService(BaseService):
             conversation_id: UUID,
             message_id: UUID,
             agent_thoughts: list[AgentThought],
+            token_buffer_memory: Optional[TokenBufferMemory] = None,
     ):
-        """存储智能体推理步骤消息"""
+        """存储智能体推理步骤消息，开启AGENT_THOUGHT_WRITE_BEHIND时交给后台任务写入，会话流无需等待数据库操作即可结束"""
+        # 1.未开启异步写入时直接在当前线程写入
+        if not AGENT_THOUGHT_WRITE_BEHIND:
+            return self.persist_agent_thoughts(
+                account_id=account_id,
+                app_id=app_id,
+                app_config=app_config,
+                conversation_id=conversation_id,
+                message_id=message_id,
+                agent_thoughts=agent_thoughts,
+                token_buffer_memory=token_buffer_memory,
+            )
+
+        # 2.序列化推理过程后投递到Celery队列，由Redis中的队列作为持久化缓冲，worker重启后也不会丢失
+        persist_agent_thoughts.delay(
+            account_id,
+            app_id,
+            {"long_term_memory": app_config["long_term_memory"]},
+            conversation_id,
+            message_id,
+            [agent_thought.model_dump(mode="json", exclude={"stream_id"}) for agent_thought in agent_thoughts],
+        )
+
+    def persist_agent_thoughts(
+            self,
+            account_id: UUID,
+            app_id: UUID,
+            app_config: dict[str, Any],
+            conversation_id: UUID,
+            message_id: UUID,
+            agent_thoughts: list[AgentThought],
+            token_buffer_memory: Optional[TokenBufferMemory] = None,
+            replace_existing: bool = False,
+    ) -> None:
+        """在同一个事务中批量插入推理步骤并更新消息，传递短期记忆组件时同时记录该问答的token数并追加到会话的问答窗口缓存
+
+        replace_existing为True时(后台任务重试或者重新投递)先删除该消息已写入的推理步骤，已写入过时不再重复更新统计与调度摘要/命名任务。
+        """
         # 1.定义变量存储推理位置及总耗时
         position = 0
         latency = 0
+        rows: list[dict[str, Any]] = []
+        message_fields: dict[str, Any] = {}
+        answer = None
 
-        # 2.在子线程中重新查询conversation以及message，确保对象会被子线程的会话管理到
+        # 2.重新查询conversation以及message，确保对象会被当前线程的会话管理到
         conversation = self.get(Conversation, conversation_id)
         message = self.get(Message, message_id)
 
-        # 3.循环遍历所有的智能体推理过程执行存储操作
+        # 3.循环遍历所有的智能体推理过程，汇总需要插入的推理步骤以及需要更新的消息字段
         for agent_thought in agent_thoughts:
-            # 4.存储长期记忆召回、推理、消息、动作、知识库检索等步骤
+            # 4.记录长期记忆召回、推理、消息、动作、知识库检索等步骤
             if agent_thought.event in [
                 QueueEvent.LONG_TERM_MEMORY_RECALL,
                 QueueEvent.AGENT_THOUGHT,
@@ -160,41 +247,39 @@ class ConversationService(BaseService):
                 position += 1
                 latency += agent_thought.latency
 
-                # 6.创建智能体消息推理步骤
-                self.create(
-                    MessageAgentThought,
-                    app_id=app_id,
-                    conversation_id=conversation.id,
-                    message_id=message.id,
-                    invoke_from=InvokeFrom.DEBUGGER,
-                    created_by=account_id,
-                    position=position,
-                    event=agent_thought.event,
-                    thought=agent_thought.thought,
-                    observation=agent_thought.observation,
-                    tool=agent_thought.tool,
-                    tool_input=agent_thought.tool_input,
+                # 6.记录智能体消息推理步骤
+                rows.append({
+                    "app_id": app_id,
+                    "conversation_id": conversation.id,
+                    "message_id": message.id,
+                    "invoke_from": InvokeFrom.DEBUGGER,
+                    "created_by": account_id,
+                    "position": position,
+                    "event": agent_thought.event,
+                    "thought": agent_thought.thought,
+                    "observation": agent_thought.observation,
+                    "tool": agent_thought.tool,
+                    "tool_input": agent_thought.tool_input,
                     # 消息相关数据
-                    message=agent_thought.message,
-                    message_token_count=agent_thought.message_token_count,
-                    message_unit_price=agent_thought.message_unit_price,
-                    message_price_unit=agent_thought.message_price_unit,
+                    "message": agent_thought.message,
+                    "message_token_count": agent_thought.message_token_count,
+                    "message_unit_price": agent_thought.message_unit_price,
+                    "message_price_unit": agent_thought.message_price_unit,
                     # 答案相关字段
-                    answer=agent_thought.answer,
-                    answer_token_count=agent_thought.answer_token_count,
-                    answer_unit_price=agent_thought.answer_unit_price,
-                    answer_price_unit=agent_thought.answer_price_unit,
+                    "answer": agent_thought.answer,
+                    "answer_token_count": agent_thought.answer_token_count,
+                    "answer_unit_price": agent_thought.answer_unit_price,
+                    "answer_price_unit": agent_thought.answer_price_unit,
                     # Agent推理统计相关
-                    total_token_count=agent_thought.total_token_count,
-                    total_price=agent_thought.total_price,
-                    latency=agent_thought.latency,
-                )
+                    "total_token_count": agent_thought.total_token_count,
+                    "total_price": agent_thought.total_price,
+                    "latency": agent_thought.latency,
+                })
 
-            # 7.检测事件是否为Agent_message
+            # 7.检测事件是否为Agent_message，是则记录消息信息
             if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                # 8.更新消息信息
-                self.update(
-                    message,
+                answer = agent_thought.answer
+                message_fields.update(
                     # 消息相关字段
                     message=agent_thought.message,
                     message_token_count=agent_thought.message_token_count,
@@ -211,81 +296,135 @@ class ConversationService(BaseService):
                     latency=latency,
                 )
 
-                # 9.检测是否开启长期记忆
-                if app_config["long_term_memory"]["enable"]:
-                    Thread(
-                        target=self._generate_summary_and_update,
-                        kwargs={
-                            "flask_app": current_app._get_current_object(),
-                            "conversation_id": conversation.id,
-                            "query": message.query,
-                            "answer": agent_thought.answer,
-                        },
-                    ).start()
-
-                # 10.处理生成新会话名称
-                if conversation.is_new:
-                    Thread(
-                        target=self._generate_conversation_name_and_update,
-                        kwargs={
-                            "flask_app": current_app._get_current_object(),
-                            "conversation_id": conversation.id,
-                            "query": message.query,
-                        }
-                    ).start()
-
-            # 11.判断是否为停止或者错误，如果是则需要更新消息状态
+            # 8.判断是否为停止或者错误，如果是则需要更新消息状态
             if agent_thought.event in [QueueEvent.TIMEOUT, QueueEvent.STOP, QueueEvent.ERROR]:
-                self.update(
-                    message,
-                    status=agent_thought.event,
-                    error=agent_thought.observation,
-                )
+                message_fields.update(status=agent_thought.event, error=agent_thought.observation)
                 break
 
-    def _generate_summary_and_update(
-            self,
-            flask_app: Flask,
-            conversation_id: UUID,
-            query: str,
-            answer: str,
-    ):
-        with flask_app.app_context():
-            # 1.根据id获取会话
+        # 9.在同一个事务中批量插入推理步骤并更新消息，需要替换时先删除已写入的推理步骤
+        persisted = False
+        with self.db.auto_commit():
+            if replace_existing:
+                persisted = self.db.session.execute(
+                    delete(MessageAgentThought).where(MessageAgentThought.message_id == message.id)
+                ).rowcount > 0
+            if rows:
+                self.db.session.execute(insert(MessageAgentThought), rows)
+            for field, value in message_fields.items():
+                setattr(message, field, value)
+
+        # 10.首次生成答案时更新应用每日统计，并处理会话摘要与会话命名
+        if answer is not None and not persisted:
+            self.app_stat_service.record_message(message)
+
+            # 11.检测是否开启长期记忆，开启则将问答加入待摘要列表并调度防抖的摘要任务
+            if app_config["long_term_memory"]["enable"]:
+                self._schedule_summary(conversation.id, message.query, answer)
+
+            # 12.处理生成新会话名称
+            if conversation.is_new:
+                self._schedule_conversation_name(conversation.id, message.query)
+
+        # 13.记录问答作为短期记忆的token数，便于后续对话直接按token数截断
+        if token_buffer_memory is not None:
+            token_buffer_memory.append_message(message)
+
+    def _schedule_summary(self, conversation_id: UUID, query: str, answer: str) -> None:
+        """将问答加入会话的待摘要列表，会话没有已调度的摘要任务时延迟调度一个，期间新的问答会合并到同一次摘要"""
+        # 1.追加待摘要的问答
+        pending_key = CONVERSATION_PENDING_SUMMARY.format(conversation_id=conversation_id)
+        pipeline = self.redis_client.pipeline()
+        pipeline.rpush(pending_key, json.dumps({"query": query, "answer": answer}, ensure_ascii=False))
+        pipeline.expire(pending_key, CONVERSATION_TASK_EXPIRE_TIME)
+        pipeline.execute()
+
+        # 2.抢占调度标记，成功时才调度摘要任务
+        scheduled_key = CONVERSATION_SUMMARY_SCHEDULED.format(conversation_id=conversation_id)
+        if self.redis_client.set(scheduled_key, 1, nx=True, ex=CONVERSATION_SUMMARY_SCHEDULED_EXPIRE_TIME):
+            summarize_conversation.apply_async((conversation_id,), countdown=SUMMARY_DEBOUNCE)
+
+    def _schedule_conversation_name(self, conversation_id: UUID, query: str) -> None:
+        """调度会话命名任务，同一个会话只调度一次"""
+        scheduled_key = CONVERSATION_NAME_SCHEDULED.format(conversation_id=conversation_id)
+        if self.redis_client.set(scheduled_key, 1, nx=True, ex=CONVERSATION_TASK_EXPIRE_TIME):
+            generate_conversation_name.delay(conversation_id, query)
+
+    @contextmanager
+    def side_task_slot(self) -> Generator[bool, None, None]:
+        """占用一个会话后台任务的执行名额，返回是否占用成功，用于限制所有worker中同时调用LLM的后台任务数
+
+        每个名额是一个带到期时间的租约，worker被强制终止未能归还的名额会在租约到期后被清理。
+        """
+        # 1.清理已到期的租约，随后添加本次任务的租约并统计当前占用数
+        lease_id = str(uuid.uuid4())
+        now = time.time()
+        pipeline = self.redis_client.pipeline()
+        pipeline.zremrangebyscore(CONVERSATION_TASK_SLOTS, "-inf", now)
+        pipeline.zadd(CONVERSATION_TASK_SLOTS, {lease_id: now + CONVERSATION_TASK_SLOT_LEASE_TIME})
+        pipeline.zcard(CONVERSATION_TASK_SLOTS)
+        pipeline.expire(CONVERSATION_TASK_SLOTS, CONVERSATION_TASK_SLOT_LEASE_TIME)
+        _, _, count, _ = pipeline.execute()
+
+        # 2.超过上限时立即归还
+        if count > SIDE_TASK_MAX_CONCURRENCY:
+            self.redis_client.zrem(CONVERSATION_TASK_SLOTS, lease_id)
+            yield False
+            return
+
+        # 3.任务执行完毕后归还名额
+        try:
+            yield True
+        finally:
+            self.redis_client.zrem(CONVERSATION_TASK_SLOTS, lease_id)
+
+    def summarize_pending_turns(self, conversation_id: UUID) -> None:
+        """取出会话所有待摘要的问答，使用一次LLM调用合并到会话摘要中"""
+        pending_key = CONVERSATION_PENDING_SUMMARY.format(conversation_id=conversation_id)
+        scheduled_key = CONVERSATION_SUMMARY_SCHEDULED.format(conversation_id=conversation_id)
+        try:
+            # 1.原子地取出并清空待摘要列表
+            pipeline = self.redis_client.pipeline()
+            pipeline.lrange(pending_key, 0, -1)
+            pipeline.delete(pending_key)
+            data, _ = pipeline.execute()
+            turns = [json.loads(item) for item in data]
+
+            # 2.根据id获取会话，会话不存在时直接跳过
             conversation = self.get(Conversation, conversation_id)
+            if not turns or conversation is None:
+                return
 
-            # 2.计算会话新摘要信息
-            new_summary = self.summary(
-                query,
-                answer,
-                conversation.summary
-            )
-
-            # 3.更新会话的摘要信息
-            self.update(
-                conversation,
-                summary=new_summary,
+            # 3.计算会话新摘要信息并更新
+            new_summary = self.summary_turns(turns, conversation.summary)
+            self.update(conversation, summary=new_summary)
+        except Exception as e:
+            logging.exception(
+                "生成会话摘要出错, conversation_id: %(conversation_id)s, 错误信息: %(error)s",
+                {"conversation_id": conversation_id, "error": e},
             )
-
-    def _generate_conversation_name_and_update(
-            self,
-            flask_app: Flask,
-            conversation_id: UUID,
-            query: str
-    ) -> None:
+        finally:
+            # 4.释放调度标记，执行期间又有新的问答加入时重新调度
+            self.redis_client.delete(scheduled_key)
+            if self.redis_client.llen(pending_key) > 0 and self.redis_client.set(
+                    scheduled_key, 1, nx=True, ex=CONVERSATION_SUMMARY_SCHEDULED_EXPIRE_TIME,
+            ):
+                summarize_conversation.apply_async((conversation_id,), countdown=SUMMARY_DEBOUNCE)
+
+    def generate_conversation_name_and_update(self, conversation_id: UUID, query: str) -> None:
         """生成会话名字并更新"""
-        with flask_app.app_context():
-            # 1.根据会话id获取会话
-            conversation = self.get(Conversation, conversation_id)
+        # 1.根据会话id获取会话
+        conversation = self.get(Conversation, conversation_id)
+        if conversation is None:
+            return
 
-            # 2.计算获取新会话名字
-            new_conversation_name = self.generate_conversation_name(query)
+        # 2.计算获取新会话名字
+        new_conversation_name = self.generate_conversation_name(query)
 
-            # 3.调用更新服务更新会话名称
-            self.update(
-                conversation,
-                name=new_conversation_name,
-            )
+        # 3.调用更新服务更新会话名称
+        self.update(
+            conversation,
+            name=new_conversation_name,
+        )
 
     def get_conversation(self, conversation_id: UUID, account: Account) -> Conversation:
         """根据传递的会话id+account，获取指定的会话信息"""
@@ -320,8 +459,8 @@ class ConversationService(BaseService):
             conversation_id: UUID,
             req: GetConversationMessagesWithPageReq,
             account: Account,
-    ) -> tuple[list[Message], Paginator]:
-        """根据传递的会话id+请求数据，获取当前账号下该会话的消息分页列表数据"""
+    ) -> tuple[list[Message], Union[Paginator, CursorPaginator]]:
+        """根据传递的会话id+请求数据，获取当前账号下该会话的消息分页列表数据，携带cursor参数时按(created_at, id)进行游标分页"""
         # 1.获取会话并校验权限
         conversation = self.get_conversation(conversation_id, account)
 
@@ -333,16 +472,21 @@ class ConversationService(BaseService):
             created_at_datetime = datetime.fromtimestamp(req.created_at.data)
             filters.append(Message.created_at <= created_at_datetime)
 
-        # 4.执行分页并查询数据
-        messages = paginator.paginate(
-            self.db.session.query(Message).options(joinedload(Message.agent_thoughts)).filter(
-                Message.conversation_id == conversation.id,
-                Message.status.in_([MessageStatus.STOP, MessageStatus.NORMAL]),
-                Message.answer != "",
-                ~Message.is_deleted,
-                *filters,
-            ).order_by(desc("created_at"))
+        # 4.构建查询，携带游标时使用游标分页
+        query = self.db.session.query(Message).options(joinedload(Message.agent_thoughts)).filter(
+            Message.conversation_id == conversation.id,
+            Message.status.in_([MessageStatus.STOP, MessageStatus.NORMAL]),
+            Message.answer != "",
+            ~Message.is_deleted,
+            *filters,
         )
+        if req.cursor_mode:
+            paginator = CursorPaginator(db=self.db, req=req)
+            messages = paginator.paginate(query, [Message.created_at, Message.id])
+            return messages, paginator
+
+        # 5.执行分页并查询数据
+        messages = paginator.paginate(query.order_by(desc("created_at")))
 
         return messages, paginator
 
@@ -370,6 +514,7 @@ class ConversationService(BaseService):
 
         # 4.校验通过修改消息is_deleted属性标记删除
         self.update(message, is_deleted=True)
+        TokenBufferMemory.clear_history_cache(conversation.id)
 
         return message
 
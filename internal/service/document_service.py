@@ -3,6 +3,7 @@ import random
 import time
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Union
 from uuid import UUID
 
 from injector import inject
@@ -17,7 +18,7 @@ from internal.lib.helper import datetime_to_timestamp
 from internal.model import Dataset, Document, Segment, UploadFile, ProcessRule, Account
 from internal.schema.document_schema import GetDocumentsWithPageReq
 from internal.task.document_task import build_documents, update_document_enabled, delete_document
-from pkg.paginator import Paginator
+from pkg.paginator import Paginator, CursorPaginator
 from pkg.sqlalchemy import SQLAlchemy
 from .base_service import BaseService
 
@@ -234,8 +235,8 @@ class DocumentService(BaseService):
 
     def get_documents_with_page(
             self, dataset_id: UUID, req: GetDocumentsWithPageReq, account: Account,
-    ) -> tuple[list[Document], Paginator]:
-        """根据传递的知识库id+请求数据获取文档分页列表数据"""
+    ) -> tuple[list[Document], Union[Paginator, CursorPaginator]]:
+        """根据传递的知识库id+请求数据获取文档分页列表数据，携带cursor参数时按(created_at, id)进行游标分页"""
         # 1.获取知识库并校验权限
         dataset = self.get(Dataset, dataset_id)
         if dataset is None or dataset.account_id != account.id:
@@ -252,10 +253,15 @@ class DocumentService(BaseService):
         if req.search_word.data:
             filters.append(Document.name.ilike(f"%{req.search_word.data}%"))
 
-        # 4.执行分页并获取数据
-        documents = paginator.paginate(
-            self.db.session.query(Document).filter(*filters).order_by(desc("created_at"))
-        )
+        # 4.携带游标时使用游标分页
+        query = self.db.session.query(Document).filter(*filters)
+        if req.cursor_mode:
+            paginator = CursorPaginator(db=self.db, req=req)
+            documents = paginator.paginate(query, [Document.created_at, Document.id])
+            return documents, paginator
+
+        # 5.执行分页并获取数据
+        documents = paginator.paginate(query.order_by(desc("created_at")))
 
         return documents, paginator
 
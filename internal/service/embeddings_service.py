@@ -1,13 +1,24 @@
+import os
 from dataclasses import dataclass
 
 import tiktoken
-from injector import inject
+from injector import inject, singleton
 from langchain.embeddings import CacheBackedEmbeddings
-from langchain_community.embeddings import DashScopeEmbeddings
-from langchain_community.storage import RedisStore
 from langchain_core.embeddings import Embeddings
 from redis import Redis
 
+from internal.core.embeddings import (
+    BatchingEmbeddings,
+    RedisEmbeddingsStore,
+    create_embeddings,
+    get_embeddings_dimension,
+)
+
+# 旧版CacheBackedEmbeddings缓存使用的提供者、模型以及命名空间，只有该模型的旧缓存可以迁移
+LEGACY_EMBEDDINGS_PROVIDER = "dashscope"
+LEGACY_EMBEDDINGS_MODEL = "text-embedding-v3"
+LEGACY_EMBEDDINGS_NAMESPACE = "embeddings"
+
 
 # class FixedDashScopeEmbeddings(DashScopeEmbeddings):
 #     """
@@ -24,16 +35,16 @@ from redis import Redis
 
 
 @inject
+@singleton
 @dataclass
 class EmbeddingsService:
     """文本嵌入模型服务"""
-    _store: RedisStore
+    _store: RedisEmbeddingsStore
     _embeddings: Embeddings
     _cache_backed_embeddings: CacheBackedEmbeddings
 
     def __init__(self, redis: Redis):
         """构造函数，初始化文本嵌入模型客户端、存储器、缓存客户端"""
-        self._store = RedisStore(client=redis)
         # self._embeddings = HuggingFaceEmbeddings(
         #     model_name="Alibaba-NLP/gte-multilingual-base",
         #     cache_folder=os.path.join(os.getcwd(), "internal", "core", "embeddings"),
@@ -41,13 +52,29 @@ class EmbeddingsService:
         #         "trust_remote_code": True,
         #     }
         # )
-        self._embeddings = DashScopeEmbeddings(model="text-embedding-v3")
-        # self._embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-        self._cache_backed_embeddings = CacheBackedEmbeddings.from_bytes_store(
+        # 通过EMBEDDINGS_PROVIDER选择文本嵌入模型提供者，CI/压测/远程服务不可用时可切换为local
+        provider = os.getenv("EMBEDDINGS_PROVIDER", "dashscope")
+        model = os.getenv("EMBEDDINGS_MODEL", "text-embedding-v3")
+        dimension = int(os.getenv("EMBEDDINGS_DIMENSION", 1024))
+        self._embeddings = create_embeddings(provider=provider, model=model, dimension=dimension)
+        # 将并发请求的单条query在极短窗口内合并成一次批量调用，服务为单例以保证所有请求共享同一个派发器
+        self._embeddings = BatchingEmbeddings(
             self._embeddings,
-            self._store,
-            namespace="embeddings",
+            batch_window_ms=float(os.getenv("EMBEDDINGS_BATCH_WINDOW_MS", 5)),
+            max_batch_size=int(os.getenv("EMBEDDINGS_MAX_BATCH_SIZE", 10)),
+        )
+        # self._embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+        # 向量以二进制格式缓存并按模型+实际输出维度隔离，旧版JSON缓存只来自默认的DashScope模型，仅该模型在读取时自动迁移
+        is_legacy_model = provider == LEGACY_EMBEDDINGS_PROVIDER and model == LEGACY_EMBEDDINGS_MODEL
+        self._store = RedisEmbeddingsStore(
+            client=redis,
+            model=f"{provider}/{model}",
+            dimension=get_embeddings_dimension(provider, model, dimension),
+            codec=os.getenv("EMBEDDINGS_CACHE_CODEC", "float32"),
+            ttl=int(os.getenv("EMBEDDINGS_CACHE_TTL", 7 * 24 * 60 * 60)),
+            legacy_namespace=LEGACY_EMBEDDINGS_NAMESPACE if is_legacy_model else None,
         )
+        self._cache_backed_embeddings = CacheBackedEmbeddings(self._embeddings, self._store)
 
     @classmethod
     def calculate_token_count(cls, query: str) -> int:
@@ -56,7 +83,7 @@ class EmbeddingsService:
         return len(encoding.encode(query))
 
     @property
-    def store(self) -> RedisStore:
+    def store(self) -> RedisEmbeddingsStore:
         return self._store
 
     @property
@@ -11,6 +11,7 @@ from redis import Redis
 from sqlalchemy import func
 from weaviate.classes.query import Filter
 
+from internal.core.deduplication import SimHashIndex, simhash_fingerprint
 from internal.core.file_extractor import FileExtractor
 from internal.entity.cache_entity import (
     LOCK_DOCUMENT_UPDATE_ENABLED
@@ -243,11 +244,25 @@ class IndexingService(BaseService):
                 Segment.document_id == document.id,
             ).scalar()
 
-            # 5.循环处理片段数据并添加元数据，同时存储到postgres数据库中
+            # 5.开启近似重复片段去除时，使用该知识库已有片段的SimHash指纹构建检测索引
+            simhash_index = None
+            if self.process_rule_service.is_pre_process_rule_enabled(process_rule, "remove_duplicate_segments"):
+                simhash_index = self._build_simhash_index(document.dataset_id)
+
+            # 6.循环处理片段数据并添加元数据，同时存储到postgres数据库中，近似重复的片段直接跳过不做向量化
             segments = []
+            unique_lc_segments = []
+            duplicate_segment_count = 0
             for lc_segment in lc_segments:
-                position += 1
                 content = lc_segment.page_content
+                fingerprint = simhash_fingerprint(content)
+                if simhash_index is not None and fingerprint:
+                    if simhash_index.find(int(fingerprint, 16)) is not None:
+                        duplicate_segment_count += 1
+                        continue
+                    simhash_index.add(int(fingerprint, 16), fingerprint)
+
+                position += 1
                 segment = self.create(
                     Segment,
                     account_id=document.account_id,
@@ -259,6 +274,7 @@ class IndexingService(BaseService):
                     character_count=len(content),
                     token_count=self.embeddings_service.calculate_token_count(content),
                     hash=generate_text_hash(content),
+                    fingerprint=fingerprint,
                     status=SegmentStatus.WAITING,
                 )
                 lc_segment.metadata = {
@@ -271,19 +287,32 @@ class IndexingService(BaseService):
                     "segment_enabled": False,
                 }
                 segments.append(segment)
+                unique_lc_segments.append(lc_segment)
 
-            # 6.更新文档的数据，涵盖状态、token数等内容
+            # 7.更新文档的数据，涵盖状态、token数、重复片段数等内容
             self.update(
                 document,
                 token_count=sum([segment.token_count for segment in segments]),
+                duplicate_segment_count=duplicate_segment_count,
                 status=DocumentStatus.INDEXING,
                 splitting_completed_at=datetime.now(),
             )
 
-            return lc_segments
+            return unique_lc_segments
         except Exception as e:
             print("_splitting出现异常:", e)
 
+    def _build_simhash_index(self, dataset_id: UUID) -> SimHashIndex:
+        """根据知识库id加载已有片段的SimHash指纹，构建近似重复检测索引"""
+        simhash_index = SimHashIndex()
+        fingerprints = self.db.session.query(Segment).with_entities(Segment.fingerprint).filter(
+            Segment.dataset_id == dataset_id,
+            Segment.fingerprint != "",
+        ).all()
+        for fingerprint, in fingerprints:
+            simhash_index.add(int(fingerprint, 16), fingerprint)
+        return simhash_index
+
     def _indexing(self, document: Document, lc_segments: list[LCDocument]) -> None:
         """根据传递的信息构建索引，涵盖关键词提取、词表构建"""
         for lc_segment in lc_segments:
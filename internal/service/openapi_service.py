@@ -1,19 +1,20 @@
-import json
+import functools
 from dataclasses import dataclass
+from uuid import UUID
 
 from flask import current_app
 from injector import inject
 from typing_extensions import Generator
 
-from internal.core.agent.agents import FunctionCallAgent, ReACTAgent
+from internal.core.agent.agents import AgentChatStream, FunctionCallAgent, ReACTAgent, get_agent_queue_manager_class
 from internal.core.agent.entities.agent_entity import AgentConfig
-from internal.core.agent.entities.queue_entity import QueueEvent
 from internal.core.language_model.entities.model_entity import ModelFeature
 from internal.core.memory.token_buffer_memory import TokenBufferMemory
+from internal.core.tracing import get_tracer, traced
 from internal.entity.app_entity import AppStatus
 from internal.entity.conversation_entity import InvokeFrom, MessageStatus
 from internal.entity.dataset_entity import RetrievalSource
-from internal.exception import NotFoundException, ForbiddenException
+from internal.exception import NotFoundException, ForbiddenException, TooManyRequestsException
 from internal.model import Account, EndUser, Conversation, Message
 from internal.schema.openapi_schema import OpenAPIChatReq
 from pkg.response import Response
@@ -41,6 +42,56 @@ class OpenAPIService(BaseService):
 
     def chat(self, req: OpenAPIChatReq, account: Account):
         """根据传递的请求+账号信息发起聊天对话，返回数据为块内容或者生成器"""
+        # 1.构建会话流，流式输出时直接返回生成器
+        chat_stream = self.create_chat_stream(req, account)
+        if req.stream.data is True:
+            return chat_stream.stream()
+
+        # 2.块内容输出
+        try:
+            agent_result = chat_stream.agent.invoke(chat_stream.agent_state)
+        except TooManyRequestsException:
+            chat_stream.on_reject()
+            raise
+
+        # 3.将消息以及推理过程添加到数据库
+        chat_stream.on_finish(agent_thoughts=agent_result.agent_thoughts)
+
+        return Response(data={
+            "id": chat_stream.extra_data["message_id"],
+            "end_user_id": chat_stream.extra_data["end_user_id"],
+            "conversation_id": chat_stream.extra_data["conversation_id"],
+            "query": req.query.data,
+            "image_urls": req.image_urls.data,
+            "answer": agent_result.answer,
+            "total_token_count": 0,
+            "latency": agent_result.latency,
+            "agent_thoughts": [{
+                "id": str(agent_thought.id),
+                "event": agent_thought.event,
+                "thought": agent_thought.thought,
+                "observation": agent_thought.observation,
+                "tool": agent_thought.tool,
+                "tool_input": agent_thought.tool_input,
+                "latency": agent_thought.latency,
+                "created_at": 0,
+            } for agent_thought in agent_result.agent_thoughts]
+        })
+
+    def resume_chat(self, task_id: UUID, last_event_id: str, account: Account) -> Generator:
+        """根据传递的任务id+最后接收的事件id+账号信息，断线重连继续获取开放API流式对话的事件"""
+        # 1.开放API的智能体以账号+调试来源执行，因此使用相同的身份校验任务归属并继续读取事件
+        agent_queue_manager = get_agent_queue_manager_class()(user_id=account.id, invoke_from=InvokeFrom.DEBUGGER)
+        return AgentChatStream.resume(
+            agent_queue_manager,
+            task_id,
+            last_event_id,
+            include={"event", "thought", "observation", "tool", "tool_input", "answer", "latency"},
+        )
+
+    @traced("chat.prepare")
+    def create_chat_stream(self, req: OpenAPIChatReq, account: Account) -> AgentChatStream:
+        """根据传递的请求+账号信息构建开放API会话流，同步/异步(ASGI)流式输出以及块内容输出共用"""
         # 1.判断当前应用是否属于当前账号
         app = self.app_service.get_app(req.app_id.data, account)
 
@@ -80,7 +131,8 @@ class OpenAPIService(BaseService):
             })
 
         # 7.获取校验后的运行时配置
-        app_config = self.app_config_service.get_app_config(app)
+        with get_tracer().span("chat.load_config"):
+            app_config = self.app_config_service.get_app_config(app)
 
         # 8.新建一条消息记录
         message = self.create(Message, **{
@@ -102,17 +154,20 @@ class OpenAPIService(BaseService):
             conversation=conversation,
             model_instance=llm,
         )
-        history = token_buffer_memory.get_history_prompt_messages(
-            message_limit=app_config["dialog_round"],
-        )
+        with get_tracer().span("chat.history"):
+            history = token_buffer_memory.get_history_prompt_messages(
+                message_limit=app_config["dialog_round"],
+            )
 
         # 11.将草稿配置中的tools转换成LangChain工具
-        tools = self.app_config_service.get_langchain_tools_by_tools_config(app_config["tools"])
+        with get_tracer().span("chat.tools"):
+            tools = self.app_config_service.get_langchain_tools_by_tools_config(app_config["tools"])
 
         # 8.将草稿配置中的mcp_tool
         if app_config["mcp_tools"]:
             print(app_config["mcp_tools"])
-            mcp_tools = self.optimized_mcp_service.get_langchain_tools_by_mcp_tool_config(app_config["mcp_tools"])
+            with get_tracer().span("chat.mcp_tools"):
+                mcp_tools = self.optimized_mcp_service.get_langchain_tools_by_mcp_tool_config(app_config["mcp_tools"])
             # mcp_tools = self.app_config_service.get_langchain_tools_by_mcp_tool_config(draft_app_config["mcp_tools"])
             for tool in mcp_tools:
                 tools.append(tool)
@@ -149,94 +204,28 @@ class OpenAPIService(BaseService):
             ),
         )
 
-        # 15.定义智能体状态基础数据
-        agent_state = {
-            "messages": [llm.convert_to_human_message(req.query.data, req.image_urls.data)],
-            "history": history,
-            "long_term_memory": conversation.summary,
-        }
-
-        # 16.根据stream类型差异执行不同的代码
-        if req.stream.data is True:
-            agent_thoughts_dict = {}
-
-            def handle_stream() -> Generator:
-                """流式事件处理器，在Python只要在函数内部使用了yield关键字，那么这个函数的返回值类型肯定是生成器"""
-                for agent_thought in agent.stream(agent_state):
-                    # 提取thought以及answer
-                    event_id = str(agent_thought.id)
-
-                    # 将数据填充到agent_thought，便于存储到数据库服务中
-                    if agent_thought.event != QueueEvent.PING:
-                        # 除了agent_message数据为叠加，其他均为覆盖
-                        if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                            if event_id not in agent_thoughts_dict:
-                                # 初始化智能体消息事件
-                                agent_thoughts_dict[event_id] = agent_thought
-                            else:
-                                # 叠加智能体消息
-                                agent_thoughts_dict[event_id] = agent_thoughts_dict[event_id].model_copy(update={
-                                    "thought": agent_thoughts_dict[event_id].thought + agent_thought.thought,
-                                    "answer": agent_thoughts_dict[event_id].answer + agent_thought.answer,
-                                    "latency": agent_thought.latency,
-                                })
-                        else:
-                            # 处理其他类型事件的消息
-                            agent_thoughts_dict[event_id] = agent_thought
-                    data = {
-                        **agent_thought.model_dump(include={
-                            "event", "thought", "observation", "tool", "tool_input", "answer", "latency",
-                        }),
-                        "id": event_id,
-                        "end_user_id": str(end_user.id),
-                        "conversation_id": str(conversation.id),
-                        "message_id": str(message.id),
-                        "task_id": str(agent_thought.task_id),
-                    }
-                    yield f"event: {agent_thought.event}\ndata:{json.dumps(data)}\n\n"
-
-                # 22.将消息以及推理过程添加到数据库
-                self.conversation_service.save_agent_thoughts(
-                    account_id=account.id,
-                    app_id=app.id,
-                    app_config=app_config,
-                    conversation_id=conversation.id,
-                    message_id=message.id,
-                    agent_thoughts=[agent_thought for agent_thought in agent_thoughts_dict.values()],
-                )
-
-            return handle_stream()
-
-        # 17.块内容输出
-        agent_result = agent.invoke(agent_state)
-
-        # 18.将消息以及推理过程添加到数据库
-        self.conversation_service.save_agent_thoughts(
-            account_id=account.id,
-            app_id=app.id,
-            app_config=app_config,
-            conversation_id=conversation.id,
-            message_id=message.id,
-            agent_thoughts=agent_result.agent_thoughts,
+        # 15.构建会话流，结束后将消息以及推理过程添加到数据库
+        return AgentChatStream(
+            agent=agent,
+            agent_state={
+                "messages": [llm.convert_to_human_message(req.query.data, req.image_urls.data)],
+                "history": history,
+                "long_term_memory": conversation.summary,
+            },
+            include={"event", "thought", "observation", "tool", "tool_input", "answer", "latency"},
+            extra_data={
+                "end_user_id": str(end_user.id),
+                "conversation_id": str(conversation.id),
+                "message_id": str(message.id),
+            },
+            on_finish=functools.partial(
+                self.conversation_service.save_agent_thoughts,
+                account_id=account.id,
+                app_id=app.id,
+                app_config=app_config,
+                conversation_id=conversation.id,
+                message_id=message.id,
+                token_buffer_memory=token_buffer_memory,
+            ),
+            on_reject=lambda: self.delete(message),
         )
-
-        return Response(data={
-            "id": str(message.id),
-            "end_user_id": str(end_user.id),
-            "conversation_id": str(conversation.id),
-            "query": req.query.data,
-            "image_urls": req.image_urls.data,
-            "answer": agent_result.answer,
-            "total_token_count": 0,
-            "latency": agent_result.latency,
-            "agent_thoughts": [{
-                "id": str(agent_thought.id),
-                "event": agent_thought.event,
-                "thought": agent_thought.thought,
-                "observation": agent_thought.observation,
-                "tool": agent_thought.tool,
-                "tool_input": agent_thought.tool_input,
-                "latency": agent_thought.latency,
-                "created_at": 0,
-            } for agent_thought in agent_result.agent_thoughts]
-        })
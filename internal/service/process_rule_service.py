@@ -30,6 +30,14 @@ class ProcessRuleService:
             **kwargs
         )
 
+    @classmethod
+    def is_pre_process_rule_enabled(cls, process_rule: ProcessRule, rule_id: str) -> bool:
+        """判断处理规则中指定的预处理规则是否开启"""
+        return any(
+            pre_process_rule["id"] == rule_id and pre_process_rule["enabled"] is True
+            for pre_process_rule in process_rule.rule["pre_process_rules"]
+        )
+
     @classmethod
     def clean_text_by_process_rule(cls, text: str, process_rule: ProcessRule) -> str:
         """根据传递的处理规则清除多余的字符串"""
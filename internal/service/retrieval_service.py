@@ -9,7 +9,7 @@ from langchain_core.documents import Document as LCDocument
 from langchain_core.tools import BaseTool
 from pydantic import Field, BaseModel
 from sqlalchemy import update
-from typing_extensions import Optional
+from typing_extensions import Any, Callable, Optional
 
 from internal.core.agent.entities.agent_entity import DATASET_RETRIEVAL_TOOL_NAME
 from internal.entity.dataset_entity import RetrievalStrategy, RetrievalSource
@@ -23,6 +23,28 @@ from .overflow_run import SynchronizedStructuredTool
 from .vector_database_service import VectorDatabaseService
 
 
+class DatasetRetrievalTool(SynchronizedStructuredTool):
+    """知识库检索工具，支持无副作用的预取，预取结果被使用时才记录知识库查询与片段命中次数"""
+    retrieve_func: Callable[[str], list[LCDocument]]  # 只执行检索，不记录查询与命中
+    record_func: Callable[[str, list[LCDocument]], None]  # 记录查询与命中
+
+    @classmethod
+    def format_documents(cls, documents: list[LCDocument]) -> str:
+        """将LangChain文档列表转换成工具返回的字符串"""
+        if len(documents) == 0:
+            return "知识库内没有检索到对应内容"
+        return combine_documents(documents)
+
+    def prefetch(self, query: str) -> list[LCDocument]:
+        """预取检索结果，不产生任何记录"""
+        return self.retrieve_func(query)
+
+    def use_prefetched(self, query: str, documents: list[LCDocument]) -> Any:
+        """使用预取的检索结果，记录查询与命中后转换成工具结果"""
+        self.record_func(query, documents)
+        return self.format_documents(documents)
+
+
 @inject
 @dataclass
 class RetrievalService(BaseService):
@@ -42,6 +64,20 @@ class RetrievalService(BaseService):
             retrival_source: str = RetrievalSource.HIT_TESTING,
     ) -> list[LCDocument]:
         """根据传递的query+知识库列表执行检索，并返回检索的文档+得分数据（如果检索策略为全文检索，则得分为0）"""
+        lc_documents = self.retrieve_in_datasets(dataset_ids, query, account_id, retrieval_strategy, k, score)
+        self.record_search(query, account_id, lc_documents, retrival_source)
+        return lc_documents
+
+    def retrieve_in_datasets(
+            self,
+            dataset_ids: list[UUID],
+            query: str,
+            account_id: UUID,
+            retrieval_strategy: str = RetrievalStrategy.SEMANTIC,
+            k: int = 4,
+            score: float = 0,
+    ) -> list[LCDocument]:
+        """根据传递的query+知识库列表执行检索，不记录知识库查询也不更新片段命中次数"""
         # 1.提取知识库列表并校验权限同时更新知识库id
         datasets = self.db.session.query(Dataset).filter(
             Dataset.id.in_(dataset_ids),
@@ -82,7 +118,17 @@ class RetrievalService(BaseService):
         else:
             lc_documents = hybrid_retriever.invoke(query)[:k]
 
-        # 4.添加知识库查询记录（只存储唯一记录，也就是一个知识库如果检索了多篇文档，也只存储一条）
+        return lc_documents
+
+    def record_search(
+            self,
+            query: str,
+            account_id: UUID,
+            lc_documents: list[LCDocument],
+            retrival_source: str = RetrievalSource.HIT_TESTING,
+    ) -> None:
+        """记录检索结果被使用的知识库查询，并更新片段的命中次数"""
+        # 1.添加知识库查询记录（只存储唯一记录，也就是一个知识库如果检索了多篇文档，也只存储一条）
         unique_dataset_ids = list(set(str(lc_document.metadata["dataset_id"]) for lc_document in lc_documents))
         for dataset_id in unique_dataset_ids:
             self.create(
@@ -95,7 +141,7 @@ class RetrievalService(BaseService):
                 created_by=account_id,
             )
 
-        # 5.批量更新片段的命中次数，召回次数，涵盖了构建+执行语句
+        # 2.批量更新片段的命中次数，召回次数，涵盖了构建+执行语句
         with self.db.auto_commit():
             stmt = (
                 update(Segment)
@@ -104,8 +150,6 @@ class RetrievalService(BaseService):
             )
             self.db.session.execute(stmt)
 
-        return lc_documents
-
     def create_langchain_tool_from_search(
             self,
             flask_app: Flask,
@@ -122,32 +166,33 @@ class RetrievalService(BaseService):
             """知识库检索工具输入结构"""
             query: str = Field(description="知识库搜索query语句，类型为字符串")
 
+        def retrieve(query: str) -> list[LCDocument]:
+            """只执行检索，用于投机预取"""
+            with flask_app.app_context():
+                return self.retrieve_in_datasets(dataset_ids, query, account_id, retrieval_strategy, k, score)
+
+        def record(query: str, documents: list[LCDocument]) -> None:
+            """记录知识库查询与片段命中次数"""
+            with flask_app.app_context():
+                self.record_search(query, account_id, documents, retrival_source)
+
         def dataset_retrieval(query: str, callbacks: Optional[CallbackManagerForToolRun] = None, **kwargs) -> str:
             """如果需要搜索扩展的知识库内容，当你觉得用户的提问超过你的知识范围时，可以尝试调用该工具，输入为搜索query语句，返回数据为检索内容字符串"""
-            # 1.调用search_in_datasets检索得到LangChain文档列表
-            with flask_app.app_context():
-                documents = self.search_in_datasets(
-                    dataset_ids=dataset_ids,
-                    query=query,
-                    account_id=account_id,
-                    retrieval_strategy=retrieval_strategy,
-                    k=k,
-                    score=score,
-                    retrival_source=retrival_source,
-                )
+            # 1.检索得到LangChain文档列表并记录查询与命中
+            documents = retrieve(query)
+            record(query, documents)
 
             # 2.将LangChain文档列表转换成字符串后返回
-            if len(documents) == 0:
-                return "知识库内没有检索到对应内容"
-
-            return combine_documents(documents)
+            return DatasetRetrievalTool.format_documents(documents)
 
-        dataset_retrieval = SynchronizedStructuredTool.from_function(
+        dataset_retrieval = DatasetRetrievalTool.from_function(
             func=dataset_retrieval,
             name=DATASET_RETRIEVAL_TOOL_NAME,
             args_schema=DatasetRetrievalInput,
             description="""如果需要搜索扩展的知识库内容，当你觉得用户的提问超过你的知识范围时，可以尝试调用该工具，输入为搜索query语句，返回数据为检索内容字符串""",
             return_direct=True,
+            retrieve_func=retrieve,
+            record_func=record,
         )
 
         return dataset_retrieval
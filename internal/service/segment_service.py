@@ -2,6 +2,7 @@ import logging
 import uuid
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Union
 from uuid import UUID
 
 from injector import inject
@@ -9,6 +10,7 @@ from langchain_core.documents import Document as LCDocument
 from redis import Redis
 from sqlalchemy import asc, func
 
+from internal.core.deduplication import simhash_fingerprint
 from internal.entity.cache_entity import LOCK_EXPIRE_TIME, LOCK_SEGMENT_UPDATE_ENABLED
 from internal.entity.dataset_entity import DocumentStatus, SegmentStatus
 from internal.exception import NotFoundException, FailException, ValidateErrorException
@@ -19,7 +21,7 @@ from internal.schema.segment_schema import (
     CreateSegmentReq,
     UpdateSegmentReq,
 )
-from pkg.paginator import Paginator
+from pkg.paginator import Paginator, CursorPaginator
 from pkg.sqlalchemy import SQLAlchemy
 from .base_service import BaseService
 from .embeddings_service import EmbeddingsService
@@ -91,6 +93,7 @@ class SegmentService(BaseService):
                 token_count=token_count,
                 keywords=req.keywords.data,
                 hash=generate_text_hash(req.content.data),
+                fingerprint=simhash_fingerprint(req.content.data),
                 enabled=True,
                 processing_started_at=datetime.now(),
                 indexing_completed_at=datetime.now(),
@@ -181,6 +184,7 @@ class SegmentService(BaseService):
                 keywords=req.keywords.data,
                 content=req.content.data,
                 hash=new_hash,
+                fingerprint=simhash_fingerprint(req.content.data),
                 character_count=len(req.content.data),
                 token_count=self.embeddings_service.calculate_token_count(req.content.data),
             )
@@ -222,25 +226,28 @@ class SegmentService(BaseService):
 
     def get_segments_with_page(
             self, dataset_id: UUID, document_id: UUID, req: GetSegmentsWithPageReq, account: Account,
-    ) -> tuple[list[Segment], Paginator]:
-        """根据传递的信息获取片段列表分页数据"""
+    ) -> tuple[list[Segment], Union[Paginator, CursorPaginator]]:
+        """根据传递的信息获取片段列表分页数据，携带cursor参数时按(position, id)进行游标分页"""
         # 1.获取文档并校验权限
         document = self.get(Document, document_id)
         if document is None or document.dataset_id != dataset_id or document.account_id != account.id:
             raise NotFoundException("该知识库文档不存在，或无权限查看，请核实后重试")
 
-        # 2.构建分页查询器
-        paginator = Paginator(db=self.db, req=req)
-
-        # 3.构建筛选器
+        # 2.构建筛选器
         filters = [Segment.document_id == document_id]
         if req.search_word.data:
             filters.append(Segment.content.ilike(f"%{req.search_word.data}%"))
+        query = self.db.session.query(Segment).filter(*filters)
 
-        # 4.执行分页并获取数据
-        segments = paginator.paginate(
-            self.db.session.query(Segment).filter(*filters).order_by(asc("position"))
-        )
+        # 3.携带游标时使用游标分页，片段按位置正序排列
+        if req.cursor_mode:
+            paginator = CursorPaginator(db=self.db, req=req)
+            segments = paginator.paginate(query, [Segment.position, Segment.id], ascending=True)
+            return segments, paginator
+
+        # 4.构建分页查询器，执行分页并获取数据
+        paginator = Paginator(db=self.db, req=req)
+        segments = paginator.paginate(query.order_by(asc("position")))
 
         return segments, paginator
 
@@ -1,15 +1,13 @@
-import json
+import functools
 from dataclasses import dataclass
 from uuid import UUID
 
 from flask import current_app
 from injector import inject
-from sqlalchemy import desc
 from typing_extensions import Generator, Any
 
-from internal.core.agent.agents import FunctionCallAgent, ReACTAgent, AgentQueueManager
+from internal.core.agent.agents import AgentChatStream, FunctionCallAgent, ReACTAgent, get_agent_queue_manager_class
 from internal.core.agent.entities.agent_entity import AgentConfig
-from internal.core.agent.entities.queue_entity import QueueEvent
 from internal.core.language_model.entities.model_entity import ModelFeature
 from internal.core.memory.token_buffer_memory import TokenBufferMemory
 from internal.entity.app_entity import AppStatus
@@ -17,7 +15,8 @@ from internal.entity.conversation_entity import InvokeFrom, MessageStatus
 from internal.entity.dataset_entity import RetrievalSource
 from internal.exception import NotFoundException, ForbiddenException
 from internal.model import App, Account, Conversation, Message
-from internal.schema.web_app_schema import WebAppChatReq
+from internal.schema.web_app_schema import WebAppChatReq, GetConversationsReq
+from pkg.paginator import CursorPaginator
 from pkg.sqlalchemy import SQLAlchemy
 from .app_config_service import AppConfigService
 from .base_service import BaseService
@@ -27,6 +26,10 @@ from .optimized_mcp_service import OptimizedMCPServiceWithFucCache
 from .retrieval_service import RetrievalService
 
 
+# 未使用游标分页时WebApp会话列表最多返回的条数
+WEB_APP_CONVERSATION_LIMIT = 100
+
+
 @inject
 @dataclass
 class WebAppService(BaseService):
@@ -77,6 +80,10 @@ class WebAppService(BaseService):
 
     def web_app_chat(self, token: str, req: WebAppChatReq, account: Account) -> Generator:
         """根据传递的token凭证+请求与指定的WebApp进行对话"""
+        return self.create_web_app_chat_stream(token, req, account).stream()
+
+    def create_web_app_chat_stream(self, token: str, req: WebAppChatReq, account: Account) -> AgentChatStream:
+        """根据传递的token凭证+请求构建WebApp会话流，同步与异步(ASGI)会话共用"""
         # 1.获取WebApp应用并校验应用是否发布
         app = self.get_web_app(token)
 
@@ -170,65 +177,32 @@ class WebAppService(BaseService):
             ),
         )
 
-        # 13.定义字典存储推理过程，并调用智能体获取消息
-        agent_thoughts = {}
-        for agent_thought in agent.stream({
-            "messages": [llm.convert_to_human_message(req.query.data, req.image_urls.data)],
-            "history": history,
-            "long_term_memory": conversation.summary,
-        }):
-            # 14.提取thought以及answer
-            event_id = str(agent_thought.id)
-
-            # 15.将数据填充到agent_thought，便于存储到数据库服务中
-            if agent_thought.event != QueueEvent.PING:
-                # 16.除了agent_message数据为叠加，其他均为覆盖
-                if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                    if event_id not in agent_thoughts:
-                        # 17.初始化智能体消息事件
-                        agent_thoughts[event_id] = agent_thought
-                    else:
-                        # 18.叠加智能体消息
-                        agent_thoughts[event_id] = agent_thoughts[event_id].model_copy(update={
-                            "thought": agent_thoughts[event_id].thought + agent_thought.thought,
-                            # 消息相关数据
-                            "message": agent_thought.message,
-                            "message_token_count": agent_thought.message_token_count,
-                            "message_unit_price": agent_thought.message_unit_price,
-                            "message_price_unit": agent_thought.message_price_unit,
-                            # 答案相关数据
-                            "answer": agent_thoughts[event_id].answer + agent_thought.answer,
-                            "answer_token_count": agent_thought.answer_token_count,
-                            "answer_unit_price": agent_thought.answer_unit_price,
-                            "answer_price_unit": agent_thought.answer_price_unit,
-                            # Agent推理统计相关
-                            "total_token_count": agent_thought.total_token_count,
-                            "total_price": agent_thought.total_price,
-                            "latency": agent_thought.latency,
-                        })
-                else:
-                    # 19.处理其他类型事件的消息
-                    agent_thoughts[event_id] = agent_thought
-            data = {
-                **agent_thought.model_dump(include={
-                    "event", "thought", "observation", "tool", "tool_input", "answer",
-                    "total_token_count", "total_price", "latency",
-                }),
-                "id": event_id,
+        # 13.构建会话流，结束后将消息以及推理过程添加到数据库
+        return AgentChatStream(
+            agent=agent,
+            agent_state={
+                "messages": [llm.convert_to_human_message(req.query.data, req.image_urls.data)],
+                "history": history,
+                "long_term_memory": conversation.summary,
+            },
+            include={
+                "event", "thought", "observation", "tool", "tool_input", "answer",
+                "total_token_count", "total_price", "latency",
+            },
+            extra_data={
                 "conversation_id": str(conversation.id),
                 "message_id": str(message.id),
-                "task_id": str(agent_thought.task_id),
-            }
-            yield f"event: {agent_thought.event}\ndata:{json.dumps(data)}\n\n"
-
-        # 20.将消息以及推理过程添加到数据库
-        self.conversation_service.save_agent_thoughts(
-            account_id=account.id,
-            app_id=app.id,
-            app_config=app_config,
-            conversation_id=conversation.id,
-            message_id=message.id,
-            agent_thoughts=[agent_thought for agent_thought in agent_thoughts.values()],
+            },
+            on_finish=functools.partial(
+                self.conversation_service.save_agent_thoughts,
+                account_id=account.id,
+                app_id=app.id,
+                app_config=app_config,
+                conversation_id=conversation.id,
+                message_id=message.id,
+                token_buffer_memory=token_buffer_memory,
+            ),
+            on_reject=lambda: self.delete(message),
         )
 
     def stop_web_app_chat(self, token: str, task_id: UUID, account: Account):
@@ -237,20 +211,52 @@ class WebAppService(BaseService):
         self.get_web_app(token)
 
         # 2.调用智能体队列管理器停止特定任务
-        AgentQueueManager.set_stop_flag(task_id, InvokeFrom.WEB_APP, account.id)
+        get_agent_queue_manager_class().set_stop_flag(task_id, InvokeFrom.WEB_APP, account.id)
 
-    def get_conversations(self, token: str, is_pinned: bool, account: Account) -> list[Conversation]:
-        """根据传递的token+is_pinned+account获取指定账号在该WebApp下的会话列表数据"""
+    def resume_web_app_chat(self, token: str, task_id: UUID, last_event_id: str, account: Account) -> Generator:
+        """根据传递的token+任务id+最后接收的事件id，断线重连继续获取WebApp会话的流式事件"""
+        # 1.获取WebApp应用并校验应用是否发布
+        self.get_web_app(token)
+
+        # 2.从队列管理器中继续读取事件，不会重新生成答案，数据帧与实时数据帧保持一致
+        agent_queue_manager = get_agent_queue_manager_class()(user_id=account.id, invoke_from=InvokeFrom.WEB_APP)
+        return AgentChatStream.resume(
+            agent_queue_manager,
+            task_id,
+            last_event_id,
+            include={
+                "event", "thought", "observation", "tool", "tool_input", "answer",
+                "total_token_count", "total_price", "latency",
+            },
+        )
+
+    def get_conversations(
+            self,
+            token: str,
+            req: GetConversationsReq,
+            account: Account,
+    ) -> tuple[list[Conversation], CursorPaginator]:
+        """根据传递的token+请求数据+account获取指定账号在该WebApp下的会话列表数据
+
+        携带cursor参数时按(created_at, id)进行游标分页，否则返回最近的WEB_APP_CONVERSATION_LIMIT条会话，
+        两种方式都返回分页器，旧列表接口可通过分页器的has_more/next_cursor判断是否被截断并改用游标分页继续获取。
+        """
         # 1.获取WebApp应用并校验应用是否发布
         app = self.get_web_app(token)
 
-        # 2.筛选过滤并查询数据
-        conversations = self.db.session.query(Conversation).filter(
+        # 2.构建筛选查询
+        query = self.db.session.query(Conversation).filter(
             Conversation.app_id == app.id,
             Conversation.created_by == account.id,
             Conversation.invoke_from == InvokeFrom.WEB_APP,
-            Conversation.is_pinned == is_pinned,
+            Conversation.is_pinned == req.is_pinned.data,
             ~Conversation.is_deleted,
-        ).order_by(desc("created_at")).all()
+        )
+
+        # 3.携带游标时使用游标分页，未携带游标时兼容旧的列表接口，返回第一页并限制条数为WEB_APP_CONVERSATION_LIMIT
+        paginator = CursorPaginator(db=self.db, req=req if req.cursor_mode else None)
+        if not req.cursor_mode:
+            paginator.page_size = WEB_APP_CONVERSATION_LIMIT
+
+        return paginator.paginate(query, [Conversation.created_at, Conversation.id]), paginator
 
-        return conversations
@@ -238,4 +238,5 @@ class WechatService(BaseService):
                 conversation_id=conversation.id,
                 message_id=message_id,
                 agent_thoughts=agent_result.agent_thoughts,
+                token_buffer_memory=token_buffer_memory,
             )
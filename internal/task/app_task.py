@@ -1,3 +1,5 @@
+from datetime import date, timedelta
+from typing import Optional
 from uuid import UUID
 
 from celery import shared_task
@@ -15,3 +17,14 @@ def auto_create_app(
 
     app_service = injector.get(AppService)
     app_service.auto_create_app(name, description, account_id)
+
+
+@shared_task
+def backfill_app_daily_stats(days: int = 14, app_id: Optional[UUID] = None) -> int:
+    """根据消息表回填最近days天(含今天)的应用每日统计汇总，不传递应用id时回填所有应用"""
+    from app.http.module import injector
+    from internal.service import AppStatService
+
+    app_stat_service = injector.get(AppStatService)
+    today = date.today()
+    return app_stat_service.backfill_daily_stats(today - timedelta(days=days - 1), today, app_id)
@@ -0,0 +1,66 @@
+from uuid import UUID
+
+from celery import shared_task
+
+
+@shared_task(bind=True, max_retries=None)
+def summarize_conversation(self, conversation_id: UUID) -> None:
+    """将会话中所有待摘要的问答一次性合并到会话摘要中，并发数达到上限时延迟重试"""
+    from app.http.module import injector
+    from internal.service.conversation_service import ConversationService, SIDE_TASK_RETRY_COUNTDOWN
+
+    conversation_service = injector.get(ConversationService)
+    with conversation_service.side_task_slot() as acquired:
+        if not acquired:
+            raise self.retry(countdown=SIDE_TASK_RETRY_COUNTDOWN)
+        conversation_service.summarize_pending_turns(conversation_id)
+
+
+@shared_task(bind=True, max_retries=None)
+def generate_conversation_name(self, conversation_id: UUID, query: str) -> None:
+    """根据会话的首个提问生成会话名称，并发数达到上限时延迟重试"""
+    from app.http.module import injector
+    from internal.service.conversation_service import ConversationService, SIDE_TASK_RETRY_COUNTDOWN
+
+    conversation_service = injector.get(ConversationService)
+    with conversation_service.side_task_slot() as acquired:
+        if not acquired:
+            raise self.retry(countdown=SIDE_TASK_RETRY_COUNTDOWN)
+        conversation_service.generate_conversation_name_and_update(conversation_id, query)
+
+
+@shared_task(
+    acks_late=True,
+    reject_on_worker_lost=True,
+    autoretry_for=(Exception,),
+    max_retries=5,
+    retry_backoff=True,
+)
+def persist_agent_thoughts(
+        account_id: UUID,
+        app_id: UUID,
+        app_config: dict,
+        conversation_id: UUID,
+        message_id: UUID,
+        agent_thoughts: list[dict],
+) -> None:
+    """异步写入智能体推理过程，写入后清除会话的问答窗口缓存，下次获取短期记忆时从数据库重建并补充token数
+
+    任务在执行完成后才确认，worker异常退出或者写入失败时会重新执行，写入时替换该消息已有的推理步骤，重复执行不会产生重复数据。
+    """
+    from app.http.module import injector
+    from internal.core.agent.entities.queue_entity import AgentThought
+    from internal.core.memory.token_buffer_memory import TokenBufferMemory
+    from internal.service.conversation_service import ConversationService
+
+    conversation_service = injector.get(ConversationService)
+    conversation_service.persist_agent_thoughts(
+        account_id=account_id,
+        app_id=app_id,
+        app_config=app_config,
+        conversation_id=conversation_id,
+        message_id=message_id,
+        agent_thoughts=[AgentThought(**agent_thought) for agent_thought in agent_thoughts],
+        replace_existing=True,
+    )
+    TokenBufferMemory.clear_history_cache(conversation_id)
@@ -5,6 +5,6 @@
 @Author  : thezehui@gmail.com
 @File    : __init__.py.py
 """
-from .paginator import PaginatorReq, Paginator, PageModel
+from .paginator import PaginatorReq, Paginator, CursorPaginator, PageModel, encode_cursor, decode_cursor
 
-__all__ = ["PaginatorReq", "Paginator", "PageModel"]
+__all__ = ["PaginatorReq", "Paginator", "CursorPaginator", "PageModel", "encode_cursor", "decode_cursor"]
@@ -5,17 +5,73 @@
 @Author  : thezehui@gmail.com
 @File    : paginator.py
 """
+import base64
+import binascii
+import json
 import math
+import uuid
 from dataclasses import dataclass
-from typing_extensions import Any
+from datetime import datetime
+from typing_extensions import Any, Optional as TypingOptional, Sequence, Union
 
 from flask_wtf import FlaskForm
-from wtforms import IntegerField
-from wtforms.validators import Optional, NumberRange
+from sqlalchemy import asc, desc, tuple_
+from sqlalchemy.orm import Query
+from wtforms import BooleanField, IntegerField, StringField
+from wtforms.validators import Optional, NumberRange, ValidationError
 
+from internal.exception import ValidateErrorException
 from pkg.sqlalchemy import SQLAlchemy
 
 
+def encode_cursor(values: Sequence[Any]) -> str:
+    """将排序列的取值编码成不透明的游标字符串，时间类型单独标记以便解码后还原"""
+    data = [{"dt": value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(data, default=str, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    """解码游标字符串，格式错误时抛出ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("游标格式错误") from e
+    if not isinstance(data, list) or not data:
+        raise ValueError("游标格式错误")
+    return [
+        datetime.fromisoformat(value["dt"]) if isinstance(value, dict) and "dt" in value else value
+        for value in data
+    ]
+
+
+def _parse_cursor_value(value: Any, column: Any) -> Any:
+    """按排序列的类型校验并转换游标中的取值，类型不匹配时抛出ValueError"""
+    try:
+        python_type = column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return value
+    if python_type is uuid.UUID:
+        return uuid.UUID(str(value))
+    if python_type is int and (not isinstance(value, int) or isinstance(value, bool)):
+        raise ValueError("游标格式错误")
+    if python_type is float and (not isinstance(value, (int, float)) or isinstance(value, bool)):
+        raise ValueError("游标格式错误")
+    if python_type in (str, datetime) and not isinstance(value, python_type):
+        raise ValueError("游标格式错误")
+    return value
+
+
+def _validate_cursor(form, field) -> None:
+    """校验游标格式"""
+    if field.data:
+        try:
+            decode_cursor(field.data)
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+
 class PaginatorReq(FlaskForm):
     """分页请求基础类，涵盖当前页数、每页条数，如果接口请求需要携带分页信息，可直接继承该类"""
     current_page = IntegerField("current_page", default=1, validators=[
@@ -26,6 +82,14 @@ class PaginatorReq(FlaskForm):
         Optional(),
         NumberRange(min=1, max=50, message="每页数据的条数范围在1-50")
     ])
+    # 游标分页参数，仅支持游标分页的接口生效，传递cursor(第一页传空字符串)时使用游标分页
+    cursor = StringField("cursor", default="", validators=[Optional(), _validate_cursor])
+    estimate_total = BooleanField("estimate_total", default=False)  # 游标分页时是否返回估算的总条数
+
+    @property
+    def cursor_mode(self) -> bool:
+        """请求是否携带了cursor参数，携带时使用游标分页"""
+        return bool(self.cursor.raw_data)
 
 
 @dataclass
@@ -55,7 +119,74 @@ class Paginator:
         return p.items
 
 
+@dataclass
+class CursorPaginator:
+    """游标分页器，按排序列(默认created_at, id)进行keyset分页，不执行COUNT与OFFSET，深度翻页与第一页的耗时相同"""
+    page_size: int = 20  # 每页条数
+    next_cursor: str = ""  # 下一页的游标，为空表示没有更多数据
+    has_more: bool = False  # 是否还有更多数据
+    total_record: TypingOptional[int] = None  # 估算的总条数，请求估算时才有值
+
+    def __init__(self, db: SQLAlchemy, req: PaginatorReq = None):
+        self.cursor = ""
+        self.estimate_total = False
+        if req is not None:
+            self.page_size = req.page_size.data
+            self.cursor = req.cursor.data or ""
+            self.estimate_total = bool(req.estimate_total.data)
+        self.db = db
+
+    def paginate(self, query: Query, columns: Sequence[Any], ascending: bool = False) -> list[Any]:
+        """对传入的查询进行游标分页，columns为排序列，最后一列需要唯一(例如id)，数据库中需要有对应的联合索引"""
+        # 1.按需估算总条数，使用查询计划中的行数估算值，避免COUNT全表扫描
+        if self.estimate_total:
+            self.total_record = self._estimate_count(query)
+
+        # 2.携带游标时只查询游标之后的数据，游标取值的个数与类型需要与排序列一致，避免篡改的游标引发SQL错误
+        key = tuple_(*columns)
+        if self.cursor:
+            values = self._decode_cursor_values(columns)
+            query = query.filter(key > values if ascending else key < values)
+
+        # 3.多查询一条数据用于判断是否还有下一页
+        order = asc if ascending else desc
+        items = query.order_by(None).order_by(*[order(column) for column in columns]).limit(self.page_size + 1).all()
+        self.has_more = len(items) > self.page_size
+        items = items[:self.page_size]
+
+        # 4.使用最后一条数据的排序列生成下一页游标
+        self.next_cursor = encode_cursor([
+            getattr(items[-1], column.key) for column in columns
+        ]) if self.has_more else ""
+
+        return items
+
+    def _decode_cursor_values(self, columns: Sequence[Any]) -> tuple[Any, ...]:
+        """解码游标并按排序列校验取值，格式错误时抛出数据验证异常"""
+        try:
+            values = decode_cursor(self.cursor)
+            if len(values) != len(columns):
+                raise ValueError("游标格式错误")
+            return tuple(_parse_cursor_value(value, column) for value, column in zip(values, columns))
+        except ValueError as e:
+            raise ValidateErrorException("游标格式错误") from e
+
+    def _estimate_count(self, query: Query) -> int:
+        """通过EXPLAIN获取PostgreSQL查询计划中的估算行数"""
+        sql, params = self.compile_count_statement(query, self.db.engine.dialect)
+        result = self.db.session.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params).scalar()
+        plan = json.loads(result) if isinstance(result, str) else result
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    @classmethod
+    def compile_count_statement(cls, query: Query, dialect: Any) -> tuple[str, dict[str, Any]]:
+        """编译用于估算总条数的查询语句，去除预加载的关联查询(避免JOIN放大行数)，并展开IN等扩展参数"""
+        statement = query.enable_eagerloads(False).order_by(None).statement
+        compiled = statement.compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+        return str(compiled), compiled.params
+
+
 @dataclass
 class PageModel:
     list: list[Any]
-    paginator: Paginator
+    paginator: Union[Paginator, CursorPaginator]
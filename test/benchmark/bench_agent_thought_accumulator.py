@@ -0,0 +1,78 @@
+"""
+推理事件聚合基准测试：对比逐token model_copy拼接与AgentThoughtAccumulator在长答案下的单token耗时
+
+运行方式: python -m test.benchmark.bench_agent_thought_accumulator --tokens 8000
+"""
+import argparse
+import time
+import uuid
+
+from internal.core.agent.agents import AgentThoughtAccumulator
+from internal.core.agent.entities.queue_entity import AgentThought, AgentThoughtDelta
+
+
+def aggregate_with_model_copy(events: list[AgentThoughtDelta]) -> list[float]:
+    """原实现：每个增量事件复制一次完整的AgentThought并拼接字符串，返回每个事件的耗时"""
+    costs = []
+    agent_thoughts = {}
+    for event in events:
+        start = time.perf_counter()
+        event_id = str(event.id)
+        if event_id not in agent_thoughts:
+            agent_thoughts[event_id] = event.to_agent_thought()
+        else:
+            agent_thoughts[event_id] = agent_thoughts[event_id].model_copy(update={
+                "thought": agent_thoughts[event_id].thought + event.thought,
+                "answer": agent_thoughts[event_id].answer + event.answer,
+                "latency": event.latency,
+            })
+        costs.append(time.perf_counter() - start)
+    return costs
+
+
+def aggregate_with_accumulator(events: list[AgentThoughtDelta]) -> list[float]:
+    """新实现：片段追加到列表，读取结果时拼接一次(拼接耗时计入最后一个事件)"""
+    costs = []
+    accumulator = AgentThoughtAccumulator()
+    for event in events:
+        start = time.perf_counter()
+        accumulator.add(event)
+        costs.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    accumulator.agent_thoughts
+    costs[-1] += time.perf_counter() - start
+    return costs
+
+
+def report(name: str, costs: list[float], buckets: int) -> None:
+    """按区间输出平均单token耗时(微秒)，耗时平稳说明聚合为线性复杂度"""
+    size = len(costs) // buckets
+    averages = [sum(costs[i * size:(i + 1) * size]) / size * 1e6 for i in range(buckets)]
+    print(f"{name:<16}{sum(costs) * 1000:>10.2f}" + "".join(f"{average:>10.2f}" for average in averages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推理事件聚合基准测试")
+    parser.add_argument("--tokens", type=int, default=8000)
+    parser.add_argument("--token-size", type=int, default=4, help="单个token的平均字符数")
+    parser.add_argument("--buckets", type=int, default=4)
+    args = parser.parse_args()
+
+    # 1.构建同一个事件id下的增量事件序列，模拟长答案的流式输出
+    event_id, task_id = uuid.uuid4(), uuid.uuid4()
+    events = [
+        AgentThoughtDelta(id=event_id, task_id=task_id, thought="字" * args.token_size, latency=index / 1000)
+        for index in range(args.tokens)
+    ]
+    # 预热pydantic
+    AgentThought(id=event_id, task_id=task_id, event=events[0].event).model_copy()
+
+    # 2.分别统计两种实现的总耗时以及各区间的平均单token耗时
+    header = "".join(f"{'q' + str(i + 1) + '(us)':>10}" for i in range(args.buckets))
+    print(f"{'impl':<16}{'total(ms)':>10}{header}")
+    report("model_copy", aggregate_with_model_copy(events), args.buckets)
+    report("accumulator", aggregate_with_accumulator(events), args.buckets)
+
+
+if __name__ == "__main__":
+    main()
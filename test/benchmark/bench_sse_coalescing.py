@@ -0,0 +1,69 @@
+"""
+SSE合并基准测试：对比逐token输出与合并输出在长答案下的数据帧数、传输字节数以及序列化CPU耗时
+
+运行方式: python -m test.benchmark.bench_sse_coalescing --tokens 8000
+"""
+import argparse
+import time
+import uuid
+
+from internal.core.agent.agents import AgentChatStream
+from internal.core.agent.entities.queue_entity import AgentThought, AgentThoughtDelta, QueueEvent
+
+
+class ReplayAgent:
+    """按固定间隔回放事件的智能体，模拟LLM流式输出"""
+
+    def __init__(self, events: list, interval: float):
+        self.events = events
+        self.interval = interval
+
+    def stream(self, agent_state):
+        for event in self.events:
+            if self.interval:
+                time.sleep(self.interval)
+            yield event
+
+
+def run(name: str, events: list, interval: float, coalesce_ms: int, coalesce_bytes: int) -> None:
+    """执行一次会话流并输出统计数据"""
+    chat_stream = AgentChatStream(
+        agent=ReplayAgent(events, interval),
+        agent_state={},
+        include={"event", "thought", "answer", "latency"},
+        extra_data={"conversation_id": str(uuid.uuid4()), "message_id": str(uuid.uuid4())},
+        on_finish=lambda agent_thoughts: None,
+        coalesce_ms=coalesce_ms,
+        coalesce_bytes=coalesce_bytes,
+    )
+    for _ in chat_stream.stream():
+        pass
+    stats = chat_stream.stats
+    print(f"{name:<20}{stats['frames']:>8}{stats['bytes'] / 1024:>12.1f}{stats['cpu_ms']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE合并基准测试")
+    parser.add_argument("--tokens", type=int, default=8000)
+    parser.add_argument("--interval-ms", type=float, default=0.2, help="模拟的token输出间隔")
+    args = parser.parse_args()
+
+    # 1.构建一次完整回答的事件序列：增量事件+统计事件+结束事件
+    event_id, task_id = uuid.uuid4(), uuid.uuid4()
+    events = [
+        AgentThoughtDelta(id=event_id, task_id=task_id, thought="字词", latency=index / 1000)
+        for index in range(args.tokens)
+    ]
+    events.append(AgentThought(id=event_id, task_id=task_id, event=QueueEvent.AGENT_MESSAGE, total_token_count=10))
+    events.append(AgentThought(id=uuid.uuid4(), task_id=task_id, event=QueueEvent.AGENT_END))
+
+    # 2.分别统计不合并、按时间合并以及按字节合并的输出
+    interval = args.interval_ms / 1000
+    print(f"{'mode':<20}{'frames':>8}{'bytes(KB)':>12}{'cpu(ms)':>10}")
+    run("per-token", events, interval, 0, 0)
+    run("coalesce 50ms", events, interval, 50, 0)
+    run("coalesce 1KB", events, interval, 0, 1024)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import time
+from typing import Any, Optional
+
+
+def _encode(value: Any) -> bytes:
+    """与redis-py一致，写入的数据统一转换成bytes"""
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode("utf-8")
+
+
+class FakeRedis:
+    """测试用的进程内Redis，只实现项目中用到的命令，过期时间基于time.time()计算"""
+
+    def __init__(self):
+        self.data: dict[bytes, Any] = {}
+        self.expire_at: dict[bytes, float] = {}
+        self._stream_seq = 0
+
+    def _get(self, key: Any, default: Any = None) -> Any:
+        key = _encode(key)
+        if key in self.expire_at and self.expire_at[key] <= time.time():
+            self.data.pop(key, None)
+            self.expire_at.pop(key, None)
+        return self.data.get(key, default)
+
+    def get(self, key: Any) -> Optional[bytes]:
+        return self._get(key)
+
+    def mget(self, keys: list[Any]) -> list[Optional[bytes]]:
+        return [self._get(key) for key in keys]
+
+    def set(self, key: Any, value: Any, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        if nx and self._get(key) is not None:
+            return None
+        self.data[_encode(key)] = _encode(value)
+        self.expire_at.pop(_encode(key), None)
+        if ex is not None:
+            self.expire(key, ex)
+        return True
+
+    def setex(self, key: Any, ttl: int, value: Any) -> bool:
+        return self.set(key, value, ex=ttl)
+
+    def delete(self, *keys: Any) -> int:
+        count = 0
+        for key in keys:
+            if self._get(key) is not None:
+                count += 1
+            self.data.pop(_encode(key), None)
+            self.expire_at.pop(_encode(key), None)
+        return count
+
+    def exists(self, *keys: Any) -> int:
+        return len([key for key in keys if self._get(key) is not None])
+
+    def expire(self, key: Any, seconds: float) -> bool:
+        if self._get(key) is None:
+            return False
+        self.expire_at[_encode(key)] = time.time() + seconds
+        return True
+
+    def ttl(self, key: Any) -> int:
+        if self._get(key) is None:
+            return -2
+        if _encode(key) not in self.expire_at:
+            return -1
+        return int(self.expire_at[_encode(key)] - time.time())
+
+    def incr(self, key: Any, amount: int = 1) -> int:
+        value = int(self._get(key, b"0")) + amount
+        self.data[_encode(key)] = _encode(value)
+        return value
+
+    def decr(self, key: Any, amount: int = 1) -> int:
+        return self.incr(key, -amount)
+
+    def rpush(self, key: Any, *values: Any) -> int:
+        items = self._get(key)
+        if items is None:
+            items = self.data[_encode(key)] = []
+        items.extend(_encode(value) for value in values)
+        return len(items)
+
+    def rpushx(self, key: Any, *values: Any) -> int:
+        if self._get(key) is None:
+            return 0
+        return self.rpush(key, *values)
+
+    def lrange(self, key: Any, start: int, end: int) -> list[bytes]:
+        items = self._get(key, [])
+        end = len(items) if end == -1 else end + 1
+        return list(items[start:end])
+
+    def ltrim(self, key: Any, start: int, end: int) -> bool:
+        items = self._get(key)
+        if items is not None:
+            self.data[_encode(key)] = self.lrange(key, start, end)
+        return True
+
+    def llen(self, key: Any) -> int:
+        return len(self._get(key, []))
+
+    def zadd(self, key: Any, mapping: dict[Any, float]) -> int:
+        members = self._get(key)
+        if members is None:
+            members = self.data[_encode(key)] = {}
+        added = len([member for member in mapping if _encode(member) not in members])
+        members.update({_encode(member): float(score) for member, score in mapping.items()})
+        return added
+
+    def zrem(self, key: Any, *members: Any) -> int:
+        items = self._get(key, {})
+        return len([member for member in members if items.pop(_encode(member), None) is not None])
+
+    def zremrangebyscore(self, key: Any, min_score: Any, max_score: Any) -> int:
+        items = self._get(key, {})
+        removed = [member for member, score in items.items() if float(min_score) <= score <= float(max_score)]
+        for member in removed:
+            del items[member]
+        return len(removed)
+
+    def zcard(self, key: Any) -> int:
+        return len(self._get(key, {}))
+
+    def sadd(self, key: Any, *members: Any) -> int:
+        items = self._get(key)
+        if items is None:
+            items = self.data[_encode(key)] = set()
+        added = {_encode(member) for member in members} - items
+        items.update(added)
+        return len(added)
+
+    def pfadd(self, key: Any, *members: Any) -> int:
+        """HyperLogLog使用集合模拟，计数为精确值"""
+        items = self._get(key)
+        created = items is None
+        return int(self.sadd(key, *members) > 0 or created)
+
+    def pfcount(self, *keys: Any) -> int:
+        return len(set().union(*[self._get(key, set()) for key in keys]))
+
+    def hincrby(self, key: Any, field: Any, amount: int = 1) -> int:
+        items = self._get(key)
+        if items is None:
+            items = self.data[_encode(key)] = {}
+        value = int(items.get(_encode(field), b"0")) + amount
+        items[_encode(field)] = _encode(value)
+        return value
+
+    def hincrbyfloat(self, key: Any, field: Any, amount: float = 1.0) -> float:
+        items = self._get(key)
+        if items is None:
+            items = self.data[_encode(key)] = {}
+        value = float(items.get(_encode(field), b"0")) + amount
+        items[_encode(field)] = _encode(value)
+        return value
+
+    def hgetall(self, key: Any) -> dict[bytes, bytes]:
+        return dict(self._get(key, {}))
+
+    def xadd(self, key: Any, fields: dict, maxlen: Optional[int] = None, approximate: bool = True) -> bytes:
+        entries = self._get(key)
+        if entries is None:
+            entries = self.data[_encode(key)] = []
+        self._stream_seq += 1
+        entry_id = f"{int(time.time() * 1000)}-{self._stream_seq}".encode("utf-8")
+        entries.append((entry_id, {_encode(field): _encode(value) for field, value in fields.items()}))
+        if maxlen is not None:
+            del entries[:-maxlen]
+        return entry_id
+
+    def xread(self, streams: dict, count: Optional[int] = None, block: Optional[int] = None) -> list:
+        """读取指定id之后的事件，传递block时轮询等待新事件，超时返回空列表"""
+
+        def parse(entry_id: Any) -> tuple[int, ...]:
+            return tuple(int(part) for part in (entry_id.decode() if isinstance(entry_id, bytes) else entry_id).split("-"))
+
+        deadline = time.time() + (block or 0) / 1000
+        while True:
+            response = []
+            for key, last_id in streams.items():
+                entries = [entry for entry in self._get(key, []) if parse(entry[0]) > parse(last_id)]
+                if entries:
+                    response.append([_encode(key), entries[:count] if count else entries])
+            if response or time.time() >= deadline:
+                return response
+            time.sleep(0.01)
+
+    def xlen(self, key: Any) -> int:
+        return len(self._get(key, []))
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """测试用的Redis管道，记录命令并在execute时依次执行"""
+
+    def __init__(self, redis_client: FakeRedis):
+        self.redis_client = redis_client
+        self.commands: list[tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return command
+
+    def execute(self) -> list[Any]:
+        commands, self.commands = self.commands, []
+        return [getattr(self.redis_client, name)(*args, **kwargs) for name, args, kwargs in commands]
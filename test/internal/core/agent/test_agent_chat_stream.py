@@ -0,0 +1,136 @@
+import asyncio
+import uuid
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langgraph.graph import StateGraph
+from langgraph.graph.state import CompiledStateGraph
+from pydantic import PrivateAttr
+from redis import Redis
+
+import internal.core.agent.agents.base_agent as base_agent_module
+from app.http.module import injector
+from internal.core.agent.agents import AgentChatStream, AgentExecutor, BaseAgent
+from internal.core.agent.entities.agent_entity import AgentConfig, AgentState
+from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
+from internal.entity.conversation_entity import InvokeFrom
+from internal.exception import TooManyRequestsException
+from test.fake_redis import FakeRedis
+
+
+class EchoAgent(BaseAgent):
+    """测试用智能体，只有一个异步节点，原样返回用户提问，收到release事件前不会结束"""
+    _release: asyncio.Event = PrivateAttr(None)
+
+    @classmethod
+    def _build_agent(cls) -> CompiledStateGraph:
+        graph = StateGraph(AgentState)
+        graph.add_node("echo", cls._node("_echo_node", "_aecho_node"))
+        graph.set_entry_point("echo")
+        graph.set_finish_point("echo")
+        return graph.compile()
+
+    def _echo_node(self, state: AgentState) -> AgentState:
+        raise NotImplementedError
+
+    async def _aecho_node(self, state: AgentState) -> AgentState:
+        await self._release.wait()
+        task_id = state["task_id"]
+        self.agent_queue_manager.publish(task_id, AgentThought(
+            id=uuid.uuid4(), task_id=task_id, event=QueueEvent.AGENT_MESSAGE, answer=state["messages"][0].content,
+        ))
+        self.agent_queue_manager.publish(task_id, AgentThought(
+            id=uuid.uuid4(), task_id=task_id, event=QueueEvent.AGENT_END,
+        ))
+        return state
+
+
+@pytest.fixture
+def async_executor(monkeypatch):
+    """替换Redis与异步准入控制池，异步执行名额只有1个"""
+    redis_client = FakeRedis()
+    get = injector.get
+    monkeypatch.setattr(injector, "get", lambda cls: redis_client if cls is Redis else get(cls))
+    executor = AgentExecutor(max_concurrency=1, max_queue_depth=0)
+    monkeypatch.setattr(base_agent_module, "get_async_agent_executor", lambda: executor)
+    return executor
+
+
+def _build_chat_stream(persisted: list) -> AgentChatStream:
+    agent = EchoAgent.model_construct(llm=None, agent_config=AgentConfig(user_id=uuid.uuid4()))
+    agent._agent = EchoAgent._get_compiled_agent()
+    agent._release = asyncio.Event()
+    return AgentChatStream(
+        agent=agent,
+        agent_state={"messages": [HumanMessage("你好")]},
+        include={"event", "answer"},
+        extra_data={},
+        on_finish=lambda agent_thoughts: persisted.append(agent_thoughts),
+        coalesce_ms=0,
+        coalesce_bytes=0,
+    )
+
+
+def test_agent_chat_stream_astream(async_executor):
+    """测试异步会话流输出SSE数据帧，结束后执行持久化并释放异步执行名额"""
+
+    async def main():
+        persisted = []
+        chat_stream = _build_chat_stream(persisted)
+        frames_stream = chat_stream.astream()
+        assert async_executor.stats()["running"] == 1
+
+        chat_stream.agent._release.set()
+        frames = "".join([frame async for frame in frames_stream])
+        assert '"event":"agent_message","answer":"你好"' in frames
+        assert '"event":"agent_end"' in frames
+        assert [agent_thought.event for agent_thought in persisted[0]] == [
+            QueueEvent.AGENT_MESSAGE, QueueEvent.AGENT_END,
+        ]
+
+        await asyncio.sleep(0.01)
+        assert async_executor.stats()["running"] == 0
+
+    asyncio.run(main())
+
+
+def test_agent_chat_stream_astream_rejects_when_saturated(async_executor):
+    """测试异步执行名额已满时调用astream立即抛出429异常，智能体结束后可以继续提交"""
+
+    async def main():
+        first = _build_chat_stream([])
+        first_frames = first.astream()
+
+        with pytest.raises(TooManyRequestsException):
+            _build_chat_stream([]).astream()
+        assert async_executor.stats()["rejected_total"] == 1
+
+        first.agent._release.set()
+        _ = [frame async for frame in first_frames]
+        await asyncio.sleep(0.01)
+        second = _build_chat_stream([])
+        second.astream()
+        second.agent._release.set()
+
+    asyncio.run(main())
+
+
+def test_agent_chat_stream_astream_cancel_releases_slot(async_executor):
+    """测试客户端断开(取消输出任务)时取消智能体任务并释放异步执行名额"""
+
+    async def main():
+        chat_stream = _build_chat_stream([])
+        frames_stream = chat_stream.astream()
+
+        async def consume():
+            return [frame async for frame in frames_stream]
+
+        consume_task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        consume_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await consume_task
+        await asyncio.sleep(0.01)
+        assert async_executor.stats()["running"] == 0
+
+    asyncio.run(main())
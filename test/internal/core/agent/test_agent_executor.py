@@ -0,0 +1,36 @@
+import threading
+
+import pytest
+
+from internal.core.agent.agents import AgentExecutor
+from internal.exception import TooManyRequestsException
+
+
+def test_agent_executor_rejects_when_saturated():
+    """测试执行池运行数与排队数均达到上限时快速拒绝，释放后可以继续提交"""
+    executor = AgentExecutor(max_concurrency=1, max_queue_depth=0, queue_timeout=0.1)
+    release = threading.Event()
+    future = executor.submit(release.wait)
+
+    with pytest.raises(TooManyRequestsException) as exc_info:
+        executor.submit(lambda: None)
+    assert exc_info.value.retry_after >= 1
+
+    stats = executor.stats()
+    assert stats["running"] == 1 and stats["rejected_total"] == 1
+
+    release.set()
+    future.result(timeout=1)
+    executor.submit(lambda: None).result(timeout=1)
+    assert executor.stats()["completed_total"] == 2
+
+
+def test_agent_executor_queue_timeout():
+    """测试排队等待超时后拒绝"""
+    executor = AgentExecutor(max_concurrency=1, max_queue_depth=1, queue_timeout=0.05)
+    release = threading.Event()
+    executor.submit(release.wait)
+
+    with pytest.raises(TooManyRequestsException):
+        executor.submit(lambda: None)
+    release.set()
@@ -0,0 +1,32 @@
+import uuid
+
+from internal.core.agent.agents import AgentThoughtAccumulator
+from internal.core.agent.entities.queue_entity import AgentThought, AgentThoughtDelta, QueueEvent
+
+
+def test_accumulator_merges_message_deltas_and_stats():
+    """测试增量事件按片段拼接，统计事件补充消息列表与token数据，其他事件直接覆盖"""
+    task_id, message_id, action_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    accumulator = AgentThoughtAccumulator()
+
+    accumulator.add(AgentThought(id=action_id, task_id=task_id, event=QueueEvent.AGENT_ACTION, tool="a"))
+    accumulator.add(AgentThought(id=action_id, task_id=task_id, event=QueueEvent.AGENT_ACTION, tool="b"))
+    for index, text in enumerate(["你好", "，", "世界"]):
+        accumulator.add(AgentThoughtDelta(id=message_id, task_id=task_id, thought=text, latency=index))
+    accumulator.add(AgentThought(id=uuid.uuid4(), task_id=task_id, event=QueueEvent.PING))
+    accumulator.add(AgentThought(
+        id=message_id,
+        task_id=task_id,
+        event=QueueEvent.AGENT_MESSAGE,
+        message=[{"type": "human"}],
+        total_token_count=12,
+        latency=3,
+    ))
+
+    action, message = accumulator.agent_thoughts
+    assert action.tool == "b"
+    assert message.thought == message.answer == "你好，世界"
+    assert message.message == [{"type": "human"}]
+    assert message.total_token_count == 12 and message.latency == 3
+    assert accumulator.answer == "你好，世界"
+    assert accumulator.agent_thoughts[1].answer == "你好，世界"
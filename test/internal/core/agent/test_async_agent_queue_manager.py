@@ -0,0 +1,70 @@
+import asyncio
+import uuid
+
+import pytest
+from redis import Redis
+
+from app.http.module import injector
+from internal.core.agent.agents import AsyncAgentQueueManager
+from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
+from internal.entity.conversation_entity import InvokeFrom
+from internal.exception import FailException
+from test.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    """队列管理器通过injector获取Redis，替换成进程内的FakeRedis"""
+    redis_client = FakeRedis()
+    get = injector.get
+    monkeypatch.setattr(injector, "get", lambda cls: redis_client if cls is Redis else get(cls))
+    return redis_client
+
+
+async def _collect(manager: AsyncAgentQueueManager, task_id: uuid.UUID) -> list[QueueEvent]:
+    return [agent_thought.event async for agent_thought in manager.alisten(task_id)]
+
+
+def test_async_queue_manager_listen_raises_fail_exception(redis_client):
+    """测试异步队列管理器不支持同步监听"""
+
+    async def main():
+        manager = AsyncAgentQueueManager(user_id=uuid.uuid4(), invoke_from=InvokeFrom.DEBUGGER)
+        with pytest.raises(FailException):
+            next(iter(manager.listen(uuid.uuid4())))
+
+    asyncio.run(main())
+
+
+def test_async_queue_manager_stop_flag_is_per_instance(redis_client):
+    """测试每个管理器独立检测停止标识，停止一个任务不会影响另一个管理器"""
+
+    async def main():
+        user_id = uuid.uuid4()
+        first = AsyncAgentQueueManager(user_id=user_id, invoke_from=InvokeFrom.DEBUGGER)
+        second = AsyncAgentQueueManager(user_id=user_id, invoke_from=InvokeFrom.DEBUGGER)
+        first.stop_check_interval = second.stop_check_interval = 0.01
+        first_task_id, second_task_id = uuid.uuid4(), uuid.uuid4()
+        first.queue(first_task_id)
+        second.queue(second_task_id)
+
+        first_events = asyncio.create_task(_collect(first, first_task_id))
+        second_events = asyncio.create_task(_collect(second, second_task_id))
+        await asyncio.sleep(0.02)
+        assert first._listening == {str(first_task_id)}
+        assert second._listening == {str(second_task_id)}
+        assert first._stop_watcher is not second._stop_watcher
+
+        # 1.设置第一个任务的停止标识，只有第一个管理器结束监听
+        AsyncAgentQueueManager.set_stop_flag(first_task_id, InvokeFrom.DEBUGGER, user_id)
+        assert await asyncio.wait_for(first_events, timeout=1) == [QueueEvent.STOP]
+        assert not second_events.done()
+
+        # 2.第二个任务正常结束
+        second.publish(second_task_id, AgentThought(
+            id=uuid.uuid4(), task_id=second_task_id, event=QueueEvent.AGENT_END,
+        ))
+        assert await asyncio.wait_for(second_events, timeout=1) == [QueueEvent.AGENT_END]
+        assert not first._listening and not second._listening
+
+    asyncio.run(main())
@@ -0,0 +1,49 @@
+import uuid
+
+from langchain_core.messages import HumanMessage
+
+from internal.core.agent.agents import FunctionCallAgent
+from internal.core.agent.entities.agent_entity import AgentConfig
+from internal.core.agent.entities.queue_entity import QueueEvent
+
+
+class RecordingQueueManager:
+    """记录发布事件的队列管理器"""
+
+    def __init__(self):
+        self.events = []
+
+    def publish(self, task_id, agent_thought):
+        self.events.append(agent_thought)
+
+
+def _build_agent() -> FunctionCallAgent:
+    agent = FunctionCallAgent.model_construct(
+        llm=None,
+        agent_config=AgentConfig(
+            user_id=uuid.uuid4(),
+            review_config={
+                "enable": True,
+                "keywords": ["bad"],
+                "inputs_config": {"enable": True, "preset_response": "包含敏感词"},
+                "outputs_config": {"enable": False},
+            },
+        ),
+    )
+    agent._agent_queue_manager = RecordingQueueManager()
+    return agent
+
+
+def test_preset_operation_reviews_multimodal_input():
+    """测试多模态(图片+文本)输入同样会进行输入审核，且不会因为内容是列表而出错"""
+    image_part = {"type": "image_url", "image_url": {"url": "https://example.com/a.png"}}
+
+    agent = _build_agent()
+    state = {"task_id": uuid.uuid4(), "messages": [HumanMessage([{"type": "text", "text": "正常提问"}, image_part])]}
+    assert agent._preset_operation_node(state) == {"messages": []}
+    assert agent.agent_queue_manager.events == []
+
+    agent = _build_agent()
+    state = {"task_id": uuid.uuid4(), "messages": [HumanMessage([{"type": "text", "text": "a bad one"}, image_part])]}
+    assert agent._preset_operation_node(state)["messages"][0].content == "包含敏感词"
+    assert [event.event for event in agent.agent_queue_manager.events] == [QueueEvent.AGENT_MESSAGE, QueueEvent.AGENT_END]
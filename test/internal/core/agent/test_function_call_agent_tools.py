@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+
+import internal.core.agent.agents.function_call_agent as function_call_agent_module
+from internal.core.agent.agents import FunctionCallAgent
+from internal.core.agent.entities.agent_entity import AgentConfig
+
+
+class RecordingQueueManager:
+    """记录发布事件的队列管理器"""
+
+    def __init__(self):
+        self.events = []
+
+    def publish(self, task_id, agent_thought):
+        self.events.append(agent_thought)
+
+
+def _build_agent(tools: list, **kwargs) -> FunctionCallAgent:
+    agent = FunctionCallAgent.model_construct(
+        llm=None,
+        agent_config=AgentConfig(user_id=uuid.uuid4(), tools=tools, **kwargs),
+    )
+    agent._agent_queue_manager = RecordingQueueManager()
+    return agent
+
+
+def _sleep_tool(name: str, seconds: float) -> StructuredTool:
+    def func() -> str:
+        time.sleep(seconds)
+        return name
+
+    return StructuredTool.from_function(func=func, name=name, description=name)
+
+
+def _run_tools_node(agent: FunctionCallAgent, names: list[str]) -> list:
+    tool_calls = [{"id": f"call_{index}", "name": name, "args": {}} for index, name in enumerate(names)]
+    state = {"task_id": uuid.uuid4(), "messages": [AIMessage(content="", tool_calls=tool_calls)]}
+    return agent._tools_node(state)["messages"]
+
+
+def test_tools_node_runs_in_parallel_and_keeps_order():
+    """测试同一轮的工具调用并行执行，事件按完成顺序发布，工具消息按调用顺序返回"""
+    agent = _build_agent([_sleep_tool("slow", 0.2), _sleep_tool("fast", 0.01)])
+
+    start_at = time.perf_counter()
+    messages = _run_tools_node(agent, ["slow", "fast"])
+
+    assert time.perf_counter() - start_at < 0.35
+    assert [(message.tool_call_id, json.loads(message.content)) for message in messages] == [
+        ("call_0", "slow"), ("call_1", "fast"),
+    ]
+    assert [event.tool for event in agent.agent_queue_manager.events] == ["fast", "slow"]
+
+
+def test_tools_node_timeout_and_error_observations():
+    """测试超时与出错的工具返回对应的观察内容，超时后不再等待工具结束"""
+    release = threading.Event()
+
+    def hang() -> str:
+        release.wait(5)
+        return "hang"
+
+    def broken() -> str:
+        raise ValueError("boom")
+
+    agent = _build_agent(
+        [
+            StructuredTool.from_function(func=hang, name="hang", description="hang"),
+            StructuredTool.from_function(func=broken, name="broken", description="broken"),
+        ],
+        tool_timeout=0.05,
+    )
+
+    start_at = time.perf_counter()
+    messages = _run_tools_node(agent, ["hang", "broken"])
+    release.set()
+
+    assert time.perf_counter() - start_at < 1
+    assert [json.loads(message.content) for message in messages] == [
+        "工具执行出错: 工具执行超时(0.05秒)", "工具执行出错: boom",
+    ]
+    observations = {event.tool: json.loads(event.observation) for event in agent.agent_queue_manager.events}
+    assert observations == {"hang": "工具执行出错: 工具执行超时(0.05秒)", "broken": "工具执行出错: boom"}
+
+
+def test_tools_node_timeout_excludes_queue_time(monkeypatch):
+    """测试超时从工具开始执行时计时，在共享线程池中排队的时间不计入"""
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(function_call_agent_module, "get_tool_executor", lambda: executor)
+    agent = _build_agent([_sleep_tool("first", 0.1), _sleep_tool("second", 0.1)], tool_timeout=0.15)
+
+    messages = _run_tools_node(agent, ["first", "second"])
+    executor.shutdown()
+
+    assert [json.loads(message.content) for message in messages] == ["first", "second"]
+    assert all(event.latency < 0.15 for event in agent.agent_queue_manager.events)
+
+
+def test_tools_node_timeouts_keep_threads_bounded(monkeypatch):
+    """测试工具超时后不会额外创建线程，存活线程数始终不超过共享线程池的大小"""
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(function_call_agent_module, "get_tool_executor", lambda: executor)
+    release = threading.Event()
+
+    def hang() -> str:
+        release.wait(0.3)
+        return "hang"
+
+    agent = _build_agent(
+        [StructuredTool.from_function(func=hang, name="hang", description="hang")],
+        tool_timeout=0.05,
+    )
+    baseline = threading.active_count()
+
+    for _ in range(3):
+        messages = _run_tools_node(agent, ["hang", "hang"])
+        assert [json.loads(message.content) for message in messages] == ["工具执行出错: 工具执行超时(0.05秒)"] * 2
+        assert threading.active_count() <= baseline + 2
+
+    release.set()
+    executor.shutdown()
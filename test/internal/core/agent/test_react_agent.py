@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessageChunk
+
+from internal.core.agent.agents import ReACTAgent
+from internal.core.agent.agents.function_call_agent import LLMStreamState
+
+
+def _stream(chunks: list[str]) -> tuple[LLMStreamState, list[str]]:
+    """使用不支持工具调用的模型逐块处理输出，返回流式状态以及发布的消息片段"""
+    published = []
+    agent = SimpleNamespace(
+        llm=SimpleNamespace(features=[]),
+        _publish_agent_message=lambda state, llm_stream, content: published.append(content),
+    )
+    llm_stream = LLMStreamState()
+    for chunk in chunks:
+        ReACTAgent._on_llm_chunk(agent, {}, llm_stream, AIMessageChunk(content=chunk))
+    return llm_stream, published
+
+
+def test_react_thought_chunks_are_not_merged_per_chunk():
+    """测试工具调用输出确定类型后不再逐块合并内容块"""
+    llm_stream, published = _stream(["```", "json\n", *['{"name": "x"}'] * 1000, "```"])
+    assert llm_stream.generation_type == "thought"
+    assert llm_stream._gathered_count == 0
+    assert published == []
+
+
+def test_react_message_publishes_leading_chunks():
+    """测试文本输出在确定类型时补发此前的内容块"""
+    llm_stream, published = _stream(["你好", "，我是", "智能体助手", "。"])
+    assert llm_stream.generation_type == "message"
+    assert published == ["你好，我是智能体助手", "。"]
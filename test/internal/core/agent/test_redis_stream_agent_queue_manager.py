@@ -0,0 +1,138 @@
+import json
+import threading
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from redis import Redis
+
+from app.http.module import injector
+from internal.core.agent.agents import AgentChatStream, RedisStreamAgentQueueManager
+from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
+from internal.entity.conversation_entity import InvokeFrom
+from internal.exception import FailException
+from test.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    """替换Redis客户端，并缩短XREAD阻塞时长"""
+    redis_client = FakeRedis()
+    get = injector.get
+    monkeypatch.setattr(injector, "get", lambda cls: redis_client if cls is Redis else get(cls))
+    monkeypatch.setattr(RedisStreamAgentQueueManager, "block_ms", 20)
+    return redis_client
+
+
+def _thought(task_id: uuid.UUID, event: QueueEvent, answer: str = "") -> AgentThought:
+    return AgentThought(id=uuid.uuid4(), task_id=task_id, event=event, answer=answer)
+
+
+def _publish_answer(manager: RedisStreamAgentQueueManager, task_id: uuid.UUID) -> None:
+    manager.publish(task_id, _thought(task_id, QueueEvent.AGENT_MESSAGE, "你好"))
+    manager.publish(task_id, _thought(task_id, QueueEvent.AGENT_MESSAGE, "世界"))
+    manager.publish(task_id, _thought(task_id, QueueEvent.AGENT_END))
+
+
+def test_publish_and_listen_until_end_marker(redis_client):
+    """测试发布的事件按顺序被读取并附带Stream事件id，读取到结束标识后监听结束"""
+    manager = RedisStreamAgentQueueManager(user_id=uuid.uuid4(), invoke_from=InvokeFrom.DEBUGGER)
+    task_id = uuid.uuid4()
+    _publish_answer(manager, task_id)
+
+    thoughts = [thought for thought in manager.listen(task_id) if thought.event != QueueEvent.PING]
+
+    assert [thought.event for thought in thoughts] == [QueueEvent.AGENT_MESSAGE] * 2 + [QueueEvent.AGENT_END]
+    assert [thought.answer for thought in thoughts[:2]] == ["你好", "世界"]
+    assert all(thought.stream_id for thought in thoughts)
+    assert redis_client.xlen(manager.generate_task_stream_key(task_id)) == 4
+    assert redis_client.ttl(manager.generate_task_stream_key(task_id)) > 0
+
+
+def test_listen_receives_events_published_from_other_thread(redis_client):
+    """测试监听端阻塞读取时可以收到其他线程(进程)发布的事件"""
+    user_id, task_id = uuid.uuid4(), uuid.uuid4()
+    manager = RedisStreamAgentQueueManager(user_id=user_id, invoke_from=InvokeFrom.DEBUGGER)
+    publisher = RedisStreamAgentQueueManager(user_id=user_id, invoke_from=InvokeFrom.DEBUGGER)
+    timer = threading.Timer(0.05, _publish_answer, args=(publisher, task_id))
+    timer.start()
+
+    events = [thought.event for thought in manager.listen(task_id) if thought.event != QueueEvent.PING]
+    timer.join()
+
+    assert events == [QueueEvent.AGENT_MESSAGE] * 2 + [QueueEvent.AGENT_END]
+
+
+def test_resume_from_last_event_id(redis_client):
+    """测试断线重连时只返回Last-Event-ID之后的事件，其他用户无法读取该任务"""
+    user_id, task_id = uuid.uuid4(), uuid.uuid4()
+    manager = RedisStreamAgentQueueManager(user_id=user_id, invoke_from=InvokeFrom.DEBUGGER)
+    _publish_answer(manager, task_id)
+    first = next(manager.listen(task_id))
+
+    resumed = list(RedisStreamAgentQueueManager(user_id=user_id, invoke_from=InvokeFrom.DEBUGGER).resume(
+        task_id, first.stream_id,
+    ))
+
+    assert [thought.answer for thought in resumed] == ["世界", ""]
+    other = RedisStreamAgentQueueManager(user_id=uuid.uuid4(), invoke_from=InvokeFrom.DEBUGGER)
+    with pytest.raises(FailException):
+        list(other.resume(task_id, "0-0"))
+    with pytest.raises(FailException):
+        list(manager.resume(uuid.uuid4(), "0-0"))
+
+
+def test_stop_flag_writes_stop_event_and_end_marker(redis_client):
+    """测试停止任务时往Stream写入停止事件与结束标识，监听端无需轮询即可结束，非任务所属用户无法停止"""
+    user_id, task_id = uuid.uuid4(), uuid.uuid4()
+    manager = RedisStreamAgentQueueManager(user_id=user_id, invoke_from=InvokeFrom.WEB_APP)
+    manager.publish(task_id, _thought(task_id, QueueEvent.AGENT_MESSAGE, "你好"))
+
+    RedisStreamAgentQueueManager.set_stop_flag(task_id, InvokeFrom.WEB_APP, uuid.uuid4())
+    assert redis_client.xlen(manager.generate_task_stream_key(task_id)) == 1
+
+    RedisStreamAgentQueueManager.set_stop_flag(task_id, InvokeFrom.WEB_APP, user_id)
+    events = [thought.event for thought in manager.listen(task_id) if thought.event != QueueEvent.PING]
+
+    assert events == [QueueEvent.AGENT_MESSAGE, QueueEvent.STOP]
+    assert redis_client.exists(manager.generate_task_stopped_cache_key(task_id))
+
+
+def test_resumed_frames_match_live_frames(redis_client):
+    """测试断线重连返回的数据帧与实时数据帧一样附带会话id、消息id以及SSE事件id"""
+    user_id, task_id = uuid.uuid4(), uuid.uuid4()
+    extra_data = {"conversation_id": str(uuid.uuid4()), "message_id": str(uuid.uuid4())}
+    manager = RedisStreamAgentQueueManager(user_id=user_id, invoke_from=InvokeFrom.WEB_APP)
+    RedisStreamAgentQueueManager.set_task_extra_data(task_id, extra_data)
+    _publish_answer(manager, task_id)
+
+    frames = list(AgentChatStream.resume(
+        RedisStreamAgentQueueManager(user_id=user_id, invoke_from=InvokeFrom.WEB_APP),
+        task_id, "0-0", include={"event", "answer"}, extra_data={"conversation_id": "default"},
+    ))
+
+    assert len(frames) == 3
+    assert all(frame.startswith("id: ") for frame in frames)
+    data = json.loads(frames[0].split("data:", 1)[1])
+    assert data["answer"] == "你好"
+    assert data["message_id"] == extra_data["message_id"]
+    assert data["conversation_id"] == extra_data["conversation_id"]
+    assert data["task_id"] == str(task_id)
+
+
+def test_chat_stream_records_extra_data_for_resume(redis_client, monkeypatch):
+    """测试使用Stream队列后端时，会话流在提交任务时记录附加数据，供断线重连补全数据帧"""
+    monkeypatch.setenv("AGENT_QUEUE_BACKEND", "redis_stream")
+    extra_data = {"conversation_id": str(uuid.uuid4()), "message_id": str(uuid.uuid4())}
+    chat_stream = AgentChatStream(
+        agent=SimpleNamespace(stream=lambda state: iter([])),
+        agent_state={"messages": []},
+        include={"event"},
+        extra_data=extra_data,
+        on_finish=lambda agent_thoughts: None,
+    )
+
+    chat_stream.stream()
+
+    manager = RedisStreamAgentQueueManager(user_id=uuid.uuid4(), invoke_from=InvokeFrom.DEBUGGER)
+    assert manager.get_task_extra_data(chat_stream.agent_state["task_id"]) == extra_data
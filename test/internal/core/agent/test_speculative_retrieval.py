@@ -0,0 +1,69 @@
+from internal.core.agent.agents import get_speculative_retrieval_stats
+from internal.core.agent.agents.speculative_retrieval import SpeculativeRetrieval, query_similarity
+
+
+class _FakeRetrievalTool:
+    """记录预取与使用次数的检索工具"""
+
+    def __init__(self):
+        self.prefetched: list[str] = []
+        self.recorded: list[tuple[str, list[str]]] = []
+
+    def prefetch(self, query: str) -> list[str]:
+        self.prefetched.append(query)
+        return [f"doc:{query}"]
+
+    def use_prefetched(self, query: str, documents: list[str]) -> str:
+        self.recorded.append((query, documents))
+        return "\n".join(documents)
+
+
+def _stats_delta(before: dict, after: dict) -> dict:
+    return {key: after[key] - before[key] for key in ("started", "hits", "misses", "discarded")}
+
+
+def test_query_similarity():
+    """测试相同语句忽略大小写与标点，不相关语句相似度低"""
+    assert query_similarity("LLM是什么?", "llm 是什么") == 1.0
+    assert query_similarity("北京今天的天气", "北京今天的天气怎么样") > 0.5
+    assert query_similarity("今天北京的天气", "Python装饰器") == 0.0
+
+
+def test_speculative_retrieval_hit_records_search():
+    """测试语句相似时复用预取结果，且只有使用时才记录查询"""
+    before = get_speculative_retrieval_stats()
+    tool = _FakeRetrievalTool()
+    speculative_retrieval = SpeculativeRetrieval(tool, "北京今天的天气", 0.5)
+    speculative_retrieval.future.result(timeout=1)
+    assert tool.recorded == []
+
+    assert speculative_retrieval.take("北京今天的天气怎么样")
+    assert speculative_retrieval.result() == "doc:北京今天的天气"
+    assert tool.recorded == [("北京今天的天气", ["doc:北京今天的天气"])]
+    assert not speculative_retrieval.take("北京今天的天气")
+    assert _stats_delta(before, get_speculative_retrieval_stats()) == {
+        "started": 1, "hits": 1, "misses": 0, "discarded": 0,
+    }
+
+
+def test_speculative_retrieval_miss_and_discard_have_no_side_effects():
+    """测试语句不相似以及预取结果未被使用时都不会记录查询"""
+    before = get_speculative_retrieval_stats()
+    tool = _FakeRetrievalTool()
+    missed = SpeculativeRetrieval(tool, "北京今天的天气", 0.5)
+    discarded = SpeculativeRetrieval(tool, "Python装饰器", 0.5)
+    missed.future.result(timeout=1)
+    discarded.future.result(timeout=1)
+
+    assert not missed.take("LangGraph的状态如何持久化")
+    assert tool.prefetched == ["北京今天的天气", "Python装饰器"]
+    assert tool.recorded == []
+    assert _stats_delta(before, get_speculative_retrieval_stats()) == {
+        "started": 2, "hits": 0, "misses": 1, "discarded": 1,
+    }
+
+
+def test_speculative_retrieval_requires_prefetch_support():
+    """测试不支持预取的工具不会开启投机检索"""
+    assert SpeculativeRetrieval.supports(_FakeRetrievalTool())
+    assert not SpeculativeRetrieval.supports(object())
@@ -0,0 +1,64 @@
+import threading
+
+from internal.core.embeddings import BatchingEmbeddings, HashEmbeddings
+
+
+class _RecordingEmbeddings(HashEmbeddings):
+    """记录每次批量调用的文本嵌入模型"""
+    calls: list[list[str]] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+
+def test_batching_embeddings_coalesces_concurrent_queries():
+    """测试并发的embed_query被合并成批量调用，且结果与单独调用一致"""
+    underlying = _RecordingEmbeddings(dimension=32, calls=[])
+    embeddings = BatchingEmbeddings(underlying, batch_window_ms=50, max_batch_size=4)
+    texts = [f"query-{i % 6}" for i in range(12)]
+    results: dict[int, list[float]] = {}
+
+    def worker(index: int):
+        results[index] = embeddings.embed_query(texts[index])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(results[i] == underlying.embed_query(texts[i]) for i in range(len(texts)))
+    assert len(underlying.calls) < len(texts)
+    assert all(len(batch) <= 4 for batch in underlying.calls)
+
+
+def test_batching_embeddings_leader_returns_after_own_batch():
+    """测试leader派发完自身所在批次后即返回，剩余的query交给新的leader派发"""
+    started, release = threading.Semaphore(0), threading.Semaphore(0)
+
+    class _GatedEmbeddings(HashEmbeddings):
+        def embed_documents(self, texts: list[str]) -> list[list[float]]:
+            started.release()
+            release.acquire()
+            return super().embed_documents(texts)
+
+    embeddings = BatchingEmbeddings(_GatedEmbeddings(dimension=8), batch_window_ms=1, max_batch_size=1)
+    results: dict[str, list[float]] = {}
+    leader = threading.Thread(target=lambda: results.update(a=embeddings.embed_query("a")), daemon=True)
+    follower = threading.Thread(target=lambda: results.update(b=embeddings.embed_query("b")), daemon=True)
+
+    leader.start()
+    assert started.acquire(timeout=1)
+    follower.start()
+    while not embeddings._pending:
+        pass
+
+    release.release()
+    leader.join(timeout=1)
+    assert not leader.is_alive() and "a" in results
+
+    assert started.acquire(timeout=1)
+    release.release()
+    follower.join(timeout=1)
+    assert not follower.is_alive() and "b" in results
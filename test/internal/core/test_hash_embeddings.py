@@ -0,0 +1,48 @@
+from http import HTTPStatus
+from types import SimpleNamespace
+
+import dashscope
+import numpy as np
+
+from internal.core.embeddings import HashEmbeddings, create_embeddings
+
+
+def test_hash_embeddings_is_deterministic():
+    """测试同一文本多次嵌入得到完全一致的向量"""
+    embeddings = HashEmbeddings(dimension=256)
+    assert embeddings.embed_query("LLMOps平台") == embeddings.embed_query("LLMOps平台")
+    assert embeddings.embed_documents(["LLMOps平台"])[0] == embeddings.embed_query("LLMOps平台")
+
+
+def test_hash_embeddings_dimension_and_norm():
+    """测试向量维度以及L2归一化"""
+    vector = create_embeddings("local", "hash", 128).embed_query("hello world 你好世界")
+    assert len(vector) == 128
+    assert abs(float(np.linalg.norm(vector)) - 1.0) < 1e-5
+    assert not any(HashEmbeddings(dimension=16).embed_query("   "))
+
+
+def test_hash_embeddings_similarity():
+    """测试相似文本的余弦相似度高于不相关文本"""
+    embeddings = HashEmbeddings()
+    query, similar, other = embeddings.embed_documents(["如何创建知识库", "怎么创建一个知识库", "today is sunny"])
+    assert np.dot(query, similar) > np.dot(query, other)
+
+
+def test_dashscope_embeddings_passes_dimension_for_supported_models(monkeypatch):
+    """测试DashScope文本嵌入模型只对支持自定义维度的模型传递向量维度"""
+    calls = []
+
+    def call(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(
+            status_code=HTTPStatus.OK,
+            output={"embeddings": [{"text_index": 0, "embedding": [0.0] * kwargs.get("dimension", 1536)}]},
+        )
+
+    monkeypatch.setattr(dashscope.TextEmbedding, "call", call)
+
+    assert len(create_embeddings("dashscope", "text-embedding-v3", 512).embed_query("你好")) == 512
+    assert calls[-1]["dimension"] == 512
+    assert len(create_embeddings("dashscope", "text-embedding-v2", 512).embed_query("你好")) == 1536
+    assert "dimension" not in calls[-1]
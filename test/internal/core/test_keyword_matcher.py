@@ -0,0 +1,37 @@
+from internal.core.review import KeywordMatcher, get_keyword_matcher
+
+
+def test_keyword_matcher_contains_and_redact():
+    """测试敏感词检测以及替换，匹配忽略大小写且重叠的敏感词只替换一次"""
+    matcher = KeywordMatcher(["he", "she", "hers", "敏感词", "Bad"])
+
+    assert matcher.contains("这里有敏感词")
+    assert matcher.contains("a BAD case")
+    assert not matcher.contains("完全正常的内容")
+    assert matcher.redact("ushers bad 这是敏感词") == "u** ** 这是**"
+    assert KeywordMatcher([]).redact("bad") == "bad"
+    assert get_keyword_matcher(["bad"]) is get_keyword_matcher(["bad"])
+
+
+def test_keyword_redactor_handles_keywords_across_chunks():
+    """测试流式替换时跨内容块的敏感词同样会被替换，且与整段替换的结果一致"""
+    matcher = KeywordMatcher(["敏感词", "secret"])
+    text = "这段回复里藏着敏感词，还有一个SECRET以及secre结尾"
+    expected = matcher.redact(text)
+
+    for size in range(1, 6):
+        redactor = matcher.redactor()
+        output = "".join(redactor.feed(text[i:i + size]) for i in range(0, len(text), size))
+        output += redactor.flush()
+        assert output == expected
+        assert "敏感词" not in output and "SECRET" not in output
+
+
+def test_keyword_matcher_contains_multimodal_content():
+    """测试多模态消息的内容列表只检测文本部分，图片部分不会导致出错"""
+    matcher = get_keyword_matcher(["bad"])
+    image_part = {"type": "image_url", "image_url": {"url": "https://example.com/bad.png"}}
+
+    assert not matcher.contains([{"type": "text", "text": "x"}, image_part])
+    assert matcher.contains([{"type": "text", "text": "a BAD case"}, image_part])
+    assert matcher.contains(["plain bad text"])
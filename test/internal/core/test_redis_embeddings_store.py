@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain_core.stores import InMemoryByteStore
+
+from internal.core.embeddings import HashEmbeddings, RedisEmbeddingsStore, encode_embedding, decode_embedding
+from test.fake_redis import FakeRedis
+
+
+@pytest.mark.parametrize("codec, max_error, max_size", [
+    ("float32", 1e-7, 1 + 4 * 1024),
+    ("float16", 1e-3, 1 + 2 * 1024),
+    ("int8", 1e-2, 1 + 4 + 1024),
+])
+def test_embedding_codec_round_trip(codec, max_error, max_size):
+    """测试不同编码格式的体积以及解码误差"""
+    vector = HashEmbeddings(dimension=1024).embed_query("测试向量编码")
+    data = encode_embedding(vector, codec)
+    decoded = decode_embedding(data)
+
+    assert len(data) == max_size
+    assert len(decoded) == len(vector)
+    assert float(np.max(np.abs(np.array(decoded) - np.array(vector)))) < max_error
+
+
+def test_embedding_codec_rejects_unknown_format():
+    """测试不支持的编码格式"""
+    with pytest.raises(ValueError):
+        encode_embedding([0.1, 0.2], "bfloat16")
+    with pytest.raises(ValueError):
+        decode_embedding(b"\xff\x00")
+
+
+def test_store_mset_mget_and_refresh_ttl():
+    """测试批量写入与读取向量，未命中返回None，写入时设置过期时间并在命中时续期"""
+    redis_client = FakeRedis()
+    store = RedisEmbeddingsStore(redis_client, "text-embedding-v3", 4, codec="float16", ttl=3600)
+    store.mset([("你好", [0.5, -0.25, 0.125, 1.0]), ("世界", [0.0, 0.0, 0.0, 0.0])])
+
+    assert store.mget(["你好", "不存在", "世界"]) == [[0.5, -0.25, 0.125, 1.0], None, [0.0, 0.0, 0.0, 0.0]]
+    key = store._get_key("你好")
+    assert key.startswith("embeddings:text-embedding-v3:4:")
+    assert 3500 < redis_client.ttl(key) <= 3600
+
+    redis_client.expire(key, 10)
+    store.mget(["你好"])
+    assert redis_client.ttl(key) > 3500
+    assert store.mget([]) == []
+
+
+def test_store_migrates_legacy_cache_backed_embeddings():
+    """测试旧版CacheBackedEmbeddings写入的JSON缓存被迁移成新格式后可读取，维度不一致的旧缓存不迁移"""
+    redis_client = FakeRedis()
+    legacy_namespace = "text-embedding-v3"
+    embeddings = HashEmbeddings(dimension=8)
+
+    # 1.使用旧版CacheBackedEmbeddings写入缓存，并复制到Redis中
+    legacy_store = InMemoryByteStore()
+    CacheBackedEmbeddings.from_bytes_store(
+        embeddings, legacy_store, namespace=legacy_namespace,
+    ).embed_documents(["你好", "世界"])
+    CacheBackedEmbeddings.from_bytes_store(
+        HashEmbeddings(dimension=4), legacy_store, namespace=legacy_namespace,
+    ).embed_documents(["维度不同"])
+    for key, value in legacy_store.store.items():
+        redis_client.set(key, value)
+
+    # 2.新格式未命中时回查旧版缓存并迁移
+    store = RedisEmbeddingsStore(redis_client, "text-embedding-v3", 8, ttl=3600, legacy_namespace=legacy_namespace)
+    vectors = store.mget(["你好", "维度不同", "世界"])
+
+    assert np.allclose(vectors[0], embeddings.embed_query("你好"), atol=1e-6)
+    assert np.allclose(vectors[2], embeddings.embed_query("世界"), atol=1e-6)
+    assert vectors[1] is None
+    assert not redis_client.exists(store._get_legacy_key("你好"))
+    assert redis_client.exists(store._get_legacy_key("维度不同"))
+    assert redis_client.exists(store._get_key("你好"))
+    assert redis_client.ttl(store._get_key("你好")) > 0
+
+    # 3.迁移后直接从新格式读取
+    assert np.allclose(
+        RedisEmbeddingsStore(redis_client, "text-embedding-v3", 8).mget(["你好"])[0],
+        embeddings.embed_query("你好"),
+        atol=1e-6,
+    )
@@ -0,0 +1,25 @@
+from internal.core.deduplication import SimHashIndex, simhash, simhash_fingerprint
+
+
+def test_simhash_detects_near_duplicates():
+    """测试SimHash能识别仅页码不同的样板文本，且不会误判不同内容"""
+    disclaimer = (
+        "免责声明：本文档内容仅供参考，不构成任何投资建议或承诺。本公司对文档中信息的准确性、完整性和及时性不作任何保证，"
+        "因使用本文档内容而导致的任何直接或间接损失，本公司不承担任何责任。版权所有 © 2024 某某科技有限公司，"
+        "保留所有权利，未经书面许可不得转载。第{}页"
+    )
+    content = "LLMOps平台支持知识库管理、应用编排、工作流以及多种内置工具，帮助开发者快速构建AI应用。"
+
+    assert simhash(disclaimer.format(1)) == simhash(disclaimer.format(1))
+
+    index = SimHashIndex()
+    index.add(simhash(disclaimer.format(1)), "disclaimer")
+    assert all(index.find(simhash(disclaimer.format(page))) == "disclaimer" for page in range(2, 12))
+    assert index.find(simhash(content)) is None
+
+
+def test_simhash_fingerprint_skips_texts_without_words():
+    """测试归一化后为空的文本不生成指纹，避免这类文本指纹都为0互相误判为重复"""
+    assert simhash_fingerprint("—— !!! ==") == ""
+    assert simhash_fingerprint("") == ""
+    assert simhash_fingerprint("LLMOps平台") == f"{simhash('LLMOps平台'):016x}"
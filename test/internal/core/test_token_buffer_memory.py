@@ -0,0 +1,165 @@
+import json
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from internal.core.memory.token_buffer_memory import TokenBufferMemory
+from internal.entity.cache_entity import CONVERSATION_HISTORY_WINDOW
+from internal.entity.conversation_entity import MessageStatus
+from test.fake_redis import FakeRedis
+
+
+class StubModel:
+    """测试用模型，每条消息的token数等于内容长度"""
+
+    def __init__(self):
+        self.count_calls = 0
+
+    def convert_to_human_message(self, query: str, image_urls: list[str]) -> HumanMessage:
+        return HumanMessage(content=query)
+
+    def get_num_tokens_from_messages(self, messages: list) -> int:
+        self.count_calls += 1
+        return sum(len(message.content) for message in messages)
+
+
+class StubQuery:
+    """测试用查询，忽略过滤条件，按创建时间倒序返回消息"""
+
+    def __init__(self, db: "StubDB"):
+        self.db = db
+
+    def filter(self, *args):
+        return self
+
+    def order_by(self, *args):
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def all(self) -> list:
+        self.db.query_count += 1
+        return list(reversed(self.db.messages))[:self._limit]
+
+
+class StubDB:
+    """测试用数据库，记录查询与提交次数"""
+
+    def __init__(self, messages: list):
+        self.messages = messages
+        self.query_count = 0
+        self.commit_count = 0
+        self.session = SimpleNamespace(query=lambda model: StubQuery(self))
+
+    @contextmanager
+    def auto_commit(self):
+        yield
+        self.commit_count += 1
+
+
+def _message(conversation_id: uuid.UUID, query: str, answer: str, history_token_count: int = 0, **kwargs):
+    return SimpleNamespace(
+        id=uuid.uuid4(),
+        conversation_id=conversation_id,
+        query=query,
+        image_urls=[],
+        answer=answer,
+        history_token_count=history_token_count or len(query) + len(answer),
+        status=kwargs.get("status", MessageStatus.NORMAL),
+        is_deleted=kwargs.get("is_deleted", False),
+    )
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    """替换短期记忆使用的Redis客户端"""
+    redis_client = FakeRedis()
+    monkeypatch.setattr(TokenBufferMemory, "_get_redis_client", classmethod(lambda cls: redis_client))
+    return redis_client
+
+
+def _build_memory(messages: list) -> tuple[TokenBufferMemory, StubDB, StubModel]:
+    db, model = StubDB(messages), StubModel()
+    conversation = SimpleNamespace(id=messages[0].conversation_id if messages else uuid.uuid4())
+    return TokenBufferMemory(db=db, conversation=conversation, model_instance=model), db, model
+
+
+def test_history_window_miss_then_hit(redis_client):
+    """测试缓存未命中时从数据库加载并回填，再次获取时直接读取缓存"""
+    conversation_id = uuid.uuid4()
+    memory, db, _ = _build_memory([
+        _message(conversation_id, "问题1", "答案1"),
+        _message(conversation_id, "问题2", "答案2"),
+    ])
+
+    messages = memory.get_history_prompt_messages()
+    assert [message.content for message in messages] == ["问题1", "答案1", "问题2", "答案2"]
+    assert isinstance(messages[0], HumanMessage) and isinstance(messages[1], AIMessage)
+    assert db.query_count == 1
+    key = CONVERSATION_HISTORY_WINDOW.format(conversation_id=conversation_id)
+    assert redis_client.llen(key) == 2 and redis_client.ttl(key) > 0
+
+    assert memory.get_history_prompt_messages() == messages
+    assert db.query_count == 1
+
+
+def test_history_window_backfills_token_count(redis_client):
+    """测试未记录token数的旧消息在加载时计算并回写"""
+    conversation_id = uuid.uuid4()
+    legacy = _message(conversation_id, "旧问题", "旧答案")
+    legacy.history_token_count = 0
+    memory, db, model = _build_memory([legacy, _message(conversation_id, "问题", "答案")])
+
+    memory.get_history_prompt_messages()
+    assert legacy.history_token_count == 6
+    assert model.count_calls == 1 and db.commit_count == 1
+
+    key = CONVERSATION_HISTORY_WINDOW.format(conversation_id=conversation_id)
+    assert json.loads(redis_client.lrange(key, 0, 0)[0])["token_count"] == 6
+
+
+def test_append_message_rpushx(redis_client):
+    """测试保存消息时只追加到已存在的缓存窗口，缓存不存在时不创建，错误消息不作为短期记忆"""
+    conversation_id = uuid.uuid4()
+    memory, db, _ = _build_memory([_message(conversation_id, "问题1", "答案1")])
+    key = CONVERSATION_HISTORY_WINDOW.format(conversation_id=conversation_id)
+
+    # 1.缓存不存在时只持久化token数，不创建缓存窗口
+    message = _message(conversation_id, "问题2", "答案22")
+    message.history_token_count = 0
+    memory.append_message(message)
+    assert message.history_token_count == 7 and db.commit_count == 1
+    assert not redis_client.exists(key)
+
+    # 2.缓存存在时追加到窗口末尾
+    memory.get_history_prompt_messages()
+    memory.append_message(_message(conversation_id, "问题3", "答案3"))
+    assert [json.loads(item)["query"] for item in redis_client.lrange(key, 0, -1)] == ["问题1", "问题3"]
+
+    # 3.出错的消息不会追加
+    memory.append_message(_message(conversation_id, "问题4", "", status=MessageStatus.ERROR))
+    assert redis_client.llen(key) == 2
+
+
+def test_history_token_budget_trimming(redis_client):
+    """测试从最新的问答开始按token数截断，并同时遵循消息条数限制"""
+    conversation_id = uuid.uuid4()
+    memory, _, _ = _build_memory([
+        _message(conversation_id, "q1", "a1", history_token_count=50),
+        _message(conversation_id, "q2", "a2", history_token_count=30),
+        _message(conversation_id, "q3", "a3", history_token_count=20),
+    ])
+
+    def queries(**kwargs) -> list[str]:
+        return [message.content for message in memory.get_history_prompt_messages(**kwargs)][::2]
+
+    assert queries(max_token_limit=100) == ["q1", "q2", "q3"]
+    assert queries(max_token_limit=99) == ["q2", "q3"]
+    assert queries(max_token_limit=19) == []
+    assert queries(max_token_limit=100, message_limit=1) == ["q3"]
+    assert queries(message_limit=0) == []
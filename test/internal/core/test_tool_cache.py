@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+import pytest
+import requests
+from langchain_core.tools import StructuredTool, ToolException
+
+import internal.core.tools.tool_cache as tool_cache_module
+from internal.core.tools.api_tools.entities import ToolEntity
+from internal.core.tools.api_tools.providers import ApiProviderManager
+from internal.core.tools.builtin_tools.providers.gaode.gaode_weather import GaodeWeatherTool
+from internal.core.tools.tool_cache import CachedTool, ToolResultCache
+from test.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    """使用进程内的Redis替代真实的Redis"""
+    redis_client = FakeRedis()
+    monkeypatch.setattr(ToolResultCache, "_get_redis_client", classmethod(lambda cls: redis_client))
+    return redis_client
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可控的当前时间"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_local_cache_evicts_least_recently_used(monkeypatch):
+    """测试Redis不可用时降级为进程内缓存，并淘汰最久未使用的数据"""
+
+    def unavailable(cls):
+        raise ConnectionError("redis unavailable")
+
+    monkeypatch.setattr(ToolResultCache, "_get_redis_client", classmethod(unavailable))
+    cache = ToolResultCache(max_size=2)
+    cache.set("a", 1, 60)
+    cache.set("b", 2, 60)
+    assert cache.get("a") == (True, 1)
+    cache.set("c", 3, 60)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1) and cache.get("c") == (True, 3)
+    assert cache.stats()["local_hits"] == 3
+
+
+def test_redis_cache_shared_between_processes(redis_client):
+    """测试其他进程写入的缓存从Redis读取，并回填进程内缓存"""
+    ToolResultCache().set("key", {"answer": 42}, 60)
+    cache = ToolResultCache()
+
+    assert cache.get("key") == (True, {"answer": 42})
+    assert cache.get("key") == (True, {"answer": 42})
+    assert cache.stats()["redis_hits"] == 1 and cache.stats()["local_hits"] == 1
+
+
+def test_cache_expires_after_ttl(redis_client, clock):
+    """测试缓存时间到期后进程内缓存与Redis缓存都不再命中"""
+    cache = ToolResultCache()
+    cache.set("key", "value", 10)
+    clock[0] += 9
+    assert cache.get("key") == (True, "value")
+    clock[0] += 2
+    assert cache.get("key") == (False, None)
+
+
+def test_cached_tool_caches_results_but_not_errors(redis_client, monkeypatch):
+    """测试相同参数只调用一次原始工具，执行出错时不写入缓存"""
+    monkeypatch.setattr(tool_cache_module, "_tool_result_cache", ToolResultCache())
+    calls = []
+
+    def search(query: str) -> str:
+        """搜索工具"""
+        calls.append(query)
+        if query == "error":
+            raise ValueError("search failed")
+        return f"result:{query}"
+
+    tool = CachedTool.wrap(StructuredTool.from_function(search), tool_id="test:search", cache_ttl=60)
+    assert tool.invoke_with_cache({"query": "a"}) == ("result:a", False)
+    assert tool.invoke_with_cache({"query": "a"}) == ("result:a", True)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            tool.invoke({"query": "error"})
+    assert calls == ["a", "error", "error"]
+
+
+@pytest.mark.parametrize("method, cache_ttl, cached", [
+    ("get", 0, False),
+    ("get", 60, True),
+    ("post", 60, False),
+])
+def test_api_tool_cache_is_opt_in(method, cache_ttl, cached):
+    """测试API工具只有作者开启缓存的GET请求才会包装结果缓存"""
+    tool = ApiProviderManager().get_tool(ToolEntity(
+        id="provider", name="weather", url="https://example.com/weather", method=method, cache_ttl=cache_ttl,
+    ))
+    assert isinstance(tool, CachedTool) == cached
+
+
+class _Response:
+    """测试用的HTTP响应"""
+
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+        self.ok = status_code < 400
+
+
+def test_api_tool_failures_are_not_cached(redis_client, monkeypatch):
+    """测试开启缓存的API工具请求失败(非2xx)时不写入缓存，未开启缓存时失败响应仍作为结果返回"""
+    monkeypatch.setattr(tool_cache_module, "_tool_result_cache", ToolResultCache())
+    responses = [_Response(503, "unavailable"), _Response(200, "sunny"), _Response(500, "boom")]
+    monkeypatch.setattr(requests, "request", lambda **kwargs: responses.pop(0))
+
+    tool = ApiProviderManager().get_tool(ToolEntity(
+        id="provider", name="weather", url="https://example.com/weather", method="get", cache_ttl=60,
+    ))
+    with pytest.raises(ToolException):
+        tool.invoke_with_cache({})
+    assert tool.invoke_with_cache({}) == ("sunny", False)
+    assert tool.invoke_with_cache({}) == ("sunny", True)
+
+    uncached = ApiProviderManager().get_tool(ToolEntity(
+        id="provider", name="weather", url="https://example.com/weather", method="get",
+    ))
+    assert uncached.invoke({}) == "boom"
+
+
+def test_builtin_tool_failures_are_not_cached(redis_client, monkeypatch):
+    """测试内置工具失败时抛出ToolException，缓存包装后不写入缓存，未包装时失败信息作为结果返回"""
+    monkeypatch.setattr(tool_cache_module, "_tool_result_cache", ToolResultCache())
+    monkeypatch.setenv("GAODE_API_KEY", "key")
+
+    def unavailable():
+        raise ConnectionError("network down")
+
+    monkeypatch.setattr(requests, "session", unavailable)
+
+    assert GaodeWeatherTool().invoke({"city": "广州"}) == "获取广州天气预报信息失败"
+
+    tool = CachedTool.wrap(GaodeWeatherTool(), tool_id="builtin:gaode:gaode_weather", cache_ttl=600)
+    for _ in range(2):
+        with pytest.raises(ToolException):
+            tool.invoke_with_cache({"city": "广州"})
+    assert tool_cache_module.get_tool_result_cache().stats()["misses"] == 2
+
+
+def test_cached_tool_async_failures_are_not_cached(redis_client, monkeypatch):
+    """测试异步调用失败时同样不写入缓存"""
+    monkeypatch.setattr(tool_cache_module, "_tool_result_cache", ToolResultCache())
+    calls = []
+
+    def flaky(query: str) -> str:
+        """不稳定的工具"""
+        calls.append(query)
+        if len(calls) == 1:
+            raise ToolException("temporarily unavailable")
+        return f"result:{query}"
+
+    tool = CachedTool.wrap(
+        StructuredTool.from_function(flaky, handle_tool_error=True), tool_id="test:flaky", cache_ttl=60,
+    )
+    with pytest.raises(ToolException):
+        asyncio.run(tool.ainvoke_with_cache({"query": "a"}))
+    assert asyncio.run(tool.ainvoke_with_cache({"query": "a"})) == ("result:a", False)
+    assert asyncio.run(tool.ainvoke_with_cache({"query": "a"})) == ("result:a", True)
+    assert calls == ["a", "a"]
@@ -0,0 +1,43 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from internal.core.tracing import InMemoryTracer, NoopTracer
+
+
+def test_in_memory_tracer_records_nested_spans():
+    """测试内存追踪器记录跨度的父子关系、属性、事件以及异常，复制上下文后线程池中的跨度同样可以关联父跨度"""
+    tracer = InMemoryTracer()
+
+    def invoke_tool():
+        with tracer.span("agent.tool", {"tool": "current_time"}):
+            pass
+
+    with tracer.span("agent.run", {"task_id": "1"}) as run_span:
+        run_span.set_attribute("queue_delay_ms", 1.5)
+        with tracer.span("llm.call") as llm_span:
+            llm_span.add_event("first_token")
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(contextvars.copy_context().run, invoke_tool).result()
+        with pytest.raises(ValueError):
+            with tracer.span("agent.node.tools"):
+                raise ValueError("工具出错")
+
+    exporter = tracer.exporter
+    run, = exporter.get_finished_spans("agent.run")
+    llm, = exporter.get_finished_spans("llm.call")
+    node, = exporter.get_finished_spans("agent.node.tools")
+    tool, = exporter.get_finished_spans("agent.tool")
+    assert run.parent_id is None and run.attributes == {"task_id": "1", "queue_delay_ms": 1.5}
+    assert llm.parent_id == run.span_id and llm.events[0][0] == "first_token"
+    assert tool.parent_id == run.span_id and tool.attributes == {"tool": "current_time"}
+    assert node.parent_id == run.span_id and isinstance(node.exception, ValueError)
+    assert run.duration_ms >= llm.duration_ms
+
+
+def test_noop_tracer_is_silent():
+    """测试空追踪器可以正常嵌套使用且不记录任何数据"""
+    with NoopTracer().span("agent.run") as span:
+        span.set_attributes({"task_id": "1"})
+        span.add_event("first_token")
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import uuid
+from types import SimpleNamespace
+
+from flask import Flask
+
+from internal.core.agent.agents import AgentChatStream
+from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
+from internal.exception import TooManyRequestsException
+from internal.server import Asgi
+
+
+def _build_asgi(agent_astream, calls: list) -> Asgi:
+    """构建只有一个会话流端点的ASGI应用，会话流使用桩智能体"""
+    app = Flask(__name__)
+    app.register_error_handler(
+        TooManyRequestsException,
+        lambda e: ({"message": e.message}, 429, {"Retry-After": str(e.retry_after)}),
+    )
+
+    @app.post("/chat")
+    def chat():
+        return {"message": "sync"}
+
+    def chat_stream():
+        return AgentChatStream(
+            agent=SimpleNamespace(astream=agent_astream),
+            agent_state={},
+            include={"event", "answer"},
+            extra_data={},
+            on_finish=lambda agent_thoughts: calls.append(("finish", len(agent_thoughts))),
+            on_reject=lambda: calls.append(("reject", None)),
+            coalesce_ms=0,
+            coalesce_bytes=0,
+        )
+
+    return Asgi(app, stream_views={"chat": chat_stream})
+
+
+def _request(asgi: Asgi) -> list[dict]:
+    """发起会话流请求，返回发送的ASGI消息"""
+    messages = []
+    requests = [{"type": "http.request", "body": b"{}", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop(0)
+        await asyncio.sleep(10)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/chat", "headers": [], "query_string": b""}
+    asyncio.run(asgi(scope, receive, send))
+    return messages
+
+
+def test_asgi_streams_agent_thoughts():
+    """测试会话流端点在事件循环中逐帧输出SSE数据，结束后执行持久化回调"""
+
+    async def agent_astream(agent_state):
+        task_id = uuid.uuid4()
+        yield AgentThought(id=uuid.uuid4(), task_id=task_id, event=QueueEvent.AGENT_MESSAGE, answer="你好")
+        yield AgentThought(id=uuid.uuid4(), task_id=task_id, event=QueueEvent.AGENT_END)
+
+    calls = []
+    messages = _request(_build_asgi(agent_astream, calls))
+
+    assert messages[0]["status"] == 200
+    assert (b"content-type", b"text/event-stream; charset=utf-8") in messages[0]["headers"]
+    body = b"".join(message.get("body", b"") for message in messages[1:]).decode("utf-8")
+    assert '"event":"agent_message","answer":"你好"' in body and '"event":"agent_end"' in body
+    assert messages[-1] == {"type": "http.response.body", "body": b""}
+    assert calls == [("finish", 2)]
+
+
+def test_asgi_rejects_when_async_agents_saturated():
+    """测试异步执行名额已满时返回429以及Retry-After，并执行拒绝回调"""
+
+    def agent_astream(agent_state):
+        raise TooManyRequestsException("当前请求过多，请稍后重试", retry_after=3)
+
+    calls = []
+    messages = _request(_build_asgi(agent_astream, calls))
+
+    assert messages[0]["status"] == 429
+    assert (b"retry-after", b"3") in messages[0]["headers"]
+    assert json.loads(messages[1]["body"])["message"] == "当前请求过多，请稍后重试"
+    assert calls == [("reject", None)]
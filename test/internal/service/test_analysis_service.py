@@ -0,0 +1,101 @@
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from internal.entity.analysis_entity import AnalysisGranularity, MAX_ANALYSIS_BUCKETS
+from internal.exception import ValidateErrorException
+from internal.schema.analysis_schema import GetAppAnalysisTrendReq
+from internal.service.analysis_service import AnalysisService
+from test.fake_redis import FakeRedis
+
+
+@pytest.mark.parametrize("granularity, expected", [
+    (AnalysisGranularity.HOUR, datetime(2024, 10, 3, 15)),
+    (AnalysisGranularity.DAY, datetime(2024, 10, 3)),
+    (AnalysisGranularity.WEEK, datetime(2024, 9, 30)),
+])
+def test_truncate_datetime(granularity, expected):
+    """测试按时间粒度截断时间，与date_trunc一致，周以周一为起点(2024-10-03为周四)"""
+    assert AnalysisService.truncate_datetime(datetime(2024, 10, 3, 15, 42, 7, 123), granularity) == expected
+    assert AnalysisService.truncate_datetime(expected, granularity) == expected
+
+
+def _analysis_service(stats: list) -> AnalysisService:
+    app = SimpleNamespace(id=uuid.uuid4())
+    analysis_service = AnalysisService(
+        db=None,
+        redis_client=FakeRedis(),
+        app_service=SimpleNamespace(get_app=lambda app_id, account: app),
+        app_stat_service=None,
+    )
+    analysis_service.aggregate_messages_by_time_range = lambda app, start_at, end_at, granularity: stats
+    return analysis_service
+
+
+def _req(start_at: datetime, end_at: datetime, granularity: AnalysisGranularity) -> SimpleNamespace:
+    return SimpleNamespace(
+        start_at=SimpleNamespace(data=int(start_at.timestamp())),
+        end_at=SimpleNamespace(data=int(end_at.timestamp())),
+        granularity=SimpleNamespace(data=granularity.value),
+    )
+
+
+def test_app_analysis_trend_fills_empty_buckets():
+    """测试趋势数据从截断后的开始时间生成全部时间桶，没有消息的时间桶各项指标为0"""
+    week_start = datetime(2024, 9, 30)
+    stat = SimpleNamespace(
+        bucket=week_start + timedelta(weeks=1), message_count=6, account_count=2, conversation_count=3,
+        total_token_count=60, latency_sum=3.0, total_price=1.5,
+    )
+    analysis_service = _analysis_service([stat])
+
+    trend = analysis_service.get_app_analysis_trend(
+        uuid.uuid4(), _req(datetime(2024, 10, 2, 8), datetime(2024, 10, 20), AnalysisGranularity.WEEK), None,
+    )
+
+    assert trend["total_messages_trend"]["x_axis"] == [
+        int((week_start + timedelta(weeks=week)).timestamp()) for week in range(3)
+    ]
+    assert trend["total_messages_trend"]["y_axis"] == [0, 6, 0]
+    assert trend["active_accounts_trend"]["y_axis"] == [0, 2, 0]
+    assert trend["avg_of_conversation_messages_trend"]["y_axis"] == [0.0, 2.0, 0.0]
+    assert trend["cost_consumption_trend"]["y_axis"] == [0.0, 1.5, 0.0]
+
+
+def test_app_analysis_trend_rejects_too_many_buckets():
+    """测试时间桶数量超过上限时提示增大时间粒度，恰好达到上限时正常返回"""
+    analysis_service = _analysis_service([])
+    start_at = datetime(2024, 10, 1)
+
+    trend = analysis_service.get_app_analysis_trend(
+        uuid.uuid4(), _req(start_at, start_at + timedelta(hours=MAX_ANALYSIS_BUCKETS), AnalysisGranularity.HOUR), None,
+    )
+    assert len(trend["total_messages_trend"]["x_axis"]) == MAX_ANALYSIS_BUCKETS
+
+    with pytest.raises(ValidateErrorException):
+        analysis_service.get_app_analysis_trend(
+            uuid.uuid4(),
+            _req(start_at, start_at + timedelta(hours=MAX_ANALYSIS_BUCKETS + 1), AnalysisGranularity.HOUR),
+            None,
+        )
+
+
+@pytest.mark.parametrize("end_offset, granularity, is_valid", [
+    (3600, "hour", True),
+    (0, "day", False),
+    (-3600, "day", False),
+    (3600, "month", False),
+])
+def test_get_app_analysis_trend_req_validation(app, end_offset, granularity, is_valid):
+    """测试结束时间必须大于开始时间，时间粒度只能是hour/day/week"""
+    start_at = int(datetime(2024, 10, 1).timestamp())
+    with app.test_request_context():
+        req = GetAppAnalysisTrendReq(MultiDict({
+            "start_at": start_at, "end_at": start_at + end_offset, "granularity": granularity,
+        }))
+        assert req.validate() is is_valid
+        if end_offset <= 0:
+            assert "end_at" in req.errors
@@ -0,0 +1,265 @@
+import uuid
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from internal.model import Message
+from internal.service.analysis_service import AnalysisService
+from internal.service.app_stat_service import AppStatService
+from test.fake_redis import FakeRedis
+
+
+def _stat(bucket: datetime, message_count: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        bucket=bucket, message_count=message_count, account_count=1, conversation_count=1,
+        total_token_count=message_count * 10, latency_sum=1.0, total_price=0.1,
+    )
+
+
+def test_record_message_swallows_redis_errors():
+    """测试统计出错时只记录日志，不影响消息保存后的其他处理"""
+
+    class _BrokenRedis:
+        def pipeline(self, *args, **kwargs):
+            raise ConnectionError("redis unavailable")
+
+    message = SimpleNamespace(
+        id=uuid.uuid4(), app_id=uuid.uuid4(), answer="你好", created_at=datetime.now(),
+        created_by=uuid.uuid4(), conversation_id=uuid.uuid4(), total_token_count=10, latency=1.0, total_price=0,
+    )
+    AppStatService(db=None, redis_client=_BrokenRedis()).record_message(message)
+
+
+def test_app_analysis_fills_missing_days_from_messages(monkeypatch):
+    """测试每日统计汇总只覆盖部分日期时，缺少的日期在数据库中按天聚合补齐，已有的汇总不被覆盖"""
+    today_midnight = datetime.combine(datetime.now(), datetime.min.time())
+    days = [today_midnight - timedelta(days=14 - day) for day in range(14)]
+    daily_stats = {day.date(): _stat(day, 10) for day in days[-3:]}
+    app = SimpleNamespace(id=uuid.uuid4())
+    analysis_service = AnalysisService(
+        db=None,
+        redis_client=FakeRedis(),
+        app_service=SimpleNamespace(get_app=lambda app_id, account: app),
+        app_stat_service=SimpleNamespace(
+            get_daily_stats=lambda app_id, start_date, end_date: dict(daily_stats),
+            get_covered_since=lambda app_id: None,
+            get_distinct_counts=lambda app_id, stats: None,
+        ),
+    )
+    aggregated_ranges = []
+
+    def aggregate(app, start_at, end_at, granularity):
+        aggregated_ranges.append((start_at, end_at))
+        return [_stat(day, 99 if day.date() in daily_stats else 1) for day in days if day >= start_at]
+
+    monkeypatch.setattr(analysis_service, "aggregate_messages_by_time_range", aggregate)
+    monkeypatch.setattr(analysis_service, "get_distinct_counts_by_time_range", lambda app, start_at, end_at: (1, 1))
+    app_analysis = analysis_service.get_app_analysis(app.id, SimpleNamespace())
+
+    assert aggregated_ranges == [(days[0], today_midnight)]
+    assert app_analysis["total_messages_trend"]["y_axis"] == [1, 1, 1, 1, 10, 10, 10]
+    assert app_analysis["total_messages"]["data"] == 34
+
+
+class _StubQuery:
+    def __init__(self, rows: list):
+        self.rows = rows
+
+    def filter(self, *args):
+        return self
+
+    def group_by(self, *args):
+        return self
+
+    def distinct(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class _StubSession:
+    """按查询的字段返回回填用到的聚合行、去重用户行与去重会话行"""
+
+    def __init__(self, stat_rows: list, account_rows: list, conversation_rows: list):
+        self.stat_rows = stat_rows
+        self.account_rows = account_rows
+        self.conversation_rows = conversation_rows
+
+    def query(self, *columns):
+        if len(columns) > 3:
+            return _StubQuery(self.stat_rows)
+        return _StubQuery(self.account_rows if columns[2] is Message.created_by else self.conversation_rows)
+
+
+def _backfill_service(monkeypatch, redis_client: FakeRedis, app_id, stat_date: date, account_id, conversation_id):
+    stat_rows = [(app_id, stat_date, 1, 1, 1, 10, 1.0, 0)]
+    db = SimpleNamespace(session=_StubSession(
+        stat_rows, [(app_id, stat_date, account_id)], [(app_id, stat_date, conversation_id)],
+    ))
+    app_stat_service = AppStatService(db=db, redis_client=redis_client)
+    upserts = []
+    monkeypatch.setattr(app_stat_service, "_upsert", lambda values, accumulate: upserts.append((values, accumulate)))
+    return app_stat_service, upserts
+
+
+def test_backfill_seeds_dedup_sets_so_live_updates_do_not_double_count(monkeypatch):
+    """测试当天中途回填后，已回填的用户与会话再次发消息时不会被重复计入当日的用户数与会话数"""
+    app_id, account_id, conversation_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    today = date.today()
+    app_stat_service, upserts = _backfill_service(
+        monkeypatch, FakeRedis(), app_id, today, account_id, conversation_id,
+    )
+
+    assert app_stat_service.backfill_daily_stats(today, today) == 1
+    app_stat_service.record_message(SimpleNamespace(
+        id=uuid.uuid4(), app_id=app_id, answer="你好", created_at=datetime.now(), created_by=account_id,
+        conversation_id=conversation_id, total_token_count=10, latency=1.0, total_price=0,
+    ))
+
+    live_values, accumulate = upserts[-1]
+    assert accumulate is True
+    assert live_values[0]["message_count"] == 1
+    assert live_values[0]["account_count"] == 0
+    assert live_values[0]["conversation_count"] == 0
+
+
+def test_backfill_advances_watermark_only_when_reaching_recent_days(monkeypatch):
+    """测试回填覆盖到最近的日期时前移水位线，只回填历史日期时水位线不变"""
+    redis_client = FakeRedis()
+    app_id = uuid.uuid4()
+    today = date.today()
+    app_stat_service, _ = _backfill_service(monkeypatch, redis_client, app_id, today, uuid.uuid4(), uuid.uuid4())
+
+    assert app_stat_service.get_covered_since(app_id) is None
+    app_stat_service.backfill_daily_stats(today - timedelta(days=30), today - timedelta(days=20))
+    assert app_stat_service.get_covered_since(app_id) is None
+
+    app_stat_service.backfill_daily_stats(today - timedelta(days=3), today, app_id)
+    assert app_stat_service.get_covered_since(app_id) == today - timedelta(days=3)
+    assert app_stat_service.get_covered_since(uuid.uuid4()) is None
+
+    app_stat_service.backfill_daily_stats(today - timedelta(days=13), today)
+    assert app_stat_service.get_covered_since(app_id) == today - timedelta(days=13)
+    assert app_stat_service.get_covered_since(uuid.uuid4()) == today - timedelta(days=13)
+
+
+def test_distinct_counts_union_daily_hyperloglogs():
+    """测试多天的去重用户数与会话数由每日HyperLogLog合并得到，有消息的日期缺少HyperLogLog时返回None"""
+    redis_client = FakeRedis()
+    app_stat_service = AppStatService(db=None, redis_client=redis_client)
+    app_id, account_id = uuid.uuid4(), uuid.uuid4()
+    upserts = []
+    app_stat_service._upsert = lambda values, accumulate: upserts.append(values)
+    today = datetime.combine(date.today(), datetime.min.time())
+    for day in range(2):
+        app_stat_service.record_message(SimpleNamespace(
+            id=uuid.uuid4(), app_id=app_id, answer="你好", created_at=today - timedelta(days=day) + timedelta(hours=1),
+            created_by=account_id, conversation_id=uuid.uuid4(), total_token_count=10, latency=1.0, total_price=0,
+        ))
+    stats = {
+        (today - timedelta(days=day)).date(): SimpleNamespace(message_count=1)
+        for day in range(2)
+    }
+
+    assert app_stat_service.get_distinct_counts(app_id, stats) == (1, 2)
+    assert app_stat_service.get_distinct_counts(app_id, {date.today(): SimpleNamespace(message_count=0)}) == (0, 0)
+    stats[date.today() - timedelta(days=5)] = SimpleNamespace(message_count=3)
+    assert app_stat_service.get_distinct_counts(app_id, stats) is None
+
+
+def test_app_analysis_reads_quiet_days_after_watermark_as_zero(monkeypatch):
+    """测试水位线之后没有汇总行的日期按0计算，不再回退到消息表聚合，去重数量来自每日HyperLogLog"""
+    today_midnight = datetime.combine(datetime.now(), datetime.min.time())
+    days = [today_midnight - timedelta(days=14 - day) for day in range(14)]
+    daily_stats = {day.date(): _stat(day, 10) for day in days[-3:]}
+    app = SimpleNamespace(id=uuid.uuid4())
+    analysis_service = AnalysisService(
+        db=None,
+        redis_client=FakeRedis(),
+        app_service=SimpleNamespace(get_app=lambda app_id, account: app),
+        app_stat_service=SimpleNamespace(
+            get_daily_stats=lambda app_id, start_date, end_date: dict(daily_stats),
+            get_covered_since=lambda app_id: days[0].date(),
+            get_distinct_counts=lambda app_id, stats: (len(stats), len(stats)),
+        ),
+    )
+
+    def fail(*args, **kwargs):
+        raise AssertionError("不应回退到消息表统计")
+
+    monkeypatch.setattr(analysis_service, "aggregate_messages_by_time_range", fail)
+    monkeypatch.setattr(analysis_service, "get_distinct_counts_by_time_range", fail)
+    app_analysis = analysis_service.get_app_analysis(app.id, SimpleNamespace())
+
+    assert app_analysis["total_messages_trend"]["y_axis"] == [0, 0, 0, 0, 10, 10, 10]
+    assert app_analysis["total_messages"]["data"] == 30
+    assert app_analysis["active_accounts"]["data"] == 3
+
+
+def _message(app_id, created_at: datetime, account_id=None, conversation_id=None) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=uuid.uuid4(), app_id=app_id, answer="你好", created_at=created_at,
+        created_by=account_id or uuid.uuid4(), conversation_id=conversation_id or uuid.uuid4(),
+        total_token_count=10, latency=0.5, total_price=0.25,
+    )
+
+
+def test_live_stats_accumulate_per_hour_and_union_distinct_counts():
+    """测试实时计数按小时累加，整个时间段的用户数与会话数为多个小时HyperLogLog合并去重后的数量"""
+    app_stat_service = AppStatService(db=None, redis_client=FakeRedis())
+    app_id, account_id, conversation_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    hours = [datetime(2024, 10, 1, 9), datetime(2024, 10, 1, 10), datetime(2024, 10, 1, 11)]
+    for message in [
+        _message(app_id, hours[0].replace(minute=5), account_id, conversation_id),
+        _message(app_id, hours[0].replace(minute=30), account_id, conversation_id),
+        _message(app_id, hours[0].replace(minute=45)),
+        _message(app_id, hours[1].replace(minute=1), account_id, conversation_id),
+        _message(uuid.uuid4(), hours[1].replace(minute=1)),
+    ]:
+        app_stat_service._record_live_stat(message)
+
+    live_stats = app_stat_service.get_live_stats(app_id, hours)
+
+    assert [stat["hour"] for stat in live_stats["hourly"]] == hours
+    assert [stat["message_count"] for stat in live_stats["hourly"]] == [3, 1, 0]
+    assert [stat["account_count"] for stat in live_stats["hourly"]] == [2, 1, 0]
+    assert [stat["total_token_count"] for stat in live_stats["hourly"]] == [30, 10, 0]
+    assert live_stats["hourly"][0]["latency_sum"] == 1.5
+    assert live_stats["hourly"][0]["total_price"] == 0.75
+    assert live_stats["account_count"] == 2
+    assert live_stats["conversation_count"] == 2
+
+
+def test_app_today_analysis_response():
+    """测试今日实时统计的返回结构：按小时的趋势以及只有data字段的概览指标"""
+    redis_client = FakeRedis()
+    app_stat_service = AppStatService(db=None, redis_client=redis_client)
+    app = SimpleNamespace(id=uuid.uuid4())
+    account_id = uuid.uuid4()
+    now = datetime.now()
+    for _ in range(2):
+        app_stat_service._record_live_stat(_message(app.id, now, account_id))
+    analysis_service = AnalysisService(
+        db=None,
+        redis_client=redis_client,
+        app_service=SimpleNamespace(get_app=lambda app_id, account: app),
+        app_stat_service=app_stat_service,
+    )
+
+    today_analysis = analysis_service.get_app_today_analysis(app.id, SimpleNamespace())
+
+    assert set(today_analysis) == {
+        "total_messages_trend", "active_accounts_trend", "avg_of_conversation_messages_trend",
+        "cost_consumption_trend", "total_messages", "active_accounts", "avg_of_conversation_messages",
+        "token_output_rate", "cost_consumption",
+    }
+    today_midnight = datetime.combine(now, datetime.min.time())
+    assert today_analysis["total_messages_trend"]["x_axis"] == [
+        int((today_midnight + timedelta(hours=hour)).timestamp()) for hour in range(now.hour + 1)
+    ]
+    assert today_analysis["total_messages_trend"]["y_axis"] == [0] * now.hour + [2]
+    assert today_analysis["total_messages"] == {"data": 2}
+    assert today_analysis["active_accounts"] == {"data": 1}
+    assert today_analysis["avg_of_conversation_messages"] == {"data": 1.0}
+    assert today_analysis["token_output_rate"] == {"data": 20.0}
+    assert today_analysis["cost_consumption"] == {"data": 0.5}
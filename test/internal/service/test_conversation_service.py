@@ -0,0 +1,181 @@
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+import internal.service.conversation_service as conversation_service_module
+from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
+from internal.entity.cache_entity import (
+    CONVERSATION_PENDING_SUMMARY,
+    CONVERSATION_SUMMARY_SCHEDULED,
+    CONVERSATION_TASK_SLOTS,
+)
+from internal.model import Conversation
+from internal.service.conversation_service import ConversationService
+from test.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def scheduled(monkeypatch):
+    """记录调度的摘要任务，不投递到Celery"""
+    calls = []
+    monkeypatch.setattr(
+        conversation_service_module.summarize_conversation,
+        "apply_async",
+        lambda args, countdown=None: calls.append((args, countdown)),
+    )
+    return calls
+
+
+@pytest.fixture
+def conversation_service():
+    return ConversationService(db=None, redis_client=FakeRedis(), app_stat_service=None)
+
+
+def test_schedule_summary_debounces_turns(conversation_service, scheduled):
+    """防抖窗口内的多轮问答只调度一次摘要任务"""
+    conversation_id = uuid.uuid4()
+    conversation_service._schedule_summary(conversation_id, "q1", "a1")
+    conversation_service._schedule_summary(conversation_id, "q2", "a2")
+
+    assert len(scheduled) == 1
+    pending_key = CONVERSATION_PENDING_SUMMARY.format(conversation_id=conversation_id)
+    assert conversation_service.redis_client.llen(pending_key) == 2
+
+
+def test_summarize_pending_turns_reschedules_new_turns(conversation_service, scheduled, monkeypatch):
+    """摘要执行期间加入的问答会在任务结束后重新调度"""
+    conversation_id = uuid.uuid4()
+    conversation_service._schedule_summary(conversation_id, "q1", "a1")
+    conversation = SimpleNamespace(summary="")
+    summarized_turns = []
+
+    def summary_turns(turns, old_summary=""):
+        summarized_turns.append(turns)
+        conversation_service.redis_client.rpush(
+            CONVERSATION_PENDING_SUMMARY.format(conversation_id=conversation_id),
+            json.dumps({"query": "q2", "answer": "a2"}),
+        )
+        return "summary"
+
+    monkeypatch.setattr(conversation_service, "get", lambda model, _id: conversation)
+    monkeypatch.setattr(conversation_service, "update", lambda model, **kwargs: model.__dict__.update(kwargs))
+    monkeypatch.setattr(conversation_service, "summary_turns", summary_turns)
+    conversation_service.summarize_pending_turns(conversation_id)
+
+    assert summarized_turns == [[{"query": "q1", "answer": "a1"}]]
+    assert conversation.summary == "summary"
+    assert len(scheduled) == 2
+    scheduled_key = CONVERSATION_SUMMARY_SCHEDULED.format(conversation_id=conversation_id)
+    assert conversation_service.redis_client.exists(scheduled_key)
+
+
+def test_side_task_slot_limits_concurrency(conversation_service, monkeypatch):
+    """名额占满时无法获取，归还后可以再次获取"""
+    monkeypatch.setattr(conversation_service_module, "SIDE_TASK_MAX_CONCURRENCY", 1)
+    with conversation_service.side_task_slot() as acquired:
+        assert acquired
+        with conversation_service.side_task_slot() as nested_acquired:
+            assert not nested_acquired
+    with conversation_service.side_task_slot() as acquired:
+        assert acquired
+    assert conversation_service.redis_client.zcard(CONVERSATION_TASK_SLOTS) == 0
+
+
+def test_side_task_slot_reclaims_expired_leases(conversation_service, monkeypatch):
+    """worker被强制终止未归还的名额在租约到期后会被清理"""
+    monkeypatch.setattr(conversation_service_module, "SIDE_TASK_MAX_CONCURRENCY", 1)
+    conversation_service.redis_client.zadd(CONVERSATION_TASK_SLOTS, {"leaked": time.time() - 1})
+    with conversation_service.side_task_slot() as acquired:
+        assert acquired
+
+
+class _StubDB:
+    """记录事务中执行的语句，删除语句返回指定的删除条数"""
+
+    def __init__(self, deleted: int = 0):
+        self.statements = []
+        self.commits = 0
+        self.session = SimpleNamespace(execute=self._execute)
+        self.deleted = deleted
+
+    def _execute(self, statement, params=None):
+        self.statements.append((statement, params))
+        return SimpleNamespace(rowcount=self.deleted if statement.is_delete else len(params or []))
+
+    @contextmanager
+    def auto_commit(self):
+        yield
+        self.commits += 1
+
+
+def _persist_service(monkeypatch, scheduled, deleted: int = 0):
+    """构建使用记录数据库的会话服务，返回服务、会话、消息以及统计记录"""
+    conversation = SimpleNamespace(id=uuid.uuid4(), is_new=True)
+    message = SimpleNamespace(id=uuid.uuid4(), query="你好", answer="", status="normal", error="")
+    recorded = []
+    conversation_service = ConversationService(
+        db=_StubDB(deleted), redis_client=FakeRedis(), app_stat_service=SimpleNamespace(record_message=recorded.append),
+    )
+    monkeypatch.setattr(
+        conversation_service, "get", lambda model, _id: conversation if model is Conversation else message,
+    )
+    monkeypatch.setattr(conversation_service, "_schedule_conversation_name", lambda *args: scheduled.append(args))
+    return conversation_service, conversation, message, recorded
+
+
+def _thoughts(task_id: uuid.UUID, final_event: QueueEvent) -> list[AgentThought]:
+    return [
+        AgentThought(id=uuid.uuid4(), task_id=task_id, event=QueueEvent.AGENT_THOUGHT, thought="思考", latency=0.5),
+        AgentThought(
+            id=uuid.uuid4(), task_id=task_id, event=QueueEvent.AGENT_MESSAGE, answer="你好呀",
+            message=[{"role": "user", "content": "你好"}], total_token_count=12, latency=1.0,
+        ),
+        AgentThought(id=uuid.uuid4(), task_id=task_id, event=final_event, observation="已停止"),
+        AgentThought(id=uuid.uuid4(), task_id=task_id, event=QueueEvent.AGENT_MESSAGE, answer="忽略"),
+    ]
+
+
+@pytest.mark.parametrize("final_event", [QueueEvent.STOP, QueueEvent.ERROR])
+def test_persist_agent_thoughts_bulk_insert_and_message_update(scheduled, monkeypatch, final_event):
+    """测试推理步骤在一个事务中批量插入并更新消息，停止/错误事件更新消息状态且之后的事件被忽略"""
+    conversation_service, conversation, message, recorded = _persist_service(monkeypatch, scheduled)
+    conversation_service.persist_agent_thoughts(
+        account_id=uuid.uuid4(), app_id=uuid.uuid4(), app_config={"long_term_memory": {"enable": True}},
+        conversation_id=conversation.id, message_id=message.id, agent_thoughts=_thoughts(uuid.uuid4(), final_event),
+    )
+
+    db = conversation_service.db
+    assert db.commits == 1
+    assert len(db.statements) == 1
+    statement, rows = db.statements[0]
+    assert statement.is_insert
+    assert [(row["position"], row["event"]) for row in rows] == [
+        (1, QueueEvent.AGENT_THOUGHT), (2, QueueEvent.AGENT_MESSAGE),
+    ]
+    assert message.answer == "你好呀"
+    assert message.total_token_count == 12
+    assert message.latency == 1.5
+    assert (message.status, message.error) == (final_event, "已停止")
+    assert recorded == [message]
+    assert len(scheduled) == 2
+
+
+def test_persist_agent_thoughts_replace_existing_is_idempotent(scheduled, monkeypatch):
+    """测试后台任务重新执行时先删除已写入的推理步骤，已写入过时不再重复统计与调度任务"""
+    conversation_service, conversation, message, recorded = _persist_service(monkeypatch, scheduled, deleted=2)
+    conversation_service.persist_agent_thoughts(
+        account_id=uuid.uuid4(), app_id=uuid.uuid4(), app_config={"long_term_memory": {"enable": True}},
+        conversation_id=conversation.id, message_id=message.id,
+        agent_thoughts=_thoughts(uuid.uuid4(), QueueEvent.STOP), replace_existing=True,
+    )
+
+    statements = [statement for statement, _ in conversation_service.db.statements]
+    assert [statement.is_delete for statement in statements] == [True, False]
+    assert statements[1].is_insert
+    assert message.answer == "你好呀"
+    assert recorded == []
+    assert scheduled == []
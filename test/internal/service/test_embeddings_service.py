@@ -0,0 +1,24 @@
+import pytest
+
+from internal.service.embeddings_service import EmbeddingsService
+from test.fake_redis import FakeRedis
+
+
+@pytest.mark.parametrize("provider, model, dimension, namespace, legacy_namespace", [
+    ("dashscope", "text-embedding-v3", "1024", "embeddings:dashscope/text-embedding-v3:1024:", "embeddings"),
+    ("dashscope", "text-embedding-v3", "512", "embeddings:dashscope/text-embedding-v3:512:", "embeddings"),
+    ("dashscope", "text-embedding-v4", "1024", "embeddings:dashscope/text-embedding-v4:1024:", None),
+    ("dashscope", "text-embedding-v2", "1024", "embeddings:dashscope/text-embedding-v2:1536:", None),
+    ("local", "hash", "64", "embeddings:local/hash:64:", None),
+    ("openai", "text-embedding-3-small", "256", "embeddings:openai/text-embedding-3-small:256:", None),
+])
+def test_embeddings_store_namespace(monkeypatch, provider, model, dimension, namespace, legacy_namespace):
+    """测试缓存命名空间使用模型实际输出的维度，只有旧版默认的DashScope模型才回查旧版缓存"""
+    monkeypatch.setenv("EMBEDDINGS_PROVIDER", provider)
+    monkeypatch.setenv("EMBEDDINGS_MODEL", model)
+    monkeypatch.setenv("EMBEDDINGS_DIMENSION", dimension)
+
+    store = EmbeddingsService(FakeRedis()).store
+
+    assert store.namespace == namespace
+    assert store.legacy_namespace == legacy_namespace
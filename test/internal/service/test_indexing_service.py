@@ -0,0 +1,108 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.documents import Document as LCDocument
+
+from internal.core.deduplication import simhash_fingerprint
+from internal.schema.document_schema import CreateDocumentsReq
+from internal.service.indexing_service import IndexingService
+from internal.service.process_rule_service import ProcessRuleService
+
+DISCLAIMER = "免责声明：本文档内容仅供参考，不构成任何投资建议或承诺，本公司对信息的准确性和完整性不作任何保证，版权所有。第{}页"
+CONTENT = "LLMOps平台支持知识库管理、应用编排、工作流以及多种内置工具，帮助开发者快速构建属于自己的AI应用。"
+EXISTING = "知识库文档会被解析、分割成片段，再提取关键词并写入向量数据库，之后即可在应用中通过检索召回使用。"
+
+
+def _rule(remove_duplicate_segments: bool) -> dict:
+    return {
+        "pre_process_rules": [
+            {"id": "remove_extra_space", "enabled": True},
+            {"id": "remove_url_and_email", "enabled": True},
+            {"id": "remove_duplicate_segments", "enabled": remove_duplicate_segments},
+        ],
+        "segment": {"separators": ["\n\n"], "chunk_size": 100, "chunk_overlap": 0},
+    }
+
+
+class _StubQuery:
+    def __init__(self, rows: list):
+        self.rows = rows
+
+    def with_entities(self, *args):
+        return self
+
+    def filter(self, *args):
+        return self
+
+    def scalar(self):
+        return 0
+
+    def all(self):
+        return self.rows
+
+
+def _splitting(monkeypatch, remove_duplicate_segments: bool):
+    """使用真实的处理规则服务与文本分割器执行_splitting，返回保留的片段、写入的片段以及文档更新的字段"""
+    existing_fingerprints = [(simhash_fingerprint(EXISTING),)]
+    indexing_service = IndexingService(
+        db=SimpleNamespace(session=SimpleNamespace(query=lambda *args: _StubQuery(existing_fingerprints))),
+        redis_client=None,
+        file_extractor=None,
+        process_rule_service=ProcessRuleService(),
+        embeddings_service=SimpleNamespace(calculate_token_count=len),
+        jieba_service=None,
+        keyword_table_service=None,
+        vector_database_service=None,
+    )
+    created, updates = [], {}
+    monkeypatch.setattr(
+        indexing_service, "create",
+        lambda model, **kwargs: created.append(SimpleNamespace(id=uuid.uuid4(), **kwargs)) or created[-1],
+    )
+    monkeypatch.setattr(indexing_service, "update", lambda model, **kwargs: updates.update(kwargs))
+    document = SimpleNamespace(
+        id=uuid.uuid4(), account_id=uuid.uuid4(), dataset_id=uuid.uuid4(),
+        process_rule=SimpleNamespace(rule=_rule(remove_duplicate_segments)),
+    )
+    page_content = "\n\n".join([
+        DISCLAIMER.format(1), CONTENT, DISCLAIMER.format(2), "—" * 60, EXISTING, "=" * 60, DISCLAIMER.format(3),
+    ])
+    lc_segments = indexing_service._splitting(document, [LCDocument(page_content=page_content)])
+    return lc_segments, created, updates
+
+
+def test_splitting_skips_near_duplicate_segments(monkeypatch):
+    """测试开启近似重复片段去除后，重复的样板文本以及知识库中已有的片段被跳过并记录数量，无有效文字的片段不参与检测"""
+    lc_segments, created, updates = _splitting(monkeypatch, True)
+
+    assert [segment.content for segment in created] == [DISCLAIMER.format(1), CONTENT, "—" * 60, "=" * 60]
+    assert [segment.fingerprint for segment in created][2:] == ["", ""]
+    assert [segment.position for segment in created] == [1, 2, 3, 4]
+    assert len(lc_segments) == 4
+    assert updates["duplicate_segment_count"] == 3
+
+
+def test_splitting_keeps_duplicates_when_rule_disabled(monkeypatch):
+    """测试未开启近似重复片段去除时保留全部片段，但仍然记录指纹"""
+    lc_segments, created, updates = _splitting(monkeypatch, False)
+
+    assert len(created) == len(lc_segments) == 7
+    assert updates["duplicate_segment_count"] == 0
+    assert created[0].fingerprint == simhash_fingerprint(DISCLAIMER.format(1)) != ""
+
+
+@pytest.mark.parametrize("pre_process_rules, is_valid", [
+    (_rule(True)["pre_process_rules"], True),
+    (_rule(True)["pre_process_rules"][:2], True),
+    (_rule(True)["pre_process_rules"][1:], False),
+    ([*_rule(True)["pre_process_rules"][:2], {"id": "remove_duplicate_segments", "enabled": "yes"}], False),
+])
+def test_create_documents_req_duplicate_rule_is_optional(app, pre_process_rules, is_valid):
+    """测试近似重复片段去除为可选的预处理规则，两个必填规则缺失或者enabled格式错误时校验失败"""
+    rule = {**_rule(True), "pre_process_rules": pre_process_rules}
+    with app.test_request_context(method="POST", json={
+        "upload_file_ids": [str(uuid.uuid4())], "process_type": "custom", "rule": rule,
+    }):
+        req = CreateDocumentsReq()
+        assert req.validate() is is_valid
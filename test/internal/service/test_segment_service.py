@@ -0,0 +1,49 @@
+import uuid
+from types import SimpleNamespace
+
+from internal.core.deduplication import simhash_fingerprint
+from internal.entity.dataset_entity import SegmentStatus
+from internal.service.segment_service import SegmentService
+
+
+class _StubQuery:
+    def filter(self, *args):
+        return self
+
+    def first(self):
+        return 0, 0
+
+
+def test_update_segment_recomputes_fingerprint(monkeypatch):
+    """测试修改片段内容时同步更新SimHash指纹，避免新文档按旧内容做近似重复检测"""
+    account = SimpleNamespace(id=uuid.uuid4())
+    segment = SimpleNamespace(
+        id=uuid.uuid4(), account_id=account.id, dataset_id=uuid.uuid4(), document_id=uuid.uuid4(),
+        node_id=uuid.uuid4(), status=SegmentStatus.COMPLETED, hash="old", fingerprint=simhash_fingerprint("旧的片段内容"),
+        document=SimpleNamespace(id=uuid.uuid4()),
+    )
+    segment_service = SegmentService(
+        db=SimpleNamespace(session=SimpleNamespace(query=lambda *args: _StubQuery())),
+        redis_client=None,
+        jieba_service=None,
+        embeddings_service=SimpleNamespace(
+            calculate_token_count=len, embeddings=SimpleNamespace(embed_query=lambda text: [0.0]),
+        ),
+        keyword_table_service=SimpleNamespace(
+            delete_keyword_table_from_ids=lambda *args: None, add_keyword_table_from_ids=lambda *args: None,
+        ),
+        vector_database_service=SimpleNamespace(collection=SimpleNamespace(
+            data=SimpleNamespace(update=lambda **kwargs: None),
+        )),
+    )
+    monkeypatch.setattr(segment_service, "get", lambda model, model_id: segment)
+    monkeypatch.setattr(
+        segment_service, "update", lambda model, **kwargs: [setattr(model, key, value) for key, value in kwargs.items()],
+    )
+    req = SimpleNamespace(
+        content=SimpleNamespace(data="LLMOps平台支持知识库管理与应用编排"), keywords=SimpleNamespace(data=["LLMOps"]),
+    )
+
+    segment_service.update_segment(segment.dataset_id, segment.document_id, segment.id, req, account)
+
+    assert segment.fingerprint == simhash_fingerprint("LLMOps平台支持知识库管理与应用编排")
@@ -0,0 +1,64 @@
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import internal.service.web_app_service as web_app_service_module
+from internal.service.web_app_service import WebAppService
+from pkg.paginator import decode_cursor
+
+
+class _StubQuery:
+    """按created_at、id倒序返回会话，记录查询的条数"""
+
+    def __init__(self, rows: list):
+        self.rows = rows
+        self.limits = []
+
+    def filter(self, *args):
+        return self
+
+    def order_by(self, *args):
+        return self
+
+    def limit(self, limit: int):
+        self.limits.append(limit)
+        return SimpleNamespace(all=lambda: self.rows[:limit])
+
+
+def _get_conversations(monkeypatch, count: int):
+    now = datetime(2024, 10, 1)
+    rows = [SimpleNamespace(id=uuid.uuid4(), created_at=now - timedelta(minutes=i)) for i in range(count)]
+    query = _StubQuery(rows)
+    web_app_service = WebAppService(
+        db=SimpleNamespace(session=SimpleNamespace(query=lambda *args: query)),
+        app_config_service=None,
+        retrieval_service=None,
+        conversation_service=None,
+        language_model_service=None,
+        optimized_mcp_service=None,
+    )
+    monkeypatch.setattr(web_app_service, "get_web_app", lambda token: SimpleNamespace(id=uuid.uuid4()))
+    monkeypatch.setattr(web_app_service_module, "WEB_APP_CONVERSATION_LIMIT", 3)
+    req = SimpleNamespace(cursor_mode=False, is_pinned=SimpleNamespace(data=False))
+
+    conversations, paginator = web_app_service.get_conversations("token", req, SimpleNamespace(id=uuid.uuid4()))
+    return rows, query, conversations, paginator
+
+
+def test_legacy_conversations_report_truncation(monkeypatch):
+    """测试未携带游标时最多返回WEB_APP_CONVERSATION_LIMIT条会话，被截断时返回继续获取的游标"""
+    rows, query, conversations, paginator = _get_conversations(monkeypatch, 5)
+
+    assert conversations == rows[:3]
+    assert query.limits == [4]
+    assert paginator.has_more
+    assert decode_cursor(paginator.next_cursor) == [rows[2].created_at, str(rows[2].id)]
+
+
+def test_legacy_conversations_without_truncation(monkeypatch):
+    """测试会话数不超过上限时返回全部会话，且没有更多数据"""
+    rows, query, conversations, paginator = _get_conversations(monkeypatch, 3)
+
+    assert conversations == rows
+    assert not paginator.has_more
+    assert paginator.next_cursor == ""
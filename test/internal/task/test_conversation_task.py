@@ -0,0 +1,61 @@
+import json
+import uuid
+
+from redis import Redis
+
+import internal.service.conversation_service as conversation_service_module
+from app.http.module import injector
+from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
+from internal.service.conversation_service import ConversationService
+from internal.task.conversation_task import persist_agent_thoughts
+from test.fake_redis import FakeRedis
+
+
+def test_persist_agent_thoughts_registered(app):
+    """worker从app.http.app启动，启动后需要能找到推理过程异步写入任务"""
+    assert persist_agent_thoughts.name in app.extensions["celery"].tasks
+
+
+def test_persist_agent_thoughts_options():
+    """推理过程写入任务执行完成后才确认，写入失败时自动重试"""
+    assert persist_agent_thoughts.acks_late
+    assert persist_agent_thoughts.reject_on_worker_lost
+    assert persist_agent_thoughts.autoretry_for == (Exception,)
+    assert persist_agent_thoughts.max_retries > 0
+
+
+def test_write_behind_round_trip(monkeypatch):
+    """开启异步写入时推理过程经JSON序列化投递，任务还原出与原始数据一致的推理过程并替换写入"""
+    task_id = uuid.uuid4()
+    agent_thoughts = [
+        AgentThought(
+            id=uuid.uuid4(), task_id=task_id, event=QueueEvent.AGENT_ACTION, tool="google_serper",
+            tool_input={"query": "LLMOps"}, observation="结果", latency=0.3,
+        ),
+        AgentThought(
+            id=uuid.uuid4(), task_id=task_id, event=QueueEvent.AGENT_MESSAGE, answer="你好",
+            message=[{"role": "user", "content": "你好"}], total_price=0.01, stream_id="1-0",
+        ),
+    ]
+    delayed, persisted = [], []
+    monkeypatch.setattr(conversation_service_module, "AGENT_THOUGHT_WRITE_BEHIND", True)
+    monkeypatch.setattr(persist_agent_thoughts, "delay", lambda *args: delayed.append(args))
+    conversation_service = ConversationService(db=None, redis_client=FakeRedis(), app_stat_service=None)
+    monkeypatch.setattr(conversation_service, "persist_agent_thoughts", lambda **kwargs: persisted.append(kwargs))
+    get = injector.get
+    monkeypatch.setattr(
+        injector, "get",
+        lambda cls: conversation_service if cls is ConversationService else FakeRedis() if cls is Redis else get(cls),
+    )
+
+    conversation_service.save_agent_thoughts(
+        account_id=uuid.uuid4(), app_id=uuid.uuid4(), app_config={"long_term_memory": {"enable": False}},
+        conversation_id=uuid.uuid4(), message_id=uuid.uuid4(), agent_thoughts=agent_thoughts,
+    )
+    account_id, app_id, app_config, conversation_id, message_id, payload = delayed[0]
+    persist_agent_thoughts(account_id, app_id, app_config, conversation_id, message_id, json.loads(json.dumps(payload)))
+
+    assert persisted[0]["replace_existing"] is True
+    assert persisted[0]["agent_thoughts"] == [
+        agent_thought.model_copy(update={"stream_id": ""}) for agent_thought in agent_thoughts
+    ]
@@ -0,0 +1,127 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Uuid, create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session, declarative_base, joinedload, relationship
+
+from internal.exception import ValidateErrorException
+from pkg.paginator import CursorPaginator, decode_cursor, encode_cursor
+
+Base = declarative_base()
+
+
+class _Item(Base):
+    """游标分页测试数据"""
+    __tablename__ = "item"
+    id = Column(String(36), primary_key=True)
+    position = Column(Integer)
+    created_at = Column(DateTime)
+    tags = relationship("_Tag")
+
+
+class _Tag(Base):
+    """用于验证预加载关联查询的数据"""
+    __tablename__ = "tag"
+    id = Column(Integer, primary_key=True)
+    item_id = Column(ForeignKey("item.id"))
+
+
+@pytest.fixture
+def session():
+    """内存SQLite数据库，创建5条数据，其中两条created_at相同"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([
+            _Item(id=f"id-{i}", position=i, created_at=datetime(2024, 9, 1, min(i, 3))) for i in range(5)
+        ])
+        session.commit()
+        yield session
+
+
+def _paginate_all(query, columns, ascending: bool = False, page_size: int = 2) -> list[list[str]]:
+    """按游标依次获取所有页，返回每页数据的id"""
+    pages, cursor = [], ""
+    while True:
+        paginator = CursorPaginator(db=None)
+        paginator.page_size, paginator.cursor = page_size, cursor
+        pages.append([item.id for item in paginator.paginate(query, columns, ascending)])
+        if not paginator.has_more:
+            assert paginator.next_cursor == ""
+            return pages
+        cursor = paginator.next_cursor
+
+
+def test_cursor_round_trip():
+    """测试游标编码后可以还原排序列的取值，时间类型保持为datetime"""
+    created_at = datetime(2024, 9, 8, 22, 57, 3)
+    id = uuid.uuid4()
+    cursor = encode_cursor([created_at, id])
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == [created_at, str(id)]
+    assert decode_cursor(encode_cursor([12, str(id)])) == [12, str(id)]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor!", "e30", ""])
+def test_decode_invalid_cursor(cursor):
+    """测试格式错误的游标抛出ValueError"""
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_cursor_paginate_descending(session):
+    """测试按(created_at, id)倒序翻页，相同时间的数据按id区分且不重复、不遗漏"""
+    query = session.query(_Item)
+    assert _paginate_all(query, [_Item.created_at, _Item.id]) == [
+        ["id-4", "id-3"], ["id-2", "id-1"], ["id-0"],
+    ]
+
+
+def test_cursor_paginate_ascending(session):
+    """测试按(position, id)正序翻页，数据条数刚好为页大小整数倍时最后一页没有更多数据"""
+    query = session.query(_Item).filter(_Item.position < 4)
+    assert _paginate_all(query, [_Item.position, _Item.id], ascending=True) == [
+        ["id-0", "id-1"], ["id-2", "id-3"],
+    ]
+
+
+@pytest.mark.parametrize("values", [
+    [datetime(2024, 9, 1, 2), "id-2", 3],
+    [datetime(2024, 9, 1, 2)],
+    ["2024-09-01T02:00:00", "id-2"],
+    [datetime(2024, 9, 1, 2), 2],
+])
+def test_cursor_paginate_rejects_tampered_cursor(session, values):
+    """测试取值个数或者类型与排序列不一致的游标抛出数据验证异常，而不是执行出错的SQL"""
+    paginator = CursorPaginator(db=None)
+    paginator.cursor = encode_cursor(values)
+
+    with pytest.raises(ValidateErrorException):
+        paginator.paginate(session.query(_Item), [_Item.created_at, _Item.id])
+
+
+def test_cursor_values_follow_column_types():
+    """测试UUID排序列的游标取值被还原为UUID，格式错误时抛出数据验证异常"""
+    id = uuid.uuid4()
+    columns = [Column("created_at", DateTime), Column("id", Uuid)]
+    paginator = CursorPaginator(db=None)
+
+    paginator.cursor = encode_cursor([datetime(2024, 9, 1), id])
+    assert paginator._decode_cursor_values(columns) == (datetime(2024, 9, 1), id)
+
+    paginator.cursor = encode_cursor([datetime(2024, 9, 1), "not-a-uuid"])
+    with pytest.raises(ValidateErrorException):
+        paginator._decode_cursor_values(columns)
+
+
+def test_compile_count_statement(session):
+    """测试估算总条数的语句展开IN参数并去除预加载的关联查询"""
+    query = session.query(_Item).options(joinedload(_Item.tags)).filter(_Item.position.in_([1, 2, 3]))
+    sql, params = CursorPaginator.compile_count_statement(query, postgresql.psycopg2.dialect())
+
+    assert "POSTCOMPILE" not in sql
+    assert "JOIN" not in sql
+    assert sorted(params.values()) == [1, 2, 3]